@@ -0,0 +1,77 @@
+import hashlib
+import os
+import re
+import threading
+
+from blob_store import link_into
+
+
+def sanitize_filename(name: str) -> str:
+    """Remove caracteres inválidos para NTFS e normaliza espaços."""
+    name = re.sub(r'[<>:"/\\|?*]', "_", name)
+    name = re.sub(r"\s+", " ", name).strip()
+    return name or "anexo"
+
+
+def _md5(path):
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+class AdmissionalArchive:
+    """
+    Consumidor da varredura do main.py: arquiva os anexos dos emails "ASO ADMISSIONAL"
+    em dest_base/<data de recebimento>/, no mesmo layout do aso_admissional_email.py,
+    reaproveitando o arquivo que o main ja salvou (hardlink) em vez de um segundo
+    SaveAsFile sobre o mesmo email.
+
+    So recebe os anexos que o main salva: assunto aceito pela regex do main (que exige
+    "ASO ADMISSIONAL - <obra>"), dentro da janela e ainda nao lidos em execucao anterior
+    (marca d'agua, indice de mensagens, pre-filtro de anexos) nem abaixo de
+    ASO_ATTACH_MIN_BYTES. O que o main pulou por ja conhecer foi arquivado na execucao
+    que o leu primeiro.
+    """
+
+    name = "admissional"
+
+    def __init__(self, dest_base, subject_prefix="ASO ADMISSIONAL", exts=(".pdf",), log_fn=None):
+        self.dest_base = dest_base
+        self.subject_prefix = (subject_prefix or "").strip().upper()
+        self.exts = tuple(e.lower() for e in exts or ())
+        self._log = log_fn
+        self._hashes = set()
+        self._lock = threading.Lock()
+        self.saved = 0
+        self.linked = 0
+
+    def accepts(self, subject):
+        return (subject or "").strip().upper().startswith(self.subject_prefix)
+
+    def consume(self, received, filename, path, subject="", sender=""):
+        """Arquiva path (anexo ja salvo em disco); retorna o destino ou None se ignorado/duplicado."""
+        nome = filename or os.path.basename(path)
+        if self.exts and not nome.lower().endswith(self.exts):
+            return None
+        h = _md5(path)
+        with self._lock:
+            if h in self._hashes:
+                return None
+            self._hashes.add(h)
+            pasta = os.path.join(self.dest_base, received.strftime("%Y-%m-%d"))
+            os.makedirs(pasta, exist_ok=True)
+            base, ext = os.path.splitext(sanitize_filename(nome))
+            destino = os.path.join(pasta, base + ext)
+            seq = 1
+            while os.path.exists(destino):
+                destino = os.path.join(pasta, f"{base}_{seq}{ext}")
+                seq += 1
+            modo = link_into(path, destino)
+            self.saved += 1
+            if modo == "link":
+                self.linked += 1
+        if self._log:
+            self._log(f"Anexo arquivado (admissional): {destino} | Assunto: {subject} | De: {sender}")
+        return destino
@@ -1,5 +1,5 @@
 import os
-import re
+import sys
 import hashlib
 import traceback
 from datetime import datetime, timedelta
@@ -7,6 +7,10 @@ from datetime import datetime, timedelta
 import win32com.client as win32
 from dotenv import load_dotenv
 from custom_logger import emit_terminal
+from outlook_scan import OUTLOOK_TABLE_SCAN, EntryIdItems, build_dasl_filter, table_rows
+from folder_cache import FolderCache, mailbox_key
+from admissional_archive import sanitize_filename
+from folder_index import FolderIndex, find_folder
 
 load_dotenv()
 
@@ -32,6 +36,18 @@ MAX_EMAILS = int(os.getenv("ASO_MAX_EMAILS", "400"))
 # Profundidade máxima de varredura de pastas (fallback recursivo)
 MAPI_SCAN_DEPTH = int(os.getenv("ASO_MAPI_SCAN_DEPTH", "6"))
 
+# Cache da pasta resolvida (StoreID/EntryID); a cascata de descoberta so roda se o id falhar
+FOLDER_CACHE_ENABLED = os.getenv("ASO_FOLDER_CACHE", "1").strip().lower() in ("1", "true", "yes")
+FOLDER_CACHE_PATH = os.getenv("ASO_FOLDER_CACHE_PATH") or os.path.join(DEST_BASE, "json", "folder_cache.json")
+
+# Indice persistido da arvore de pastas MAPI para a varredura por nome (reindexa a raiz apos ASO_FOLDER_INDEX_MAX_AGE_H)
+FOLDER_INDEX_ENABLED = os.getenv("ASO_FOLDER_INDEX", "1").strip().lower() in ("1", "true", "yes")
+FOLDER_INDEX_PATH = os.getenv("ASO_FOLDER_INDEX_PATH") or os.path.join(DEST_BASE, "json", "folder_index.json")
+FOLDER_INDEX_MAX_AGE_H = float(os.getenv("ASO_FOLDER_INDEX_MAX_AGE_H", "168") or 0)
+
+# Com ASO_ADMISSIONAL_SHARED=1 o main.py arquiva estes anexos na propria varredura
+SHARED_SCAN = os.getenv("ASO_ADMISSIONAL_SHARED", "").strip().lower() in ("1", "true", "yes")
+
 LOG_DIR = os.path.join(DEST_BASE, "logs")
 os.makedirs(LOG_DIR, exist_ok=True)
 
@@ -136,13 +152,6 @@ def enviar_resumo_email(destinatario, relatorio):
         registrar_log(f"Falha ao enviar email de resumo: {e}")
 
 
-def sanitize_filename(name: str) -> str:
-    """Remove caracteres inválidos para NTFS e normaliza espaços."""
-    name = re.sub(r'[<>:"/\\|?*]', "_", name)
-    name = re.sub(r"\s+", " ", name).strip()
-    return name or "anexo"
-
-
 def hash_file(path: str) -> str | None:
     """Retorna hash MD5 do arquivo ou None em caso de erro."""
     md5 = hashlib.md5()
@@ -241,13 +250,26 @@ def _iter_folders(folder, max_depth=4, depth=0):
         return
 
 
-def procurar_pasta_por_nome(namespace, wanted_names, max_depth=4):
+def procurar_pasta_por_nome(namespace, wanted_names, max_depth=4, index=None):
     """
     Procura uma pasta por nome (case-insensitive) em:
     - namespace.Folders (roots)
     - cada Store.GetRootFolder()
     Retorna o primeiro folder que casar.
+    Com index (FolderIndex), a busca e feita no indice persistido e so raizes novas ou
+    vencidas sao varridas; sem indice, percorre a arvore inteira via COM.
     """
+    if index is not None:
+        try:
+            return find_folder(namespace, index, wanted_names, max_depth=max_depth, log_fn=registrar_log)
+        except Exception as e:
+            registrar_log(f"Falha no indice de pastas; varrendo direto: {e}")
+        finally:
+            try:
+                index.save()
+            except Exception as e:
+                registrar_log(f"Falha ao gravar indice de pastas: {e}")
+
     wanted = [w.lower() for w in wanted_names if w]
 
     # 1) roots (namespace.Folders)
@@ -348,15 +370,37 @@ def salvar_anexos(msg, destino_base, hashes_vistos: set[str]) -> int:
     return saved
 
 
-def buscar_emails(limit: int = MAX_EMAILS) -> None:
+def buscar_emails(limit: int = MAX_EMAILS, forcar: bool = False) -> None:
     """
     Lê a caixa de entrada da conta alvo, filtra assunto prefixo 'ASO ADMISSIONAL'
     (case-insensitive) recebido nos últimos DAYS_BACK dias e salva anexos.
+    Com SHARED_SCAN a coleta já acontece no main.py; forcar=True (--force) roda mesmo assim.
     """
+    if SHARED_SCAN and not forcar:
+        registrar_log("ASO_ADMISSIONAL_SHARED ativo: anexos arquivados pela varredura do main.py; coleta separada ignorada.")
+        return
+
     namespace = conectar_outlook()
-    conta = obter_conta(namespace)
 
     mailbox_root = None
+    inbox = None
+
+    # 0) pasta resolvida em execucao anterior, aberta direto pelo EntryID
+    folder_cache = None
+    cache_key = mailbox_key(TARGET_ACCOUNT, MAILBOX_NAME, STORE_NAME)
+    if FOLDER_CACHE_ENABLED:
+        try:
+            folder_cache = FolderCache(FOLDER_CACHE_PATH)
+            inbox = folder_cache.open(namespace, cache_key, log_fn=registrar_log)
+        except Exception as e:
+            registrar_log(f"Falha ao carregar cache de pastas: {e}")
+            inbox = None
+    inbox_em_cache = inbox is not None
+    if inbox_em_cache:
+        mailbox_root = inbox
+        registrar_log(f"Usando pasta em cache: {getattr(inbox, 'FolderPath', '')}")
+
+    conta = obter_conta(namespace) if not mailbox_root else None
 
     # 1) tentar conta real
     if conta:
@@ -382,7 +426,6 @@ def buscar_emails(limit: int = MAX_EMAILS) -> None:
             registrar_log(f"Usando inbox compartilhada de: {TARGET_ACCOUNT}")
 
     # 4) fallback: Store mapeada (Data Files)
-    inbox = None
     if not mailbox_root:
         try:
             stores = namespace.Stores
@@ -406,7 +449,13 @@ def buscar_emails(limit: int = MAX_EMAILS) -> None:
     # 5) FALLBACK EXTRA: varrer tudo no MAPI procurando pasta "Aso/ASO"
     if not mailbox_root:
         wanted_names = [STORE_NAME, MAILBOX_NAME, "Aso", "ASO", TARGET_ACCOUNT]
-        found = procurar_pasta_por_nome(namespace, wanted_names, max_depth=MAPI_SCAN_DEPTH)
+        folder_index = None
+        if FOLDER_INDEX_ENABLED:
+            try:
+                folder_index = FolderIndex(FOLDER_INDEX_PATH, max_age_h=FOLDER_INDEX_MAX_AGE_H)
+            except Exception as e:
+                registrar_log(f"Falha ao carregar indice de pastas: {e}")
+        found = procurar_pasta_por_nome(namespace, wanted_names, max_depth=MAPI_SCAN_DEPTH, index=folder_index)
         if found:
             mailbox_root = found
             registrar_log(f"Encontrada pasta por varredura MAPI: {getattr(found, 'Name', '')}")
@@ -437,7 +486,29 @@ def buscar_emails(limit: int = MAX_EMAILS) -> None:
         registrar_log(f"Erro ao acessar caixa de entrada: {e}")
         return
 
+    if folder_cache is not None and not inbox_em_cache:
+        try:
+            folder_cache.remember(cache_key, inbox)
+            folder_cache.save()
+        except Exception as e:
+            registrar_log(f"Falha ao gravar cache de pastas: {e}")
+
     limite_data = datetime.now() - timedelta(days=DAYS_BACK)
+
+    # Table API: data/assunto lidos em bloco; só os candidatos são abertos pelo EntryID.
+    linhas = None
+    if OUTLOOK_TABLE_SCAN:
+        filtro = build_dasl_filter(limite_data, None, subject_like=f"{SUBJECT_PREFIX}%")
+        linhas = table_rows(inbox, filtro, max_rows=limit, log_fn=registrar_log)
+    if linhas is not None:
+        prefixo = SUBJECT_PREFIX.upper()
+        candidatas = [
+            linha for linha in linhas
+            if linha.received and linha.received >= limite_data
+            and linha.subject.strip().upper().startswith(prefixo)
+        ]
+        itens = EntryIdItems(namespace, candidatas, store_id=getattr(inbox, "StoreID", None))
+
     hashes_vistos: set[str] = set()
     processados = 0
     salvos = 0
@@ -472,7 +543,7 @@ def buscar_emails(limit: int = MAX_EMAILS) -> None:
 if __name__ == "__main__":
     registrar_log("===== INÍCIO: COLETA ASO ADMISSIONAL =====")
     try:
-        buscar_emails()
+        buscar_emails(forcar="--force" in sys.argv[1:])
     except Exception as e:
         registrar_log(f"Erro fatal: {e}")
         try:
@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# Uma trava por caminho enquanto houver quem a use (contagem de usos); depois sai do dicionario.
+_TRAVAS = {}
+_TRAVAS_LOCK = threading.Lock()
+
+
+@contextmanager
+def trava_caminho(path):
+    """Serializa, dentro do processo, quem le e regrava o mesmo arquivo; produz o caminho normalizado."""
+    chave = os.path.normcase(os.path.abspath(path))
+    with _TRAVAS_LOCK:
+        trava, usos = _TRAVAS.get(chave, (None, 0))
+        trava = trava or threading.Lock()
+        _TRAVAS[chave] = (trava, usos + 1)
+    try:
+        with trava:
+            yield chave
+    finally:
+        with _TRAVAS_LOCK:
+            trava, usos = _TRAVAS[chave]
+            if usos <= 1:
+                del _TRAVAS[chave]
+            else:
+                _TRAVAS[chave] = (trava, usos - 1)
+
+
+def write_text_atomic(path, text, encoding="utf-8"):
+    """Grava o arquivo inteiro em um temporario na mesma pasta e troca com os.replace."""
+    pasta = os.path.dirname(path) or "."
+    os.makedirs(pasta, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=os.path.splitext(path)[1], dir=pasta)
+    try:
+        with os.fdopen(fd, "w", encoding=encoding, newline="") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return path
+
+
+def write_json_atomic(path, data, indent=2):
+    return write_text_atomic(path, json.dumps(data, indent=indent, ensure_ascii=False))
+
+
+def read_json(path, default=None):
+    if not path or not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return default
+
+
+def read_text(path, default=""):
+    if not path or not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception:
+        return default
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import tempfile
+from collections import namedtuple
+from datetime import datetime
+
+from atomic_io import read_json, write_json_atomic
+
+
+PR_ATTACH_DATA_BIN = "http://schemas.microsoft.com/mapi/proptag/0x37010102"
+PR_ATTACH_CONTENT_ID = "http://schemas.microsoft.com/mapi/proptag/0x3712001F"
+
+
+class AttachmentFingerprint(namedtuple("AttachmentFingerprint", "key strong name size")):
+    """
+    strong=True: derivada do conteudo (hash de PR_ATTACH_DATA_BIN) ou do content id MAPI,
+    segura para pular o anexo. strong=False: so nome + tamanho, apenas informativa.
+    """
+
+    __slots__ = ()
+
+
+def attachment_size(att):
+    try:
+        return int(getattr(att, "Size", None))
+    except (TypeError, ValueError):
+        return None
+
+
+def attachment_data(att):
+    """PR_ATTACH_DATA_BIN via PropertyAccessor, ou None se indisponivel/recusado (sem SaveAsFile)."""
+    accessor = getattr(att, "PropertyAccessor", None)
+    if accessor is None:
+        return None
+    try:
+        dados = accessor.GetProperty(PR_ATTACH_DATA_BIN)
+    except Exception:
+        return None
+    return bytes(dados) if dados else None
+
+
+def attachment_bytes(att, tmp_dir=None):
+    """
+    Conteudo do anexo em memoria: PR_ATTACH_DATA_BIN via PropertyAccessor ou, se recusado,
+    SaveAsFile num temporario local (tmp_dir; nunca a pasta da obra), lido e removido.
+    """
+    dados = attachment_data(att)
+    if dados is not None:
+        return dados
+    fd, caminho = tempfile.mkstemp(prefix="aso_anexo_", suffix=".pdf", dir=tmp_dir)
+    os.close(fd)
+    try:
+        att.SaveAsFile(caminho)
+        with open(caminho, "rb") as f:
+            return f.read()
+    finally:
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+def attachment_fingerprint(att, data=None, read_data=True):
+    """
+    Impressao digital do anexo sem SaveAsFile (nenhum I/O em disco); data = bytes ja lidos.
+    read_data=False: o chamador ja tentou attachment_data; nao pede o binario de novo ao Outlook.
+    """
+    nome = (getattr(att, "FileName", "") or "").strip().lower()
+    tamanho = attachment_size(att)
+    if not data and read_data:
+        # PropertyAccessor pode recusar binarios grandes; nesse caso cai para o content id.
+        data = attachment_data(att)
+    if data:
+        return AttachmentFingerprint(f"sha256:{hashlib.sha256(data).hexdigest()}", True, nome, tamanho)
+    accessor = getattr(att, "PropertyAccessor", None)
+    if accessor is not None:
+        try:
+            content_id = accessor.GetProperty(PR_ATTACH_CONTENT_ID)
+            if content_id:
+                return AttachmentFingerprint(f"cid:{content_id}|{nome}|{tamanho or ''}", True, nome, tamanho)
+        except Exception:
+            pass
+    return AttachmentFingerprint(f"meta:{nome}|{tamanho or ''}", False, nome, tamanho)
+
+
+class AttachmentIndex:
+    """Impressoes digitais (fortes) de anexos ja processados com sucesso."""
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        data = read_json(path, default=None)
+        if not isinstance(data, dict) or not isinstance(data.get("fingerprints"), dict):
+            data = {"version": self.VERSION, "fingerprints": {}}
+        self._data = data
+        self._dirty = False
+
+    def __contains__(self, key):
+        return bool(key) and key in self._data["fingerprints"]
+
+    def add(self, key, **info):
+        if not key:
+            return
+        entry = {"updated_at": datetime.now().isoformat()}
+        entry.update(info)
+        self._data["fingerprints"][key] = entry
+        self._dirty = True
+
+    def __len__(self):
+        return len(self._data["fingerprints"])
+
+    def save(self):
+        if not self._dirty or not self.path:
+            return
+        self._data["version"] = self.VERSION
+        self._data["updated_at"] = datetime.now().isoformat()
+        write_json_atomic(self.path, self._data)
+        self._dirty = False
@@ -0,0 +1,127 @@
+import base64
+import json
+import os
+import time
+
+from atomic_io import read_json, write_json_atomic
+
+try:
+    import win32crypt  # DPAPI (pywin32): cifra presa ao usuario/maquina do Windows
+except ImportError:
+    win32crypt = None
+
+_DPAPI_DESCRICAO = "ASOgui Yube storage_state"
+
+
+def dpapi_disponivel():
+    return win32crypt is not None
+
+
+def _selar(estado):
+    texto = json.dumps(estado, ensure_ascii=False)
+    if win32crypt is None:
+        return "none", estado
+    blob = win32crypt.CryptProtectData(texto.encode("utf-8"), _DPAPI_DESCRICAO, None, None, None, 0)
+    return "dpapi", base64.b64encode(bytes(blob)).decode("ascii")
+
+
+def _abrir(data):
+    protecao = data.get("protection")
+    if protecao == "none":
+        return data.get("state")
+    if protecao == "dpapi":
+        if win32crypt is None:
+            raise ValueError("estado cifrado com DPAPI sem win32crypt disponivel")
+        _descricao, texto = win32crypt.CryptUnprotectData(base64.b64decode(data["state"]), None, None, None, 0)
+        return json.loads(bytes(texto).decode("utf-8"))
+    raise ValueError(f"protecao desconhecida: {protecao}")
+
+
+class AuthStateStore:
+    """
+    storage_state do Playwright (cookies + localStorage) da ultima sessao autenticada na Yube,
+    reaproveitado na criacao do proximo contexto. Fica no perfil do usuario (fora do share),
+    gravado de forma atomica com permissao so do dono (mkstemp cria 0600); com pywin32 o
+    conteudo e cifrado com DPAPI. Sem DPAPI, os cookies so sao gravados em texto puro com
+    allow_plaintext=True (com aviso no log); caso contrario nada e salvo e um estado em texto
+    puro ja existente e ignorado e apagado. Estado mais velho que max_age_h, ilegivel ou
+    recusado pela sonda de autenticacao e apagado. Contadores: hits (login pulado), misses
+    (estado recusado), absent (sem estado valido) e saves.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path, max_age_h=12, clock=time.time, allow_plaintext=False, log_fn=None):
+        self.path = path
+        self.max_age_h = max_age_h
+        self._clock = clock
+        self.allow_plaintext = allow_plaintext
+        self._log = log_fn
+        self._avisado = False
+        self.hits = 0
+        self.misses = 0
+        self.absent = 0
+        self.saves = 0
+
+    def load(self):
+        data = read_json(self.path, default=None)
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            return None
+        try:
+            idade_h = (self._clock() - float(data.get("saved_at") or 0)) / 3600
+            if self.max_age_h and idade_h > self.max_age_h:
+                self.clear()
+                return None
+            if data.get("protection") == "none" and not self.allow_plaintext:
+                raise ValueError("estado em texto puro nao permitido")
+            estado = _abrir(data)
+        except Exception:
+            self.clear()
+            return None
+        return estado if isinstance(estado, dict) else None
+
+    def _avisar(self, mensagem):
+        if self._log is not None and not self._avisado:
+            self._avisado = True
+            self._log(mensagem)
+
+    def save(self, estado):
+        """Grava o estado; devolve False se ele nao pode ser protegido e o texto puro nao foi permitido."""
+        if not dpapi_disponivel():
+            if not self.allow_plaintext:
+                self._avisar(
+                    "pywin32 (DPAPI) indisponivel: sessao da Yube NAO sera salva em disco "
+                    "(YUBE_AUTH_STATE_PLAINTEXT=1 grava os cookies em texto puro)."
+                )
+                return False
+            self._avisar(f"ATENCAO: cookies da sessao da Yube gravados SEM cifra em {self.path} (so o dono pode ler).")
+        protecao, conteudo = _selar(estado)
+        write_json_atomic(self.path, {
+            "version": self.VERSION,
+            "saved_at": self._clock(),
+            "protection": protecao,
+            "state": conteudo,
+        })
+        if protecao == "none":
+            try:
+                os.chmod(self.path, 0o600)
+            except OSError:
+                pass
+        self.saves += 1
+        return True
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def as_dict(self):
+        tentativas = self.hits + self.misses + self.absent
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "absent": self.absent,
+            "saves": self.saves,
+            "hit_rate": round(self.hits / tentativas, 3) if tentativas else None,
+        }
@@ -0,0 +1,205 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from atomic_io import read_json, write_json_atomic
+
+BUFFER_BYTES = 1024 * 1024
+
+
+def sha256_file(path, buffer_size=BUFFER_BYTES):
+    h = hashlib.sha256()
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+
+def link_into(origem, destino):
+    """destino passa a apontar para o conteudo de origem: hardlink (outro volume: copia), trocado com os.replace."""
+    temporario = f"{destino}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        os.link(origem, temporario)
+        modo = "link"
+    except OSError:
+        shutil.copyfile(origem, temporario)
+        modo = "copy"
+    try:
+        os.replace(temporario, destino)
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+    return modo
+
+
+class StreamHasher:
+    """SHA-256 incremental dos bytes gravados por um stream; reset() quando o download recomeca do zero."""
+
+    def __init__(self, name="sha256"):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self._h = hashlib.new(self.name)
+        self.size = 0
+
+    def update(self, data):
+        self._h.update(data)
+        self.size += len(data)
+
+    def hexdigest(self):
+        return self._h.hexdigest()
+
+
+class BlobStore:
+    """
+    Anexos enderecados por conteudo: root/<sha256[:2]>/<sha256><ext>. O arquivo de trabalho
+    (temporario na pasta da obra, download do Google Drive) vira um hardlink do blob, entao
+    cada conteudo fica uma vez so em disco. O hash de um stream e calculado enquanto os
+    bytes sao gravados (remember); arquivos gravados por terceiros (SaveAsFile) sao lidos
+    uma vez, em blocos grandes. O indice (index_path) guarda os digests conhecidos e quais
+    ja foram processados com sucesso; ele sobrevive entre execucoes e a limpeza de blobs
+    antigos (prune) so remove os bytes, nao a entrada do indice.
+    """
+
+    VERSION = 1
+
+    def __init__(self, root, index_path=None, buffer_size=BUFFER_BYTES):
+        self.root = root
+        self.index_path = index_path
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._conhecidos = {}
+        data = read_json(index_path, default=None) if index_path else None
+        if not isinstance(data, dict) or not isinstance(data.get("blobs"), dict):
+            data = {"version": self.VERSION, "blobs": {}}
+        self._data = data
+        self._dirty = False
+        self.stored = 0
+        self.reused = 0
+        self.hashed_on_write = 0
+        self.rehashed_bytes = 0
+
+    def path_for(self, digest, ext=".pdf"):
+        return os.path.join(self.root, digest[:2], digest + (ext or ".bin"))
+
+    def remember(self, path, digest):
+        """Hash ja calculado durante a escrita de path: ingest nao rele o arquivo."""
+        st = os.stat(path)
+        with self._lock:
+            self._conhecidos[os.path.abspath(path)] = (st.st_size, st.st_mtime_ns, digest)
+
+    def digest_of(self, path):
+        st = os.stat(path)
+        with self._lock:
+            conhecido = self._conhecidos.pop(os.path.abspath(path), None)
+        if conhecido is not None and conhecido[:2] == (st.st_size, st.st_mtime_ns):
+            with self._lock:
+                self.hashed_on_write += 1
+            return conhecido[2]
+        digest = sha256_file(path, self.buffer_size)
+        with self._lock:
+            self.rehashed_bytes += st.st_size
+        return digest
+
+    def ingest(self, path):
+        """Registra path no store e devolve (sha256, blob, novo); conteudo repetido passa a ser hardlink do blob."""
+        digest = self.digest_of(path)
+        ext = os.path.splitext(path)[1].lower() or ".bin"
+        blob = self.path_for(digest, ext)
+        with self._lock:
+            novo = not os.path.exists(blob)
+            if novo:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                link_into(path, blob)
+                self.stored += 1
+            else:
+                self.reused += 1
+            entry = self._data["blobs"].setdefault(digest, {"stored_at": datetime.now().isoformat()})
+            entry["ext"] = ext
+            entry["size"] = os.path.getsize(blob)
+            self._dirty = True
+        if not novo and not os.path.samefile(path, blob):
+            # Mesmo conteudo ja guardado: a copia de trabalho vira referencia ao blob.
+            link_into(blob, path)
+        return digest, blob, novo
+
+    def lookup(self, digest):
+        """Caminho do blob de digest, se o conteudo ainda esta no store (ou None)."""
+        with self._lock:
+            entry = self._data["blobs"].get(digest)
+        if not isinstance(entry, dict):
+            return None
+        blob = self.path_for(digest, entry.get("ext") or ".pdf")
+        return blob if os.path.exists(blob) else None
+
+    def is_processed(self, digest):
+        """Conteudo ja processado com sucesso (nesta ou em outra execucao)."""
+        with self._lock:
+            entry = self._data["blobs"].get(digest)
+        return isinstance(entry, dict) and bool(entry.get("processed_at"))
+
+    def mark_processed(self, digest, **info):
+        if not digest:
+            return
+        with self._lock:
+            entry = self._data["blobs"].setdefault(digest, {"stored_at": datetime.now().isoformat()})
+            entry["processed_at"] = datetime.now().isoformat()
+            entry.update(info)
+            self._dirty = True
+
+    def __len__(self):
+        return len(self._data["blobs"])
+
+    def save(self):
+        with self._lock:
+            if not self._dirty or not self.index_path:
+                return
+            self._data["version"] = self.VERSION
+            self._data["updated_at"] = datetime.now().isoformat()
+            write_json_atomic(self.index_path, self._data)
+            self._dirty = False
+
+    def prune(self, max_age_days, now=None):
+        """
+        Remove blobs mais velhos que max_age_days que nao estao referenciados por nenhum
+        hardlink. So os bytes saem: o digest continua no indice (deduplicacao entre execucoes).
+        """
+        if not max_age_days or not os.path.isdir(self.root):
+            return 0
+        limite = (now or time.time()) - max_age_days * 86400
+        removidos = 0
+        for prefixo in os.scandir(self.root):
+            if not prefixo.is_dir():
+                continue
+            for entrada in os.scandir(prefixo.path):
+                try:
+                    st = entrada.stat()
+                    if st.st_nlink <= 1 and st.st_mtime < limite:
+                        os.remove(entrada.path)
+                        removidos += 1
+                except OSError:
+                    continue
+        return removidos
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "stored": self.stored,
+                "reused": self.reused,
+                "hashed_on_write": self.hashed_on_write,
+                "rehashed_bytes": self.rehashed_bytes,
+                "indexed": len(self._data["blobs"]),
+            }
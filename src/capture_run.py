@@ -0,0 +1,190 @@
+import hashlib
+import threading
+
+from blob_store import sha256_file
+from outlook_scan import ProxyStats
+
+
+class CaptureRun:
+    """
+    Estado de uma execucao de captar_emails compartilhado pelos estagios do pipeline
+    (uma thread COM por caixa, workers de OCR, thread unica do RPA): janela de busca,
+    contadores, deduplicacao da execucao, indices persistentes e as travas que os
+    protegem. Os estagios em main.py recebem a instancia explicitamente; indices e
+    caches desligados ficam None.
+    """
+
+    def __init__(
+        self,
+        stats,
+        inicio_hoje,
+        inicio_janela,
+        inicio_amanha,
+        limit=200,
+        watch=False,
+        fonte=None,
+        caixas=(),
+        manifest_items=None,
+        run_budget=None,
+        reprocess=False,
+        full_rescan=False,
+        keep_com=False,
+        log_fn=None,
+    ):
+        self.stats = stats
+        self.inicio_hoje = inicio_hoje
+        self.inicio_janela = inicio_janela
+        self.inicio_amanha = inicio_amanha
+        self.limit = limit
+        self.watch = watch
+        self.fonte = fonte
+        self.caixas = list(caixas)
+        self.manifest_items = manifest_items
+        self.run_budget = run_budget
+        self.reprocess = reprocess
+        self.full_rescan = full_rescan
+        # Modo watch: namespace do Outlook mantido na thread COM entre ciclos.
+        self.keep_com = keep_com
+        self._log = log_fn
+
+        self.sync_state = None
+        self.message_index = None
+        self.attachment_index = None
+        self.gdrive_cache = None
+        self.blob_store = None
+        self.folder_cache = None
+        self.consumidores = []
+        self.pipeline = None
+        self.downloads = None
+
+        self.com_stats = ProxyStats()
+        self.por_caixa = {}
+        self.em_memoria = {"attachments": 0, "bytes": 0}
+        self.sample_subjects = []
+        self.processados = 0
+        self.last_error = None
+
+        self._anexos_processados = set()
+        self._impressoes = set()
+        # Marca d'agua bloqueada por pasta (sync_key): falha numa caixa nao segura as outras.
+        self._marca_bloqueada = {}
+        self._pastas_em_uso = set()
+        self.trava_hashes = threading.Lock()
+        self.trava_stats = threading.Lock()
+        self.trava_pastas = threading.Lock()
+
+    # Contadores ---------------------------------------------------------
+
+    def stats_parcial(self):
+        # Cada anexo (e cada caixa, no estagio COM) conta num dicionario proprio, somado em stats.
+        return {
+            k: [] if isinstance(v, list) else 0
+            for k, v in self.stats.items()
+            if isinstance(v, (list, int)) and not isinstance(v, bool)
+        }
+
+    def mesclar_stats(self, parcial):
+        with self.trava_stats:
+            for k, v in parcial.items():
+                if isinstance(v, list):
+                    self.stats[k].extend(v)
+                elif v:
+                    self.stats[k] += v
+
+    def contar_em_memoria(self, tamanho):
+        with self.trava_stats:
+            self.em_memoria["attachments"] += 1
+            self.em_memoria["bytes"] += tamanho
+
+    def orcamento_estourado(self):
+        if self.run_budget is None or not self.run_budget.expired():
+            return False
+        with self.trava_stats:
+            primeira_vez = not self.stats["run_budget_exceeded"]
+            self.stats["run_budget_exceeded"] = True
+        if primeira_vez and self._log is not None:
+            self._log(
+                "Orcamento de tempo da execucao excedido; novos anexos nao serao aceitos.",
+                context={"limite_sec": self.run_budget.seconds, "elapsed_sec": round(self.run_budget.elapsed(), 1)},
+            )
+        return True
+
+    # Deduplicacao -------------------------------------------------------
+
+    def ja_sincronizada(self, sync_key, recebido, entry_id):
+        if self.sync_state is None or sync_key is None or self.full_rescan:
+            return False
+        return self.sync_state.ja_sincronizada(sync_key, recebido, entry_id)
+
+    def impressao_nova(self, chave):
+        # Mesmo anexo encaminhado para mais de uma caixa: so a primeira leitura o salva.
+        with self.trava_hashes:
+            if chave in self._impressoes:
+                return False
+            if self.attachment_index is not None and chave in self.attachment_index and not self.reprocess:
+                return False
+            self._impressoes.add(chave)
+            return True
+
+    def hash_novo(self, caminho, dados=None, digest=None):
+        """
+        Hash do anexo, ou None se o conteudo ja foi processado (nesta execucao ou, pelo indice
+        do store, numa anterior). digest: SHA-256 ja conhecido (download do Drive). Sem digest,
+        o store usa o hash calculado na escrita e o PDF vira hardlink do blob; anexo em memoria
+        e hasheado dos proprios bytes, sem blob (nada e gravado no share).
+        """
+        hash_atual = digest
+        if hash_atual is None and dados is not None:
+            hash_atual = hashlib.sha256(dados).hexdigest()
+        elif hash_atual is None and self.blob_store is not None:
+            try:
+                hash_atual = self.blob_store.ingest(caminho)[0]
+            except OSError as e:
+                if self._log is not None:
+                    self._log(f"  Falha ao guardar anexo no store por conteudo: {e}")
+        if hash_atual is None:
+            hash_atual = sha256_file(caminho)
+        if self.blob_store is not None and not self.reprocess and self.blob_store.is_processed(hash_atual):
+            return None
+        with self.trava_hashes:
+            if hash_atual in self._anexos_processados:
+                return None
+            self._anexos_processados.add(hash_atual)
+            return hash_atual
+
+    def gdrive_ja_processado(self, entrada):
+        if self.gdrive_cache is None or entrada is None or self.reprocess:
+            return False
+        return self.gdrive_cache.is_processed(entrada)
+
+    # Pastas e marca d'agua ----------------------------------------------
+
+    def reservar_pasta(self, sync_key):
+        """False se outra caixa desta execucao ja le a mesma pasta."""
+        with self.trava_stats:
+            if sync_key in self._pastas_em_uso:
+                return False
+            self._pastas_em_uso.add(sync_key)
+            return True
+
+    def segurar_marca(self, sync_key):
+        """A marca d'agua da pasta nao avanca mais nesta execucao."""
+        self._marca_bloqueada[sync_key] = True
+
+    def concluir_sync(self, email):
+        """Avanca a marca d'agua da pasta ate o email concluido (nunca alem de um que falhou)."""
+        sync_key = email.get("sync_key")
+        if email.get("falhou") or email.get("reler"):
+            # reler: RPA com erro ou anexo com erro/paginas com falha, a refazer na proxima execucao.
+            self.segurar_marca(sync_key)
+        sync_msg = email.get("sync_msg")
+        if sync_msg is not None and email.get("nao_aceitos"):
+            # Anexos recusados pelo orcamento: email precisa ser revisto na proxima execucao.
+            self.segurar_marca(sync_key)
+        if (
+            self.sync_state is not None
+            and sync_key is not None
+            and sync_msg is not None
+            and not self._marca_bloqueada.get(sync_key)
+        ):
+            self.sync_state.advance(sync_key, *sync_msg)
@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import deque
+
+DEFAULT_DELAYS_MS = (250, 500, 1000, 2000)
+
+
+class BackoffSchedule:
+    """
+    Atraso (ms) da proxima tentativa de uma chamada COM rejeitada (Outlook ocupado).
+    Fixo: ciclo 250/500/1000/2000 (comportamento historico). Adaptativo: sobe um degrau
+    por rejeicao dentro da janela recente (rajada = Outlook travado, espera mais) e volta
+    ao primeiro degrau quando a janela esvazia.
+    """
+
+    def __init__(self, delays=DEFAULT_DELAYS_MS, adaptive=False, window_sec=10.0, clock=time.monotonic):
+        self.delays = tuple(delays) or DEFAULT_DELAYS_MS
+        self.adaptive = adaptive
+        self.window_sec = window_sec
+        self._clock = clock
+        self._idx = 0
+        self._recentes = deque()
+
+    def next_delay(self):
+        if not self.adaptive:
+            delay = self.delays[self._idx % len(self.delays)]
+            self._idx += 1
+            return delay
+        agora = self._clock()
+        self._recentes.append(agora)
+        while self._recentes and agora - self._recentes[0] > self.window_sec:
+            self._recentes.popleft()
+        return self.delays[min(len(self._recentes), len(self.delays)) - 1]
+
+
+def _zerados():
+    return {"rejections": 0, "retries": 0, "cancelled": 0, "backoff_ms": 0, "max_delay_ms": 0, "max_wait_ms": 0}
+
+
+class RejectionStats:
+    """
+    Rejeicoes de chamadas COM vistas pelos MessageFilter da execucao (um por thread COM):
+    total, novas tentativas, canceladas, atraso somado e a maior espera de uma unica chamada.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_thread = {}
+
+    def reset(self):
+        with self._lock:
+            self._por_thread = {}
+
+    def record(self, delay_ms, waited_ms, thread_name=None):
+        """delay_ms < 0 = chamada cancelada; waited_ms = tempo desde o inicio da chamada (tickCount)."""
+        nome = thread_name or threading.current_thread().name
+        with self._lock:
+            c = self._por_thread.setdefault(nome, _zerados())
+            c["rejections"] += 1
+            if delay_ms < 0:
+                c["cancelled"] += 1
+                espera = waited_ms or 0
+            else:
+                c["retries"] += 1
+                c["backoff_ms"] += delay_ms
+                c["max_delay_ms"] = max(c["max_delay_ms"], delay_ms)
+                espera = (waited_ms or 0) + delay_ms
+            c["max_wait_ms"] = max(c["max_wait_ms"], int(espera))
+
+    def for_thread(self, thread_name):
+        with self._lock:
+            return dict(self._por_thread.get(thread_name) or _zerados())
+
+    def as_dict(self):
+        with self._lock:
+            total = _zerados()
+            for c in self._por_thread.values():
+                for k in ("rejections", "retries", "cancelled", "backoff_ms"):
+                    total[k] += c[k]
+                for k in ("max_delay_ms", "max_wait_ms"):
+                    total[k] = max(total[k], c[k])
+            return total
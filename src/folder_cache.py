@@ -0,0 +1,82 @@
+from datetime import datetime
+
+from atomic_io import read_json, write_json_atomic
+
+
+def mailbox_key(*nomes):
+    """Chave do cache: identificadores configurados da mailbox (email, nome visivel, store)."""
+    return "|".join((n or "").strip().lower() for n in nomes)
+
+
+def open_folder(namespace, entry_id, store_id=None):
+    if store_id:
+        return namespace.GetFolderFromID(entry_id, store_id)
+    return namespace.GetFolderFromID(entry_id)
+
+
+class FolderCache:
+    """
+    StoreID/EntryID da pasta resolvida em execucoes anteriores, para abrir a inbox
+    direto com Namespace.GetFolderFromID. A cascata de descoberta (contas, Folders(nome),
+    inbox compartilhada, varredura MAPI) so roda quando o id em cache falha.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        data = read_json(path, default=None)
+        if not isinstance(data, dict) or not isinstance(data.get("folders"), dict):
+            data = {"version": self.VERSION, "folders": {}}
+        self._data = data
+        self._dirty = False
+
+    def get(self, key):
+        entry = self._data["folders"].get(key)
+        if not isinstance(entry, dict) or not entry.get("entry_id"):
+            return None
+        return entry
+
+    def open(self, namespace, key, log_fn=None):
+        """Abre a pasta em cache; se o id nao abrir mais, esquece a entrada e retorna None."""
+        entry = self.get(key)
+        if entry is None:
+            return None
+        try:
+            folder = open_folder(namespace, entry["entry_id"], entry.get("store_id"))
+            # GetFolderFromID pode devolver um proxy valido para pasta removida; Items confirma.
+            folder.Items
+        except Exception as e:
+            if log_fn:
+                log_fn(f"Pasta em cache nao abriu ({entry.get('folder_path') or entry['entry_id']}); refazendo descoberta: {e}")
+            self.forget(key)
+            return None
+        return folder
+
+    def remember(self, key, folder):
+        entry_id = getattr(folder, "EntryID", None)
+        if not entry_id:
+            return
+        store_id = getattr(folder, "StoreID", None)
+        atual = self._data["folders"].get(key) or {}
+        if atual.get("entry_id") == entry_id and atual.get("store_id") == store_id:
+            return
+        self._data["folders"][key] = {
+            "entry_id": entry_id,
+            "store_id": store_id,
+            "folder_path": getattr(folder, "FolderPath", "") or "",
+            "updated_at": datetime.now().isoformat(),
+        }
+        self._dirty = True
+
+    def forget(self, key):
+        if self._data["folders"].pop(key, None) is not None:
+            self._dirty = True
+
+    def save(self):
+        if not self._dirty or not self.path:
+            return
+        self._data["version"] = self.VERSION
+        self._data["updated_at"] = datetime.now().isoformat()
+        write_json_atomic(self.path, self._data)
+        self._dirty = False
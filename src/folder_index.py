@@ -0,0 +1,209 @@
+from collections import deque, namedtuple
+from datetime import datetime, timedelta
+
+from atomic_io import read_json, write_json_atomic
+from folder_cache import open_folder
+
+
+class FolderRecord(namedtuple("FolderRecord", "name path entry_id store_id item_count depth root")):
+    """Uma pasta MAPI indexada; root = chave da raiz (store) em que foi encontrada."""
+
+    __slots__ = ()
+
+
+def _colecao(folders):
+    try:
+        total = folders.Count
+    except Exception:
+        return
+    for i in range(1, total + 1):
+        try:
+            yield folders.Item(i)
+        except Exception:
+            continue
+
+
+def list_roots(namespace):
+    """Raizes a indexar: namespace.Folders e Store.GetRootFolder(), sem repetir a mesma store."""
+    raizes = []
+    vistas = set()
+
+    def _add(folder):
+        chave = root_key(folder)
+        if chave and chave not in vistas:
+            vistas.add(chave)
+            raizes.append((chave, folder))
+
+    try:
+        for root in _colecao(namespace.Folders):
+            _add(root)
+    except Exception:
+        pass
+    try:
+        for store in _colecao(namespace.Stores):
+            try:
+                _add(store.GetRootFolder())
+            except Exception:
+                continue
+    except Exception:
+        pass
+    return raizes
+
+
+def root_key(folder):
+    store_id = getattr(folder, "StoreID", None)
+    entry_id = getattr(folder, "EntryID", None)
+    if not store_id and not entry_id:
+        return None
+    return f"{store_id or ''}|{entry_id or ''}"
+
+
+def walk_bfs(root, max_depth=4):
+    """(pasta, profundidade) em largura: pastas rasas (as provaveis) saem primeiro."""
+    fila = deque([(root, 0)])
+    while fila:
+        folder, depth = fila.popleft()
+        yield folder, depth
+        if depth >= max_depth:
+            continue
+        try:
+            subs = folder.Folders
+        except Exception:
+            continue
+        for sub in _colecao(subs):
+            fila.append((sub, depth + 1))
+
+
+def _registro(folder, depth, chave_raiz):
+    try:
+        item_count = folder.Items.Count
+    except Exception:
+        item_count = None
+    return FolderRecord(
+        getattr(folder, "Name", "") or "",
+        getattr(folder, "FolderPath", "") or "",
+        getattr(folder, "EntryID", None),
+        getattr(folder, "StoreID", None),
+        item_count,
+        depth,
+        chave_raiz,
+    )
+
+
+def name_matches(name, wanted):
+    nome = (name or "").lower()
+    return any(w == nome or w in nome for w in wanted)
+
+
+class FolderIndex:
+    """
+    Arvore de pastas MAPI (nome, caminho, EntryID, StoreID, total de itens) montada em
+    largura e persistida em JSON. Busca por nome e feita em memoria; so raizes novas,
+    vencidas (max_age) ou invalidadas por um EntryID que nao abre sao varridas de novo.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path, max_age_h=24 * 7):
+        self.path = path
+        self.max_age = timedelta(hours=max_age_h) if max_age_h else None
+        data = read_json(path, default=None)
+        if not isinstance(data, dict) or not isinstance(data.get("roots"), dict):
+            data = {"version": self.VERSION, "roots": {}}
+        self._data = data
+        self._dirty = False
+        self.scanned_roots = 0
+
+    def records(self):
+        for chave, raiz in self._data["roots"].items():
+            for f in raiz.get("folders") or []:
+                yield FolderRecord(
+                    f.get("name", ""), f.get("path", ""), f.get("entry_id"), f.get("store_id"),
+                    f.get("item_count"), f.get("depth", 0), chave,
+                )
+
+    def find(self, wanted_names):
+        """Registros cujo nome casa (igual ou contem), na ordem raiz -> largura."""
+        wanted = [w.lower() for w in wanted_names if w]
+        if not wanted:
+            return []
+        return [r for r in self.records() if r.entry_id and name_matches(r.name, wanted)]
+
+    def _vencida(self, raiz, now):
+        if raiz.get("max_depth") is None:
+            return True
+        if self.max_age is None:
+            return False
+        try:
+            return now - datetime.fromisoformat(raiz.get("indexed_at") or "") > self.max_age
+        except ValueError:
+            return True
+
+    def index_root(self, chave, folder, max_depth):
+        registros = [_registro(f, d, chave) for f, d in walk_bfs(folder, max_depth=max_depth)]
+        self._data["roots"][chave] = {
+            "name": getattr(folder, "Name", "") or "",
+            "max_depth": max_depth,
+            "indexed_at": datetime.now().isoformat(),
+            "folders": [
+                {"name": r.name, "path": r.path, "entry_id": r.entry_id, "store_id": r.store_id, "item_count": r.item_count, "depth": r.depth}
+                for r in registros
+            ],
+        }
+        self._dirty = True
+        self.scanned_roots += 1
+        return registros
+
+    def refresh(self, namespace, max_depth=4, force=False, log_fn=None):
+        """Varre so as raizes novas, vencidas ou indexadas com profundidade menor; remove as que sumiram."""
+        now = datetime.now()
+        raizes = list_roots(namespace)
+        atuais = {chave for chave, _ in raizes}
+        for chave in list(self._data["roots"]):
+            if chave not in atuais:
+                del self._data["roots"][chave]
+                self._dirty = True
+        for chave, folder in raizes:
+            raiz = self._data["roots"].get(chave)
+            if not force and raiz is not None and not self._vencida(raiz, now) and raiz["max_depth"] >= max_depth:
+                continue
+            if log_fn:
+                log_fn(f"Indexando pastas MAPI: {getattr(folder, 'Name', '') or chave}")
+            self.index_root(chave, folder, max_depth)
+
+    def invalidate_root(self, chave):
+        raiz = self._data["roots"].get(chave)
+        if raiz is not None:
+            raiz["max_depth"] = None
+            self._dirty = True
+
+    def save(self):
+        if not self._dirty or not self.path:
+            return
+        self._data["version"] = self.VERSION
+        self._data["updated_at"] = datetime.now().isoformat()
+        write_json_atomic(self.path, self._data)
+        self._dirty = False
+
+
+def find_folder(namespace, index, wanted_names, max_depth=4, log_fn=None):
+    """
+    Primeira pasta cujo nome casa, aberta pelo EntryID/StoreID do indice. Registro que nao
+    abre (pasta movida/removida) invalida a raiz, que e reindexada na mesma chamada.
+    """
+    for _tentativa in range(2):
+        index.refresh(namespace, max_depth=max_depth, log_fn=log_fn)
+        invalidou = False
+        for rec in index.find(wanted_names):
+            if rec.depth > max_depth:
+                continue
+            try:
+                return open_folder(namespace, rec.entry_id, rec.store_id)
+            except Exception:
+                # Arvore mudou: reindexa a raiz antes de tentar outros registros dela.
+                index.invalidate_root(rec.root)
+                invalidou = True
+                break
+        if not invalidou:
+            break
+    return None
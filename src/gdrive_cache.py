@@ -0,0 +1,118 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+from atomic_io import read_json, write_json_atomic
+
+
+class GDriveCache:
+    """
+    Arquivos do Google Drive ja baixados, por file id: nome resolvido, tamanho, SHA-256,
+    validadores HTTP (ETag/Last-Modified). O conteudo fica no BlobStore (o download vira
+    hardlink do blob, com o hash calculado durante o stream). Dentro do TTL o id e servido
+    do blob (ou pulado, se o mesmo conteudo ja foi processado) sem acesso a rede; depois
+    disso o download vira uma requisicao condicional (304 = conteudo igual).
+    """
+
+    VERSION = 2
+
+    def __init__(self, path, blob_store, ttl_sec=24 * 3600):
+        self.path = path
+        self.blob_store = blob_store
+        self.ttl_sec = ttl_sec
+        data = read_json(path, default=None)
+        # Versao 1 (copias por MD5 fora do store) e descartada: os ids voltam a ser baixados.
+        if not isinstance(data, dict) or not isinstance(data.get("files"), dict) or data.get("version") != self.VERSION:
+            data = {"version": self.VERSION, "files": {}}
+        self._data = data
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def get(self, file_id):
+        """Entrada do id com o blob ainda presente no store (ou None); "blob" = caminho atual."""
+        with self._lock:
+            entry = self._data["files"].get(file_id)
+            if not isinstance(entry, dict) or not entry.get("sha256"):
+                return None
+            entry = dict(entry)
+        blob = self.blob_store.lookup(entry["sha256"])
+        if blob is None:
+            return None
+        entry["blob"] = blob
+        return entry
+
+    def is_fresh(self, entry, now=None):
+        if not entry or not self.ttl_sec:
+            return False
+        try:
+            verificado = datetime.fromisoformat(entry.get("checked_at") or "")
+        except ValueError:
+            return False
+        return (now or datetime.now()) - verificado < timedelta(seconds=self.ttl_sec)
+
+    @staticmethod
+    def is_processed(entry):
+        return bool(entry) and entry.get("processed_sha256") == entry.get("sha256")
+
+    @staticmethod
+    def validators(entry):
+        """Cabecalhos condicionais para revalidar a entrada (vazio se o servidor nao mandou nenhum)."""
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, file_id, src_path, filename, etag=None, last_modified=None):
+        """Guarda src_path no BlobStore (hardlink; hash do stream, sem reler) e registra o id."""
+        sha256, blob, _novo = self.blob_store.ingest(src_path)
+        agora = datetime.now().isoformat()
+        with self._lock:
+            anterior = self._data["files"].get(file_id) or {}
+            entry = {
+                "filename": filename,
+                "size": os.path.getsize(blob),
+                "sha256": sha256,
+                "etag": etag,
+                "last_modified": last_modified,
+                "checked_at": agora,
+                "updated_at": agora,
+            }
+            if anterior.get("processed_sha256"):
+                entry["processed_sha256"] = anterior["processed_sha256"]
+            self._data["files"][file_id] = entry
+            self._dirty = True
+        return dict(entry, blob=blob)
+
+    def touch(self, file_id):
+        """Revalidacao respondeu 304: conteudo igual, renova o TTL."""
+        with self._lock:
+            entry = self._data["files"].get(file_id)
+            if isinstance(entry, dict):
+                entry["checked_at"] = datetime.now().isoformat()
+                self._dirty = True
+
+    def mark_processed(self, file_id, sha256):
+        with self._lock:
+            entry = self._data["files"].get(file_id)
+            if isinstance(entry, dict) and entry.get("sha256") == sha256:
+                entry["processed_sha256"] = sha256
+                self._dirty = True
+
+    def forget(self, file_id):
+        with self._lock:
+            if self._data["files"].pop(file_id, None) is not None:
+                self._dirty = True
+
+    def __len__(self):
+        return len(self._data["files"])
+
+    def save(self):
+        with self._lock:
+            if not self._dirty or not self.path:
+                return
+            self._data["version"] = self.VERSION
+            self._data["updated_at"] = datetime.now().isoformat()
+            write_json_atomic(self.path, self._data)
+            self._dirty = False
@@ -0,0 +1,255 @@
+import http.client
+import os
+import socket
+import threading
+import urllib.error
+import urllib.request
+
+
+# Leitura em blocos grandes: PDFs de lote do Drive passam de dezenas de MB.
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+_ERROS_CONEXAO = (http.client.IncompleteRead, http.client.HTTPException, ConnectionError, socket.timeout, TimeoutError)
+
+
+class ConnectionPool:
+    """
+    Conexoes http.client ociosas por (esquema, host, tunel), reaproveitadas entre downloads.
+    tunel: host:porta de destino quando host e um proxy HTTPS (CONNECT via set_tunnel).
+    """
+
+    def __init__(self, max_per_host=4, timeout=60):
+        self.max_per_host = max(1, int(max_per_host or 1))
+        self.timeout = timeout
+        self._livres = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, https, host, timeout=None, tunnel=None, tunnel_headers=None):
+        chave = (https, host, tunnel)
+        with self._lock:
+            livres = self._livres.get(chave)
+            if livres:
+                self.reused += 1
+                return livres.pop(), True
+            self.created += 1
+        cls = http.client.HTTPSConnection if https else http.client.HTTPConnection
+        conn = cls(host, timeout=timeout or self.timeout)
+        if tunnel:
+            conn.set_tunnel(tunnel, headers=tunnel_headers)
+        return conn, False
+
+    def release(self, https, host, conn, tunnel=None):
+        with self._lock:
+            livres = self._livres.setdefault((https, host, tunnel), [])
+            if len(livres) < self.max_per_host:
+                livres.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            conexoes = [c for livres in self._livres.values() for c in livres]
+            self._livres.clear()
+        for conn in conexoes:
+            conn.close()
+
+
+class _PooledResponse:
+    """
+    Resposta no formato que o urllib espera (code/msg/url/info). A conexao volta ao pool
+    so se o corpo foi lido ate o fim; fechada antes disso (ex.: filtro de nome) e descartada.
+    """
+
+    def __init__(self, resp, conn, devolver, url):
+        self._resp = resp
+        self._conn = conn
+        self._devolver = devolver
+        self.url = url
+        self.code = self.status = resp.status
+        self.msg = self.reason = resp.reason
+        self.headers = resp.headers
+
+    def info(self):
+        return self.headers
+
+    def geturl(self):
+        return self.url
+
+    def getcode(self):
+        return self.code
+
+    def _fim(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        if self._resp.isclosed() and not self._resp.will_close:
+            self._devolver(conn)
+        else:
+            self._resp.close()
+            conn.close()
+
+    def read(self, n=-1):
+        dados = self._resp.read() if n is None or n < 0 else self._resp.read(n)
+        if not dados or self._resp.isclosed():
+            self._fim()
+        return dados
+
+    def readinto(self, buf):
+        n = self._resp.readinto(buf)
+        if not n or self._resp.isclosed():
+            self._fim()
+        return n
+
+    def close(self):
+        self._fim()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        self.close()
+        return False
+
+
+class KeepAliveHandler(urllib.request.AbstractHTTPHandler):
+    """
+    Handler do urllib que reaproveita conexoes (HTTP/1.1 keep-alive) via ConnectionPool,
+    no lugar do HTTPHandler/HTTPSHandler padrao, que abre um socket por requisicao.
+    """
+
+    handler_order = 400
+
+    def __init__(self, pool=None, debuglevel=0):
+        super().__init__(debuglevel)
+        self.pool = pool or ConnectionPool()
+
+    http_request = urllib.request.AbstractHTTPHandler.do_request_
+    https_request = urllib.request.AbstractHTTPHandler.do_request_
+
+    def http_open(self, req):
+        return self._abrir(req, False)
+
+    def https_open(self, req):
+        return self._abrir(req, True)
+
+    def _abrir(self, req, https):
+        host = req.host
+        if not host:
+            raise urllib.error.URLError("no host given")
+        headers = dict(req.unredirected_hdrs)
+        headers.update({k: v for k, v in req.headers.items() if k not in headers})
+        headers = {nome.title(): valor for nome, valor in headers.items()}
+        headers["Connection"] = "keep-alive"
+        timeout = req.timeout if isinstance(req.timeout, (int, float)) else None
+        # Com HTTPS_PROXY o ProxyHandler troca req.host pelo proxy e guarda o destino em
+        # _tunnel_host: como no do_open do urllib, a conexao abre um tunel CONNECT ate ele.
+        tunel = getattr(req, "_tunnel_host", None) or None
+        tunel_headers = {}
+        if tunel and "Proxy-Authorization" in headers:
+            tunel_headers["Proxy-Authorization"] = headers.pop("Proxy-Authorization")
+
+        while True:
+            conn, reaproveitada = self.pool.acquire(https, host, timeout, tunnel=tunel, tunnel_headers=tunel_headers)
+            try:
+                conn.request(req.get_method(), req.selector, req.data, headers)
+                resp = conn.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                # Conexao ociosa pode ter sido fechada pelo servidor: tenta uma nova.
+                if reaproveitada:
+                    continue
+                raise urllib.error.URLError(e)
+            return _PooledResponse(resp, conn, lambda c: self.pool.release(https, host, c, tunnel=tunel), req.get_full_url())
+
+
+def content_length(resp):
+    try:
+        valor = int(resp.headers.get("Content-Length"))
+    except (TypeError, ValueError):
+        return None
+    return valor if valor >= 0 else None
+
+
+def range_start(resp):
+    """Inicio do Content-Range de uma resposta 206 (ou None se nao for parcial)."""
+    if getattr(resp, "status", getattr(resp, "code", None)) != 206:
+        return None
+    valor = (resp.headers.get("Content-Range") or "").strip()
+    try:
+        unidade, resto = valor.split(" ", 1)
+        return int(resto.split("-", 1)[0]) if unidade.lower() == "bytes" else None
+    except ValueError:
+        return None
+
+
+def _ler(resp, view):
+    readinto = getattr(resp, "readinto", None)
+    if readinto is not None:
+        return readinto(view)
+    dados = resp.read(len(view))
+    view[: len(dados)] = dados
+    return len(dados)
+
+
+def _fechar(resp):
+    try:
+        resp.close()
+    except Exception:
+        pass
+
+
+def stream_to_file(resp, path, reopen=None, chunk_size=DEFAULT_CHUNK_SIZE, retries=3, log_fn=None, hasher=None):
+    """
+    Grava o corpo de resp em path (via path + ".part"). Se a conexao cair no meio,
+    reopen(offset) refaz a requisicao com "Range: bytes=offset-" e o download continua
+    de onde parou; servidor sem suporte a Range (200) recomeca do zero.
+    hasher (update/reset, ex.: blob_store.StreamHasher) recebe os bytes na mesma passada da escrita.
+    """
+    parcial = path + ".part"
+    total = content_length(resp)
+    escritos = 0
+    tentativas = 0
+    view = memoryview(bytearray(max(64 * 1024, int(chunk_size or DEFAULT_CHUNK_SIZE))))
+    try:
+        with open(parcial, "wb") as f:
+            while True:
+                try:
+                    while True:
+                        n = _ler(resp, view)
+                        if not n:
+                            break
+                        f.write(view[:n])
+                        if hasher is not None:
+                            hasher.update(view[:n])
+                        escritos += n
+                    _fechar(resp)
+                    if total is not None and escritos < total:
+                        raise http.client.IncompleteRead(b"", total - escritos)
+                    break
+                except _ERROS_CONEXAO as e:
+                    _fechar(resp)
+                    if reopen is None or tentativas >= retries:
+                        raise
+                    tentativas += 1
+                    if log_fn:
+                        log_fn(f"  Download interrompido em {escritos} bytes ({e!r}); retomando ({tentativas}/{retries}).")
+                    resp = reopen(escritos)
+                    if range_start(resp) == escritos:
+                        continue
+                    # Sem Range: o servidor mandou o arquivo inteiro de novo.
+                    f.seek(0)
+                    f.truncate()
+                    if hasher is not None:
+                        hasher.reset()
+                    escritos = 0
+                    total = content_length(resp)
+        os.replace(parcial, path)
+    except BaseException:
+        try:
+            os.remove(parcial)
+        except OSError:
+            pass
+        raise
+    return path
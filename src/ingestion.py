@@ -0,0 +1,265 @@
+import os
+import re
+import shutil
+from collections import namedtuple
+from datetime import datetime
+from email import policy
+from email.parser import BytesHeaderParser, BytesParser
+from email.utils import parsedate_to_datetime
+
+from attachment_index import PR_ATTACH_DATA_BIN
+from message_index import PR_INTERNET_MESSAGE_ID
+from outlook_scan import to_naive_datetime
+
+
+OBRA_DIR_RE = re.compile(r"^Obra_([A-Za-z0-9]+)$", re.IGNORECASE)
+
+
+class _PropertyAccessor:
+    def __init__(self, props):
+        self._props = props
+
+    def GetProperty(self, name):
+        valor = self._props.get(name)
+        if callable(valor):
+            valor = valor()
+        if valor is None:
+            raise KeyError(name)
+        return valor
+
+
+class OfflineAttachment:
+    def __init__(self, filename, data=None, path=None):
+        self.FileName = filename
+        self._data = data
+        self._path = path
+        self.Size = len(data) if data is not None else os.path.getsize(path)
+        self.PropertyAccessor = _PropertyAccessor({PR_ATTACH_DATA_BIN: self._bytes})
+
+    def _bytes(self):
+        if self._data is not None:
+            return self._data
+        with open(self._path, "rb") as f:
+            return f.read()
+
+    def SaveAsFile(self, path):
+        if self._data is not None:
+            with open(path, "wb") as f:
+                f.write(self._data)
+        else:
+            shutil.copyfile(self._path, path)
+
+
+class OfflineAttachments:
+    def __init__(self, items):
+        self._items = list(items)
+
+    @property
+    def Count(self):
+        return len(self._items)
+
+    def Item(self, i):
+        return self._items[i - 1]
+
+
+class OfflineMail:
+    """MailItem minimo montado a partir de um arquivo (.eml/.msg/PDF)."""
+
+    Class = 43
+    MessageClass = "IPM.Note"
+
+    def __init__(self, entry_id, subject, received, body="", html_body="", attachments=(), message_id=None):
+        self.EntryID = entry_id
+        self.Subject = subject or ""
+        self.ReceivedTime = received
+        self.Body = body or ""
+        self.HTMLBody = html_body or ""
+        self.Attachments = OfflineAttachments(attachments)
+        self.PropertyAccessor = _PropertyAccessor({PR_INTERNET_MESSAGE_ID: message_id})
+
+
+class SourceEntry(namedtuple("SourceEntry", "entry_id received subject path kind")):
+    __slots__ = ()
+
+
+def _mtime(path):
+    return datetime.fromtimestamp(os.path.getmtime(path))
+
+
+def _data_cabecalho(valor, path):
+    try:
+        recebido = to_naive_datetime(parsedate_to_datetime(str(valor))) if valor else None
+    except (TypeError, ValueError):
+        recebido = None
+    return recebido or _mtime(path)
+
+
+def _texto(valor):
+    if isinstance(valor, bytes):
+        return valor.decode("utf-8", errors="ignore")
+    return valor or ""
+
+
+def load_eml(path, entry_id):
+    with open(path, "rb") as f:
+        msg = BytesParser(policy=policy.default).parse(f)
+    body = html = ""
+    parte = msg.get_body(preferencelist=("plain",))
+    if parte is not None:
+        body = _texto(parte.get_content())
+    parte = msg.get_body(preferencelist=("html",))
+    if parte is not None:
+        html = _texto(parte.get_content())
+    anexos = []
+    for parte in msg.iter_attachments():
+        nome = parte.get_filename()
+        dados = parte.get_payload(decode=True)
+        if nome and dados is not None:
+            anexos.append(OfflineAttachment(nome, data=dados))
+    return OfflineMail(
+        entry_id,
+        str(msg.get("Subject", "") or ""),
+        _data_cabecalho(msg.get("Date"), path),
+        body=body,
+        html_body=html,
+        attachments=anexos,
+        message_id=(str(msg.get("Message-ID", "") or "").strip() or None),
+    )
+
+
+def _abrir_msg(path):
+    # Dependencia opcional: .msg do Outlook via extract-msg (puro Python, roda fora do Windows).
+    import extract_msg
+
+    return extract_msg.Message(path)
+
+
+def load_msg(path, entry_id):
+    msg = _abrir_msg(path)
+    try:
+        anexos = []
+        for att in getattr(msg, "attachments", []) or []:
+            nome = getattr(att, "longFilename", None) or getattr(att, "shortFilename", None)
+            dados = getattr(att, "data", None)
+            if nome and isinstance(dados, bytes):
+                anexos.append(OfflineAttachment(nome, data=dados))
+        recebido = to_naive_datetime(getattr(msg, "date", None)) or _data_cabecalho(getattr(msg, "date", None), path)
+        return OfflineMail(
+            entry_id,
+            getattr(msg, "subject", "") or "",
+            recebido,
+            body=_texto(getattr(msg, "body", "")),
+            html_body=_texto(getattr(msg, "htmlBody", "")),
+            attachments=anexos,
+            message_id=(getattr(msg, "messageId", None) or "").strip() or None,
+        )
+    finally:
+        try:
+            msg.close()
+        except Exception:
+            pass
+
+
+def load_pdf(path, entry_id, numero_obra):
+    # PDF solto em Obra_<n>: vira um "email" sintetico com o assunto padrao.
+    return OfflineMail(
+        entry_id,
+        f"ASO ADMISSIONAL - {numero_obra}",
+        _mtime(path),
+        attachments=[OfflineAttachment(os.path.basename(path), path=path)],
+    )
+
+
+class SourceItems:
+    """Colecao no formato de Items: a lista vem do scan (cabecalhos) e o arquivo so e lido em Item(i)."""
+
+    def __init__(self, source, entries):
+        self._source = source
+        self._entries = list(entries)
+
+    @property
+    def Count(self):
+        return len(self._entries)
+
+    def Sort(self, *_args, **_kwargs):
+        self._entries.sort(key=lambda e: e.received, reverse=True)
+
+    def Item(self, i):
+        return self._source.load(self._entries[i - 1])
+
+    def entry(self, i):
+        return self._entries[i - 1]
+
+
+class DirectorySource:
+    """
+    Pasta de arquivos no lugar da inbox do Outlook (mesma interface de Folder/Items/MailItem
+    usada por captar_emails): *.eml, *.msg (requer extract-msg) e PDFs soltos diretamente
+    em Obra_<n>/ (subpastas de data geradas pelo robo sao ignoradas). Permite replay de
+    carga e ingestao fora do Windows, sem COM.
+    """
+
+    name = "directory"
+
+    def __init__(self, path, log_fn=None):
+        self.path = os.path.abspath(path)
+        self.FolderPath = self.path
+        self.StoreID = f"dir:{self.path}"
+        self.EntryID = None
+        self._log = log_fn
+        self._msg_indisponivel = False
+
+    @property
+    def Items(self):
+        return SourceItems(self, self.scan())
+
+    def _entry_id(self, path):
+        return "file:" + os.path.relpath(path, self.path).replace(os.sep, "/")
+
+    def _cabecalho_eml(self, path):
+        with open(path, "rb") as f:
+            cab = BytesHeaderParser(policy=policy.default).parse(f)
+        return str(cab.get("Subject", "") or ""), _data_cabecalho(cab.get("Date"), path)
+
+    def scan(self):
+        entradas = []
+        for raiz, pastas, arquivos in os.walk(self.path):
+            pastas.sort()
+            obra = OBRA_DIR_RE.match(os.path.basename(raiz))
+            for nome in sorted(arquivos):
+                path = os.path.join(raiz, nome)
+                ext = os.path.splitext(nome)[1].lower()
+                try:
+                    if ext == ".eml":
+                        assunto, recebido = self._cabecalho_eml(path)
+                        entradas.append(SourceEntry(self._entry_id(path), recebido, assunto, path, "eml"))
+                    elif ext == ".msg":
+                        mail = self._carregar_msg(path)
+                        if mail is not None:
+                            entradas.append(SourceEntry(mail.EntryID, mail.ReceivedTime, mail.Subject, path, "msg"))
+                    elif ext == ".pdf" and obra:
+                        entradas.append(SourceEntry(self._entry_id(path), _mtime(path), f"ASO ADMISSIONAL - {obra.group(1)}", path, "pdf"))
+                except Exception as e:
+                    if self._log:
+                        self._log(f"Arquivo ignorado na fonte offline ({nome}): {e}")
+        entradas.sort(key=lambda e: e.received, reverse=True)
+        return entradas
+
+    def _carregar_msg(self, path):
+        if self._msg_indisponivel:
+            return None
+        try:
+            return load_msg(path, self._entry_id(path))
+        except ImportError:
+            self._msg_indisponivel = True
+            if self._log:
+                self._log("Arquivos .msg ignorados: pacote extract-msg nao instalado.")
+            return None
+
+    def load(self, entry):
+        if entry.kind == "eml":
+            return load_eml(entry.path, entry.entry_id)
+        if entry.kind == "msg":
+            return load_msg(entry.path, entry.entry_id)
+        obra = OBRA_DIR_RE.match(os.path.basename(os.path.dirname(entry.path)))
+        return load_pdf(entry.path, entry.entry_id, obra.group(1))
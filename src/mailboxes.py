@@ -0,0 +1,115 @@
+import re
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Mailbox(namedtuple("Mailbox", "account name")):
+    """Uma caixa monitorada: conta/endereco no Outlook e nome exibido na arvore de pastas."""
+
+    __slots__ = ()
+
+    @property
+    def label(self):
+        return self.account or self.name or ""
+
+
+def _lista(valor):
+    return [p.strip() for p in re.split(r"[;,]", valor or "")]
+
+
+def parse_mailboxes(accounts, names=""):
+    """
+    ASO_EMAIL_ACCOUNT e ASO_MAILBOX_NAME aceitam listas separadas por ";" ou ",",
+    pareadas por posicao (conta i <-> nome i). Entradas vazias ou repetidas sao ignoradas.
+    """
+    contas = _lista(accounts)
+    nomes = _lista(names)
+    caixas = []
+    vistas = set()
+    for i in range(max(len(contas), len(nomes))):
+        conta = contas[i] if i < len(contas) else ""
+        nome = nomes[i] if i < len(nomes) else ""
+        chave = (conta.lower(), nome.lower())
+        if not (conta or nome) or chave in vistas:
+            continue
+        vistas.add(chave)
+        caixas.append(Mailbox(conta, nome))
+    return caixas
+
+
+class ComThreads:
+    """
+    Uma thread COM persistente por caixa, reaproveitada entre ciclos do modo watch: o
+    apartamento COM, o MessageFilter e o namespace do Outlook abertos no primeiro ciclo
+    continuam na mesma thread nos seguintes. close() roda finalize_fn em cada thread.
+    """
+
+    def __init__(self, finalize_fn=None):
+        self._finalize = finalize_fn
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def submit(self, mailbox, fn, *args):
+        with self._lock:
+            pool = self._pools.get(mailbox)
+            if pool is None:
+                pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"aso-com-{len(self._pools) + 1}")
+                self._pools[mailbox] = pool
+        return pool.submit(fn, *args)
+
+    def close(self):
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            if self._finalize is not None:
+                try:
+                    pool.submit(self._finalize).result()
+                except Exception:
+                    pass
+            pool.shutdown(wait=True)
+
+
+def scan_mailboxes(mailboxes, scan_fn, finalize_fn=None, log_fn=None, threads=None):
+    """
+    scan_fn(mailbox) para cada caixa; resultados na ordem das caixas (None = caixa falhou).
+    Uma caixa so roda na thread atual (comportamento historico). Com varias, cada uma
+    ganha uma thread propria ("aso-com-<n>"): scan_fn inicializa ali o apartamento COM
+    (e o MessageFilter) e finalize_fn o libera ao fim da thread. threads (ComThreads):
+    as threads das caixas sobrevivem a chamada e finalize_fn so roda no close() delas.
+    """
+    if len(mailboxes) <= 1:
+        return [scan_fn(m) for m in mailboxes]
+    resultados = [None] * len(mailboxes)
+    if threads is not None:
+        futuros = [threads.submit(m, scan_fn, m) for m in mailboxes]
+        for pos, (mailbox, futuro) in enumerate(zip(mailboxes, futuros)):
+            try:
+                resultados[pos] = futuro.result()
+            except Exception as e:
+                if log_fn:
+                    log_fn(f"Falha na leitura da caixa {mailbox.label}: {e}")
+        return resultados
+
+    def _rodar(pos, mailbox):
+        try:
+            resultados[pos] = scan_fn(mailbox)
+        except Exception as e:
+            if log_fn:
+                log_fn(f"Falha na leitura da caixa {mailbox.label}: {e}")
+        finally:
+            if finalize_fn:
+                try:
+                    finalize_fn()
+                except Exception:
+                    pass
+
+    threads = [
+        threading.Thread(target=_rodar, args=(pos, m), name=f"aso-com-{pos + 1}", daemon=True)
+        for pos, m in enumerate(mailboxes)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return resultados
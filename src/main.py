@@ -1,16 +1,26 @@
-import win32com.client as win32
-import pywintypes
-import pythoncom
+try:
+    import win32com.client as win32
+    import pywintypes
+    import pythoncom
+except ImportError:
+    # Sem pywin32 (Linux/CI): so fontes offline (ASO_SOURCE_DIR) funcionam.
+    win32 = pywintypes = pythoncom = None
 import os
 import re
 import shutil
+import tempfile
 import uuid
+import threading
 import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from dotenv import load_dotenv
 import sys
 import html as html_lib
 import urllib.request
 import urllib.parse
+import urllib.error
 import http.cookiejar
 
 # Carrega variaveis de ambiente do arquivo .env (se existir)
@@ -26,13 +36,13 @@ for _env_path in _env_candidates:
 else:
     load_dotenv(override=True)
 import pytesseract
-from pdf2image import convert_from_path
+from pdf2image import convert_from_bytes, convert_from_path
 from datetime import datetime, timedelta
 import traceback
 import hashlib
 import time
 from PIL import ImageOps, ImageFilter
-from rpa_yube import run_from_main
+from rpa_yube import YubeSession, default_auth_state, run_from_main, use_session
 
 # Módulos customizados
 from custom_logger import RpaLogger, emit_terminal
@@ -45,10 +55,46 @@ from outcomes import (
     SKIPPED_DUPLICATE,
     SKIPPED_DRAFT,
     SKIPPED_NON_ASO,
+    SKIPPED_TINY,
 )
 from utils_masking import mask_cpf, mask_cpf_in_text, mask_pii_in_obj
 from idempotency import should_skip_duplicate
 from sql_integration import insert_aso_record, parse_br_date
+from rasterizer import build_rasterizer
+from time_budget import TimeBudget, TempoEsgotado, eh_timeout
+from ocr_artifacts import OcrArtifactBundle
+from atomic_io import trava_caminho
+from sync_state import SyncState
+from message_index import MessageIndex, message_identity
+from attachment_index import AttachmentIndex, attachment_bytes, attachment_data, attachment_fingerprint, attachment_size
+from folder_cache import FolderCache, mailbox_key
+from pipeline import MailPipeline, PipelineJob
+from ingestion import DirectorySource
+from gdrive_http import ConnectionPool, KeepAliveHandler, stream_to_file
+from gdrive_cache import GDriveCache
+from admissional_archive import AdmissionalArchive
+from mailboxes import ComThreads, Mailbox, parse_mailboxes, scan_mailboxes
+from com_filter import BackoffSchedule, RejectionStats
+from blob_store import BlobStore, StreamHasher, link_into
+from capture_run import CaptureRun
+from outlook_scan import (
+    ASO_SUBJECT_RE,
+    OUTLOOK_TABLE_SCAN,
+    EntryIdItems,
+    MailProxy,
+    ProxyItems,
+    ProxyStats,
+    build_dasl_filter,
+    restrict_items,
+    sort_items,
+    table_rows,
+    to_naive_datetime,
+)
+
+try:
+    from preprocessing import preprocess_for_ocr
+except ImportError:  # numpy ausente: mantem apenas o fallback PIL
+    preprocess_for_ocr = None
 
 # ----------------------------
 # CONFIGURAÇÕES
@@ -148,6 +194,8 @@ PASTA_JSON = os.path.join(PASTA_BASE, "json")
 PASTA_ADMISSAO_INPUT = os.getenv("ASO_ADMITIR_INPUT_DIR", r"P:\ProcessoAsoAdimitir\processados")
 EMAIL_DESEJADO = os.getenv("ASO_EMAIL_ACCOUNT", "aso@enesa.com.br")
 MAILBOX_NAME = os.getenv("ASO_MAILBOX_NAME", "Aso")  # nome exibido na árvore
+# Varias caixas: listas separadas por ";" ou "," (conta i <-> nome i), cada uma lida por uma thread COM propria.
+MAILBOXES = parse_mailboxes(EMAIL_DESEJADO, MAILBOX_NAME)
 
 def _safe_makedirs(path, label):
     try:
@@ -175,9 +223,20 @@ logger = RpaLogger(
 )
 reporter = ReportGenerator(PASTA_RELATORIOS, json_dir=PASTA_JSON)
 
-TARGET_ACCOUNT = os.getenv("ASO_EMAIL_ACCOUNT", "aso@enesa.com.br")
+TARGET_ACCOUNT = "; ".join(m.account for m in MAILBOXES if m.account) or EMAIL_DESEJADO
 GDRIVE_NAME_FILTER = os.getenv("ASO_GDRIVE_NAME_FILTER", "asos enesa").strip().lower()
 GDRIVE_TIMEOUT_SEC = int(os.getenv("ASO_GDRIVE_TIMEOUT_SEC", "60"))
+# Downloads do Drive em paralelo (pool limitado; 0/1 = um por vez), com conexoes keep-alive
+# reaproveitadas, retomada via Range apos queda de conexao e leitura em blocos grandes
+try:
+    GDRIVE_WORKERS = max(0, int(os.getenv("ASO_GDRIVE_WORKERS", "4") or 0))
+    GDRIVE_RETRIES = max(0, int(os.getenv("ASO_GDRIVE_RETRIES", "3") or 0))
+    GDRIVE_CHUNK_BYTES = max(64, int(os.getenv("ASO_GDRIVE_CHUNK_KB", "4096") or 4096)) * 1024
+except ValueError:
+    GDRIVE_WORKERS = 4
+    GDRIVE_RETRIES = 3
+    GDRIVE_CHUNK_BYTES = 4096 * 1024
+GDRIVE_BASE_URL = os.getenv("ASO_GDRIVE_BASE_URL", "https://drive.google.com/uc?export=download").strip()
 DEBUG_MODE = (
     os.getenv("ASO_DEBUG", "").strip().lower() in ("1", "true", "yes")
     or os.getenv("DEBUG", "").strip().lower() in ("1", "true", "yes")
@@ -188,6 +247,123 @@ PROCESSED_INDEX_ENABLED = os.getenv("ASO_PROCESSED_INDEX_ENABLE", "1").strip().l
 PROCESSED_INDEX_PATH = None
 PROCESSED_INDEX_SUCCESS = set()
 PROCESSED_KEY_BY_FILENAME = {}
+# Workers de OCR leem/alteram o indice de processados e os destinos gravados ao mesmo tempo.
+PROCESSED_INDEX_LOCK = threading.Lock()
+# Destinos (caminho completo) gravados e registrados no banco por este processo.
+DESTINOS_GRAVADOS = set()
+RASTERIZER_BACKEND = os.getenv("ASO_RASTERIZER", "poppler").strip().lower() or "poppler"
+_RASTERIZER = None
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, str(default)) or default)
+    except ValueError:
+        return float(default)
+
+
+# Orcamentos de tempo (0 = sem limite). Timeouts por chamada matam o processo filho.
+OCR_CALL_TIMEOUT_SEC = _env_float("ASO_OCR_CALL_TIMEOUT_SEC", 60)
+OCR_PAGE_BUDGET_SEC = _env_float("ASO_OCR_PAGE_BUDGET_SEC", 180)
+RASTER_TIMEOUT_SEC = _env_float("ASO_RASTER_TIMEOUT_SEC", 300)
+RUN_BUDGET_SEC = _env_float("ASO_RUN_BUDGET_SEC", 0)
+
+# Pre-processamento NumPy (deskew + binarizacao + recorte) antes da primeira passada de OCR
+OCR_PREPROCESS = os.getenv("ASO_OCR_PREPROCESS", "1").strip().lower() in ("1", "true", "yes")
+OCR_BINARIZE = os.getenv("ASO_OCR_BINARIZE", "otsu").strip().lower() or "otsu"
+
+# Anexos por conteudo (SHA-256 calculado na escrita) em PROCESSO_ASO_BASE/blobs; pastas de obra e
+# espelho de admissao apontam para o blob por hardlink. Blobs sem referencia somem apos MAX_AGE_D dias;
+# o indice de digests processados fica (pula o mesmo conteudo em execucoes seguintes).
+BLOB_STORE_ENABLED = os.getenv("ASO_BLOB_STORE", "1").strip().lower() in ("1", "true", "yes")
+BLOB_STORE_DIR = os.getenv("ASO_BLOB_STORE_DIR") or os.path.join(PASTA_BASE, "blobs")
+BLOB_STORE_INDEX_PATH = os.getenv("ASO_BLOB_STORE_INDEX_PATH") or os.path.join(PASTA_JSON, "blob_index.json")
+BLOB_STORE_MAX_AGE_D = _env_float("ASO_BLOB_STORE_MAX_AGE_D", 30)
+
+# MessageFilter: atraso das novas tentativas pela taxa recente de rejeicoes do Outlook (0 = ciclo fixo 250-2000 ms)
+COM_ADAPTIVE_BACKOFF = os.getenv("ASO_COM_ADAPTIVE_BACKOFF", "").strip().lower() in ("1", "true", "yes")
+COM_BACKOFF_WINDOW_SEC = _env_float("ASO_COM_BACKOFF_WINDOW_SEC", 10)
+
+# Filtro DASL (Items.Restrict) por janela de datas e assunto na leitura do Outlook
+OUTLOOK_RESTRICT = os.getenv("ASO_OUTLOOK_RESTRICT", "1").strip().lower() in ("1", "true", "yes")
+
+# Sincronizacao incremental: marca d'agua (ReceivedTime + EntryIDs da fronteira) por mailbox/pasta
+INCREMENTAL_SYNC = os.getenv("ASO_INCREMENTAL_SYNC", "1").strip().lower() in ("1", "true", "yes")
+FULL_RESCAN = os.getenv("ASO_FULL_RESCAN", "").strip().lower() in ("1", "true", "yes")
+SYNC_STATE_PATH = os.getenv("ASO_SYNC_STATE_PATH") or os.path.join(PASTA_JSON, "sync_state.json")
+
+# Indice por email (Message-ID/EntryID + anexos): pula emails concluidos antes do SaveAsFile
+MESSAGE_INDEX_ENABLED = os.getenv("ASO_MESSAGE_INDEX_ENABLE", "1").strip().lower() in ("1", "true", "yes")
+MESSAGE_INDEX_PATH = os.getenv("ASO_MESSAGE_INDEX_PATH") or os.path.join(PASTA_JSON, "message_index.json")
+
+# Pre-filtro de anexos (nome/tamanho/content id/hash via PropertyAccessor) antes do SaveAsFile
+ATTACH_PREFILTER = os.getenv("ASO_ATTACH_PREFILTER", "1").strip().lower() in ("1", "true", "yes")
+ATTACH_INDEX_PATH = os.getenv("ASO_ATTACH_INDEX_PATH") or os.path.join(PASTA_JSON, "attachment_index.json")
+try:
+    ATTACH_MIN_BYTES = int(os.getenv("ASO_ATTACH_MIN_BYTES", "2048") or 0)
+except ValueError:
+    ATTACH_MIN_BYTES = 2048
+
+# Anexo do Outlook lido para a memoria (PropertyAccessor ou temporario local) e rasterizado dos bytes:
+# a pasta da obra so recebe as paginas finais. Acima de ASO_ATTACH_IN_MEMORY_MAX_MB, SaveAsFile como antes.
+ATTACH_IN_MEMORY = os.getenv("ASO_ATTACH_IN_MEMORY", "0").strip().lower() in ("1", "true", "yes")
+ATTACH_IN_MEMORY_MAX_MB = _env_float("ASO_ATTACH_IN_MEMORY_MAX_MB", 50)
+ATTACH_TMP_DIR = os.getenv("ASO_ATTACH_TMP_DIR", "").strip() or None
+
+# Cache da inbox resolvida (StoreID/EntryID): abre direto com GetFolderFromID nas proximas execucoes
+FOLDER_CACHE_ENABLED = os.getenv("ASO_FOLDER_CACHE", "1").strip().lower() in ("1", "true", "yes")
+FOLDER_CACHE_PATH = os.getenv("ASO_FOLDER_CACHE_PATH") or os.path.join(PASTA_JSON, "folder_cache.json")
+
+# Cache de arquivos do Google Drive por file id (SHA-256 no store de anexos + ETag/Last-Modified):
+# dentro do TTL nao acessa a rede; depois revalida com requisicao condicional. Exige ASO_BLOB_STORE.
+GDRIVE_CACHE_ENABLED = os.getenv("ASO_GDRIVE_CACHE", "1").strip().lower() in ("1", "true", "yes")
+GDRIVE_CACHE_PATH = os.getenv("ASO_GDRIVE_CACHE_PATH") or os.path.join(PASTA_JSON, "gdrive_cache.json")
+GDRIVE_CACHE_TTL_H = _env_float("ASO_GDRIVE_CACHE_TTL_H", 24)
+
+# Varredura compartilhada: os anexos dos emails "ASO ADMISSIONAL" tambem sao arquivados em
+# ASO_DEST_BASE (hardlink do PDF ja salvo), no lugar de rodar aso_admissional_email.py separado
+ADMISSIONAL_SHARED = os.getenv("ASO_ADMISSIONAL_SHARED", "").strip().lower() in ("1", "true", "yes")
+ADMISSIONAL_DEST_BASE = os.getenv("ASO_DEST_BASE", r"P:\ASO_ADMISSIONAL")
+ADMISSIONAL_SUBJECT_PREFIX = os.getenv("ASO_SUBJECT_PREFIX", "ASO ADMISSIONAL")
+
+# Uma sessao da Yube por execucao (um navegador/login para todos os emails; relogin so se expirar).
+# LAZY=0 abre o navegador ja no inicio, em paralelo com a leitura do Outlook.
+YUBE_SESSION = os.getenv("ASO_YUBE_SESSION", "1").strip().lower() in ("1", "true", "yes")
+YUBE_SESSION_LAZY = os.getenv("ASO_YUBE_SESSION_LAZY", "1").strip().lower() in ("1", "true", "yes")
+
+# Pipeline produtor/consumidor: thread COM -> workers de OCR -> thread unica de RPA (0 = tudo inline)
+try:
+    PIPELINE_WORKERS = max(0, int(os.getenv("ASO_PIPELINE_WORKERS", "0") or 0))
+except ValueError:
+    PIPELINE_WORKERS = 0
+try:
+    PIPELINE_QUEUE_SIZE = max(1, int(os.getenv("ASO_PIPELINE_QUEUE", "4") or 4))
+except ValueError:
+    PIPELINE_QUEUE_SIZE = 4
+
+# Modo continuo (--watch): polling sobre a sincronizacao incremental + resumo periodico por email
+WATCH_MODE = os.getenv("ASO_WATCH", "").strip().lower() in ("1", "true", "yes")
+WATCH_INTERVAL_SEC = _env_float("ASO_WATCH_INTERVAL_SEC", 60)
+WATCH_SUMMARY_MIN = _env_float("ASO_WATCH_SUMMARY_MIN", 60)
+
+# Fonte offline no lugar do Outlook: pasta com .eml/.msg ou PDFs em Obra_<n>/ (replay, Linux)
+SOURCE_DIR = os.getenv("ASO_SOURCE_DIR", "").strip()
+
+
+def _get_rasterizer():
+    global _RASTERIZER
+    if _RASTERIZER is None:
+        # convert_fn resolve convert_from_path em tempo de chamada (permite monkeypatch em testes).
+        _RASTERIZER = build_rasterizer(
+            RASTERIZER_BACKEND,
+            poppler_path=POPPLER_PATH,
+            dpi=300,
+            convert_fn=lambda *args, **kwargs: convert_from_path(*args, **kwargs),
+            timeout=RASTER_TIMEOUT_SEC or None,
+            convert_bytes_fn=lambda *args, **kwargs: convert_from_bytes(*args, **kwargs),
+        )
+        registrar_log("Rasterizador de PDF selecionado.", context={"backend": _RASTERIZER.name})
+    return _RASTERIZER
 
 
 def _espelhar_para_admissao(caminho_origem):
@@ -195,8 +371,11 @@ def _espelhar_para_admissao(caminho_origem):
         if not caminho_origem or not os.path.isfile(caminho_origem):
             return None
         destino = os.path.join(PASTA_ADMISSAO_INPUT, os.path.basename(caminho_origem))
-        shutil.copy2(caminho_origem, destino)
-        registrar_log("Arquivo espelhado para fila de admissao.", context={"source_file": destino})
+        if os.path.exists(destino) and os.path.samefile(caminho_origem, destino):
+            return destino
+        # Hardlink: o espelho nao duplica o PDF (outro volume: copia).
+        modo = link_into(caminho_origem, destino)
+        registrar_log("Arquivo espelhado para fila de admissao.", context={"source_file": destino, "mode": modo})
         return destino
     except Exception as e:
         registrar_log(f"Falha ao espelhar arquivo para admissao: {e}", context={"source_file": caminho_origem})
@@ -239,10 +418,40 @@ def _preprocess_img(img, scale=1.5):
         return img
 
 
-def ocr_with_fallback(img, force_full=False):
-    # Primeira tentativa rapida
+def _tesseract(img, config, budget=None):
+    timeout = OCR_CALL_TIMEOUT_SEC
+    if budget is not None:
+        budget.check()
+        timeout = budget.call_timeout(timeout)
+    try:
+        return pytesseract.image_to_string(img, lang="por+eng", config=config, timeout=timeout or 0)
+    except Exception as e:
+        if not eh_timeout(e):
+            raise
+        # O pytesseract ja matou o tesseract; so propaga se o orcamento da pagina acabou.
+        registrar_log("Tesseract excedeu o timeout da chamada.", context={"config": config, "timeout_sec": timeout})
+        if budget is not None:
+            budget.check()
+        return ""
+
+
+def _preprocess_primeira_passada(img):
+    if not OCR_PREPROCESS or preprocess_for_ocr is None:
+        return img
+    try:
+        return preprocess_for_ocr(img, method=OCR_BINARIZE)
+    except Exception as e:
+        registrar_log(f"Falha no pre-processamento NumPy; usando imagem original: {e}")
+        return img
+
+
+def ocr_with_fallback(img, force_full=False, budget=None):
+    # Primeira tentativa rapida (imagem ja alinhada/binarizada quando habilitado)
+    primeira = _preprocess_primeira_passada(img)
     try:
-        base = pytesseract.image_to_string(img, lang="por+eng", config="--oem 3 --psm 6")
+        base = _tesseract(primeira, "--oem 3 --psm 6", budget)
+    except TempoEsgotado:
+        raise
     except Exception:
         base = ""
 
@@ -256,17 +465,28 @@ def ocr_with_fallback(img, force_full=False):
         "--oem 3 --psm 4",
     ]
     texts = [base]
+    if primeira is not img:
+        try:
+            texts.append(_tesseract(img, "--oem 3 --psm 6", budget))
+        except TempoEsgotado:
+            raise
+        except Exception:
+            texts.append("")
     for cfg in configs:
         try:
-            t = pytesseract.image_to_string(img, lang="por+eng", config=cfg)
+            t = _tesseract(img, cfg, budget)
             texts.append(t)
+        except TempoEsgotado:
+            raise
         except Exception:
             texts.append("")
     pre = _preprocess_img(img)
     for cfg in configs:
         try:
-            t = pytesseract.image_to_string(pre, lang="por+eng", config=cfg)
+            t = _tesseract(pre, cfg, budget)
             texts.append(t)
+        except TempoEsgotado:
+            raise
         except Exception:
             texts.append("")
 
@@ -392,6 +612,11 @@ def _load_processed_index(path):
         return set()
 
 
+def _copiar_sob_trava(keys):
+    with PROCESSED_INDEX_LOCK:
+        return sorted(keys)
+
+
 def _save_processed_index(path, keys):
     if not path:
         return
@@ -400,7 +625,7 @@ def _save_processed_index(path, keys):
         payload = {
             "version": 1,
             "updated_at": datetime.now().isoformat(),
-            "success_keys": sorted(list(keys)),
+            "success_keys": _copiar_sob_trava(keys),
         }
         with open(path, "w", encoding="utf-8") as f:
             json.dump(payload, f, indent=2, ensure_ascii=False)
@@ -413,6 +638,28 @@ def _default_processed_index_path():
     return os.path.join(PASTA_JSON, f"processed_index_{day_key}.json")
 
 
+def _rolar_indice_processados():
+    """
+    Modo watch: o processo atravessa a meia-noite e o manifest de processados e por dia.
+    Ao virar o dia, grava o do dia anterior e passa a usar (e carregar) o do dia corrente.
+    Caminho fixo via ASO_PROCESSED_INDEX_PATH nao roda.
+    """
+    global PROCESSED_INDEX_PATH
+    if not PROCESSED_INDEX_ENABLED or not PROCESSED_INDEX_PATH or os.getenv("ASO_PROCESSED_INDEX_PATH"):
+        return
+    novo = _default_processed_index_path()
+    if novo == PROCESSED_INDEX_PATH:
+        return
+    _save_processed_index(PROCESSED_INDEX_PATH, PROCESSED_INDEX_SUCCESS)
+    chaves = _load_processed_index(novo)
+    with PROCESSED_INDEX_LOCK:
+        # Troca no lugar: quem ja guardou a referencia do set continua valido.
+        PROCESSED_INDEX_SUCCESS.clear()
+        PROCESSED_INDEX_SUCCESS.update(chaves)
+        PROCESSED_INDEX_PATH = novo
+    registrar_log("Manifest de processados do novo dia carregado.", context={"count": len(chaves), "path": novo})
+
+
 def _build_record_key(numero_obra, nome_limpo, cpf, dataaso):
     raw = f"{numero_obra}|{nome_limpo}|{cpf}|{dataaso or ''}"
     return hashlib.sha256(raw.encode("utf-8", errors="ignore")).hexdigest()
@@ -505,7 +752,7 @@ def calcular_hash_arquivo(caminho):
     hash_md5 = hashlib.md5()
     try:
         with open(caminho, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
                 hash_md5.update(chunk)
         return hash_md5.hexdigest()
     except Exception:
@@ -574,13 +821,16 @@ def _extrair_data_aso_texto(texto, texto_compacto):
 # ====================================================================
 # FUNÇÃO - EXTRAI DADOS COMPLETOS (OCR)
 # ====================================================================
-def extrair_dados_completos(img, texto_ocr=None, _retry=False):
+def extrair_dados_completos(img, texto_ocr=None, _retry=False, budget=None):
     """
     Retorna: nome, cpf, data_aso, funcao_cargo, texto_ocr
+    TempoEsgotado (orcamento da pagina) e propagado para quem chamou.
     """
     if texto_ocr is None:
         try:
-            texto_ocr = ocr_with_fallback(img)
+            texto_ocr = ocr_with_fallback(img, budget=budget)
+        except TempoEsgotado:
+            raise
         except Exception as e:
             texto_ocr = ""
             registrar_log(f"Erro no pytesseract: {e}")
@@ -665,11 +915,13 @@ def extrair_dados_completos(img, texto_ocr=None, _retry=False):
     # Se nome ou CPF ainda desconhecidos, tentar um OCR mais agressivo uma unica vez
     if (nome == "Desconhecido" or cpf == "CPF_Desconhecido") and not _retry:
         try:
-            texto2 = ocr_with_fallback(img, force_full=True)
+            texto2 = ocr_with_fallback(img, force_full=True, budget=budget)
+        except TempoEsgotado:
+            raise
         except Exception:
             texto2 = ""
         if texto2 and texto2 != texto_ocr:
-            return extrair_dados_completos(img, texto_ocr=texto2, _retry=True)
+            return extrair_dados_completos(img, texto_ocr=texto2, _retry=True, budget=budget)
 
     # Debug para casos falhos (apos fallback)
     if nome == "Desconhecido" and DEBUG_MODE:
@@ -829,29 +1081,132 @@ def extrair_dados_completos(img, texto_ocr=None, _retry=False):
 # ====================================================================
 # SALVA PDFs SEPARADOS E GERA O TXT POR ANEXO
 # ====================================================================
-def salvar_paginas_individualmente(pdf_path, pasta_destino, numero_obra, lista_novos_arquivos=None, stats=None, manifest_items=None):
+def _registrar_tempo_esgotado(pdf_path, pagina, etapa, elapsed, stats=None, manifest_items=None):
+    arquivo = os.path.basename(pdf_path) if pagina is None else f"{os.path.basename(pdf_path)}#pg{pagina}"
+    msg = f"Tempo esgotado ({etapa}) apos {elapsed:.1f}s"
+    registrar_log(msg, context={"arquivo": arquivo, "elapsed_sec": round(elapsed, 1)})
+    if stats is not None:
+        if pagina is not None:
+            stats["total_detected"] += 1
+        stats["error"] += 1
+        stats["erros"].append({"arquivo": arquivo, "erro": msg, "tipo_erro": "EXTERNAL_DEPENDENCY"})
+    if manifest_items is not None:
+        item = {
+            "file_display": mask_cpf_in_text(os.path.basename(pdf_path)),
+            "outcome": ERROR,
+            "message": msg,
+            "timed_out": True,
+            "elapsed_sec": round(elapsed, 1),
+        }
+        if pagina is not None:
+            item["page"] = pagina
+        manifest_items.append(item)
+
+
+def salvar_paginas_individualmente(pdf_path, pasta_destino, numero_obra, lista_novos_arquivos=None, stats=None, manifest_items=None, paginas=None, pdf_bytes=None):
+    """
+    Rasteriza, faz OCR e salva cada pagina do PDF. Com `paginas`, processa apenas
+    essas paginas (reentrada em paginas que falharam). Com `pdf_bytes`, rasteriza o
+    conteudo em memoria e pdf_path so nomeia artefatos/logs (o arquivo nao existe).
+    Retorna o resumo do anexo: {"pages": n, "failed_pages": [...]} (com "error" se o
+    PDF nao pode ser lido).
+    """
+    raster_inicio = time.monotonic()
+    paginas_alvo = paginas
+    fonte = pdf_path if pdf_bytes is None else pdf_bytes
     try:
-        imagens = convert_from_path(pdf_path, dpi=300, poppler_path=POPPLER_PATH)
+        if paginas_alvo:
+            rasterizador_alvo = _get_rasterizer()
+            paginas = ((n, rasterizador_alvo.render_page(fonte, n)) for n in sorted(paginas_alvo))
+        else:
+            paginas = _get_rasterizer().iter_pages(fonte)
     except Exception as e:
+        if eh_timeout(e):
+            _registrar_tempo_esgotado(pdf_path, None, "rasterizacao", time.monotonic() - raster_inicio, stats, manifest_items)
+            return {"pages": 0, "failed_pages": [], "error": "Tempo esgotado na rasterizacao"}
         registrar_log(f"Erro ao converter PDF '{pdf_path}': {e}")
         if stats is not None:
             stats["error"] += 1
             stats["erros"].append({"arquivo": os.path.basename(pdf_path), "erro": f"Erro conversao PDF: {e}"})
-        return
+        return {"pages": 0, "failed_pages": [], "error": f"Erro conversao PDF: {e}"}
+
+    rasterizador = _get_rasterizer()
+    bundle = OcrArtifactBundle(
+        pdf_path,
+        numero_obra,
+        engine={
+            "rasterizer": getattr(rasterizador, "name", "poppler"),
+            "ocr": "tesseract",
+            "preprocess": OCR_BINARIZE if (OCR_PREPROCESS and preprocess_for_ocr is not None) else None,
+        },
+    )
+    try:
+        _processar_paginas(paginas, pdf_path, pasta_destino, numero_obra, bundle, lista_novos_arquivos, stats, manifest_items)
+    finally:
+        # Artefato gravado uma unica vez por anexo (JSONL + TXT legado), de forma atomica.
+        try:
+            bundle.write(pasta_destino)
+        except Exception as e:
+            registrar_log(f"Erro ao escrever artefato OCR: {e}")
+    return bundle.resumo()
+
+
+@contextmanager
+def _trava_destino(caminho):
+    """
+    Serializa verificacao, gravacao e registro no banco de um mesmo PDF final: dois workers
+    podem extrair o mesmo "nome - cpf.pdf" para a mesma pasta de obra/data.
+    """
+    with trava_caminho(caminho) as chave:
+        yield chave
+
+
+def _gravar_pdf_atomico(img, caminho):
+    # Leitores (RPA, espelho de admissao) nunca veem um PDF pela metade.
+    temporario = f"{caminho}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        img.save(temporario, "PDF", resolution=300.0)
+        os.replace(temporario, caminho)
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
 
-    nome_txt = f"OCR_{os.path.basename(pdf_path).replace('.pdf', '')}.txt"
-    txt_path = os.path.join(pasta_destino, nome_txt)
 
-    for i, img in enumerate(imagens, start=1):
+def _processar_paginas(paginas, pdf_path, pasta_destino, numero_obra, bundle, lista_novos_arquivos=None, stats=None, manifest_items=None):
+    while True:
+        raster_inicio = time.monotonic()
+        try:
+            i, img = next(paginas)
+        except StopIteration:
+            break
+        except Exception as e:
+            # Backends por pagina (pdfium) podem falhar no meio do documento.
+            registrar_log(f"Erro ao rasterizar pagina do PDF '{pdf_path}': {e}")
+            bundle.raster_error = f"Erro conversao PDF: {e}"
+            if stats is not None:
+                stats["error"] += 1
+                stats["erros"].append({"arquivo": os.path.basename(pdf_path), "erro": f"Erro conversao PDF: {e}"})
+            break
+        raster_sec = time.monotonic() - raster_inicio
+        budget = TimeBudget(OCR_PAGE_BUDGET_SEC, etapa=f"OCR pagina {i}")
+        texto_ocr = ""
         try:
             try:
-                texto_ocr = ocr_with_fallback(img)
+                texto_ocr = ocr_with_fallback(img, budget=budget)
+            except TempoEsgotado:
+                raise
             except Exception as e:
                 texto_ocr = ""
                 registrar_log(f"Erro no pytesseract: {e}")
 
-            nome, cpf, dataaso, funcao_cargo, texto_ocr = extrair_dados_completos(img, texto_ocr=texto_ocr)
+            nome, cpf, dataaso, funcao_cargo, texto_ocr = extrair_dados_completos(img, texto_ocr=texto_ocr, budget=budget)
             is_aso = eh_aso(texto_ocr)
+            campos = {"nome": nome, "cpf": cpf, "data_aso": dataaso, "funcao_cargo": funcao_cargo}
+            tempos = {"raster_sec": raster_sec, "ocr_sec": budget.elapsed()}
+            scores = {"ocr_score": _score_ocr(texto_ocr), "is_aso": bool(is_aso)}
 
             if stats is not None:
                 stats["total_detected"] += 1
@@ -891,20 +1246,7 @@ def salvar_paginas_individualmente(pdf_path, pasta_destino, numero_obra, lista_n
                         "outcome": outcome,
                         "message": outcome_msg,
                     })
-
-                try:
-                    with open(txt_path, "a", encoding="utf-8") as txt:
-                        txt.write("\n======================================\n")
-                        txt.write(f"Obra: {numero_obra}\n")
-                        txt.write(f"Outcome: {outcome}\n")
-                        txt.write(f"Arquivo origem: {os.path.basename(pdf_path)}\n")
-                        txt.write(f"Nome: {nome}\n")
-                        txt.write(f"CPF: {mask_cpf(cpf)}\n")
-                        txt.write(f"Data ASO: {dataaso}\n")
-                        txt.write(f"Funcao/Cargo: {funcao_cargo}\n")
-                        txt.write("======================================\n")
-                except Exception as e:
-                    registrar_log(f"Erro ao escrever TXT: {e}")
+                bundle.add_page(i, outcome, outcome_msg, campos, texto_ocr, scores, tempos)
                 continue
 
             nome_limpo = re.sub(r"[^\w\s\-]", "", nome).strip()
@@ -915,7 +1257,9 @@ def salvar_paginas_individualmente(pdf_path, pasta_destino, numero_obra, lista_n
             caminho_final = os.path.join(pasta_destino, nome_final)
 
             record_key = _build_record_key(numero_obra, nome_limpo, cpf, dataaso)
-            if PROCESSED_INDEX_ENABLED and record_key in PROCESSED_INDEX_SUCCESS and not REPROCESS_EXISTING:
+            with PROCESSED_INDEX_LOCK:
+                ja_processado = record_key in PROCESSED_INDEX_SUCCESS
+            if PROCESSED_INDEX_ENABLED and ja_processado and not REPROCESS_EXISTING:
                 registrar_log(f"Arquivo ja processado (manifest): {caminho_final}")
                 if stats is not None:
                     stats["skipped_duplicate"] += 1
@@ -927,67 +1271,67 @@ def salvar_paginas_individualmente(pdf_path, pasta_destino, numero_obra, lista_n
                         "outcome": SKIPPED_DUPLICATE,
                         "message": "Arquivo ja processado anteriormente (manifest)",
                     })
+                bundle.add_page(
+                    i, SKIPPED_DUPLICATE, "Arquivo ja processado anteriormente (manifest)",
+                    campos, texto_ocr, scores, tempos, legacy_txt=False,
+                )
                 continue
 
-            if should_skip_duplicate(caminho_final):
-                registrar_log(f"Arquivo ja existe; reutilizando para RPA (nao pula por arquivo): {caminho_final}")
-                insert_aso_record(
-                    {
-                        "origem_robo": "ASOgui",
-                        "nome": nome,
-                        "cpf": cpf,
-                        "data_aso": dataaso,
-                        "funcao_cargo": funcao_cargo,
-                        "arquivo_origem": caminho_final,
-                        "referencia_origem": numero_obra,
-                    },
-                    log_fn=registrar_log,
-                )
+            registro = {
+                "origem_robo": "ASOgui",
+                "nome": nome,
+                "cpf": cpf,
+                "data_aso": dataaso,
+                "funcao_cargo": funcao_cargo,
+                "arquivo_origem": caminho_final,
+                "referencia_origem": numero_obra,
+            }
+            with _trava_destino(caminho_final) as chave_destino:
+                reutilizado = should_skip_duplicate(caminho_final)
+                if reutilizado:
+                    registrar_log(f"Arquivo ja existe; reutilizando para RPA (nao pula por arquivo): {caminho_final}")
+                else:
+                    _gravar_pdf_atomico(img, caminho_final)
+                    registrar_log(f"Arquivo salvo: {caminho_final}")
+                with PROCESSED_INDEX_LOCK:
+                    # Outro worker (ou ciclo do watch) ja gravou e registrou este destino: sem linha repetida.
+                    registrar = chave_destino not in DESTINOS_GRAVADOS
+                    DESTINOS_GRAVADOS.add(chave_destino)
+                    PROCESSED_KEY_BY_FILENAME[os.path.basename(caminho_final)] = record_key
+                _espelhar_para_admissao(caminho_final)
+                if registrar:
+                    insert_aso_record(registro, log_fn=registrar_log)
+
+            if reutilizado:
                 if lista_novos_arquivos is not None and caminho_final not in lista_novos_arquivos:
                     lista_novos_arquivos.append(caminho_final)
-                _espelhar_para_admissao(caminho_final)
-                PROCESSED_KEY_BY_FILENAME[os.path.basename(caminho_final)] = record_key
+                bundle.add_page(
+                    i, SUCCESS, "Arquivo ja existe; reutilizado", campos, texto_ocr, scores, tempos,
+                    legacy_txt=False, reused_file=nome_final,
+                )
                 continue
 
-            img.save(caminho_final, "PDF", resolution=300.0)
-            registrar_log(f"Arquivo salvo: {caminho_final}")
-            _espelhar_para_admissao(caminho_final)
-
-            insert_aso_record(
-                {
-                    "origem_robo": "ASOgui",
-                    "nome": nome,
-                    "cpf": cpf,
-                    "data_aso": dataaso,
-                    "funcao_cargo": funcao_cargo,
-                    "arquivo_origem": caminho_final,
-                    "referencia_origem": numero_obra,
-                },
-                log_fn=registrar_log,
-            )
-
             if lista_novos_arquivos is not None:
                 lista_novos_arquivos.append(caminho_final)
-            PROCESSED_KEY_BY_FILENAME[os.path.basename(caminho_final)] = record_key
-
-            try:
-                with open(txt_path, "a", encoding="utf-8") as txt:
-                    txt.write("\n======================================\n")
-                    txt.write(f"Obra: {numero_obra}\n")
-                    txt.write(f"Arquivo gerado: {nome_final}\n")
-                    txt.write(f"Nome: {nome}\n")
-                    txt.write(f"CPF: {mask_cpf(cpf)}\n")
-                    txt.write(f"Data ASO: {dataaso}\n")
-                    txt.write(f"Funcao/Cargo: {funcao_cargo}\n")
-                    txt.write("======================================\n")
-            except Exception as e:
-                registrar_log(f"Erro ao escrever TXT: {e}")
-
+            bundle.add_page(i, SUCCESS, None, campos, texto_ocr, scores, tempos, arquivo_gerado=nome_final)
+
+        except TempoEsgotado:
+            _registrar_tempo_esgotado(pdf_path, i, "OCR", budget.elapsed(), stats, manifest_items)
+            bundle.add_page(
+                i, ERROR, "Tempo esgotado em OCR", ocr_text=texto_ocr,
+                timings={"raster_sec": raster_sec, "ocr_sec": budget.elapsed()},
+                legacy_txt=False, timed_out=True,
+            )
         except Exception as e:
             registrar_log(f"Erro na pagina {i} do PDF '{pdf_path}': {e}")
             if stats is not None:
                 stats["error"] += 1
                 stats["erros"].append({"arquivo": os.path.basename(pdf_path), "erro": f"Erro pagina {i}: {e}"})
+            bundle.add_page(
+                i, ERROR, f"Erro pagina {i}: {e}", ocr_text=texto_ocr,
+                timings={"raster_sec": raster_sec, "ocr_sec": budget.elapsed()},
+                legacy_txt=False,
+            )
 
 
 # ====================================================================
@@ -1084,40 +1428,163 @@ def _gdrive_name_matches(filename):
     return GDRIVE_NAME_FILTER in (filename or "").lower()
 
 
-def _stream_download(resp, dest_dir, filename):
+def _reservar_caminho(path):
+    # Downloads paralelos para a mesma pasta: o nome final e reservado com O_EXCL.
+    base, ext = os.path.splitext(path)
+    candidatos = [path] + [f"{base}_{i}{ext}" for i in range(1, 1000)] + [f"{base}_{uuid.uuid4().hex[:8]}{ext}"]
+    for candidato in candidatos:
+        try:
+            os.close(os.open(candidato, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return candidato
+        except FileExistsError:
+            continue
+    raise FileExistsError(path)
+
+
+def _stream_download(resp, dest_dir, filename, reopen=None):
     safe_name = _safe_filename(filename) or f"gdrive_{int(time.time())}.bin"
-    full_path = _unique_path(os.path.join(dest_dir, safe_name))
-    with open(full_path, "wb") as f:
-        while True:
-            chunk = resp.read(1024 * 1024)
-            if not chunk:
-                break
-            f.write(chunk)
+    full_path = _reservar_caminho(os.path.join(dest_dir, safe_name))
+    store = _blob_store()
+    hasher = StreamHasher() if store is not None else None
     try:
-        resp.close()
-    except Exception:
-        pass
-    return full_path
+        stream_to_file(
+            resp,
+            full_path,
+            reopen=reopen,
+            chunk_size=GDRIVE_CHUNK_BYTES,
+            retries=GDRIVE_RETRIES,
+            log_fn=registrar_log,
+            hasher=hasher,
+        )
+        if store is not None:
+            store.remember(full_path, hasher.hexdigest())
+        return full_path
+    except BaseException:
+        try:
+            os.remove(full_path)
+        except OSError:
+            pass
+        raise
 
 
-def download_gdrive_file(file_id, dest_dir):
-    cookiejar = http.cookiejar.CookieJar()
-    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookiejar))
-
-    def _open(url):
-        req = urllib.request.Request(
-            url,
-            headers={
-                "User-Agent": "Mozilla/5.0",
-                "Accept": "*/*",
-            },
+_GDRIVE_OPENER = None
+_GDRIVE_OPENER_LOCK = threading.Lock()
+
+
+def _gdrive_opener():
+    """Opener unico (cookies + pool keep-alive) compartilhado pelos downloads da execucao."""
+    global _GDRIVE_OPENER
+    with _GDRIVE_OPENER_LOCK:
+        if _GDRIVE_OPENER is None:
+            pool = ConnectionPool(max_per_host=max(1, GDRIVE_WORKERS), timeout=GDRIVE_TIMEOUT_SEC)
+            _GDRIVE_OPENER = urllib.request.build_opener(
+                urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+                KeepAliveHandler(pool),
+            )
+        return _GDRIVE_OPENER
+
+
+_GDRIVE_CACHE = None
+_BLOB_STORE = None
+
+
+def _blob_store():
+    global _BLOB_STORE
+    if not BLOB_STORE_ENABLED:
+        return None
+    with _GDRIVE_OPENER_LOCK:
+        if _BLOB_STORE is None:
+            _BLOB_STORE = BlobStore(BLOB_STORE_DIR, BLOB_STORE_INDEX_PATH)
+            # Uma limpeza por processo (no modo watch, nao a cada ciclo).
+            try:
+                removidos = _BLOB_STORE.prune(BLOB_STORE_MAX_AGE_D)
+                if removidos:
+                    registrar_log(f"Store de anexos: {removidos} blobs sem referencia removidos.")
+            except OSError as e:
+                registrar_log(f"Falha ao limpar store de anexos: {e}")
+        return _BLOB_STORE
+
+
+def _gdrive_cache():
+    global _GDRIVE_CACHE
+    if not GDRIVE_CACHE_ENABLED:
+        return None
+    # O conteudo dos arquivos do Drive mora no store de anexos: sem store, sem cache.
+    store = _blob_store()
+    if store is None:
+        return None
+    with _GDRIVE_OPENER_LOCK:
+        if _GDRIVE_CACHE is None:
+            try:
+                _GDRIVE_CACHE = GDriveCache(GDRIVE_CACHE_PATH, store, ttl_sec=GDRIVE_CACHE_TTL_H * 3600)
+            except Exception as e:
+                registrar_log(f"Falha ao carregar cache do Google Drive: {e}")
+                return None
+        return _GDRIVE_CACHE
+
+
+def _copiar_do_cache(entry, dest_dir):
+    destino = _reservar_caminho(os.path.join(dest_dir, _safe_filename(entry.get("filename")) or os.path.basename(entry["blob"])))
+    # O PDF temporario e removido apos o OCR: hardlink nao afeta o blob.
+    link_into(entry["blob"], destino)
+    return destino
+
+
+def _guardar_no_cache(cache, file_id, path, headers):
+    if cache is None or not path:
+        return
+    try:
+        cache.store(
+            file_id,
+            path,
+            os.path.basename(path),
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
         )
-        return opener.open(req, timeout=GDRIVE_TIMEOUT_SEC)
+    except Exception as e:
+        registrar_log(f"Falha ao gravar cache do Google Drive ({file_id}): {e}")
+
+
+def download_gdrive_file(file_id, dest_dir):
+    cache = _gdrive_cache()
+    entry = cache.get(file_id) if cache is not None else None
+    if entry is not None and not _gdrive_name_matches(entry.get("filename")):
+        return None
+    if entry is not None and cache.is_fresh(entry):
+        return _copiar_do_cache(entry, dest_dir)
+
+    opener = _gdrive_opener()
+    condicionais = GDriveCache.validators(entry)
+
+    def _open(url, offset=0):
+        headers = {
+            "User-Agent": "Mozilla/5.0",
+            "Accept": "*/*",
+        }
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+        else:
+            headers.update(condicionais)
+        req = urllib.request.Request(url, headers=headers)
+        try:
+            return opener.open(req, timeout=GDRIVE_TIMEOUT_SEC)
+        except urllib.error.HTTPError as e:
+            if e.code != 304 or entry is None:
+                raise
+            e.close()
+            return None
 
-    base_url = "https://drive.google.com/uc?export=download"
+    def _nao_modificado():
+        # 304: conteudo igual ao da copia local.
+        cache.touch(file_id)
+        return _copiar_do_cache(entry, dest_dir)
+
+    base_url = GDRIVE_BASE_URL
     url = f"{base_url}&id={urllib.parse.quote(file_id)}"
 
     resp = _open(url)
+    if resp is None:
+        return _nao_modificado()
     cd = resp.headers.get("Content-Disposition")
     filename = _parse_filename_from_cd(cd)
     if filename:
@@ -1130,7 +1597,9 @@ def download_gdrive_file(file_id, dest_dir):
             if "pdf" not in ctype:
                 resp.close()
                 return None
-        return _stream_download(resp, dest_dir, safe_name)
+        path = _stream_download(resp, dest_dir, safe_name, reopen=lambda offset: _open(url, offset))
+        _guardar_no_cache(cache, file_id, path, resp.headers)
+        return path
 
     html_text = resp.read(1024 * 1024).decode("utf-8", errors="ignore")
     resp.close()
@@ -1142,6 +1611,8 @@ def download_gdrive_file(file_id, dest_dir):
 
     url2 = f"{base_url}&confirm={urllib.parse.quote(confirm)}&id={urllib.parse.quote(file_id)}"
     resp2 = _open(url2)
+    if resp2 is None:
+        return _nao_modificado()
     cd2 = resp2.headers.get("Content-Disposition")
     filename2 = _parse_filename_from_cd(cd2) or filename or f"gdrive_{file_id}.pdf"
     safe_name2 = _safe_filename(filename2)
@@ -1153,13 +1624,15 @@ def download_gdrive_file(file_id, dest_dir):
         if "pdf" not in ctype2:
             resp2.close()
             return None
-    return _stream_download(resp2, dest_dir, safe_name2)
+    path = _stream_download(resp2, dest_dir, safe_name2, reopen=lambda offset: _open(url2, offset))
+    _guardar_no_cache(cache, file_id, path, resp2.headers)
+    return path
 
 
 
 RPC_E_CALL_REJECTED = -2147418111
-_OUTLOOK_PREV_FILTER = None
-_OUTLOOK_COM_INIT = False
+# Apartamento COM e MessageFilter sao por thread (uma thread COM por caixa).
+_COM_ESTADO = threading.local()
 
 
 try:
@@ -1171,15 +1644,18 @@ except AttributeError:
         _IID_IOleMessageFilter = None
 
 
+# Rejeicoes de chamadas COM da execucao (todas as threads COM); zerado a cada captar_emails.
+COM_REJEICOES = RejectionStats()
+
+
 class MessageFilter:
     _com_interfaces_ = [_IID_IOleMessageFilter]
     _public_methods_ = ["HandleInComingCall", "RetryRejectedCall", "MessagePending"]
 
-    def __init__(self, max_wait_sec=60):
-        self._start = time.time()
-        self._max_wait = max_wait_sec
-        self._delays = [250, 500, 1000, 2000]
-        self._idx = 0
+    def __init__(self, max_wait_sec=60, stats=None, schedule=None):
+        self._max_wait_ms = max_wait_sec * 1000
+        self._stats = stats
+        self._schedule = schedule or BackoffSchedule(adaptive=COM_ADAPTIVE_BACKOFF, window_sec=COM_BACKOFF_WINDOW_SEC)
 
     def HandleInComingCall(self, callType, taskCaller, tickCount, interfaceInfo):
         return 0  # SERVERCALL_ISHANDLED
@@ -1189,59 +1665,78 @@ class MessageFilter:
             retry_later = pythoncom.SERVERCALL_RETRYLATER
         except Exception:
             retry_later = 2
-        elapsed = time.time() - self._start
-        if elapsed >= self._max_wait:
-            return -1  # CANCELCALL
-        if rejectType == retry_later:
-            delay = self._delays[self._idx % len(self._delays)]
-            self._idx += 1
-            return delay
-        return -1
+        # tickCount: ms desde o inicio desta chamada (o limite vale por chamada, nao por execucao).
+        waited_ms = tickCount or 0
+        if rejectType == retry_later and waited_ms < self._max_wait_ms:
+            delay = self._schedule.next_delay()
+        else:
+            delay = -1  # CANCELCALL
+        if self._stats is not None:
+            self._stats.record(delay, waited_ms)
+        return delay
 
     def MessagePending(self, taskCaller, tickCount, pendingType):
         return 2  # PENDINGMSG_WAITDEFPROCESS
 
 
 def _register_message_filter(timeout_sec):
-    global _OUTLOOK_PREV_FILTER
     if not hasattr(pythoncom, "CoRegisterMessageFilter"):
         return False
     if _IID_IOleMessageFilter is None:
         return False
-    filt = MessageFilter(max_wait_sec=timeout_sec)
-    _OUTLOOK_PREV_FILTER = pythoncom.CoRegisterMessageFilter(filt)
+    filt = MessageFilter(max_wait_sec=timeout_sec, stats=COM_REJEICOES)
+    _COM_ESTADO.prev_filter = pythoncom.CoRegisterMessageFilter(filt)
     return True
 
 
 def _unregister_message_filter():
-    global _OUTLOOK_PREV_FILTER
+    anterior = getattr(_COM_ESTADO, "prev_filter", None)
+    _COM_ESTADO.prev_filter = None
     if not hasattr(pythoncom, "CoRegisterMessageFilter"):
-        _OUTLOOK_PREV_FILTER = None
         return
-    try:
-        pythoncom.CoRegisterMessageFilter(_OUTLOOK_PREV_FILTER)
-    finally:
-        _OUTLOOK_PREV_FILTER = None
+    pythoncom.CoRegisterMessageFilter(anterior)
 
 
 def cleanup_outlook_com():
-    global _OUTLOOK_COM_INIT
+    _COM_ESTADO.namespace = None
     try:
         _unregister_message_filter()
     except Exception:
         pass
-    if _OUTLOOK_COM_INIT:
+    if getattr(_COM_ESTADO, "com_init", False):
         try:
             pythoncom.CoUninitialize()
         except Exception:
             pass
-        _OUTLOOK_COM_INIT = False
+        _COM_ESTADO.com_init = False
+
+
+def _namespace_outlook(manter=False):
+    """
+    (app, namespace) do Outlook na thread atual. manter=True (modo watch, thread COM
+    persistente): reaproveita o namespace do ciclo anterior enquanto ele responder; caido
+    (Outlook reiniciado), libera o apartamento COM e reconecta.
+    """
+    if manter:
+        aberto = getattr(_COM_ESTADO, "namespace", None)
+        if aberto is not None:
+            try:
+                _ = aberto[1].Folders.Count
+                return aberto
+            except Exception as e:
+                registrar_log(f"Sessao do Outlook perdida; reconectando: {e}")
+                cleanup_outlook_com()
+    aberto = get_outlook_namespace_robusto()
+    if manter:
+        _COM_ESTADO.namespace = aberto
+    return aberto
 
 
 def get_outlook_namespace_robusto(timeout_sec=60):
-    global _OUTLOOK_COM_INIT
+    if pythoncom is None:
+        raise RuntimeError("pywin32 nao instalado; Outlook indisponivel (use ASO_SOURCE_DIR para fonte offline)")
     pythoncom.CoInitialize()
-    _OUTLOOK_COM_INIT = True
+    _COM_ESTADO.com_init = True
     filter_enabled = _register_message_filter(timeout_sec)
 
     try:
@@ -1277,237 +1772,323 @@ def get_outlook_namespace_robusto(timeout_sec=60):
     except Exception:
         raise
 
-def captar_emails(limit=200, execution_id=None, started_at=None, manifest=None):
-    def _get_msg_datetime(msg):
-        for attr in ("ReceivedTime", "SentOn", "CreationTime"):
+def _get_msg_datetime(msg):
+    if isinstance(msg, MailProxy):
+        return msg.received
+    for attr in ("ReceivedTime", "SentOn", "CreationTime"):
+        try:
+            t = to_naive_datetime(getattr(msg, attr))
+        except Exception:
+            continue
+        if t is not None:
+            return t
+    return None
+
+
+def _get_shared_inbox(ns, smtp):
+    try:
+        recip = ns.CreateRecipient(smtp)
+        recip.Resolve()
+        if not getattr(recip, "Resolved", False):
+            return None
+        # 6 = olFolderInbox
+        return ns.GetSharedDefaultFolder(recip, 6)
+    except Exception:
+        return None
+
+
+def _dump_stores_and_folders(ns):
+    if not DEBUG_MODE:
+        return
+    try:
+        stores = []
+        for st in ns.Stores:
             try:
-                t = getattr(msg, attr)
-                if isinstance(t, datetime):
-                    if t.tzinfo:
-                        t = t.astimezone().replace(tzinfo=None)
-                    return t
-                try:
-                    # pywintypes.Time or similar COM time
-                    return datetime(t.year, t.month, t.day, t.hour, t.minute, t.second)
-                except Exception:
-                    pass
-                try:
-                    return datetime.fromtimestamp(float(t))
-                except Exception:
-                    pass
-                if isinstance(t, str):
-                    raw = t.strip()
-                    for fmt in (
-                        "%d/%m/%Y %H:%M:%S",
-                        "%d/%m/%Y %H:%M",
-                        "%m/%d/%Y %H:%M:%S",
-                        "%m/%d/%Y %H:%M",
-                        "%Y-%m-%d %H:%M:%S",
-                        "%Y-%m-%d %H:%M",
-                    ):
-                        try:
-                            return datetime.strptime(raw, fmt)
-                        except Exception:
-                            pass
-                    try:
-                        return datetime.fromisoformat(raw.replace("Z", "+00:00")).astimezone().replace(tzinfo=None)
-                    except Exception:
-                        pass
+                stores.append({
+                    "DisplayName": getattr(st, "DisplayName", ""),
+                    "FilePath": getattr(st, "FilePath", ""),
+                })
             except Exception:
                 continue
-        return None
+        registrar_log("Outlook Stores:", context={"stores": stores})
+    except Exception:
+        pass
+
+    try:
+        folder_paths = []
+        for f in ns.Folders:
+            try:
+                folder_paths.append(getattr(f, "FolderPath", ""))
+            except Exception:
+                continue
+        registrar_log("Outlook Folders (root):", context={"folders": folder_paths})
+    except Exception:
+        pass
 
-    def _get_shared_inbox(ns, smtp):
-        try:
-            recip = ns.CreateRecipient(smtp)
-            recip.Resolve()
-            if not getattr(recip, "Resolved", False):
-                return None
-            # 6 = olFolderInbox
-            return ns.GetSharedDefaultFolder(recip, 6)
-        except Exception:
-            return None
 
-    def _dump_stores_and_folders(ns):
-        if not DEBUG_MODE:
+def _find_best_inbox(ns, inicio_janela, inicio_amanha, preferred_smtp=None):
+    pattern = re.compile(
+        r"(?:ENC:|RE:|FWD:|FW:)?\s*ASO\s+ADMISSIONAL",
+        re.IGNORECASE,
+    )
+    best = None
+    candidates = []
+    seen_paths = set()
+
+    def _consider_inbox(inbox, store_name):
+        nonlocal best
+        if not inbox:
             return
         try:
-            stores = []
-            for st in ns.Stores:
-                try:
-                    stores.append({
-                        "DisplayName": getattr(st, "DisplayName", ""),
-                        "FilePath": getattr(st, "FilePath", ""),
-                    })
-                except Exception:
-                    continue
-            registrar_log("Outlook Stores:", context={"stores": stores})
+            folder_path = getattr(inbox, "FolderPath", "") or ""
+            path_key = folder_path.lower()
+            if path_key and path_key in seen_paths:
+                return
+            if path_key:
+                seen_paths.add(path_key)
+            latest_dt = None
+            has_match_today = False
+            for drec, subj in _amostra_inbox(inbox, None, 50):
+                if drec and (latest_dt is None or drec > latest_dt):
+                    latest_dt = drec
+                if drec and inicio_janela <= drec < inicio_amanha and pattern.search(subj):
+                    has_match_today = True
+                    break
+            candidates.append({
+                "store": store_name,
+                "folder": folder_path,
+                "latest": latest_dt.isoformat() if latest_dt else None,
+                "has_match_today": has_match_today,
+            })
+            score = (1 if has_match_today else 0, latest_dt or datetime.min)
+            if best is None or score > best["score"]:
+                best = {"inbox": inbox, "score": score}
         except Exception:
-            pass
+            return
 
+    for root in ns.Folders:
         try:
-            folder_paths = []
-            for f in ns.Folders:
+            store_name = getattr(root, "Name", "")
+            inbox = None
+            try:
+                inbox = root.Folders("Caixa de Entrada")
+            except Exception:
                 try:
-                    folder_paths.append(getattr(f, "FolderPath", ""))
+                    inbox = root.Folders("Inbox")
                 except Exception:
-                    continue
-            registrar_log("Outlook Folders (root):", context={"folders": folder_paths})
+                    inbox = None
+            _consider_inbox(inbox, store_name)
         except Exception:
-            pass
+            continue
 
-    def _find_best_inbox(ns, inicio_janela, inicio_amanha, preferred_smtp=None):
-        pattern = re.compile(
-            r"(?:ENC:|RE:|FWD:|FW:)?\s*ASO\s+ADMISSIONAL",
-            re.IGNORECASE,
-        )
-        best = None
-        candidates = []
-        seen_paths = set()
+    if preferred_smtp:
+        _consider_inbox(_get_shared_inbox(ns, preferred_smtp), f"shared:{preferred_smtp}")
 
-        def _consider_inbox(inbox, store_name):
-            nonlocal best
-            if not inbox:
-                return
-            try:
-                folder_path = getattr(inbox, "FolderPath", "") or ""
-                path_key = folder_path.lower()
-                if path_key and path_key in seen_paths:
-                    return
-                if path_key:
-                    seen_paths.add(path_key)
-                items = inbox.Items
-                try:
-                    items.Sort("[ReceivedTime]", True)
-                except Exception:
-                    items.Sort("ReceivedTime", True)
-                latest_dt = None
-                has_match_today = False
-                for i in range(1, min(50, items.Count) + 1):
-                    try:
-                        msg = items.Item(i)
-                        drec = _get_msg_datetime(msg)
-                        if drec and (latest_dt is None or drec > latest_dt):
-                            latest_dt = drec
-                        subj = msg.Subject or ""
-                        if drec and inicio_janela <= drec < inicio_amanha and pattern.search(subj):
-                            has_match_today = True
-                            break
-                    except Exception:
-                        continue
-                candidates.append({
-                    "store": store_name,
-                    "folder": folder_path,
-                    "latest": latest_dt.isoformat() if latest_dt else None,
-                    "has_match_today": has_match_today,
-                })
-                score = (1 if has_match_today else 0, latest_dt or datetime.min)
-                if best is None or score > best["score"]:
-                    best = {"inbox": inbox, "score": score}
-            except Exception:
-                return
+    if candidates and DEBUG_MODE:
+        registrar_log("Candidatos Inbox (auto):", context={"candidates": candidates})
+    return best["inbox"] if best else None
 
-        for root in ns.Folders:
-            try:
-                store_name = getattr(root, "Name", "")
-                inbox = None
+
+def _amostra_inbox(inbox, items, sample_size, com_assunto=True):
+    """(data, assunto) das mensagens mais recentes: Table API em bloco, ou Items.Item(i) como fallback."""
+    linhas = table_rows(inbox, max_rows=sample_size) if (OUTLOOK_TABLE_SCAN and inbox is not None) else None
+    if linhas is not None:
+        return [(linha.received, linha.subject) for linha in linhas]
+    if items is None:
+        items = inbox.Items
+        try:
+            items.Sort("[ReceivedTime]", True)
+        except Exception:
+            items.Sort("ReceivedTime", True)
+    amostra = []
+    for i in range(1, min(sample_size, items.Count) + 1):
+        try:
+            msg = items.Item(i)
+            drec = _get_msg_datetime(msg)
+            subj = ""
+            if com_assunto:
                 try:
-                    inbox = root.Folders("Caixa de Entrada")
+                    subj = msg.Subject or ""
                 except Exception:
-                    try:
-                        inbox = root.Folders("Inbox")
-                    except Exception:
-                        inbox = None
-                _consider_inbox(inbox, store_name)
-            except Exception:
-                continue
+                    subj = ""
+            amostra.append((drec, subj))
+        except Exception:
+            continue
+    return amostra
 
-        if preferred_smtp:
-            _consider_inbox(_get_shared_inbox(ns, preferred_smtp), f"shared:{preferred_smtp}")
 
-        if candidates and DEBUG_MODE:
-            registrar_log("Candidatos Inbox (auto):", context={"candidates": candidates})
-        return best["inbox"] if best else None
+def _summarize_inbox(items, inicio_janela, inicio_amanha, sample_size=50, inbox=None):
+    latest_dt = None
+    in_window = 0
+    for drec, _subj in _amostra_inbox(inbox, items, sample_size, com_assunto=False):
+        if drec and (latest_dt is None or drec > latest_dt):
+            latest_dt = drec
+        if drec and inicio_janela <= drec < inicio_amanha:
+            in_window += 1
+    return latest_dt, in_window
 
-    def _summarize_inbox(items, inicio_janela, inicio_amanha, sample_size=50):
-        latest_dt = None
-        in_window = 0
-        for i in range(1, min(sample_size, items.Count) + 1):
-            try:
-                msg = items.Item(i)
-                drec = _get_msg_datetime(msg)
-                if drec and (latest_dt is None or drec > latest_dt):
-                    latest_dt = drec
-                if drec and inicio_janela <= drec < inicio_amanha:
-                    in_window += 1
-            except Exception:
-                continue
-        return latest_dt, in_window
 
-    def _capta_core():
-        registrar_log("Iniciando leitura do Outlook...")
-        anexos_processados = set()
+def _descobrir_conta(ns, caixa):
+    conta_destino = None
 
+    # Tentativa 1: localizar pela conta do Outlook
+    for acc in ns.Accounts:
         try:
-            app, outlook = get_outlook_namespace_robusto()
-            _dump_stores_and_folders(outlook)
+            if acc.DisplayName.lower() == caixa.account.lower():
+                conta_destino = acc
+                break
+        except:
+            pass
 
+    # Tentativa 2: abrir mailbox direto pelo email
+    if not conta_destino:
+        try:
+            conta_destino = ns.Folders(caixa.account)
+        except:
             conta_destino = None
 
-            # Tentativa 1: localizar pela conta do Outlook
-            for acc in outlook.Accounts:
-                try:
-                    if acc.DisplayName.lower() == EMAIL_DESEJADO.lower():
-                        conta_destino = acc
-                        break
-                except:
-                    pass
+    # Tentativa 3: abrir mailbox pelo nome visivel
+    if not conta_destino and caixa.name:
+        try:
+            conta_destino = ns.Folders(caixa.name)
+        except:
+            conta_destino = None
 
-            # Tentativa 2: abrir mailbox direto pelo email
-            if not conta_destino:
-                try:
-                    conta_destino = outlook.Folders(EMAIL_DESEJADO)
-                except:
-                    conta_destino = None
+    return conta_destino
 
-            # Tentativa 3: abrir mailbox pelo nome visivel
-            if not conta_destino and MAILBOX_NAME:
-                try:
-                    conta_destino = outlook.Folders(MAILBOX_NAME)
-                except:
-                    conta_destino = None
 
-            # Se falhar tudo
-            if not conta_destino:
-                registrar_log(f"Mailbox nao encontrada: {EMAIL_DESEJADO} / {MAILBOX_NAME}")
-                return
+def _resumo_anexo(resumo):
+    # Substitutos de salvar_paginas podem nao devolver resumo: sem erro conhecido.
+    if not isinstance(resumo, dict):
+        return {"failed_pages": []}
+    return {k: v for k, v in resumo.items() if k in ("pages", "failed_pages", "error")}
 
-            registrar_log(f"Usando mailbox: {getattr(conta_destino, 'Name', 'Desconhecida')}")
 
-        except Exception as e:
-            registrar_log(f"Erro ao conectar no Outlook: {e}")
-            registrar_log("Verifique se o Outlook esta aberto e sem prompts. Sugestao: fechar e abrir manualmente, testar outlook /safe.")
-            return
+def _cabe_em_memoria(tamanho):
+    if not ATTACH_IN_MEMORY:
+        return False
+    # Tamanho desconhecido conta como pequeno; o limite segura a memoria da fila com varios workers.
+    return not ATTACH_IN_MEMORY_MAX_MB or not tamanho or tamanho <= ATTACH_IN_MEMORY_MAX_MB * 1024 * 1024
 
-        try:
-            # Caixa de entrada da conta selecionada
-            try:
-                inbox = conta_destino.Folders("Caixa de Entrada")
-            except:
-                inbox = conta_destino.Folders("Inbox")
 
-            mensagens = inbox.Items
-            try:
-                mensagens.Sort("[ReceivedTime]", True)
+def _registrar_erro_inesperado(ctx, e):
+    ctx.last_error = f"Erro inesperado: {e}"
+    registrar_log(ctx.last_error)
+    try:
+        erro_id = f"erro_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        pasta_erro = os.path.join(PASTA_ERROS, erro_id)
+        os.makedirs(pasta_erro, exist_ok=True)
+        with open(os.path.join(pasta_erro, "erro.txt"), "w", encoding="utf-8") as f:
+            f.write(traceback.format_exc())
+    except:
+        pass
+
+
+def _caminho_temp(ctx, pasta_data, idx):
+    if ctx.pipeline.inline and len(ctx.caixas) == 1:
+        return os.path.join(pasta_data, f"temp_{idx}.pdf")
+    # Emails da mesma obra/dia (ou de outra caixa) podem estar em voo ao mesmo tempo.
+    return os.path.join(pasta_data, f"temp_{uuid.uuid4().hex[:8]}_{idx}.pdf")
+
+
+def _despachar_anexo(ctx, msg, assunto, recebido, nome, caminho, dados=None):
+    interessados = [c for c in ctx.consumidores if c.accepts(assunto)]
+    if not interessados:
+        return
+    try:
+        remetente = getattr(msg, "SenderEmailAddress", "") or ""
+    except Exception:
+        remetente = ""
+    if dados is not None:
+        # Anexo em memoria: os ctx.consumidores recebem um temporario local, removido em seguida.
+        fd, caminho = tempfile.mkstemp(prefix="aso_anexo_", suffix=".pdf", dir=ATTACH_TMP_DIR)
+        with os.fdopen(fd, "wb") as f:
+            f.write(dados)
+    try:
+        for consumidor in interessados:
+            try:
+                consumidor.consume(recebido, nome, caminho, subject=assunto, sender=remetente)
+            except Exception as e:
+                registrar_log(f"  Falha no consumidor '{consumidor.name}' ({nome}): {e}")
+    finally:
+        if dados is not None:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+
+def _abrir_caixa(ctx, caixa, resumo):
+    """Conecta ao Outlook nesta thread e resolve a inbox da caixa: (outlook, inbox, mensagens, em_cache) ou None."""
+    inbox = None
+    inbox_em_cache = False
+    # Pasta trocada pela heuristica (_find_best_inbox) nao vai para o cache: o cache nao
+    # revalida e a escolha valeria para sempre.
+    inbox_heuristica = False
+    folder_cache_key = mailbox_key(caixa.account, caixa.name)
+
+    if ctx.fonte is not None:
+        # Fonte offline (pasta de .eml/.msg/PDF): sem COM, sem descoberta de mailbox.
+        inbox = ctx.fonte
+        registrar_log(f"Usando fonte offline: {getattr(inbox, 'FolderPath', '')}")
+        return None, inbox, sort_items(inbox.Items), True
+
+    try:
+        app, outlook = _namespace_outlook(ctx.keep_com)
+
+        if ctx.folder_cache is not None:
+            try:
+                with ctx.trava_pastas:
+                    inbox = ctx.folder_cache.open(outlook, folder_cache_key, log_fn=registrar_log)
+            except Exception as e:
+                registrar_log(f"Falha ao carregar cache de pastas: {e}")
+                inbox = None
+        if inbox is not None:
+            inbox_em_cache = True
+            registrar_log(f"Usando inbox em cache: {getattr(inbox, 'FolderPath', 'Desconhecido')}")
+        else:
+            _dump_stores_and_folders(outlook)
+            conta_destino = _descobrir_conta(outlook, caixa)
+
+            # Se falhar tudo
+            if not conta_destino:
+                registrar_log(f"Mailbox nao encontrada: {caixa.account} / {caixa.name}")
+                resumo['status'] = 'not_found'
+                return None
+
+            registrar_log(f"Usando mailbox: {getattr(conta_destino, 'Name', 'Desconhecida')}")
+
+    except Exception as e:
+        registrar_log(f"Erro ao conectar no Outlook: {e}")
+        registrar_log("Verifique se o Outlook esta aberto e sem prompts. Sugestao: fechar e abrir manualmente, testar outlook /safe.")
+        return None
+
+    if inbox_em_cache:
+        try:
+            mensagens = sort_items(inbox.Items)
+        except Exception as e:
+            registrar_log(f"Erro ao acessar inbox em cache: {e}")
+            return None
+    else:
+        try:
+            # Caixa de entrada da conta selecionada
+            try:
+                inbox = conta_destino.Folders("Caixa de Entrada")
+            except:
+                inbox = conta_destino.Folders("Inbox")
+
+            mensagens = inbox.Items
+            try:
+                mensagens.Sort("[ReceivedTime]", True)
             except Exception:
                 mensagens.Sort("ReceivedTime", True)
 
         except Exception as e:
             registrar_log(f"Erro ao acessar caixa de entrada: {e}")
             # Fallback: tentar inbox compartilhado via recipient
-            inbox = _get_shared_inbox(outlook, EMAIL_DESEJADO)
+            inbox = _get_shared_inbox(outlook, caixa.account)
             if inbox is None:
-                return
+                return None
             try:
                 mensagens = inbox.Items
                 try:
@@ -1517,473 +2098,1243 @@ def captar_emails(limit=200, execution_id=None, started_at=None, manifest=None):
                 registrar_log(f"Usando inbox compartilhado: {getattr(inbox, 'FolderPath', 'Desconhecido')}")
             except Exception as e2:
                 registrar_log(f"Erro ao acessar inbox compartilhado: {e2}")
-                return
-        
-        
-        
-        processados = 0
-        encontrados_hoje = 0
-        sample_subjects = []
-        
-        inicio_hoje = datetime.now().replace(
-            hour=0, minute=0, second=0, microsecond=0
-        )
-        inicio_amanha = inicio_hoje + timedelta(days=1)
-        # Padrão: busca apenas emails de hoje (pode ser configurado via ASO_DAYS_BACK)
-        days_back_env = os.getenv("ASO_DAYS_BACK")
-        if days_back_env is None or days_back_env == "":
-            days_back = 0  # Padrão: apenas hoje
-        else:
-            try:
-                days_back = int(days_back_env)
-                if days_back < 0:
-                    days_back = 0  # Se for negativo, usa 0 (apenas hoje)
-            except ValueError:
-                days_back = 0  # Se não for número válido, usa 0 (apenas hoje)
-        
-        inicio_janela = inicio_hoje - timedelta(days=days_back)
-        
-        if days_back == 0:
-            registrar_log(f"Janela de busca: apenas hoje ({inicio_hoje.date()})")
-        else:
-            registrar_log(f"Janela de busca: últimos {days_back} dias (de {inicio_janela.date()} até {inicio_amanha.date()})")
-            if days_back_env:
-                registrar_log(f"  (Configurado via ASO_DAYS_BACK={days_back_env})")
+                return None
 
-        try:
-            latest_dt, in_window = _summarize_inbox(mensagens, inicio_janela, inicio_amanha)
-            if in_window == 0:
-                fallback_inbox = _find_best_inbox(outlook, inicio_janela, inicio_amanha, EMAIL_DESEJADO)
-                if fallback_inbox is not None:
-                    fallback_path = getattr(fallback_inbox, "FolderPath", "")
-                    current_path = getattr(inbox, "FolderPath", "")
-                    if fallback_path and fallback_path != current_path:
-                        registrar_log(
-                            "Inbox selecionada sem mensagens na janela; alternando automaticamente.",
-                            context={
-                                "from": current_path,
-                                "to": fallback_path,
-                                "latest_selected": latest_dt.isoformat() if latest_dt else None,
-                            },
-                        )
-                        inbox = fallback_inbox
-                        mensagens = inbox.Items
-                        try:
-                            mensagens.Sort("[ReceivedTime]", True)
-                        except Exception:
-                            mensagens.Sort("ReceivedTime", True)
-        except Exception:
-            pass
-        
-        # ESTATISTICAS GERAIS ACUMULADAS
-        stats_gerais = {
-            'execution_id': execution_id,
-            'started_at': started_at.isoformat() if started_at else None,
-            'total_detected': 0,
-            'total_processed': 0,
-            'success': 0,
-            'error': 0,
-            'skipped_duplicate': 0,
-            'skipped_draft': 0,
-            'skipped_non_aso': 0,
-            'skipped_yube': 0,
-            'ocr_failures': [],
-            'sucessos': [],
-            'erros': [],
-            'skipped_items': [],
-            'tempo_total': ''
-        }
-        last_error = None
-        start_time_total = datetime.now()
-        
-        # Collect indices to iterate in reverse, to avoid issues with deleting items if that were ever implemented
-        # For now, it just ensures consistent iteration order if new items arrive during processing
-        indices = list(range(1, min(limit, mensagens.Count) + 1))
-        
-        registrar_log(f"Total de mensagens na caixa de entrada: {mensagens.Count}")
-        if DEBUG_MODE:
-            try:
-                debug_samples = []
-                for di in range(1, min(5, mensagens.Count) + 1):
-                    try:
-                        dmsg = mensagens.Item(di)
-                        rt = getattr(dmsg, "ReceivedTime", None)
-                        st = getattr(dmsg, "SentOn", None)
-                        ct = getattr(dmsg, "CreationTime", None)
-                        parsed = _get_msg_datetime(dmsg)
-                        debug_samples.append({
-                            "received_raw": str(rt),
-                            "sent_raw": str(st),
-                            "creation_raw": str(ct),
-                            "parsed": parsed.isoformat() if parsed else None,
-                            "subject": (dmsg.Subject or "")[:80],
-                        })
-                    except Exception:
-                        continue
-                if debug_samples:
-                    registrar_log("Debug datas amostra (top 5):", context={"samples": debug_samples})
-            except Exception:
-                pass
-        # NOTE: Nao troca de mailbox automaticamente.
-        # A leitura deve ocorrer apenas na inbox configurada (aso@enesa.com.br).
-        if DEBUG_MODE:
-            try:
-                recent_dates = []
-                for di in range(1, min(20, mensagens.Count) + 1):
-                    try:
-                        dmsg = mensagens.Item(di)
-                        drec = _get_msg_datetime(dmsg)
-                        if drec:
-                            recent_dates.append(drec)
-                    except Exception:
-                        continue
-                if recent_dates:
-                    recent_dates.sort(reverse=True)
+    try:
+        latest_dt, in_window = _summarize_inbox(mensagens, ctx.inicio_janela, ctx.inicio_amanha, inbox=inbox)
+        # Inbox vinda do cache ja foi a escolhida antes; janela vazia ali e legitima.
+        if in_window == 0 and not inbox_em_cache:
+            fallback_inbox = _find_best_inbox(outlook, ctx.inicio_janela, ctx.inicio_amanha, caixa.account)
+            if fallback_inbox is not None:
+                fallback_path = getattr(fallback_inbox, "FolderPath", "")
+                current_path = getattr(inbox, "FolderPath", "")
+                if fallback_path and fallback_path != current_path:
                     registrar_log(
-                        "Debug datas recentes (top3):",
-                        context={"top3": [d.isoformat() for d in recent_dates[:3]]},
+                        "Inbox selecionada sem mensagens na janela; alternando automaticamente.",
+                        context={
+                            "from": current_path,
+                            "to": fallback_path,
+                            "latest_selected": latest_dt.isoformat() if latest_dt else None,
+                        },
                     )
-            except Exception:
-                pass
-        
-        for i in reversed(indices): # Changed from `for i in range(1, ...)` to `for i in reversed(indices)`
-            try:
-                msg = mensagens.Item(i)
-        
-                # Em alguns ambientes Outlook/COM (ou wrappers), o item pode nao expor Class=43
-                # mesmo sendo um email utilizavel. So pulamos se nem ao menos houver assunto.
-                msg_class = getattr(msg, "Class", None)
-                if msg_class not in (None, 43):
+                    inbox = fallback_inbox
+                    inbox_heuristica = True
+                    mensagens = inbox.Items
                     try:
-                        _ = msg.Subject
+                        mensagens.Sort("[ReceivedTime]", True)
                     except Exception:
-                        continue
+                        mensagens.Sort("ReceivedTime", True)
+    except Exception:
+        pass
+
+    if ctx.folder_cache is not None and not inbox_em_cache and not inbox_heuristica:
+        try:
+            with ctx.trava_pastas:
+                ctx.folder_cache.remember(folder_cache_key, inbox)
+                ctx.folder_cache.save()
+        except Exception as e:
+            registrar_log(f"Falha ao gravar cache de pastas: {e}")
+    return outlook, inbox, mensagens, inbox_em_cache
+
+
+def _varrer_caixa(ctx, caixa):
+    """Uma caixa, na thread COM dela: resolve a inbox, filtra as candidatas e entrega os emails ao ctx.pipeline."""
+    resumo = {
+        'account': caixa.account,
+        'name': caixa.name,
+        'folder': None,
+        'status': 'error',
+        'messages': 0,
+        'candidates': 0,
+        'emails': 0,
+        'found_today': 0,
+        'attachments': 0,
+        'processed': 0,
+        'success': 0,
+        'error': 0,
+    }
+    ctx.por_caixa[caixa] = resumo
+    aberta = _abrir_caixa(ctx, caixa, resumo)
+    if aberta is None:
+        return None
+    outlook, inbox, mensagens, _em_cache = aberta
+    resumo['folder'] = getattr(inbox, "FolderPath", "") or ""
+    sync_key = SyncState.folder_key(getattr(inbox, "StoreID", None), resumo['folder'])
+    if not ctx.reservar_pasta(sync_key):
+        registrar_log(f"Caixa {caixa.label} aponta para uma pasta ja lida nesta execucao; ignorada: {resumo['folder']}")
+        resumo['status'] = 'duplicate_folder'
+        return None
+
+    contagem = ctx.stats_parcial()
+    resumo['messages'] = mensagens.Count
+    registrar_log(f"Total de mensagens na caixa de entrada: {resumo['messages']}")
 
-                recebido = _get_msg_datetime(msg)
-                if not recebido:
+    inicio_filtro = ctx.inicio_janela
+    if ctx.sync_state is not None:
+        try:
+            ultimo_recebido, _ids = ctx.sync_state.watermark(sync_key)
+            if ultimo_recebido is not None and not FULL_RESCAN:
+                inicio_filtro = max(ctx.inicio_janela, ultimo_recebido)
+                registrar_log(
+                    "Sincronizacao incremental a partir da marca d'agua.",
+                    context={"last_received": ultimo_recebido.isoformat(), "pasta": sync_key},
+                )
+        except Exception as e:
+            registrar_log(f"Falha ao carregar estado de sincronizacao: {e}")
+            sync_key = None
+    else:
+        sync_key = None
+
+    # Janela de datas + assunto filtrados pelo proprio Outlook (Items.Restrict / GetTable);
+    # a regex de assunto abaixo continua como validacao final.
+    filtro_dasl = build_dasl_filter(inicio_filtro, ctx.inicio_amanha) if OUTLOOK_RESTRICT else None
+
+    # Com marca d'agua, ctx.limit pagina do mais antigo para o mais novo: a marca so avanca sobre
+    # emails lidos e os mais novos que ficaram de fora entram na proxima execucao.
+    do_mais_antigo = sync_key is not None
+    restrita = False
+
+    # Table API: EntryID/data/assunto em bloco; o MailItem so e aberto para os candidatos.
+    linhas_tabela = None
+    if OUTLOOK_TABLE_SCAN:
+        linhas_tabela = table_rows(inbox, filtro_dasl, max_rows=None if do_mais_antigo else ctx.limit, log_fn=registrar_log)
+    if linhas_tabela is not None:
+        candidatas = []
+        for linha in linhas_tabela:
+            if not linha.received or not (ctx.inicio_janela <= linha.received < ctx.inicio_amanha):
+                continue
+            if linha.received.date() == ctx.inicio_hoje.date():
+                resumo['found_today'] += 1
+            if not ASO_SUBJECT_RE.search(linha.subject):
+                if DEBUG_MODE and len(ctx.sample_subjects) < 5:
+                    ctx.sample_subjects.append(linha.subject)
+                continue
+            if ctx.ja_sincronizada(sync_key, linha.received, linha.entry_id):
+                contagem['skipped_synced'] += 1
+                continue
+            candidatas.append(linha)
+        if do_mais_antigo and len(candidatas) > ctx.limit:
+            registrar_log(f"{len(candidatas)} candidatas acima do limite ({ctx.limit}); lendo as mais antigas primeiro.")
+            candidatas = candidatas[-ctx.limit:]
+        restrita = True
+        mensagens = EntryIdItems(outlook, candidatas, store_id=getattr(inbox, "StoreID", None))
+        registrar_log(
+            f"Mensagens candidatas via Table API: {len(candidatas)} de {len(linhas_tabela)} linhas lidas",
+            context={"filtro": filtro_dasl},
+        )
+    elif filtro_dasl:
+        mensagens, restrita = restrict_items(mensagens, filtro_dasl, log_fn=registrar_log)
+        if restrita:
+            registrar_log(f"Mensagens candidatas apos Restrict: {mensagens.Count}", context={"filtro": filtro_dasl})
+
+    # Cada propriedade do MailItem e lida do Outlook uma vez so (loop, debug e diagnostico).
+    proxy_stats = ProxyStats()
+    mensagens = ProxyItems(mensagens, stats=proxy_stats)
+    leitura = {
+        'caixa': resumo,
+        'mensagens': mensagens,
+        'linhas_tabela': linhas_tabela,
+        'sync_key': sync_key,
+        'stats': contagem,
+    }
+
+    # Collect indices to iterate in reverse, to avoid issues with deleting items if that were ever implemented
+    # For now, it just ensures consistent iteration order if new items arrive during processing
+    total_candidatas = mensagens.Count
+    indices = list(range(1, min(ctx.limit, total_candidatas) + 1))
+    if do_mais_antigo and total_candidatas > ctx.limit:
+        if restrita:
+            # Colecao ja restrita a janela/marca d'agua (ordem decrescente): percorre do fim e
+            # para apos `ctx.limit` emails lidos (os da fronteira ja sincronizados nao contam).
+            indices = list(range(1, total_candidatas + 1))
+            registrar_log(f"{total_candidatas} candidatas acima do limite ({ctx.limit}); lendo as mais antigas primeiro.")
+        else:
+            # Sem filtro no Outlook nao da para paginar pela data: se a primeira mensagem
+            # deixada de fora ainda esta na janela, a marca d'agua nao avanca nesta execucao.
+            try:
+                primeira_fora = _get_msg_datetime(mensagens.Item(ctx.limit + 1))
+            except Exception:
+                primeira_fora = None
+            if primeira_fora is None or primeira_fora >= inicio_filtro:
+                ctx.segurar_marca(sync_key)
+                registrar_log(
+                    f"Varredura truncada em {ctx.limit} de {total_candidatas} mensagens; marca d'agua mantida.",
+                    context={"pasta": sync_key},
+                )
+    resumo['candidates'] = len(indices)
+    if DEBUG_MODE:
+        try:
+            debug_samples = []
+            for di in range(1, min(5, mensagens.Count) + 1):
+                try:
+                    dmsg = mensagens.Item(di)
+                    rt = getattr(dmsg, "ReceivedTime", None)
+                    st = getattr(dmsg, "SentOn", None)
+                    ct = getattr(dmsg, "CreationTime", None)
+                    parsed = _get_msg_datetime(dmsg)
+                    debug_samples.append({
+                        "received_raw": str(rt),
+                        "sent_raw": str(st),
+                        "creation_raw": str(ct),
+                        "parsed": parsed.isoformat() if parsed else None,
+                        "subject": (dmsg.Subject or "")[:80],
+                    })
+                except Exception:
                     continue
-                assunto = msg.Subject or ""
-        
-                if not (inicio_janela <= recebido < inicio_amanha):
+            if debug_samples:
+                registrar_log("Debug datas amostra (top 5):", context={"samples": debug_samples})
+        except Exception:
+            pass
+    # NOTE: Nao troca de mailbox automaticamente.
+    # A leitura deve ocorrer apenas nas inboxes configuradas (ASO_EMAIL_ACCOUNT).
+    if DEBUG_MODE:
+        try:
+            recent_dates = []
+            for di in range(1, min(20, mensagens.Count) + 1):
+                try:
+                    dmsg = mensagens.Item(di)
+                    drec = _get_msg_datetime(dmsg)
+                    if drec:
+                        recent_dates.append(drec)
+                except Exception:
                     continue
-        
-                if recebido.date() == inicio_hoje.date():
-                    encontrados_hoje += 1
-        
-                # Padrao mais flexivel: aceita prefixos (ENC/RE/FW) e pequenas variacoes
-                m = re.search(
-                    r"(?:ENC:|RE:|FWD:|FW:)?\s*ASO\s+ADMISSIONAL\s*[-–]\s*([A-Za-z0-9]+)\s*[-–]\s*([0-3]?\d[/-][0-1]?\d[/-]\d{2,4})(?:\s*[-–]\s*.*)?",
-                    assunto,
-                    re.IGNORECASE
+            if recent_dates:
+                recent_dates.sort(reverse=True)
+                registrar_log(
+                    "Debug datas recentes (top3):",
+                    context={"top3": [d.isoformat() for d in recent_dates[:3]]},
                 )
+        except Exception:
+            pass
 
-                if not m:
-                    m = re.search(
-                        r"(?:ENC:|RE:|FWD:|FW:)?\s*ASO\s+ADMISSIONAL\s*[-–]\s*([A-Za-z0-9]+)(?:\s*[-–]\s*.*)?",
-                        assunto,
-                        re.IGNORECASE
-                    )
-        
-                if not m:
-                    if DEBUG_MODE and len(sample_subjects) < 5:
-                        sample_subjects.append(assunto)
+    try:
+        lidos = 0
+        for i in reversed(indices): # Changed from `for i in range(1, ...)` to `for i in reversed(indices)`
+            if ctx.orcamento_estourado() or lidos >= ctx.limit:
+                break
+            ja_sincronizados = contagem['skipped_synced']
+            job = _ler_email(ctx, leitura, i)
+            if contagem['skipped_synced'] == ja_sincronizados:
+                lidos += 1
+            if job is not None:
+                ctx.pipeline.submit(job)
+    finally:
+        ctx.mesclar_stats(contagem)
+        with ctx.trava_stats:
+            ctx.com_stats.add(proxy_stats)
+        for k in ('skipped_synced', 'skipped_message_index', 'skipped_attachment_prefilter', 'skipped_tiny', 'skipped_gdrive_cache'):
+            resumo[k] = contagem[k]
+        resumo['com_filter'] = COM_REJEICOES.for_thread(threading.current_thread().name)
+    resumo['status'] = 'ok'
+
+    if resumo['emails'] == 0 and resumo['found_today'] == 0 and not ctx.watch:
+        try:
+            diag_samples = []
+            for di in range(1, min(5, mensagens.Count) + 1):
+                try:
+                    dmsg = mensagens.Item(di)
+                    parsed = _get_msg_datetime(dmsg)
+                    diag_samples.append({
+                        "received_raw": str(getattr(dmsg, "ReceivedTime", None)),
+                        "parsed": parsed.isoformat() if parsed else None,
+                        "class": str(getattr(dmsg, "Class", None)),
+                        "subject": (getattr(dmsg, "Subject", "") or "")[:120],
+                    })
+                except Exception:
                     continue
-        
-                numero_obra = m.group(1)
-                registrar_log(f"Email compativel encontrado - Obra: {numero_obra} | Assunto: {assunto[:60]}...")
+            if diag_samples:
+                registrar_log("Diagnostico inbox (top 5):", context={"samples": diag_samples, "caixa": caixa.label})
+        except Exception:
+            pass
+    return resumo
 
-                pasta_obra = os.path.join(PASTA_BASE, f"Obra_{numero_obra}")
-                os.makedirs(pasta_obra, exist_ok=True)
 
-                data_atual = datetime.now().strftime("%Y-%m-%d")
-                pasta_data = os.path.join(pasta_obra, data_atual)
-                os.makedirs(pasta_data, exist_ok=True)
+def _ler_email(ctx, leitura, i):
+    """Estagio COM: le o email e salva os anexos; cada PDF vira uma tarefa para os workers."""
+    mensagens = leitura['mensagens']
+    linhas_tabela = leitura['linhas_tabela']
+    contagem = leitura['stats']
+    caixa = leitura['caixa']
+    job = None
+    try:
+        msg = mensagens.Item(i)
 
-                # LISTA DE ARQUIVOS GERADOS NESTA EXECUCAO PARA O RPA
-                arquivos_para_rpa = []
+        # Em alguns ambientes Outlook/COM (ou wrappers), o item pode nao expor Class=43
+        # mesmo sendo um email utilizavel. So pulamos se nem ao menos houver assunto.
+        msg_class = getattr(msg, "Class", None)
+        if msg_class not in (None, 43):
+            try:
+                _ = msg.Subject
+            except Exception:
+                return None
 
-                registrar_log(f"Pasta destino: {pasta_data}")
-        
-                body_text = ""
-                try:
-                    body_text = (msg.HTMLBody or "")
-                except Exception:
-                    body_text = ""
-                try:
-                    body_text = body_text + "\n" + (msg.Body or "")
-                except Exception:
-                    pass
+        recebido = _get_msg_datetime(msg)
+        if not recebido:
+            return None
+        assunto = msg.Subject or ""
 
-                gdrive_ids = _extract_gdrive_file_ids(body_text)
+        if not (ctx.inicio_janela <= recebido < ctx.inicio_amanha):
+            return None
 
-                anexos_pdf = []
-                total_attachments = msg.Attachments.Count
-                for ai in range(1, total_attachments + 1):
-                    att = msg.Attachments.Item(ai)
-                    if att.FileName.lower().endswith(".pdf"):
-                        anexos_pdf.append(att)
+        if linhas_tabela is None and recebido.date() == ctx.inicio_hoje.date():
+            caixa['found_today'] += 1
 
-                if anexos_pdf:
-                    for idx, anexo in enumerate(anexos_pdf, start=1):
-                        try:
-                            temp_pdf = os.path.join(pasta_data, f"temp_{idx}.pdf")
-                            anexo.SaveAsFile(temp_pdf)
-                            
-                            hash_atual = calcular_hash_arquivo(temp_pdf)
-                            if hash_atual in anexos_processados:
-                                os.remove(temp_pdf)
-                                continue
-                            
-                            anexos_processados.add(hash_atual)
-                            
-                            # Passamos a lista para coletar os novos arquivos
-                            salvar_paginas_individualmente(temp_pdf, pasta_data, numero_obra, lista_novos_arquivos=arquivos_para_rpa, stats=stats_gerais, manifest_items=(manifest.get('items') if manifest else None))
-                            
-                            os.remove(temp_pdf)
-                            
-                        except Exception as e:
-                            last_error = f"Erro ao processar anexo {idx}: {e}"
-                            registrar_log(last_error)
-                            stats_gerais['erros'].append({'arquivo': f"AnexoEmail_{idx}", 'erro': f"Erro extracao PDF: {e}"})
-
-                if not anexos_pdf and not gdrive_ids:
-                    registrar_log("  Aviso: Nenhum anexo PDF ou link Google Drive encontrado neste email")
-                    continue
+        if linhas_tabela is not None:
+            entry_id = mensagens.row(i).entry_id
+        else:
+            entry_id = getattr(msg, "EntryID", None)
+            if ctx.ja_sincronizada(leitura['sync_key'], recebido, entry_id):
+                contagem['skipped_synced'] += 1
+                return None
 
-                if gdrive_ids:
-                    if anexos_pdf:
-                        registrar_log(f"  Links Google Drive adicionais encontrados: {len(gdrive_ids)}")
-                    else:
-                        registrar_log(f"  Nenhum anexo PDF. Links Google Drive encontrados: {len(gdrive_ids)}")
+        # Padrao mais flexivel: aceita prefixos (ENC/RE/FW) e pequenas variacoes
+        m = re.search(
+            r"(?:ENC:|RE:|FWD:|FW:)?\s*ASO\s+ADMISSIONAL\s*[-–]\s*([A-Za-z0-9]+)\s*[-–]\s*([0-3]?\d[/-][0-1]?\d[/-]\d{2,4})(?:\s*[-–]\s*.*)?",
+            assunto,
+            re.IGNORECASE
+        )
 
-                    baixados = []
-                    for gid in gdrive_ids:
-                        try:
-                            caminho = download_gdrive_file(gid, pasta_data)
-                            if not caminho:
-                                registrar_log(f"  Link Google Drive ignorado pelo filtro de nome: {gid}")
-                                continue
-                            if not caminho.lower().endswith('.pdf'):
-                                registrar_log(f"  Link Google Drive ignorado (nao PDF): {os.path.basename(caminho)}")
-                                try:
-                                    os.remove(caminho)
-                                except Exception:
-                                    pass
-                                continue
-                            registrar_log(f"  Baixado Google Drive: {os.path.basename(caminho)}")
-                            baixados.append(caminho)
-                        except Exception as e:
-                            last_error = f"Erro ao baixar Google Drive ({gid}): {e}"
-                            registrar_log(last_error)
-                            stats_gerais['erros'].append({'arquivo': f"GoogleDrive_{gid}", 'erro': f"Erro download: {e}"})
-                            stats_gerais['error'] += 1
-                    
-                    if not baixados:
-                        registrar_log("  Nenhum arquivo valido baixado do Google Drive.")
+        if not m:
+            m = re.search(
+                r"(?:ENC:|RE:|FWD:|FW:)?\s*ASO\s+ADMISSIONAL\s*[-–]\s*([A-Za-z0-9]+)(?:\s*[-–]\s*.*)?",
+                assunto,
+                re.IGNORECASE
+            )
+
+        if not m:
+            if DEBUG_MODE and linhas_tabela is None and len(ctx.sample_subjects) < 5:
+                ctx.sample_subjects.append(assunto)
+            return None
+
+        numero_obra = m.group(1)
+        caixa['emails'] += 1
+        registrar_log(f"Email compativel encontrado - Obra: {numero_obra} | Assunto: {assunto[:60]}...")
+        email = {
+            'sync_msg': (recebido, entry_id),
+            'sync_key': leitura['sync_key'],
+            'caixa': caixa,
+            'numero_obra': numero_obra,
+            'recebido': recebido,
+            'nao_aceitos': 0,
+            'resultado_anexos': {},
+            'msg_key': None,
+            'rpa': False,
+        }
+        job = PipelineJob(email)
+
+        pasta_obra = os.path.join(PASTA_BASE, f"Obra_{numero_obra}")
+        os.makedirs(pasta_obra, exist_ok=True)
+
+        data_atual = datetime.now().strftime("%Y-%m-%d")
+        pasta_data = os.path.join(pasta_obra, data_atual)
+        os.makedirs(pasta_data, exist_ok=True)
+        email['pasta_data'] = pasta_data
+
+        registrar_log(f"Pasta destino: {pasta_data}")
+
+        body_text = ""
+        try:
+            body_text = (msg.HTMLBody or "")
+        except Exception:
+            body_text = ""
+        try:
+            body_text = body_text + "\n" + (msg.Body or "")
+        except Exception:
+            pass
+
+        gdrive_ids = _extract_gdrive_file_ids(body_text)
+        email['gdrive_ids'] = gdrive_ids
+
+        anexos_pdf = []
+        total_attachments = msg.Attachments.Count
+        for ai in range(1, total_attachments + 1):
+            att = msg.Attachments.Item(ai)
+            if att.FileName.lower().endswith(".pdf"):
+                anexos_pdf.append(att)
+
+        # Indice por email: concluido -> pula sem SaveAsFile; parcial -> so paginas com falha.
+        msg_anterior = None
+        resultado_anexos = email['resultado_anexos']
+        if ctx.message_index is not None and not REPROCESS_EXISTING:
+            email['msg_key'] = MessageIndex.message_key(
+                message_identity(msg, entry_id),
+                [(a.FileName, getattr(a, "Size", None)) for a in anexos_pdf],
+                gdrive_ids,
+            )
+            msg_anterior = ctx.message_index.get(email['msg_key'])
+            if ctx.message_index.is_complete(email['msg_key']):
+                registrar_log(f"Email ja processado com sucesso (indice de mensagens); pulando. Obra: {numero_obra}")
+                contagem['skipped_message_index'] += 1
+                contagem['skipped_items'].append(f"{SKIPPED_DUPLICATE}: email {mask_cpf_in_text(assunto[:60])}")
+                return job
+
+        if anexos_pdf:
+            for idx, anexo in enumerate(anexos_pdf, start=1):
+                chave_anexo = f"pdf:{idx}:{anexo.FileName}"
+                pendentes = MessageIndex.pending_pages(msg_anterior, chave_anexo)
+                if pendentes is not None and not pendentes:
+                    resultado_anexos[chave_anexo] = msg_anterior["attachments"][chave_anexo]
+                    continue
+                if ctx.orcamento_estourado():
+                    contagem['anexos_nao_aceitos'] += 1
+                    email['nao_aceitos'] += 1
+                    resultado_anexos[chave_anexo] = {"error": "Nao aceito (orcamento da execucao)"}
+                    continue
+
+                # Pre-filtro sem I/O em disco: PDF minusculo ou anexo ja conhecido.
+                impressao = None
+                dados = None
+                lidos = None
+                tamanho = attachment_size(anexo) if (ATTACH_PREFILTER or ATTACH_IN_MEMORY) else None
+                em_memoria = _cabe_em_memoria(tamanho)
+                if ATTACH_PREFILTER:
+                    if ATTACH_MIN_BYTES and tamanho and tamanho < ATTACH_MIN_BYTES:
+                        registrar_log(f"  Anexo PDF muito pequeno ({tamanho} bytes); ignorado: {anexo.FileName}")
+                        contagem['skipped_tiny'] += 1
+                        contagem['skipped_items'].append(f"{SKIPPED_TINY}: {mask_cpf_in_text(anexo.FileName)}")
+                        if ctx.manifest_items is not None:
+                            ctx.manifest_items.append({
+                                'file_display': mask_cpf_in_text(anexo.FileName),
+                                'outcome': SKIPPED_TINY,
+                                'message': f"PDF abaixo de {ATTACH_MIN_BYTES} bytes ({tamanho})",
+                            })
+                        resultado_anexos[chave_anexo] = {"failed_pages": [], "skipped": SKIPPED_TINY}
                         continue
-                    
-                    for idx, temp_pdf in enumerate(baixados, start=1):
+                    if em_memoria:
                         try:
-                            hash_atual = calcular_hash_arquivo(temp_pdf)
-                            if hash_atual in anexos_processados:
-                                os.remove(temp_pdf)
-                                continue
-                            
-                            anexos_processados.add(hash_atual)
-                            
-                            salvar_paginas_individualmente(temp_pdf, pasta_data, numero_obra, lista_novos_arquivos=arquivos_para_rpa, stats=stats_gerais, manifest_items=(manifest.get('items') if manifest else None))
-                            
-                            os.remove(temp_pdf)
-                            
-                        except Exception as e:
-                            last_error = f"Erro ao processar Google Drive {idx}: {e}"
-                            registrar_log(last_error)
-                            stats_gerais['erros'].append({'arquivo': f"GoogleDrive_{idx}", 'erro': f"Erro extracao PDF: {e}"})
-                # ==================================================
-                # CHAMAR RPA YUBE PARA A PASTA GERADA (APENAS NOVOS)
-                # ==================================================
-                if arquivos_para_rpa:
+                            # Uma unica leitura: os bytes servem para a impressao digital e para o OCR.
+                            dados = attachment_bytes(anexo, ATTACH_TMP_DIR)
+                        except Exception:
+                            dados = None
+                    else:
+                        # Fora da memoria, os bytes lidos para a impressao sao gravados no temporario
+                        # (sem um segundo SaveAsFile do mesmo binario).
+                        lidos = attachment_data(anexo)
                     try:
-                        registrar_log(f"Iniciando RPA Yube para {len(arquivos_para_rpa)} arquivos novos...")
-                        # Passamos a lista explícita para evitar processar lixo antigo
-                        # E capturamos as estatísticas de retorno
-                        stats_rpa = run_from_main(pasta_data, files_to_process=arquivos_para_rpa)
-        
-                        if stats_rpa:
-                            # ACUMULA RESULTADOS
-                            stats_gerais['sucessos'].extend([mask_cpf_in_text(s) for s in stats_rpa.get('sucessos', [])])
-                            stats_gerais['erros'].extend([{"arquivo": mask_cpf_in_text(e.get('arquivo', 'Desconhecido')), "erro": e.get('erro', '')} for e in stats_rpa.get('erros', [])])
-                            stats_gerais['success'] += len(stats_rpa.get('sucessos', []))
-                            stats_gerais['error'] += len(stats_rpa.get('erros', []))
-                            stats_gerais['skipped_yube'] += len(stats_rpa.get('pulados', []))
-                            for skipped in stats_rpa.get('pulados', []):
-                                stats_gerais['skipped_items'].append(
-                                    f"SKIPPED_YUBE: {mask_cpf_in_text(skipped.get('arquivo', 'Desconhecido'))} ({skipped.get('motivo', '')})"
-                                )
-                            stats_gerais['total_processed'] = stats_gerais['success'] + stats_gerais['error']
-                            if manifest and manifest.get('items') is not None:
-                                for fname in stats_rpa.get('sucessos', []):
-                                    manifest['items'].append({
-                                        'file_display': mask_cpf_in_text(fname),
-                                        'cpf_masked': mask_cpf(fname),
-                                        'outcome': SUCCESS,
-                                        'message': 'RPA sucesso'
-                                    })
-                                for err in stats_rpa.get('erros', []):
-                                    manifest['items'].append({
-                                        'file_display': mask_cpf_in_text(err.get('arquivo', 'Desconhecido')),
-                                        'cpf_masked': mask_cpf(err.get('arquivo', '')),
-                                        'outcome': ERROR,
-                                        'message': err.get('erro', '')
-                                    })
-                                for skipped in stats_rpa.get('pulados', []):
-                                    manifest['items'].append({
-                                        'file_display': mask_cpf_in_text(skipped.get('arquivo', 'Desconhecido')),
-                                        'cpf_masked': mask_cpf(skipped.get('arquivo', '')),
-                                        'outcome': 'SKIPPED_YUBE',
-                                        'message': skipped.get('motivo', '')
-                                    })
-                            if PROCESSED_INDEX_ENABLED:
-                                for fname in stats_rpa.get('sucessos', []):
-                                    key = PROCESSED_KEY_BY_FILENAME.get(os.path.basename(fname))
-                                    if key:
-                                        PROCESSED_INDEX_SUCCESS.add(key)
-                                for skipped in stats_rpa.get('pulados', []):
-                                    key = PROCESSED_KEY_BY_FILENAME.get(os.path.basename(skipped.get('arquivo', '')))
-                                    if key:
-                                        PROCESSED_INDEX_SUCCESS.add(key)
-        
-                    except Exception as e:
-                        last_error = f"Erro ao executar RPA Yube: {e}"
-                        registrar_log(last_error)
-                        stats_gerais['erros'].append({'arquivo': 'RPA_CRASH', 'erro': str(e)})
-                        stats_gerais['error'] += 1
+                        impressao = attachment_fingerprint(anexo, data=dados or lidos, read_data=False)
+                    except Exception:
+                        impressao = None
+                    if impressao is not None and impressao.strong:
+                        if not ctx.impressao_nova(impressao.key):
+                            registrar_log(f"  Anexo ja conhecido (pre-filtro); nao sera salvo: {anexo.FileName}")
+                            contagem['skipped_attachment_prefilter'] += 1
+                            resultado_anexos[chave_anexo] = {"failed_pages": [], "duplicate": True}
+                            continue
+                tarefa = {'tipo': 'pdf', 'idx': idx, 'chave': chave_anexo, 'pendentes': pendentes, 'impressao': impressao}
+                try:
+                    temp_pdf = _caminho_temp(ctx, pasta_data, idx)
+                    if em_memoria and dados is None:
+                        dados = attachment_bytes(anexo, ATTACH_TMP_DIR)
+                    if dados is not None:
+                        # temp_pdf so nomeia artefatos e paginas: nada e gravado na pasta da obra.
+                        tarefa['pdf_bytes'] = dados
+                        ctx.contar_em_memoria(len(dados))
+                    elif lidos is not None:
+                        with open(temp_pdf, "wb") as f:
+                            f.write(lidos)
+                    else:
+                        anexo.SaveAsFile(temp_pdf)
+                    tarefa['temp_pdf'] = temp_pdf
+                except Exception as e:
+                    tarefa['erro_save'] = e
                 else:
-                    registrar_log("Nenhum arquivo novo para processar no RPA.")
-        
-                processados += 1
-        
-            except Exception as e:
-                last_error = f"Erro inesperado: {e}"
-                registrar_log(last_error)
+                    # Antes do OCR: o worker remove o temporario ao terminar.
+                    _despachar_anexo(ctx, msg, assunto, recebido, anexo.FileName, temp_pdf, dados)
+                lidos = None
+                caixa['attachments'] += 1
+                ctx.pipeline.add(job, tarefa)
+
+        if not anexos_pdf and not gdrive_ids:
+            registrar_log("  Aviso: Nenhum anexo PDF ou link Google Drive encontrado neste email")
+            return job
+
+        if gdrive_ids:
+            if anexos_pdf:
+                registrar_log(f"  Links Google Drive adicionais encontrados: {len(gdrive_ids)}")
+            else:
+                registrar_log(f"  Nenhum anexo PDF. Links Google Drive encontrados: {len(gdrive_ids)}")
+
+            tarefas_gdrive = []
+            for idx, gid in enumerate(gdrive_ids, start=1):
+                chave_anexo = f"gdrive:{gid}"
+                pendentes = MessageIndex.pending_pages(msg_anterior, chave_anexo)
+                if pendentes is not None and not pendentes:
+                    resultado_anexos[chave_anexo] = msg_anterior["attachments"][chave_anexo]
+                    continue
+                entrada_cache = ctx.gdrive_cache.get(gid) if ctx.gdrive_cache is not None else None
+                if ctx.gdrive_cache is not None and ctx.gdrive_cache.is_fresh(entrada_cache) and ctx.gdrive_ja_processado(entrada_cache):
+                    registrar_log(f"  Link Google Drive ja processado (cache, sem download): {gid}")
+                    contagem['skipped_gdrive_cache'] += 1
+                    resultado_anexos[chave_anexo] = {"failed_pages": [], "duplicate": True}
+                    continue
+                tarefa = {'tipo': 'gdrive', 'idx': idx, 'gid': gid, 'chave': chave_anexo, 'pendentes': pendentes}
+                # Todos os links do email comecam a baixar juntos no pool de ctx.downloads.
+                if ctx.downloads is not None:
+                    tarefa['download'] = ctx.downloads.submit(download_gdrive_file, gid, email['pasta_data'])
+                tarefas_gdrive.append(tarefa)
+            for tarefa in tarefas_gdrive:
+                # Download HTTP fica com os workers: a thread COM nao espera a rede.
+                caixa['attachments'] += 1
+                ctx.pipeline.add(job, tarefa)
+
+        email['rpa'] = True
+        return job
+
+    except Exception as e:
+        _registrar_erro_inesperado(ctx, e)
+        if job is None:
+            job = PipelineJob({'sync_msg': None, 'sync_key': leitura['sync_key'], 'nao_aceitos': 0, 'resultado_anexos': {}})
+        job.payload['falhou'] = True
+        return job
+
+
+def _processar_anexo(ctx, email, tarefa):
+    """Estagio worker: baixa (Google Drive), deduplica e rasteriza/OCR um PDF."""
+    parcial = ctx.stats_parcial()
+    saida = {
+        'stats': parcial,
+        'manifest_items': [] if ctx.manifest_items is not None else None,
+        'arquivos': [],
+        'resumo': None,
+        'last_error': None,
+        'baixado': False,
+        'hash': None,
+        'impressao': None,
+    }
+    idx = tarefa['idx']
+    digest_gdrive = None
+    if tarefa['tipo'] == 'gdrive':
+        gid = tarefa['gid']
+        rotulo, descricao = f"GoogleDrive_{idx}", f"Google Drive {idx}"
+        try:
+            if 'download' in tarefa:
+                temp_pdf = tarefa['download'].result()
+            else:
+                temp_pdf = download_gdrive_file(gid, email['pasta_data'])
+            if not temp_pdf:
+                registrar_log(f"  Link Google Drive ignorado pelo filtro de nome: {gid}")
+                return saida
+            if not temp_pdf.lower().endswith('.pdf'):
+                registrar_log(f"  Link Google Drive ignorado (nao PDF): {os.path.basename(temp_pdf)}")
                 try:
-                    erro_id = f"erro_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                    pasta_erro = os.path.join(PASTA_ERROS, erro_id)
-                    os.makedirs(pasta_erro, exist_ok=True)
-                    with open(os.path.join(pasta_erro, "erro.txt"), "w", encoding="utf-8") as f:
-                        f.write(traceback.format_exc())
-                except:
+                    os.remove(temp_pdf)
+                except Exception:
                     pass
-                continue
-        
-        # ==================================================
-        # ENVIO DO RESUMO CONSOLIDADO
-        # ==================================================
-        elapsed_total = datetime.now() - start_time_total
-        run_status = "INCONSISTENT" if stats_gerais['error'] > 0 else "CONSISTENT"
-        stats_gerais['tempo_total'] = str(timedelta(seconds=int(elapsed_total.total_seconds())))
-        
-        stats_gerais['total_processed'] = stats_gerais['success'] + stats_gerais['error']
-        stats_gerais['total'] = stats_gerais['total_processed']
-        stats_gerais['run_status'] = run_status
-        if manifest is not None:
-            manifest['finished_at'] = datetime.now().isoformat()
-            manifest['duration_sec'] = int(elapsed_total.total_seconds())
-            manifest['run_status'] = run_status
-            manifest['totals'] = {
-                'total_detected': stats_gerais['total_detected'],
-                'total_processed': stats_gerais['total_processed'],
-                'success': stats_gerais['success'],
-                'error': stats_gerais['error'],
-                'skipped_duplicate': stats_gerais['skipped_duplicate'],
-                'skipped_draft': stats_gerais['skipped_draft'],
-                'skipped_non_aso': stats_gerais['skipped_non_aso'],
-            }
-            if last_error:
-                manifest['last_error'] = last_error
+                return saida
+            entrada_cache = ctx.gdrive_cache.get(gid) if ctx.gdrive_cache is not None else None
+            if entrada_cache is not None and os.path.samefile(temp_pdf, entrada_cache['blob']):
+                # Download (ou copia do cache) e hardlink do blob: o SHA-256 do stream ja esta na entrada.
+                digest_gdrive = entrada_cache['sha256']
+                # Revalidado (304) ou baixado de novo com o mesmo conteudo ja processado.
+                if ctx.gdrive_ja_processado(entrada_cache):
+                    registrar_log(f"  Link Google Drive ja processado (cache): {gid}")
+                    parcial['skipped_gdrive_cache'] += 1
+                    os.remove(temp_pdf)
+                    saida['resumo'] = {"failed_pages": [], "duplicate": True}
+                    return saida
+            registrar_log(f"  Baixado Google Drive: {os.path.basename(temp_pdf)}")
+            saida['baixado'] = True
+        except Exception as e:
+            saida['last_error'] = f"Erro ao baixar Google Drive ({gid}): {e}"
+            registrar_log(saida['last_error'])
+            parcial['erros'].append({'arquivo': f"GoogleDrive_{gid}", 'erro': f"Erro download: {e}"})
+            parcial['error'] += 1
+            saida['resumo'] = {"error": f"Erro download: {e}"}
+            return saida
+        if ctx.orcamento_estourado():
+            parcial['anexos_nao_aceitos'] += 1
+            saida['resumo'] = {"error": "Nao aceito (orcamento da execucao)"}
+            try:
+                os.remove(temp_pdf)
+            except Exception:
+                pass
+            return saida
+    else:
+        rotulo, descricao = f"AnexoEmail_{idx}", f"anexo {idx}"
+        temp_pdf = tarefa.get('temp_pdf')
+    # Solta o buffer da tarefa: a memoria do anexo vai embora com este worker.
+    dados = tarefa.pop('pdf_bytes', None)
 
-        manifest_path = None
-        if manifest is not None:
-            manifest_path = salvar_manifest(manifest, PASTA_JSON, execution_id=execution_id)
-            if manifest_path:
-                manifest['paths']['manifest'] = manifest_path
-        
-        # So envia email se houver algo processado (sucesso ou erro)
-        if stats_gerais['total_detected'] > 0 or stats_gerais['error'] > 0:
-            registrar_log("Gerando relatorio e enviando email...")
-        
-            # 1. Salvar Relatorio JSON/MD
-            report_paths = reporter.save_report(stats_gerais)
-            if manifest is not None:
-                manifest['paths'].update({
-                    'report_json': report_paths.get('json') if report_paths else None,
-                    'report_md': report_paths.get('md') if report_paths else None,
-                    'logs': PASTA_LOGS,
-                })
-        
-            # 2. Enviar Email
-            email_status, email_error = enviar_resumo_email(
-                TARGET_ACCOUNT,
-                stats_gerais,
-                execution_id,
-                run_status,
-                report_paths=report_paths,
-                manifest_path=manifest_path,
-                logger=logger,
+    try:
+        if tarefa.get('erro_save') is not None:
+            raise tarefa['erro_save']
+        hash_anexo = ctx.hash_novo(temp_pdf, dados, digest_gdrive)
+        if hash_anexo is None:
+            if dados is None:
+                os.remove(temp_pdf)
+            saida['resumo'] = {"failed_pages": [], "duplicate": True}
+            return saida
+
+        pendentes = tarefa.get('pendentes')
+        if pendentes:
+            parcial['reentered_pages'] += len(pendentes)
+            registrar_log(f"  Reprocessando apenas paginas com falha: {sorted(pendentes)}")
+
+        # Passamos a lista para coletar os novos arquivos
+        opcoes = {'paginas': pendentes} if pendentes else {}
+        if dados is not None:
+            opcoes['pdf_bytes'] = dados
+        resumo = salvar_paginas_individualmente(temp_pdf, email['pasta_data'], email['numero_obra'], lista_novos_arquivos=saida['arquivos'], stats=parcial, manifest_items=saida['manifest_items'], **opcoes)
+        saida['resumo'] = _resumo_anexo(resumo)
+        # Marcado como processado so depois do RPA (_marcar_concluidos).
+        saida['hash'] = hash_anexo
+        saida['impressao'] = tarefa.get('impressao')
+
+        if dados is None:
+            os.remove(temp_pdf)
+
+    except Exception as e:
+        saida['last_error'] = f"Erro ao processar {descricao}: {e}"
+        registrar_log(saida['last_error'])
+        parcial['erros'].append({'arquivo': rotulo, 'erro': f"Erro extracao PDF: {e}"})
+        saida['resumo'] = {"error": str(e)}
+    return saida
+
+
+def _concluir_email(ctx, email, resultados):
+    """Estagio RPA (thread unica, ordem de leitura): soma resultados, chama o Yube e avanca a marca d'agua."""
+    for _tarefa, saida, _erro in resultados:
+        if saida is not None:
+            email['nao_aceitos'] += saida['stats'].get('anexos_nao_aceitos', 0)
+    try:
+        _finalizar_email(ctx, email, resultados)
+    except Exception as e:
+        email['falhou'] = True
+        _registrar_erro_inesperado(ctx, e)
+    finally:
+        ctx.concluir_sync(email)
+
+
+def _finalizar_email(ctx, email, resultados):
+    resultado_anexos = email['resultado_anexos']
+    caixa = email.get('caixa')
+    # LISTA DE ARQUIVOS GERADOS NESTA EXECUCAO PARA O RPA
+    arquivos_para_rpa = []
+    baixou_gdrive = False
+    for tarefa, saida, erro in resultados:
+        if erro is not None:
+            email['falhou'] = True
+            _registrar_erro_inesperado(ctx, erro)
+            continue
+        ctx.mesclar_stats(saida['stats'])
+        if saida['manifest_items']:
+            ctx.manifest_items.extend(saida['manifest_items'])
+        for caminho in saida['arquivos']:
+            if caminho not in arquivos_para_rpa:
+                arquivos_para_rpa.append(caminho)
+        if saida['last_error']:
+            ctx.last_error = saida['last_error']
+        if saida['resumo'] is not None:
+            resultado_anexos[tarefa['chave']] = saida['resumo']
+        baixou_gdrive = baixou_gdrive or saida['baixado']
+
+    falhas = any(r.get("error") or r.get("failed_pages") for r in resultado_anexos.values())
+    if falhas:
+        # Anexo com erro ou paginas com falha: a marca d'agua para aqui e o email volta na proxima execucao.
+        email['reler'] = True
+    if email.get('falhou') or not email.get('rpa'):
+        return
+
+    if email['gdrive_ids']:
+        gdrive_concluidos = any(
+            k.startswith("gdrive:") and not v.get("error") for k, v in resultado_anexos.items()
+        )
+        if not baixou_gdrive and not gdrive_concluidos:
+            registrar_log("  Nenhum arquivo valido baixado do Google Drive.")
+            return
+
+    pasta_data = email['pasta_data']
+    # ==================================================
+    # CHAMAR RPA YUBE PARA A PASTA GERADA (APENAS NOVOS)
+    # ==================================================
+    rpa_ok = True
+    if arquivos_para_rpa:
+        try:
+            registrar_log(f"Iniciando RPA Yube para {len(arquivos_para_rpa)} arquivos novos...")
+            # Passamos a lista explícita para evitar processar lixo antigo
+            # E capturamos as estatísticas de retorno
+            stats_rpa = run_from_main(pasta_data, files_to_process=arquivos_para_rpa)
+            if stats_rpa and stats_rpa.get('erros'):
+                rpa_ok = False
+
+            if stats_rpa:
+                # ACUMULA RESULTADOS
+                ctx.stats['sucessos'].extend([mask_cpf_in_text(s) for s in stats_rpa.get('sucessos', [])])
+                ctx.stats['erros'].extend([{"arquivo": mask_cpf_in_text(e.get('arquivo', 'Desconhecido')), "erro": e.get('erro', '')} for e in stats_rpa.get('erros', [])])
+                ctx.stats['success'] += len(stats_rpa.get('sucessos', []))
+                ctx.stats['error'] += len(stats_rpa.get('erros', []))
+                ctx.stats['skipped_yube'] += len(stats_rpa.get('pulados', []))
+                if caixa is not None:
+                    caixa['success'] += len(stats_rpa.get('sucessos', []))
+                    caixa['error'] += len(stats_rpa.get('erros', []))
+                for skipped in stats_rpa.get('pulados', []):
+                    ctx.stats['skipped_items'].append(
+                        f"SKIPPED_YUBE: {mask_cpf_in_text(skipped.get('arquivo', 'Desconhecido'))} ({skipped.get('motivo', '')})"
+                    )
+                ctx.stats['total_processed'] = ctx.stats['success'] + ctx.stats['error']
+                if ctx.manifest_items is not None:
+                    for fname in stats_rpa.get('sucessos', []):
+                        ctx.manifest_items.append({
+                            'file_display': mask_cpf_in_text(fname),
+                            'cpf_masked': mask_cpf(fname),
+                            'outcome': SUCCESS,
+                            'message': 'RPA sucesso'
+                        })
+                    for err in stats_rpa.get('erros', []):
+                        ctx.manifest_items.append({
+                            'file_display': mask_cpf_in_text(err.get('arquivo', 'Desconhecido')),
+                            'cpf_masked': mask_cpf(err.get('arquivo', '')),
+                            'outcome': ERROR,
+                            'message': err.get('erro', '')
+                        })
+                    for skipped in stats_rpa.get('pulados', []):
+                        ctx.manifest_items.append({
+                            'file_display': mask_cpf_in_text(skipped.get('arquivo', 'Desconhecido')),
+                            'cpf_masked': mask_cpf(skipped.get('arquivo', '')),
+                            'outcome': 'SKIPPED_YUBE',
+                            'message': skipped.get('motivo', '')
+                        })
+                if PROCESSED_INDEX_ENABLED:
+                    concluidos = list(stats_rpa.get('sucessos', []))
+                    concluidos += [skipped.get('arquivo', '') for skipped in stats_rpa.get('pulados', [])]
+                    with PROCESSED_INDEX_LOCK:
+                        for fname in concluidos:
+                            key = PROCESSED_KEY_BY_FILENAME.get(os.path.basename(fname))
+                            if key:
+                                PROCESSED_INDEX_SUCCESS.add(key)
+
+        except Exception as e:
+            rpa_ok = False
+            ctx.last_error = f"Erro ao executar RPA Yube: {e}"
+            registrar_log(ctx.last_error)
+            ctx.stats['erros'].append({'arquivo': 'RPA_CRASH', 'erro': str(e)})
+            ctx.stats['error'] += 1
+    else:
+        registrar_log("Nenhum arquivo novo para processar no RPA.")
+    if not rpa_ok:
+        email['reler'] = True
+    else:
+        _marcar_concluidos(ctx, email, resultados)
+
+    msg_key = email.get('msg_key')
+    if ctx.message_index is not None and msg_key:
+        ctx.message_index.record(
+            msg_key,
+            SUCCESS if (rpa_ok and not falhas) else ERROR,
+            # Falha no RPA: proxima execucao refaz o email inteiro.
+            attachments=resultado_anexos if rpa_ok else {},
+            obra=email['numero_obra'],
+            received=email['recebido'].isoformat(),
+        )
+
+    ctx.processados += 1
+    if caixa is not None:
+        caixa['processed'] += 1
+
+
+def _marcar_concluidos(ctx, email, resultados):
+    """Apos o RPA sem erro: conteudo dos anexos sem falha passa a ser pulado nas proximas execucoes."""
+    for tarefa, saida, erro in resultados:
+        if erro is not None or saida is None or saida.get('hash') is None:
+            continue
+        resumo = saida['resumo'] or {}
+        if resumo.get("error") or resumo.get("failed_pages"):
+            continue
+        if ctx.blob_store is not None:
+            ctx.blob_store.mark_processed(saida['hash'], obra=email['numero_obra'])
+        impressao = saida.get('impressao')
+        if ctx.attachment_index is not None and impressao is not None and impressao.strong:
+            with ctx.trava_hashes:
+                ctx.attachment_index.add(impressao.key, obra=email['numero_obra'], size=impressao.size)
+        if tarefa['tipo'] == 'gdrive' and ctx.gdrive_cache is not None:
+            ctx.gdrive_cache.mark_processed(tarefa['gid'], saida['hash'])
+
+
+def _novas_stats(execution_id, started_at):
+    # ESTATISTICAS GERAIS ACUMULADAS
+    return {
+        'execution_id': execution_id,
+        'started_at': started_at.isoformat() if started_at else None,
+        'total_detected': 0,
+        'total_processed': 0,
+        'success': 0,
+        'error': 0,
+        'skipped_duplicate': 0,
+        'skipped_draft': 0,
+        'skipped_non_aso': 0,
+        'skipped_yube': 0,
+        'ocr_failures': [],
+        'sucessos': [],
+        'erros': [],
+        'skipped_items': [],
+        'tempo_total': '',
+        'run_budget_exceeded': False,
+        'anexos_nao_aceitos': 0,
+        'skipped_synced': 0,
+        'skipped_message_index': 0,
+        'reentered_pages': 0,
+        'skipped_attachment_prefilter': 0,
+        'skipped_tiny': 0,
+        'skipped_gdrive_cache': 0,
+    }
+
+
+def _janela_busca():
+    """(inicio_hoje, inicio_janela, inicio_amanha) da execucao, conforme ASO_DAYS_BACK."""
+    inicio_hoje = datetime.now().replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    inicio_amanha = inicio_hoje + timedelta(days=1)
+    # Padrão: busca apenas emails de hoje (pode ser configurado via ASO_DAYS_BACK)
+    days_back_env = os.getenv("ASO_DAYS_BACK")
+    if days_back_env is None or days_back_env == "":
+        days_back = 0  # Padrão: apenas hoje
+    else:
+        try:
+            days_back = int(days_back_env)
+            if days_back < 0:
+                days_back = 0  # Se for negativo, usa 0 (apenas hoje)
+        except ValueError:
+            days_back = 0  # Se não for número válido, usa 0 (apenas hoje)
+
+    inicio_janela = inicio_hoje - timedelta(days=days_back)
+
+    if days_back == 0:
+        registrar_log(f"Janela de busca: apenas hoje ({inicio_hoje.date()})")
+    else:
+        registrar_log(f"Janela de busca: últimos {days_back} dias (de {inicio_janela.date()} até {inicio_amanha.date()})")
+        if days_back_env:
+            registrar_log(f"  (Configurado via ASO_DAYS_BACK={days_back_env})")
+    return inicio_hoje, inicio_janela, inicio_amanha
+
+
+def _carregar_indices(ctx):
+    """Abre os caches e indices persistentes habilitados; falha ao carregar deixa o recurso desligado."""
+    if ctx.fonte is None and FOLDER_CACHE_ENABLED:
+        try:
+            ctx.folder_cache = FolderCache(FOLDER_CACHE_PATH)
+        except Exception as e:
+            registrar_log(f"Falha ao carregar cache de pastas: {e}")
+
+    if INCREMENTAL_SYNC:
+        try:
+            ctx.sync_state = SyncState(SYNC_STATE_PATH)
+            if FULL_RESCAN:
+                registrar_log("Full rescan solicitado; marca d'agua ignorada nesta execucao.")
+        except Exception as e:
+            registrar_log(f"Falha ao carregar estado de sincronizacao: {e}")
+            ctx.sync_state = None
+
+    if MESSAGE_INDEX_ENABLED:
+        try:
+            ctx.message_index = MessageIndex(MESSAGE_INDEX_PATH)
+        except Exception as e:
+            registrar_log(f"Falha ao carregar indice de mensagens: {e}")
+
+    # Consumidores extras da mesma varredura: recebem cada PDF ja salvo pelo estagio COM.
+    if ADMISSIONAL_SHARED:
+        ctx.consumidores.append(AdmissionalArchive(ADMISSIONAL_DEST_BASE, ADMISSIONAL_SUBJECT_PREFIX, log_fn=registrar_log))
+
+    if ATTACH_PREFILTER:
+        try:
+            ctx.attachment_index = AttachmentIndex(ATTACH_INDEX_PATH)
+        except Exception as e:
+            registrar_log(f"Falha ao carregar indice de anexos: {e}")
+
+    ctx.gdrive_cache = _gdrive_cache()
+    ctx.blob_store = _blob_store()
+
+
+def _salvar_indices(ctx):
+    for recurso, descricao in (
+        (ctx.sync_state, "estado de sincronizacao"),
+        (ctx.message_index, "indice de mensagens"),
+        (ctx.attachment_index, "indice de anexos"),
+        (ctx.gdrive_cache, "cache do Google Drive"),
+        (ctx.blob_store, "indice do store de anexos"),
+    ):
+        if recurso is None:
+            continue
+        try:
+            recurso.save()
+        except Exception as e:
+            registrar_log(f"Falha ao salvar {descricao}: {e}")
+
+
+def _preencher_manifest(ctx, manifest, elapsed_total, run_status, resumo_caixas, rejeicoes_com, sessao_yube):
+    stats_gerais = ctx.stats
+    manifest['finished_at'] = datetime.now().isoformat()
+    manifest['duration_sec'] = int(elapsed_total.total_seconds())
+    manifest['run_status'] = run_status
+    manifest['totals'] = {
+        'total_detected': stats_gerais['total_detected'],
+        'total_processed': stats_gerais['total_processed'],
+        'success': stats_gerais['success'],
+        'error': stats_gerais['error'],
+        'skipped_duplicate': stats_gerais['skipped_duplicate'],
+        'skipped_draft': stats_gerais['skipped_draft'],
+        'skipped_non_aso': stats_gerais['skipped_non_aso'],
+    }
+    manifest['run_budget'] = {
+        'limit_sec': RUN_BUDGET_SEC,
+        'exceeded': stats_gerais['run_budget_exceeded'],
+        'attachments_not_accepted': stats_gerais['anexos_nao_aceitos'],
+    }
+    manifest['sync'] = {
+        'incremental': ctx.sync_state is not None,
+        'full_rescan': FULL_RESCAN,
+        'skipped_synced': stats_gerais['skipped_synced'],
+        'skipped_message_index': stats_gerais['skipped_message_index'],
+        'reentered_pages': stats_gerais['reentered_pages'],
+        'skipped_attachment_prefilter': stats_gerais['skipped_attachment_prefilter'],
+        'skipped_tiny': stats_gerais['skipped_tiny'],
+        'skipped_gdrive_cache': stats_gerais['skipped_gdrive_cache'],
+    }
+    manifest['com_proxy'] = ctx.com_stats.as_dict()
+    manifest['mailboxes'] = resumo_caixas
+    manifest['com_filter'] = dict(rejeicoes_com, adaptive=COM_ADAPTIVE_BACKOFF)
+    if ctx.blob_store is not None:
+        manifest['blob_store'] = ctx.blob_store.as_dict()
+    if ATTACH_IN_MEMORY:
+        manifest['attachments_in_memory'] = dict(ctx.em_memoria)
+    if sessao_yube is not None:
+        manifest['yube_session'] = sessao_yube.as_dict()
+    for consumidor in ctx.consumidores:
+        manifest[consumidor.name] = {'saved': consumidor.saved, 'linked': consumidor.linked}
+    if ctx.last_error:
+        manifest['last_error'] = ctx.last_error
+
+
+def _capta_core(limit, execution_id, started_at, manifest, watch, fonte, sessao_yube=None, com_threads=None):
+    registrar_log("Iniciando leitura do Outlook...")
+    COM_REJEICOES.reset()
+
+    if fonte is not None:
+        caixas = [Mailbox(getattr(fonte, "FolderPath", "") or "offline", "")]
+    else:
+        caixas = list(MAILBOXES) or [Mailbox(EMAIL_DESEJADO, MAILBOX_NAME)]
+        if len(caixas) > 1:
+            registrar_log(
+                f"Lendo {len(caixas)} caixas em paralelo (uma thread COM por caixa).",
+                context={"caixas": [c.label for c in caixas]},
             )
-            if manifest is not None:
-                manifest['email_status'] = email_status
-                manifest['email_error'] = email_error
-                if manifest_path:
-                    salvar_manifest(manifest, PASTA_JSON, filepath=manifest_path, execution_id=execution_id)
-        else:
-            registrar_log("Nada processado, email de resumo nao enviado.")
-        
-        stats_gerais['finished_at'] = datetime.now().isoformat()
-        stats_gerais['run_status'] = run_status
-        if last_error:
-            stats_gerais['last_error'] = last_error
-        salvar_diagnostico_resumo(
+
+    inicio_hoje, inicio_janela, inicio_amanha = _janela_busca()
+    ctx = CaptureRun(
+        _novas_stats(execution_id, started_at),
+        inicio_hoje,
+        inicio_janela,
+        inicio_amanha,
+        limit=limit,
+        watch=watch,
+        fonte=fonte,
+        caixas=caixas,
+        manifest_items=manifest.get('items') if manifest else None,
+        run_budget=TimeBudget(RUN_BUDGET_SEC, etapa="execucao"),
+        reprocess=REPROCESS_EXISTING,
+        full_rescan=FULL_RESCAN,
+        keep_com=com_threads is not None,
+        log_fn=registrar_log,
+    )
+    start_time_total = datetime.now()
+    _carregar_indices(ctx)
+
+    # Produtor/consumidor: as threads COM (uma por caixa) so leem emails e salvam anexos;
+    # workers fazem rasterizacao/OCR/extracao e uma thread unica roda o RPA. Com 0 workers,
+    # tudo inline na thread COM.
+    if GDRIVE_WORKERS > 1:
+        ctx.downloads = ThreadPoolExecutor(max_workers=GDRIVE_WORKERS, thread_name_prefix="aso-gdrive")
+    # Sessao recebida (modo watch) fica aberta entre ciclos; quem a criou a fecha.
+    sessao_propria = sessao_yube is None
+    if sessao_propria:
+        sessao_yube = YubeSession(lazy=YUBE_SESSION_LAZY, auth_state=default_auth_state()) if YUBE_SESSION else None
+    sessao_anterior = use_session(sessao_yube) if sessao_yube is not None else None
+    ctx.pipeline = MailPipeline(
+        partial(_processar_anexo, ctx),
+        partial(_concluir_email, ctx),
+        workers=PIPELINE_WORKERS,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        log_fn=registrar_log,
+    )
+    if not ctx.pipeline.inline:
+        registrar_log(
+            "Pipeline produtor/consumidor ativo.",
+            context={"ocr_workers": PIPELINE_WORKERS, "fila_emails": PIPELINE_QUEUE_SIZE},
+        )
+    try:
+        # Uma thread COM por caixa (com varias); todas entregam os emails ao mesmo pipeline.
+        lidas = scan_mailboxes(
+            caixas, partial(_varrer_caixa, ctx), finalize_fn=cleanup_outlook_com, log_fn=registrar_log, threads=com_threads
+        )
+    finally:
+        ctx.pipeline.close()
+        if ctx.downloads is not None:
+            ctx.downloads.shutdown(wait=True)
+        if sessao_yube is not None:
+            use_session(sessao_anterior)
+            if sessao_propria:
+                _fechar_sessao_yube(sessao_yube)
+    if not any(lidas):
+        return None
+    stats_gerais = ctx.stats
+    resumo_caixas = [ctx.por_caixa[c] for c in caixas if c in ctx.por_caixa]
+    stats_gerais['mailboxes'] = resumo_caixas
+    encontrados_hoje = sum(r['found_today'] for r in resumo_caixas)
+    rejeicoes_com = COM_REJEICOES.as_dict()
+    if rejeicoes_com['rejections']:
+        registrar_log(
+            f"Outlook ocupado: {rejeicoes_com['rejections']} chamadas COM rejeitadas, "
+            f"{rejeicoes_com['backoff_ms'] / 1000:.1f}s em espera (maior espera: {rejeicoes_com['max_wait_ms'] / 1000:.1f}s)",
+            context=rejeicoes_com,
+        )
+
+    _salvar_indices(ctx)
+
+    # ==================================================
+    # ENVIO DO RESUMO CONSOLIDADO
+    # ==================================================
+    elapsed_total = datetime.now() - start_time_total
+    run_status = "INCONSISTENT" if stats_gerais['error'] > 0 else "CONSISTENT"
+    stats_gerais['tempo_total'] = str(timedelta(seconds=int(elapsed_total.total_seconds())))
+
+    stats_gerais['total_processed'] = stats_gerais['success'] + stats_gerais['error']
+    stats_gerais['total'] = stats_gerais['total_processed']
+    stats_gerais['run_status'] = run_status
+    if manifest is not None:
+        _preencher_manifest(ctx, manifest, elapsed_total, run_status, resumo_caixas, rejeicoes_com, sessao_yube)
+    for consumidor in ctx.consumidores:
+        if consumidor.saved:
+            registrar_log(f"Anexos arquivados ({consumidor.name}): {consumidor.saved} (hardlinks: {consumidor.linked})")
+
+    houve_algo = stats_gerais['total_detected'] > 0 or stats_gerais['error'] > 0
+    manifest_path = None
+    report_paths = None
+    if manifest is not None and (houve_algo or not watch):
+        manifest_path = salvar_manifest(manifest, PASTA_JSON, execution_id=execution_id)
+        if manifest_path:
+            manifest['paths']['manifest'] = manifest_path
+
+    # So envia email se houver algo processado (sucesso ou erro)
+    if houve_algo and not watch:
+        registrar_log("Gerando relatorio e enviando email...")
+
+        # 1. Salvar Relatorio JSON/MD
+        report_paths = reporter.save_report(stats_gerais)
+        if manifest is not None:
+            manifest['paths'].update({
+                'report_json': report_paths.get('json') if report_paths else None,
+                'report_md': report_paths.get('md') if report_paths else None,
+                'logs': PASTA_LOGS,
+            })
+
+        # 2. Enviar Email
+        email_status, email_error = enviar_resumo_email(
+            TARGET_ACCOUNT,
             stats_gerais,
+            execution_id,
+            run_status,
+            report_paths=report_paths,
             manifest_path=manifest_path,
-            report_paths=report_paths if 'report_paths' in locals() else None,
-            extra={"logs_dir": PASTA_LOGS}
+            logger=logger,
         )
+        if manifest is not None:
+            manifest['email_status'] = email_status
+            manifest['email_error'] = email_error
+            if manifest_path:
+                salvar_manifest(manifest, PASTA_JSON, filepath=manifest_path, execution_id=execution_id)
+    elif not watch:
+        registrar_log("Nada processado, email de resumo nao enviado.")
+
+    stats_gerais['finished_at'] = datetime.now().isoformat()
+    stats_gerais['run_status'] = run_status
+    if ctx.last_error:
+        stats_gerais['last_error'] = ctx.last_error
+    salvar_diagnostico_resumo(
+        stats_gerais,
+        manifest_path=manifest_path,
+        report_paths=report_paths,
+        extra={"logs_dir": PASTA_LOGS}
+    )
+
+    registrar_log(f"Mensagens verificadas hoje: {encontrados_hoje}; mensagens processadas: {ctx.processados}")
+    if DEBUG_MODE and ctx.processados == 0 and encontrados_hoje > 0 and ctx.sample_subjects:
+        registrar_log(f"Amostra de assuntos (hoje, nao processados): {ctx.sample_subjects}")
+    return stats_gerais
+
+
+def _fechar_sessao_yube(sessao_yube):
+    sessao_yube.close()
+    if sessao_yube.launches:
+        registrar_log("Sessao da Yube encerrada.", context=sessao_yube.as_dict())
+
+
+def captar_emails(limit=200, execution_id=None, started_at=None, manifest=None, watch=False, fonte=None, sessao_yube=None, com_threads=None):
+    """
+    watch=True (modo continuo): nao envia o email de resumo (executar_watch manda um resumo
+    periodico) e ciclos sem nada detectado nao gravam manifest nem diagnostico da inbox.
+    fonte: pasta no formato do Outlook (ex.: ingestion.DirectorySource) no lugar da inbox via COM.
+    sessao_yube / com_threads (modo watch): sessao da Yube e threads COM (mailboxes.ComThreads)
+    do chamador, reaproveitadas entre ciclos e nao encerradas aqui.
+    Os estagios (_varrer_caixa, _ler_email, _processar_anexo, _concluir_email) sao funcoes do
+    modulo que recebem o estado da execucao (CaptureRun) explicitamente.
+    """
+    try:
+        return _capta_core(limit, execution_id, started_at, manifest, watch, fonte, sessao_yube, com_threads)
+    finally:
+        if com_threads is None:
+            cleanup_outlook_com()
+
 
-        registrar_log(f"Mensagens verificadas hoje: {encontrados_hoje}; mensagens processadas: {processados}")
-        if DEBUG_MODE and processados == 0 and encontrados_hoje > 0 and sample_subjects:
-            registrar_log(f"Amostra de assuntos (hoje, nao processados): {sample_subjects}")
-        if processados == 0 and encontrados_hoje == 0:
+def _novo_manifest(execution_id, started_at):
+    return {
+        'execution_id': execution_id,
+        'started_at': started_at.isoformat(),
+        'finished_at': None,
+        'duration_sec': None,
+        'run_status': None,
+        'paths': {},
+        'email_status': None,
+        'email_error': None,
+        'totals': {},
+        'items': []
+    }
+
+
+def _acumular_stats(total, stats):
+    """Soma contadores e listas de um ciclo em total (campos texto/bool ficam de fora)."""
+    for k, v in (stats or {}).items():
+        if isinstance(v, bool) or not isinstance(v, (int, list)):
+            continue
+        if isinstance(v, list):
+            total.setdefault(k, []).extend(v)
+        else:
+            total[k] = total.get(k, 0) + v
+    if stats and stats.get('last_error'):
+        total['last_error'] = stats['last_error']
+    return total
+
+
+def _fechar_periodo(acumulado, execution_id, inicio, fim):
+    acumulado['execution_id'] = execution_id
+    acumulado['started_at'] = inicio.isoformat()
+    acumulado['finished_at'] = fim.isoformat()
+    acumulado['tempo_total'] = str(timedelta(seconds=int((fim - inicio).total_seconds())))
+    acumulado['total_processed'] = acumulado.get('success', 0) + acumulado.get('error', 0)
+    acumulado['total'] = acumulado['total_processed']
+    acumulado['run_status'] = "INCONSISTENT" if acumulado.get('error') else "CONSISTENT"
+    return acumulado
+
+
+def executar_watch(execution_id=None, started_at=None, manifest=None, intervalo_sec=None, resumo_min=None, max_ciclos=None, sleep_fn=time.sleep, fonte=None):
+    """
+    Modo continuo: a cada intervalo roda captar_emails(watch=True), que com a sincronizacao
+    incremental e o cache da inbox so le o que chegou desde o ultimo ciclo. O processo fica
+    vivo (rasterizador, indices e conexao com o Outlook aquecidos) e um resumo consolidado
+    e enviado a cada resumo_min minutos, no lugar do email unico de fim de execucao.
+    A sessao da Yube e as threads COM (com o namespace do Outlook) sao abertas uma vez e
+    reaproveitadas por todos os ciclos; o manifest de processados roda ao virar o dia.
+    Retorna os totais da sessao inteira.
+    """
+    intervalo_sec = WATCH_INTERVAL_SEC if intervalo_sec is None else intervalo_sec
+    resumo_sec = (WATCH_SUMMARY_MIN if resumo_min is None else resumo_min) * 60
+    watch_id = execution_id or str(uuid.uuid4())
+    inicio_sessao = started_at or datetime.now()
+    sessao = {}
+    periodo = {}
+    inicio_periodo = datetime.now()
+    ultimo_resumo = time.monotonic()
+    ciclo = 0
+    registrar_log(
+        "Modo watch iniciado.",
+        context={"execution_id": watch_id, "intervalo_sec": intervalo_sec, "resumo_min": resumo_sec / 60},
+    )
+
+    def _enviar_resumo():
+        nonlocal periodo, inicio_periodo, ultimo_resumo
+        if periodo.get('total_detected', 0) > 0 or periodo.get('error', 0) > 0:
+            _fechar_periodo(periodo, watch_id, inicio_periodo, datetime.now())
+            registrar_log("Modo watch: enviando resumo periodico.", context={"ciclos": ciclo, "detectados": periodo.get('total_detected', 0)})
             try:
-                diag_samples = []
-                for di in range(1, min(5, mensagens.Count) + 1):
-                    try:
-                        dmsg = mensagens.Item(di)
-                        parsed = _get_msg_datetime(dmsg)
-                        diag_samples.append({
-                            "received_raw": str(getattr(dmsg, "ReceivedTime", None)),
-                            "parsed": parsed.isoformat() if parsed else None,
-                            "class": str(getattr(dmsg, "Class", None)),
-                            "subject": (getattr(dmsg, "Subject", "") or "")[:120],
-                        })
-                    except Exception:
-                        continue
-                if diag_samples:
-                    registrar_log("Diagnostico inbox (top 5):", context={"samples": diag_samples})
+                report_paths = reporter.save_report(periodo)
+                enviar_resumo_email(TARGET_ACCOUNT, periodo, watch_id, periodo['run_status'], report_paths=report_paths, logger=logger)
+            except Exception as e:
+                registrar_log(f"Falha ao enviar resumo periodico: {e}")
+        periodo = {}
+        inicio_periodo = datetime.now()
+        ultimo_resumo = time.monotonic()
+
+    sessao_yube = YubeSession(lazy=YUBE_SESSION_LAZY, auth_state=default_auth_state()) if YUBE_SESSION else None
+    # Fonte offline nao usa COM.
+    com_threads = ComThreads(finalize_fn=cleanup_outlook_com) if fonte is None else None
+
+    try:
+        while max_ciclos is None or ciclo < max_ciclos:
+            ciclo += 1
+            ciclo_id = f"{watch_id}-{ciclo}"
+            ciclo_inicio = datetime.now()
+            try:
+                _rolar_indice_processados()
+            except Exception as e:
+                registrar_log(f"Falha ao trocar o manifest de processados do dia: {e}")
+            try:
+                stats = captar_emails(
+                    limit=500,
+                    execution_id=ciclo_id,
+                    started_at=ciclo_inicio,
+                    manifest=_novo_manifest(ciclo_id, ciclo_inicio),
+                    watch=True,
+                    fonte=fonte,
+                    sessao_yube=sessao_yube,
+                    com_threads=com_threads,
+                )
+            except Exception as e:
+                registrar_log(f"Modo watch: erro no ciclo {ciclo}: {e}")
+                stats = {'error': 1, 'erros': [{'arquivo': 'WATCH_CICLO', 'erro': str(e)}], 'last_error': str(e)}
+            _acumular_stats(periodo, stats)
+            _acumular_stats(sessao, stats)
+            try:
+                if PROCESSED_INDEX_ENABLED and PROCESSED_INDEX_PATH:
+                    _save_processed_index(PROCESSED_INDEX_PATH, PROCESSED_INDEX_SUCCESS)
             except Exception:
                 pass
-        return stats_gerais
-        
-        
-        
-    try:
-        return _capta_core()
+            if time.monotonic() - ultimo_resumo >= resumo_sec:
+                _enviar_resumo()
+            if max_ciclos is not None and ciclo >= max_ciclos:
+                break
+            sleep_fn(intervalo_sec)
+    except KeyboardInterrupt:
+        registrar_log("Modo watch interrompido; enviando resumo pendente.")
     finally:
-        cleanup_outlook_com()
+        if com_threads is not None:
+            com_threads.close()
+            cleanup_outlook_com()
+        if sessao_yube is not None:
+            _fechar_sessao_yube(sessao_yube)
+    _enviar_resumo()
+
+    _fechar_periodo(sessao, watch_id, inicio_sessao, datetime.now())
+    if manifest is not None:
+        manifest['finished_at'] = sessao['finished_at']
+        manifest['run_status'] = sessao['run_status']
+        manifest['totals'] = {
+            'total_detected': sessao.get('total_detected', 0),
+            'total_processed': sessao['total_processed'],
+            'success': sessao.get('success', 0),
+            'error': sessao.get('error', 0),
+        }
+        manifest['watch'] = {'cycles': ciclo, 'interval_sec': intervalo_sec}
+    return sessao
 # ====================================================================
 # MAIN
 # ====================================================================
 if __name__ == "__main__":
+    if "--full-rescan" in sys.argv[1:]:
+        FULL_RESCAN = True
+    if "--watch" in sys.argv[1:]:
+        WATCH_MODE = True
+    if "--source-dir" in sys.argv[1:-1]:
+        SOURCE_DIR = sys.argv[sys.argv.index("--source-dir") + 1]
+    fonte = DirectorySource(SOURCE_DIR, log_fn=registrar_log) if SOURCE_DIR else None
     execution_id = str(uuid.uuid4())
     started_at = datetime.now()
     logger.start_run(started_at=started_at, execution_id=execution_id)
@@ -2002,21 +3353,13 @@ if __name__ == "__main__":
     logger.stage(2, 3, "Processamento principal")
     stats_gerais = None
     fatal_error = None
-    manifest = {
-        'execution_id': execution_id,
-        'started_at': started_at.isoformat(),
-        'finished_at': None,
-        'duration_sec': None,
-        'run_status': None,
-        'paths': {},
-        'email_status': None,
-        'email_error': None,
-        'totals': {},
-        'items': []
-    }
+    manifest = _novo_manifest(execution_id, started_at)
     registrar_log("===== INICIO DO PROCESSAMENTO DIARIO DE ASO =====", context={"execution_id": execution_id})
     try:
-        stats_gerais = captar_emails(limit=500, execution_id=execution_id, started_at=started_at, manifest=manifest)
+        if WATCH_MODE:
+            stats_gerais = executar_watch(execution_id=execution_id, started_at=started_at, manifest=manifest, fonte=fonte)
+        else:
+            stats_gerais = captar_emails(limit=500, execution_id=execution_id, started_at=started_at, manifest=manifest, fonte=fonte)
     except Exception as e:
         fatal_error = str(e)
         logger.set_run_status("FALHA CRITICA")
@@ -0,0 +1,101 @@
+import hashlib
+from datetime import datetime
+
+from atomic_io import read_json, write_json_atomic
+from outcomes import SUCCESS
+
+
+PR_INTERNET_MESSAGE_ID = "http://schemas.microsoft.com/mapi/proptag/0x1035001F"
+
+
+def internet_message_id(msg):
+    """Message-ID SMTP via PropertyAccessor (estavel entre pastas); None se indisponivel."""
+    try:
+        valor = msg.PropertyAccessor.GetProperty(PR_INTERNET_MESSAGE_ID)
+    except Exception:
+        return None
+    valor = (valor or "").strip() if isinstance(valor, str) else None
+    return valor or None
+
+
+def message_identity(msg, entry_id=None):
+    imid = internet_message_id(msg)
+    if imid:
+        return f"imid:{imid}"
+    if entry_id is None:
+        entry_id = getattr(msg, "EntryID", None)
+    if entry_id:
+        return f"entry:{entry_id}"
+    return None
+
+
+class MessageIndex:
+    """
+    Indice persistente por email: chave = Message-ID/EntryID + impressao digital dos anexos
+    (nome/tamanho dos PDFs e ids de Google Drive). Guarda o outcome final e, por anexo,
+    as paginas que falharam, para que uma nova execucao reentre apenas nelas.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        data = read_json(path, default=None)
+        if not isinstance(data, dict) or not isinstance(data.get("messages"), dict):
+            data = {"version": self.VERSION, "messages": {}}
+        self._data = data
+        self._dirty = False
+
+    @staticmethod
+    def message_key(identity, attachments=(), gdrive_ids=()):
+        if not identity:
+            return None
+        partes = [identity]
+        partes.extend(f"{nome}:{tamanho if tamanho is not None else ''}" for nome, tamanho in attachments)
+        partes.extend(f"gdrive:{gid}" for gid in sorted(gdrive_ids or ()))
+        return hashlib.sha256("|".join(partes).encode("utf-8", errors="ignore")).hexdigest()
+
+    def get(self, key):
+        if not key:
+            return None
+        return self._data["messages"].get(key)
+
+    def is_complete(self, key):
+        entry = self.get(key)
+        return bool(entry) and entry.get("outcome") == SUCCESS
+
+    @staticmethod
+    def pending_pages(entry, attachment_key):
+        """
+        None = processar o anexo inteiro; set() vazio = anexo ja concluido;
+        set de paginas = reprocessar so as paginas que falharam.
+        """
+        if not entry:
+            return None
+        anexo = (entry.get("attachments") or {}).get(attachment_key)
+        if not anexo or anexo.get("error"):
+            return None
+        return set(anexo.get("failed_pages") or [])
+
+    def record(self, key, outcome, attachments=None, **info):
+        if not key:
+            return
+        entry = {
+            "outcome": outcome,
+            "attachments": attachments or {},
+            "updated_at": datetime.now().isoformat(),
+        }
+        entry.update(info)
+        self._data["messages"][key] = entry
+        self._dirty = True
+
+    def __len__(self):
+        return len(self._data["messages"])
+
+    def save(self):
+        if not self._dirty or not self.path:
+            return
+        self._data["version"] = self.VERSION
+        self._data["updated_at"] = datetime.now().isoformat()
+        write_json_atomic(self.path, self._data)
+        self._dirty = False
@@ -1,4 +1,8 @@
-import win32com.client as win32
+try:
+    import win32com.client as win32
+except ImportError:
+    # Sem pywin32: envio falha com status de erro (o try abaixo captura).
+    win32 = None
 from datetime import datetime
 import os
 from custom_logger import emit_terminal
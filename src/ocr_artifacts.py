@@ -0,0 +1,113 @@
+import json
+import os
+from datetime import datetime
+
+from atomic_io import read_text, trava_caminho, write_text_atomic
+from outcomes import ERROR
+from utils_masking import mask_cpf, mask_pii_in_obj
+
+
+class OcrArtifactBundle:
+    """
+    Artefato de OCR por anexo, montado em memoria e gravado uma unica vez:
+    - OCR_<pdf>.jsonl: um registro por pagina (outcome, campos, texto, scores, tempos, engine)
+    - OCR_<pdf>.txt: formato legado, gerado a partir dos mesmos registros
+    """
+
+    def __init__(self, pdf_path, numero_obra, engine=None):
+        self.pdf_path = pdf_path
+        self.numero_obra = numero_obra
+        self.engine = engine or {}
+        self.pages = []
+        self.raster_error = None
+
+    @property
+    def base_name(self):
+        return os.path.basename(self.pdf_path).replace(".pdf", "")
+
+    def add_page(
+        self,
+        page,
+        outcome,
+        message=None,
+        fields=None,
+        ocr_text="",
+        scores=None,
+        timings=None,
+        arquivo_gerado=None,
+        legacy_txt=True,
+        **extra,
+    ):
+        record = {
+            "page": page,
+            "outcome": outcome,
+            "message": message,
+            "obra": self.numero_obra,
+            "arquivo_origem": os.path.basename(self.pdf_path),
+            "arquivo_gerado": arquivo_gerado,
+            "fields": dict(fields or {}),
+            "ocr_text": ocr_text or "",
+            "scores": dict(scores or {}),
+            "timings": {k: round(v, 3) for k, v in (timings or {}).items()},
+            "engine": dict(self.engine),
+            "recorded_at": datetime.now().isoformat(),
+        }
+        record.update(extra)
+        self.pages.append((record, legacy_txt))
+        return record
+
+    def failed_pages(self):
+        return sorted({record["page"] for record, _ in self.pages if record.get("outcome") == ERROR})
+
+    def resumo(self):
+        resumo = {"pages": len(self.pages), "failed_pages": self.failed_pages()}
+        if self.raster_error:
+            resumo["error"] = self.raster_error
+        return resumo
+
+    def records(self):
+        return [mask_pii_in_obj(record) for record, _ in self.pages]
+
+    def _legacy_block(self, record):
+        fields = record.get("fields") or {}
+        lines = ["", "======================================", f"Obra: {self.numero_obra}"]
+        if record.get("arquivo_gerado"):
+            lines.append(f"Arquivo gerado: {record['arquivo_gerado']}")
+        else:
+            lines.append(f"Outcome: {record.get('outcome')}")
+            lines.append(f"Arquivo origem: {record.get('arquivo_origem')}")
+        lines.append(f"Nome: {fields.get('nome', '')}")
+        lines.append(f"CPF: {mask_cpf(fields.get('cpf', ''))}")
+        lines.append(f"Data ASO: {fields.get('data_aso', '')}")
+        lines.append(f"Funcao/Cargo: {fields.get('funcao_cargo', '')}")
+        lines.append("======================================")
+        return "\n".join(lines) + "\n"
+
+    def render_txt(self):
+        return "".join(self._legacy_block(record) for record, legacy in self.pages if legacy)
+
+    def render_jsonl(self):
+        return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in self.records())
+
+    def write(self, pasta_destino):
+        """
+        Grava JSONL + TXT de forma atomica (uma leitura e uma escrita por arquivo).
+        Se outro anexo com o mesmo nome ja gravou nesta pasta, o conteudo e preservado:
+        leitura e troca ficam sob a trava do caminho (workers paralelos nao perdem linhas).
+        """
+        if not self.pages:
+            return None, None
+        jsonl_path = os.path.join(pasta_destino, f"OCR_{self.base_name}.jsonl")
+        _acrescentar(jsonl_path, self.render_jsonl())
+
+        txt_path = None
+        novo_txt = self.render_txt()
+        if novo_txt:
+            txt_path = os.path.join(pasta_destino, f"OCR_{self.base_name}.txt")
+            _acrescentar(txt_path, novo_txt)
+        return jsonl_path, txt_path
+
+
+def _acrescentar(path, texto):
+    with trava_caminho(path):
+        write_text_atomic(path, read_text(path) + texto)
@@ -4,3 +4,4 @@ SKIPPED_DUPLICATE = "SKIPPED_DUPLICATE"
 SKIPPED_DRAFT = "SKIPPED_DRAFT"
 SKIPPED_NON_ASO = "SKIPPED_NON_ASO"
 SKIPPED_NO_RECIPIENT = "SKIPPED_NO_RECIPIENT"
+SKIPPED_TINY = "SKIPPED_TINY"
@@ -0,0 +1,334 @@
+import os
+import re
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+
+
+DASL_DATE_RECEIVED = "urn:schemas:httpmail:datereceived"
+DASL_SUBJECT = "urn:schemas:httpmail:subject"
+ASO_SUBJECT_LIKE = "%ASO%ADMISSIONAL%"
+
+
+def _dasl_datetime(dt):
+    # Em DASL as datas sao comparadas em UTC; datetime ingenuo e tratado como hora local.
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+
+def _dasl_literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def build_dasl_filter(inicio=None, fim=None, subject_like=ASO_SUBJECT_LIKE):
+    """
+    Filtro DASL para Items.Restrict: janela [inicio, fim) em ReceivedTime e assunto por LIKE.
+    O LIKE e mais permissivo que a regex de assunto, que continua como validacao final.
+    """
+    clausulas = []
+    if inicio is not None:
+        clausulas.append(f'"{DASL_DATE_RECEIVED}" >= {_dasl_literal(_dasl_datetime(inicio))}')
+    if fim is not None:
+        clausulas.append(f'"{DASL_DATE_RECEIVED}" < {_dasl_literal(_dasl_datetime(fim))}')
+    if subject_like:
+        clausulas.append(f'"{DASL_SUBJECT}" LIKE {_dasl_literal(subject_like)}')
+    if not clausulas:
+        return None
+    return "@SQL=" + " AND ".join(clausulas)
+
+
+def sort_items(items, descending=True):
+    try:
+        items.Sort("[ReceivedTime]", descending)
+    except Exception:
+        items.Sort("ReceivedTime", descending)
+    return items
+
+
+def restrict_items(items, filtro, log_fn=None):
+    """
+    Aplica Items.Restrict (filtro no servidor/Outlook). Se o provedor nao suportar
+    ou o filtro for rejeitado, devolve a colecao original para a varredura completa.
+    Retorna (items, filtrado).
+    """
+    if not filtro:
+        return items, False
+    restrict = getattr(items, "Restrict", None)
+    if restrict is None:
+        return items, False
+    try:
+        restritos = restrict(filtro)
+    except Exception as e:
+        if log_fn:
+            log_fn(f"Items.Restrict indisponivel; usando varredura completa: {e}")
+        return items, False
+    if restritos is None:
+        return items, False
+    try:
+        sort_items(restritos)
+    except Exception:
+        pass
+    return restritos, True
+
+
+# --------------------------------------------------------------------
+# Varredura em bloco via Folder.GetTable (uma chamada COM por lote de linhas)
+# --------------------------------------------------------------------
+OUTLOOK_TABLE_SCAN = os.getenv("ASO_OUTLOOK_TABLE", "1").strip().lower() in ("1", "true", "yes")
+
+OL_USER_ITEMS = 0  # olUserItems
+DASL_HAS_ATTACHMENT = "urn:schemas:httpmail:hasattachment"
+TABLE_COLUMNS = ("EntryID", "ReceivedTime", "Subject", "MessageClass", "Size", DASL_HAS_ATTACHMENT)
+ASO_SUBJECT_RE = re.compile(r"ASO\s+ADMISSIONAL", re.IGNORECASE)
+
+
+class MailRow(namedtuple("MailRow", "entry_id received subject message_class size has_attachments")):
+    __slots__ = ()
+
+
+def to_naive_datetime(value):
+    """Converte ReceivedTime (datetime, pywintypes.Time, timestamp ou texto) para datetime local ingenuo."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo:
+            value = value.astimezone().replace(tzinfo=None)
+        return value
+    try:
+        # pywintypes.Time or similar COM time
+        return datetime(value.year, value.month, value.day, value.hour, value.minute, value.second)
+    except Exception:
+        pass
+    try:
+        return datetime.fromtimestamp(float(value))
+    except Exception:
+        pass
+    if isinstance(value, str):
+        raw = value.strip()
+        for fmt in (
+            "%d/%m/%Y %H:%M:%S",
+            "%d/%m/%Y %H:%M",
+            "%m/%d/%Y %H:%M:%S",
+            "%m/%d/%Y %H:%M",
+            "%Y-%m-%d %H:%M:%S",
+            "%Y-%m-%d %H:%M",
+        ):
+            try:
+                return datetime.strptime(raw, fmt)
+            except Exception:
+                pass
+        try:
+            return datetime.fromisoformat(raw.replace("Z", "+00:00")).astimezone().replace(tzinfo=None)
+        except Exception:
+            pass
+    return None
+
+
+def _abrir_tabela(folder, filtro):
+    table = folder.GetTable(filtro or "", OL_USER_ITEMS)
+    colunas = table.Columns
+    colunas.RemoveAll()
+    for nome in TABLE_COLUMNS:
+        colunas.Add(nome)
+    try:
+        table.Sort("[ReceivedTime]", True)
+    except Exception:
+        table.Sort("ReceivedTime", True)
+    return table
+
+
+def table_rows(folder, filtro=None, max_rows=None, batch_size=200, log_fn=None):
+    """
+    Le EntryID/ReceivedTime/Subject/MessageClass/Size/anexo de uma pasta com Folder.GetTable
+    + Table.GetArray, ordenado por ReceivedTime desc. Retorna lista de MailRow, ou None se a
+    pasta nao expuser a Table API (o chamador volta para Items.Item(i)).
+    Se o filtro for rejeitado, repete sem filtro.
+    """
+    if getattr(folder, "GetTable", None) is None:
+        return None
+    try:
+        try:
+            table = _abrir_tabela(folder, filtro)
+        except Exception:
+            if not filtro:
+                raise
+            if log_fn:
+                log_fn("Filtro rejeitado por Folder.GetTable; varrendo a tabela sem filtro.")
+            table = _abrir_tabela(folder, None)
+
+        linhas = []
+        while not table.EndOfTable:
+            n = batch_size if max_rows is None else min(batch_size, max_rows - len(linhas))
+            if n <= 0:
+                break
+            bloco = table.GetArray(n)
+            if not bloco:
+                break
+            for r in bloco:
+                linhas.append(MailRow(
+                    r[0],
+                    to_naive_datetime(r[1]),
+                    r[2] or "",
+                    r[3] or "",
+                    int(r[4] or 0),
+                    bool(r[5]),
+                ))
+        return linhas
+    except Exception as e:
+        if log_fn:
+            log_fn(f"Folder.GetTable indisponivel; usando Items: {e}")
+        return None
+
+
+def open_item(namespace, entry_id, store_id=None):
+    if store_id:
+        return namespace.GetItemFromID(entry_id, store_id)
+    return namespace.GetItemFromID(entry_id)
+
+
+class EntryIdItems:
+    """
+    Colecao no formato de Items (Count/Item/Sort) sobre linhas da Table API:
+    o MailItem completo so e aberto (GetItemFromID) quando Item(i) e chamado.
+    """
+
+    def __init__(self, namespace, rows, store_id=None):
+        self._namespace = namespace
+        self._rows = list(rows)
+        self._store_id = store_id
+
+    @property
+    def Count(self):
+        return len(self._rows)
+
+    def Sort(self, *_args, **_kwargs):
+        return None
+
+    def Item(self, i):
+        return open_item(self._namespace, self._rows[i - 1].entry_id, self._store_id)
+
+    def row(self, i):
+        return self._rows[i - 1]
+
+
+class ProxyStats:
+    """Contadores das leituras feitas via MailProxy: chamadas COM reais, acertos no cache e tempo gasto."""
+
+    __slots__ = ("calls", "hits", "seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.hits = 0
+        self.seconds = 0.0
+
+    def add(self, other):
+        self.calls += other.calls
+        self.hits += other.hits
+        self.seconds += other.seconds
+
+    def as_dict(self):
+        return {"calls": self.calls, "hits": self.hits, "seconds": round(self.seconds, 3)}
+
+
+class _Falha:
+    __slots__ = ("erro",)
+
+    def __init__(self, erro):
+        self.erro = erro
+
+
+_DATA_ATTRS = ("ReceivedTime", "SentOn", "CreationTime")
+
+
+class MailProxy:
+    """
+    Envelope leve de um MailItem: cada propriedade e lida do Outlook no maximo uma vez
+    (inclusive falhas, que sao repetidas sem nova chamada) e a data de recebimento e
+    normalizada uma unica vez em .received.
+    """
+
+    __slots__ = ("_item", "_cache", "_stats")
+
+    def __init__(self, item, stats=None):
+        object.__setattr__(self, "_item", item)
+        object.__setattr__(self, "_cache", {})
+        object.__setattr__(self, "_stats", stats)
+
+    @property
+    def item(self):
+        return self._item
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        cache = self._cache
+        stats = self._stats
+        if name in cache:
+            if stats is not None:
+                stats.hits += 1
+            valor = cache[name]
+        else:
+            inicio = time.perf_counter()
+            try:
+                valor = getattr(self._item, name)
+            except Exception as e:
+                valor = _Falha(e)
+            if stats is not None:
+                stats.calls += 1
+                stats.seconds += time.perf_counter() - inicio
+            cache[name] = valor
+        if isinstance(valor, _Falha):
+            raise valor.erro
+        return valor
+
+    def __setattr__(self, name, value):
+        setattr(self._item, name, value)
+        self._cache.pop(name, None)
+
+    @property
+    def received(self):
+        """ReceivedTime, SentOn ou CreationTime (o primeiro legivel) como datetime ingenuo."""
+        cache = self._cache
+        if "_received" not in cache:
+            recebido = None
+            for attr in _DATA_ATTRS:
+                try:
+                    recebido = to_naive_datetime(getattr(self, attr))
+                except Exception:
+                    continue
+                if recebido is not None:
+                    break
+            cache["_received"] = recebido
+        return cache["_received"]
+
+
+class ProxyItems:
+    """
+    Items (ou EntryIdItems) cujo Item(i) devolve MailProxy. Os proxies mais recentes
+    ficam em um LRU pequeno: blocos de debug/diagnostico e o loop principal que leem o
+    mesmo indice reaproveitam as propriedades ja lidas sem segurar todos os itens abertos.
+    """
+
+    def __init__(self, items, stats=None, cache_size=64):
+        self._items = items
+        self.stats = stats if stats is not None else ProxyStats()
+        self._cache_size = max(1, int(cache_size or 1))
+        self._proxies = OrderedDict()
+
+    def Item(self, i):
+        proxy = self._proxies.get(i)
+        if proxy is not None:
+            self._proxies.move_to_end(i)
+            return proxy
+        proxy = MailProxy(self._items.Item(i), self.stats)
+        self._proxies[i] = proxy
+        if len(self._proxies) > self._cache_size:
+            self._proxies.popitem(last=False)
+        return proxy
+
+    def Sort(self, *args, **kwargs):
+        self._proxies.clear()
+        return self._items.Sort(*args, **kwargs)
+
+    def __getattr__(self, name):
+        # Count, Restrict, row(i)...: direto na colecao original.
+        return getattr(self._items, name)
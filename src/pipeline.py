@@ -0,0 +1,112 @@
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class PipelineJob:
+    """Um email: dados do produtor (thread COM) + tarefas por anexo enviadas aos workers."""
+
+    def __init__(self, payload):
+        self.payload = payload
+        self._tarefas = []
+
+    def resultados(self):
+        """Lista de (tarefa, resultado, erro), na ordem em que as tarefas foram adicionadas."""
+        saida = []
+        for tarefa, futuro in self._tarefas:
+            try:
+                saida.append((tarefa, futuro.result(), None))
+            except Exception as e:
+                saida.append((tarefa, None, e))
+        return saida
+
+
+_FIM = object()
+
+
+class MailPipeline:
+    """
+    Produtor/consumidor em tres estagios:
+    - thread COM (quem chama add/submit): so enumera emails e salva anexos;
+    - pool de workers: process_fn(payload, tarefa) -> rasterizacao/OCR/extracao por anexo;
+    - thread unica de RPA: finish_fn(payload, resultados) por email, na ordem de submit.
+
+    A fila entre workers e RPA e limitada (queue_size): se o RPA atrasar, submit bloqueia
+    a thread COM e o numero de PDFs temporarios em disco fica limitado.
+    workers=0 executa tudo inline na thread chamadora (comportamento historico); com
+    varias threads COM (uma por caixa) o RPA inline continua rodando um email por vez.
+    """
+
+    def __init__(self, process_fn, finish_fn, workers=0, queue_size=4, log_fn=None):
+        self._process = process_fn
+        self._finish = finish_fn
+        self._log = log_fn
+        self.workers = max(0, int(workers or 0))
+        self._executor = None
+        self._fila = None
+        self._rpa = None
+        self._fechado = False
+        self._trava_inline = threading.Lock()
+        if self.workers:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="aso-ocr")
+            self._fila = queue.Queue(maxsize=max(1, int(queue_size or 1)))
+            self._rpa = threading.Thread(target=self._loop_rpa, name="aso-rpa", daemon=True)
+            self._rpa.start()
+
+    @property
+    def inline(self):
+        return self._executor is None
+
+    def add(self, job, tarefa):
+        if self.inline:
+            futuro = Future()
+            try:
+                futuro.set_result(self._process(job.payload, tarefa))
+            except Exception as e:
+                futuro.set_exception(e)
+        else:
+            futuro = self._executor.submit(self._process, job.payload, tarefa)
+        job._tarefas.append((tarefa, futuro))
+
+    def submit(self, job):
+        """Email sem mais anexos: segue para o estagio de RPA (bloqueia se a fila estiver cheia)."""
+        if self.inline:
+            with self._trava_inline:
+                self._concluir(job)
+        else:
+            self._fila.put(job)
+
+    def _concluir(self, job):
+        try:
+            self._finish(job.payload, job.resultados())
+        except Exception as e:
+            if self._log:
+                self._log(f"Erro inesperado no estagio de RPA: {e}")
+
+    def _loop_rpa(self):
+        while True:
+            job = self._fila.get()
+            try:
+                if job is _FIM:
+                    return
+                self._concluir(job)
+            finally:
+                self._fila.task_done()
+
+    def close(self):
+        """Espera workers e RPA drenarem tudo que ja foi submetido."""
+        if self._fechado:
+            return
+        self._fechado = True
+        if self.inline:
+            return
+        self._fila.put(_FIM)
+        self._rpa.join()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        self.close()
+        return False
@@ -0,0 +1,134 @@
+import numpy as np
+from PIL import Image, ImageOps
+
+
+def to_gray_array(img):
+    if img.mode != "L":
+        img = ImageOps.grayscale(img)
+    return np.asarray(img, dtype=np.uint8)
+
+
+def otsu_threshold(gray):
+    """Limiar de Otsu pelo histograma (vetorizado)."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    if total == 0:
+        return 128
+    niveis = np.arange(256, dtype=np.float64)
+    peso_fundo = np.cumsum(hist)
+    peso_frente = total - peso_fundo
+    soma_fundo = np.cumsum(hist * niveis)
+    media_fundo = np.divide(soma_fundo, peso_fundo, out=np.zeros(256), where=peso_fundo > 0)
+    media_frente = np.divide(soma_fundo[-1] - soma_fundo, peso_frente, out=np.zeros(256), where=peso_frente > 0)
+    variancia_entre = peso_fundo * peso_frente * (media_fundo - media_frente) ** 2
+    return int(np.argmax(variancia_entre))
+
+
+def binarize_otsu(gray):
+    limiar = otsu_threshold(gray)
+    return np.where(gray > limiar, 255, 0).astype(np.uint8)
+
+
+def _soma_janela(integral, h, w, r):
+    # Soma em janela (2r+1)^2 por imagem integral, com bordas recortadas.
+    y0 = np.clip(np.arange(h) - r, 0, h)
+    y1 = np.clip(np.arange(h) + r + 1, 0, h)
+    x0 = np.clip(np.arange(w) - r, 0, w)
+    x1 = np.clip(np.arange(w) + r + 1, 0, w)
+    baixo = integral[y1]
+    cima = integral[y0]
+    soma = baixo[:, x1] - cima[:, x1] - baixo[:, x0] + cima[:, x0]
+    return soma, (y1 - y0)[:, None] * (x1 - x0)[None, :]
+
+
+def binarize_sauvola(gray, window=25, k=0.2, r_dyn=128.0):
+    """Limiar adaptativo de Sauvola: T = m * (1 + k * (s / R - 1)), com media/desvio locais."""
+    h, w = gray.shape
+    raio = max(1, int(window) // 2)
+    g = gray.astype(np.float64)
+    integral = np.zeros((h + 1, w + 1), dtype=np.float64)
+    integral[1:, 1:] = g.cumsum(0).cumsum(1)
+    integral_sq = np.zeros((h + 1, w + 1), dtype=np.float64)
+    integral_sq[1:, 1:] = (g * g).cumsum(0).cumsum(1)
+    soma, area = _soma_janela(integral, h, w, raio)
+    soma_sq, _ = _soma_janela(integral_sq, h, w, raio)
+    media = soma / area
+    desvio = np.sqrt(np.maximum(soma_sq / area - media * media, 0.0))
+    limiar = media * (1.0 + k * (desvio / r_dyn - 1.0))
+    return np.where(g > limiar, 255, 0).astype(np.uint8)
+
+
+def estimate_skew(binary, max_angle=5.0, step=0.25, max_pixels=200000):
+    """
+    Angulo (graus, sentido do Image.rotate) que deixa as linhas de texto horizontais,
+    pelo metodo do perfil de projecao: maximiza a energia do histograma de linhas.
+    """
+    ys, xs = np.nonzero(binary == 0)
+    if ys.size < 50:
+        return 0.0
+    if ys.size > max_pixels:
+        passo = int(np.ceil(ys.size / max_pixels))
+        ys, xs = ys[::passo], xs[::passo]
+    ys = ys.astype(np.float64)
+    xs = xs.astype(np.float64)
+    angulos = np.arange(-max_angle, max_angle + step / 2, step)
+    melhor_angulo = 0.0
+    melhor_score = -1.0
+    offset = float(binary.shape[0] + binary.shape[1])
+    for angulo in angulos:
+        theta = np.deg2rad(angulo)
+        linhas = np.round(ys * np.cos(theta) - xs * np.sin(theta) + offset).astype(np.int64)
+        perfil = np.bincount(linhas)
+        score = float(np.sum(np.diff(perfil.astype(np.float64)) ** 2))
+        if score > melhor_score:
+            melhor_score = score
+            melhor_angulo = float(angulo)
+    return melhor_angulo
+
+
+def crop_borders(binary, margin=10, dark_ratio=0.9):
+    """Remove faixas escuras de scanner e margens brancas, mantendo uma margem ao redor do conteudo."""
+    tinta = binary == 0
+    # Faixas quase totalmente pretas sao sombra do scanner, nao conteudo.
+    linhas_escuras = tinta.mean(axis=1) >= dark_ratio
+    colunas_escuras = tinta.mean(axis=0) >= dark_ratio
+    conteudo = tinta.copy()
+    conteudo[linhas_escuras, :] = False
+    conteudo[:, colunas_escuras] = False
+    y = np.nonzero(conteudo.any(axis=1))[0]
+    x = np.nonzero(conteudo.any(axis=0))[0]
+    if y.size == 0 or x.size == 0:
+        return binary
+    h, w = binary.shape
+    y0, y1 = max(0, y[0] - margin), min(h, y[-1] + margin + 1)
+    x0, x1 = max(0, x[0] - margin), min(w, x[-1] + margin + 1)
+    recorte = binary[y0:y1, x0:x1].copy()
+    # Limpa resquicios de borda escura dentro da margem preservada.
+    recorte[linhas_escuras[y0:y1], :] = 255
+    recorte[:, colunas_escuras[x0:x1]] = 255
+    return recorte
+
+
+def preprocess_for_ocr(img, method="otsu", deskew=True, crop=True, max_angle=5.0):
+    """
+    Pipeline vetorizado: cinza -> binarizacao (Otsu/Sauvola) -> deskew -> recorte de bordas.
+    Retorna imagem PIL modo L (0/255).
+    """
+    gray = to_gray_array(img)
+    if method == "sauvola":
+        binary = binarize_sauvola(gray)
+    else:
+        binary = binarize_otsu(gray)
+
+    if deskew:
+        # Estimativa em resolucao reduzida (1/4): suficiente para o angulo e bem mais barata.
+        reduzida = binary[::4, ::4]
+        angulo = estimate_skew(reduzida, max_angle=max_angle)
+        if abs(angulo) >= 0.25:
+            rotacionada = Image.fromarray(binary).rotate(angulo, resample=Image.NEAREST, expand=True, fillcolor=255)
+            binary = np.asarray(rotacionada, dtype=np.uint8)
+
+    if crop:
+        binary = crop_borders(binary)
+
+    return Image.fromarray(binary)
@@ -0,0 +1,174 @@
+import os
+import threading
+
+from pdf2image import convert_from_bytes, convert_from_path, pdfinfo_from_bytes, pdfinfo_from_path
+
+from custom_logger import emit_terminal
+
+
+RASTERIZER_BACKEND = os.getenv("ASO_RASTERIZER", "poppler").strip().lower() or "poppler"
+RASTER_GRAYSCALE = os.getenv("ASO_RASTER_GRAYSCALE", "0").strip().lower() in ("1", "true", "yes")
+
+# PDFium nao e thread-safe: com workers de OCR em paralelo, toda chamada ao pypdfium2 e serializada.
+_PDFIUM_LOCK = threading.RLock()
+
+
+def em_memoria(pdf):
+    """pdf dos backends: caminho do arquivo ou o conteudo ja em memoria (bytes)."""
+    return isinstance(pdf, (bytes, bytearray, memoryview))
+
+
+class PopplerRasterizer:
+    """
+    Backend padrao: pdf2image + pdftoppm (subprocesso do Poppler). PDF em memoria vai por
+    convert_from_bytes (temporario local do pdf2image, nunca o share).
+    """
+
+    name = "poppler"
+
+    def __init__(self, poppler_path=None, dpi=300, grayscale=False, convert_fn=None, timeout=None, convert_bytes_fn=None):
+        self.poppler_path = poppler_path
+        self.dpi = dpi
+        self.grayscale = grayscale
+        # Timeout por chamada do pdftoppm: o pdf2image mata o processo e levanta PDFPopplerTimeoutError.
+        self.timeout = timeout or None
+        self._convert = convert_fn or convert_from_path
+        self._convert_bytes = convert_bytes_fn or convert_from_bytes
+
+    def _kwargs(self):
+        kwargs = {"dpi": self.dpi, "poppler_path": self.poppler_path}
+        if self.grayscale:
+            kwargs["grayscale"] = True
+        if self.timeout:
+            kwargs["timeout"] = self.timeout
+        return kwargs
+
+    def _converter(self, pdf, **kwargs):
+        if em_memoria(pdf):
+            return self._convert_bytes(bytes(pdf), **kwargs)
+        return self._convert(pdf, **kwargs)
+
+    def render(self, pdf_path):
+        return self._converter(pdf_path, **self._kwargs())
+
+    def page_count(self, pdf_path):
+        if em_memoria(pdf_path):
+            info = pdfinfo_from_bytes(bytes(pdf_path), poppler_path=self.poppler_path, timeout=self.timeout)
+        else:
+            info = pdfinfo_from_path(pdf_path, poppler_path=self.poppler_path, timeout=self.timeout)
+        return int(info.get("Pages", 0) or 0)
+
+    def render_page(self, pdf_path, page_number):
+        imagens = self._converter(pdf_path, first_page=page_number, last_page=page_number, **self._kwargs())
+        return imagens[0] if imagens else None
+
+    def iter_pages(self, pdf_path):
+        # Um unico pdftoppm para o documento inteiro (comportamento historico).
+        imagens = self.render(pdf_path)
+        return iter(list(enumerate(imagens, start=1)))
+
+
+class PdfiumRasterizer:
+    """Backend in-process (pypdfium2): renderiza direto em memoria, pagina a pagina."""
+
+    name = "pdfium"
+
+    def __init__(self, dpi=300, grayscale=False):
+        import pypdfium2
+
+        self._pdfium = pypdfium2
+        self.dpi = dpi
+        self.grayscale = grayscale
+
+    def _open(self, pdf_path):
+        if isinstance(pdf_path, memoryview):
+            pdf_path = bytes(pdf_path)
+        with _PDFIUM_LOCK:
+            # Aceita caminho ou bytes (documento aberto direto do buffer).
+            return self._pdfium.PdfDocument(pdf_path)
+
+    def _close(self, doc):
+        with _PDFIUM_LOCK:
+            doc.close()
+
+    def _render_doc_page(self, doc, index):
+        with _PDFIUM_LOCK:
+            page = doc[index]
+            try:
+                bitmap = page.render(scale=self.dpi / 72.0, grayscale=self.grayscale)
+                img = bitmap.to_pil()
+                # Garante que a imagem nao depende do buffer do bitmap apos o close.
+                img = img.copy()
+                try:
+                    bitmap.close()
+                except Exception:
+                    pass
+                return img
+            finally:
+                page.close()
+
+    def render(self, pdf_path):
+        return [img for _, img in self.iter_pages(pdf_path)]
+
+    def page_count(self, pdf_path):
+        doc = self._open(pdf_path)
+        try:
+            with _PDFIUM_LOCK:
+                return len(doc)
+        finally:
+            self._close(doc)
+
+    def render_page(self, pdf_path, page_number):
+        doc = self._open(pdf_path)
+        try:
+            return self._render_doc_page(doc, page_number - 1)
+        finally:
+            self._close(doc)
+
+    def iter_pages(self, pdf_path):
+        # Abre o documento ja aqui para que erros de leitura aparecam na chamada,
+        # e nao na primeira iteracao.
+        doc = self._open(pdf_path)
+
+        def _gen():
+            try:
+                with _PDFIUM_LOCK:
+                    total = len(doc)
+                for index in range(total):
+                    yield index + 1, self._render_doc_page(doc, index)
+            finally:
+                self._close(doc)
+
+        return _gen()
+
+
+def pdfium_disponivel():
+    try:
+        import pypdfium2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def build_rasterizer(backend=None, poppler_path=None, dpi=300, grayscale=None, convert_fn=None, timeout=None, convert_bytes_fn=None):
+    backend = (backend or RASTERIZER_BACKEND or "poppler").strip().lower()
+    if grayscale is None:
+        grayscale = RASTER_GRAYSCALE
+    if backend == "pdfium":
+        if pdfium_disponivel():
+            return PdfiumRasterizer(dpi=dpi, grayscale=grayscale)
+        emit_terminal(
+            "WARNING",
+            "pypdfium2 nao instalado; usando Poppler para rasterizacao.",
+            step="setup",
+        )
+    elif backend != "poppler":
+        emit_terminal("WARNING", f"Rasterizador desconhecido '{backend}'; usando Poppler.", step="setup")
+    return PopplerRasterizer(
+        poppler_path=poppler_path,
+        dpi=dpi,
+        grayscale=grayscale,
+        convert_fn=convert_fn,
+        timeout=timeout,
+        convert_bytes_fn=convert_bytes_fn,
+    )
@@ -51,9 +51,19 @@ class ReportGenerator:
 - **Skipped Duplicate**: {stats.get('skipped_duplicate', 0)}
 - **Skipped Draft**: {stats.get('skipped_draft', 0)}
 - **Skipped Non-ASO**: {stats.get('skipped_non_aso', 0)}
-
-## Detalhes de Erros
 """
+        caixas = stats.get("mailboxes") or []
+        if len(caixas) > 1:
+            md_content += "\n## Caixas de Email\n"
+            for caixa in caixas:
+                rotulo = caixa.get("account") or caixa.get("name") or "Desconhecida"
+                md_content += (
+                    f"- **{rotulo}** ({caixa.get('status')}): mensagens={caixa.get('messages', 0)}, "
+                    f"emails ASO={caixa.get('emails', 0)}, processados={caixa.get('processed', 0)}, "
+                    f"sucessos={caixa.get('success', 0)}, erros={caixa.get('error', 0)}\n"
+                )
+
+        md_content += "\n## Detalhes de Erros\n"
         if stats.get("erros"):
             for erro in stats["erros"]:
                 arquivo = mask_cpf_in_text(erro.get("arquivo", "Desconhecido"))
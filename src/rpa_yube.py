@@ -5,10 +5,12 @@ import shutil
 import logging
 import csv
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from auth_state import AuthStateStore
 from custom_logger import emit_terminal
 from utils_masking import mask_cpf, mask_cpf_in_text
 
@@ -51,6 +53,17 @@ PRE_SAVE_WAIT_MS = int(os.getenv("PRE_SAVE_WAIT_MS", "5000"))
 SEARCH_WAIT_MS = int(os.getenv("YUBE_SEARCH_WAIT_MS", "5000"))
 RETRY_NOT_FOUND = int(os.getenv("ASO_RETRY_NOT_FOUND", "1"))
 RETRY_NOT_FOUND_DELAY_SEC = int(os.getenv("ASO_RETRY_NOT_FOUND_DELAY_SEC", "3"))
+# Sessao autenticada (storage_state) reaproveitada entre execucoes: fica no perfil do usuario, fora do share.
+# A sonda abre o app e espera so o campo de busca; o login completo roda apenas se ela falhar.
+YUBE_APP_URL = "https://app.yube.com.br/"
+# Sem pywin32/DPAPI o estado so e gravado (em texto puro, 0600) com YUBE_AUTH_STATE_PLAINTEXT=1.
+YUBE_AUTH_STATE = os.getenv("YUBE_AUTH_STATE", "1").strip().lower() in ("1", "true", "yes")
+YUBE_AUTH_STATE_PLAINTEXT = os.getenv("YUBE_AUTH_STATE_PLAINTEXT", "").strip().lower() in ("1", "true", "yes")
+YUBE_AUTH_STATE_PATH = os.getenv("YUBE_AUTH_STATE_PATH") or os.path.join(
+    os.getenv("LOCALAPPDATA") or os.path.expanduser("~"), "ASOgui", "yube_storage_state.json"
+)
+YUBE_AUTH_STATE_MAX_AGE_H = float(os.getenv("YUBE_AUTH_STATE_MAX_AGE_H", "12"))
+YUBE_AUTH_PROBE_MS = int(os.getenv("YUBE_AUTH_PROBE_MS", "8000"))
 
 # ---------- CONFIGURAÇÃO DE PASTAS CENTRALIZADAS ----------
 PROCESSO_ASO_BASE = os.getenv("PROCESSO_ASO_BASE", r"P:\ProcessoASO")
@@ -1024,138 +1037,200 @@ def processar_arquivo(page, file_path: str):
 
 
 
-def process_folder(base_path, headless=False, max_files=None, specific_files=None):
-    start_time = time.time()
+_BROWSER_ARGS = [
+    "--ignore-certificate-errors",
+    "--disable-http2",
+    "--disable-features=AllowInsecureLocalhost,SSLVersionFallback",
+    "--no-sandbox",
+    "--disable-web-security",
+]
+
+
+def _launch_browser(p, headless=False):
+    try:
+        return p.chromium.launch(headless=headless, args=_BROWSER_ARGS)
+    except Exception as e:
+        msg = str(e)
+        if "Executable doesn't exist" in msg or "playwright install" in msg:
+            logging.warning("Chromium do Playwright nao encontrado. Instalando automaticamente...")
+            if _ensure_playwright_chromium_installed():
+                return p.chromium.launch(headless=headless, args=_BROWSER_ARGS)
+        raise
+
+
+_AUTH_STATE = None
+
+
+def default_auth_state():
+    """Store do storage_state da Yube configurado (YUBE_AUTH_STATE_*); None se desligado."""
+    global _AUTH_STATE
+    if not YUBE_AUTH_STATE:
+        return None
+    if _AUTH_STATE is None:
+        _AUTH_STATE = AuthStateStore(
+            YUBE_AUTH_STATE_PATH,
+            max_age_h=YUBE_AUTH_STATE_MAX_AGE_H,
+            allow_plaintext=YUBE_AUTH_STATE_PLAINTEXT,
+            log_fn=logging.warning,
+        )
+    return _AUTH_STATE
+
+
+def sessao_autenticada(page, timeout=None):
+    """Sonda barata: abre o app e espera so o campo de busca (sem credenciais nem retentativas)."""
+    try:
+        page.goto(YUBE_APP_URL, timeout=NAV_TIMEOUT, wait_until="domcontentloaded")
+        SEL_BUSCA(page).wait_for(timeout=timeout or YUBE_AUTH_PROBE_MS)
+        return True
+    except Exception:
+        return False
+
+
+def _login_e_guardar(page, auth_state=None):
+    page = login(page)
+    if auth_state is not None:
+        try:
+            if SEL_BUSCA(page).count() > 0:
+                auth_state.save(page.context.storage_state())
+        except Exception as e:
+            logging.warning(f"Falha ao guardar sessao autenticada da Yube: {e}")
+    return page
+
+
+def _abrir_sessao(p, headless=False, auth_state=None):
+    """
+    Chromium + login + filtro "Selecionar Todas": (browser, page) prontos para a busca.
+    Com auth_state, o contexto nasce com o storage_state salvo e o login so roda se a
+    sonda nao encontrar a busca; um login bem-sucedido atualiza o estado salvo.
+    """
+    browser = _launch_browser(p, headless)
+    estado = auth_state.load() if auth_state is not None else None
+    opcoes = {"ignore_https_errors": True}
+    if estado is not None:
+        opcoes["storage_state"] = estado
+    context = browser.new_context(**opcoes)
+    page = context.new_page()
+    if estado is not None and sessao_autenticada(page):
+        auth_state.hits += 1
+        emit_terminal("OK", "Sessao salva da Yube reaproveitada; login pulado.", step="login")
+    else:
+        if auth_state is not None:
+            if estado is None:
+                auth_state.absent += 1
+            else:
+                auth_state.misses += 1
+                auth_state.clear()
+        page = _login_e_guardar(page, auth_state)
+    filtrar_todas_obras(page)
+    return browser, page
+
+
+def _listar_arquivos(base_path, max_files=None, specific_files=None):
+    if specific_files:
+        files = specific_files
+        logging.info(f"Processando {len(files)} arquivos ESPECÍFICOS enviados pelo main.")
+    else:
+        files = [str(p) for p in Path(base_path).glob("*.pdf")]
+        logging.info(f"{len(files)} arquivos encontrados em {base_path} (modo varredura).")
+
+    if max_files:
+        files = files[:max_files]
+    return files
+
+
+def _processar_arquivos(page, files):
+    """Envia cada arquivo (com retry dos nao encontrados) numa pagina ja autenticada."""
     stats = {
-        'total': 0,
+        'total': len(files),
         'sucessos': [],
         'pulados': [],
         'erros': [],
         'tempo_total': ''
     }
 
-    with sync_playwright() as p:
-        # ... (setup do browser) ...
+    retry_queue = []
+
+    def _normalize_result(result):
+        if isinstance(result, tuple) and len(result) == 3:
+            return result
+        return (bool(result), None, None)
+
+    def _erro_msg(reason):
+        if reason == "NOT_FOUND":
+            return "Funcionario nao encontrado na busca"
+        if reason == "CPF_NOT_FOUND":
+            return "CPF nao encontrado no nome"
+        if reason == "SKIPPED_ALREADY_APPROVED":
+            return "Documento ja aprovado no Yube"
+        if reason == "SKIPPED_IN_REVIEW":
+            return "Documento em validacao no Yube"
+        if reason == "SKIPPED_EDIT_EXISTS":
+            return "Documento ja existente (Editar documento)"
+        if reason == "SKIPPED_DOC_ALREADY_EXISTS":
+            return "Documento ja existe no Yube"
+        return "Falha na busca ou anexo (vide logs)"
+
+    for f in files:
+        filename = os.path.basename(f)
         try:
-            browser = p.chromium.launch(
-                headless=headless,
-                args=[
-                    "--ignore-certificate-errors",
-                    "--disable-http2",
-                    "--disable-features=AllowInsecureLocalhost,SSLVersionFallback",
-                    "--no-sandbox",
-                    "--disable-web-security",
-                ],
-            )
-        except Exception as e:
-            msg = str(e)
-            if "Executable doesn't exist" in msg or "playwright install" in msg:
-                logging.warning("Chromium do Playwright nao encontrado. Instalando automaticamente...")
-                if _ensure_playwright_chromium_installed():
-                    browser = p.chromium.launch(
-                        headless=headless,
-                        args=[
-                            "--ignore-certificate-errors",
-                            "--disable-http2",
-                            "--disable-features=AllowInsecureLocalhost,SSLVersionFallback",
-                            "--no-sandbox",
-                            "--disable-web-security",
-                        ],
-                    )
-                else:
-                    raise
+            ok, reason, retry_path = _normalize_result(processar_arquivo(page, f))
+            if ok:
+                stats["sucessos"].append(filename)
+            elif reason and str(reason).startswith("SKIPPED_"):
+                stats["pulados"].append({"arquivo": filename, "motivo": _erro_msg(reason)})
             else:
-                raise
-        context = browser.new_context(ignore_https_errors=True)
-        page = context.new_page()
-        page = login(page)
-        filtrar_todas_obras(page)
-
-        if specific_files:
-            files = specific_files
-            logging.info(f"Processando {len(files)} arquivos ESPECÍFICOS enviados pelo main.")
-        else:
-            files = [str(p) for p in Path(base_path).glob("*.pdf")]
-            logging.info(f"{len(files)} arquivos encontrados em {base_path} (modo varredura).")
-        
-        if max_files:
-            files = files[:max_files]
-
-        stats['total'] = len(files)
-
-        retry_queue = []
-
-        def _normalize_result(result):
-            if isinstance(result, tuple) and len(result) == 3:
-                return result
-            return (bool(result), None, None)
-
-        def _erro_msg(reason):
-            if reason == "NOT_FOUND":
-                return "Funcionario nao encontrado na busca"
-            if reason == "CPF_NOT_FOUND":
-                return "CPF nao encontrado no nome"
-            if reason == "SKIPPED_ALREADY_APPROVED":
-                return "Documento ja aprovado no Yube"
-            if reason == "SKIPPED_IN_REVIEW":
-                return "Documento em validacao no Yube"
-            if reason == "SKIPPED_EDIT_EXISTS":
-                return "Documento ja existente (Editar documento)"
-            if reason == "SKIPPED_DOC_ALREADY_EXISTS":
-                return "Documento ja existe no Yube"
-            return "Falha na busca ou anexo (vide logs)"
-
-        for f in files:
-            filename = os.path.basename(f)
+                stats["erros"].append({"arquivo": filename, "erro": _erro_msg(reason)})
+                if reason == "NOT_FOUND":
+                    retry_queue.append(retry_path or f)
+        except Exception as e:
+            logging.exception(f"Erro ao processar arquivo {f}: {e}")
+            stats["erros"].append({"arquivo": filename, "erro": str(e)})
+
+    if retry_queue and RETRY_NOT_FOUND > 0:
+        for attempt in range(RETRY_NOT_FOUND):
+            logging.info(f"Retry busca (nao encontrados) {attempt + 1}/{RETRY_NOT_FOUND}: {len(retry_queue)} arquivos")
+            if RETRY_NOT_FOUND_DELAY_SEC > 0:
+                time.sleep(RETRY_NOT_FOUND_DELAY_SEC)
             try:
-                ok, reason, retry_path = _normalize_result(processar_arquivo(page, f))
-                if ok:
-                    stats["sucessos"].append(filename)
-                elif reason and str(reason).startswith("SKIPPED_"):
-                    stats["pulados"].append({"arquivo": filename, "motivo": _erro_msg(reason)})
-                else:
-                    stats["erros"].append({"arquivo": filename, "erro": _erro_msg(reason)})
-                    if reason == "NOT_FOUND":
-                        retry_queue.append(retry_path or f)
+                page.goto(YUBE_URL, timeout=20000, wait_until="domcontentloaded")
+                page.wait_for_timeout(2000)
+                filtrar_todas_obras(page)
+                SEL_BUSCA(page).wait_for(timeout=15000)
             except Exception as e:
-                logging.exception(f"Erro ao processar arquivo {f}: {e}")
-                stats["erros"].append({"arquivo": filename, "erro": str(e)})
-
-        if retry_queue and RETRY_NOT_FOUND > 0:
-            for attempt in range(RETRY_NOT_FOUND):
-                logging.info(f"Retry busca (nao encontrados) {attempt + 1}/{RETRY_NOT_FOUND}: {len(retry_queue)} arquivos")
-                if RETRY_NOT_FOUND_DELAY_SEC > 0:
-                    time.sleep(RETRY_NOT_FOUND_DELAY_SEC)
+                logging.warning(f"Falha ao preparar retry: {e}")
+
+            next_retry = []
+            for f in retry_queue:
+                filename = os.path.basename(f)
                 try:
-                    page.goto(YUBE_URL, timeout=20000, wait_until="domcontentloaded")
-                    page.wait_for_timeout(2000)
-                    filtrar_todas_obras(page)
-                    SEL_BUSCA(page).wait_for(timeout=15000)
+                    ok, reason, retry_path = _normalize_result(processar_arquivo(page, f))
+                    if ok:
+                        if filename not in stats["sucessos"]:
+                            stats["sucessos"].append(filename)
+                        stats["erros"] = [e for e in stats["erros"] if e.get("arquivo") != filename]
+                        stats["pulados"] = [e for e in stats["pulados"] if e.get("arquivo") != filename]
+                    elif reason and str(reason).startswith("SKIPPED_"):
+                        if not any(e.get("arquivo") == filename for e in stats["pulados"]):
+                            stats["pulados"].append({"arquivo": filename, "motivo": _erro_msg(reason)})
+                        stats["erros"] = [e for e in stats["erros"] if e.get("arquivo") != filename]
+                    else:
+                        if reason == "NOT_FOUND":
+                            next_retry.append(retry_path or f)
                 except Exception as e:
-                    logging.warning(f"Falha ao preparar retry: {e}")
+                    logging.exception(f"Erro ao reprocessar arquivo {f}: {e}")
+            retry_queue = next_retry
+            if not retry_queue:
+                break
+    return stats
 
-                next_retry = []
-                for f in retry_queue:
-                    filename = os.path.basename(f)
-                    try:
-                        ok, reason, retry_path = _normalize_result(processar_arquivo(page, f))
-                        if ok:
-                            if filename not in stats["sucessos"]:
-                                stats["sucessos"].append(filename)
-                            stats["erros"] = [e for e in stats["erros"] if e.get("arquivo") != filename]
-                            stats["pulados"] = [e for e in stats["pulados"] if e.get("arquivo") != filename]
-                        elif reason and str(reason).startswith("SKIPPED_"):
-                            if not any(e.get("arquivo") == filename for e in stats["pulados"]):
-                                stats["pulados"].append({"arquivo": filename, "motivo": _erro_msg(reason)})
-                            stats["erros"] = [e for e in stats["erros"] if e.get("arquivo") != filename]
-                        else:
-                            if reason == "NOT_FOUND":
-                                next_retry.append(retry_path or f)
-                    except Exception as e:
-                        logging.exception(f"Erro ao reprocessar arquivo {f}: {e}")
-                retry_queue = next_retry
-                if not retry_queue:
-                    break
+
+def process_folder(base_path, headless=False, max_files=None, specific_files=None):
+    start_time = time.time()
+
+    with sync_playwright() as p:
+        browser, page = _abrir_sessao(p, headless, default_auth_state())
+        files = _listar_arquivos(base_path, max_files, specific_files)
+        stats = _processar_arquivos(page, files)
         if KEEP_BROWSER_OPEN:
             emit_terminal("INFO", "Navegador permanecera aberto (KEEP_BROWSER_OPEN=1).", step="encerramento")
         else:
@@ -1168,8 +1243,139 @@ def process_folder(base_path, headless=False, max_files=None, specific_files=Non
     return stats
 
 
+class YubeSession:
+    """
+    Navegador da Yube reaproveitado entre os emails de uma execucao: Chromium, login e o
+    filtro "Selecionar Todas" uma vez so; process() envia o lote de qualquer email e
+    close() encerra no fim. lazy=False abre o navegador ja na criacao (em paralelo com a
+    leitura do Outlook). Novo login apenas quando a busca nao aparece (sessao expirada).
+    O Playwright sync fica preso a thread que o iniciou: toda operacao roda na thread
+    propria da sessao ("aso-yube"), seja qual for a thread que chama process/close.
+    """
+
+    def __init__(self, headless=False, lazy=True, playwright_factory=None, auth_state=None):
+        self.headless = headless
+        self._factory = playwright_factory or sync_playwright
+        self.auth_state = auth_state
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aso-yube")
+        self._pw = None
+        self._browser = None
+        self._page = None
+        self._recem_logado = False
+        self.launches = 0
+        self.logins = 0
+        self.relogins = 0
+        self.batches = 0
+        self.files = 0
+        if not lazy:
+            self._executor.submit(self._iniciar_em_segundo_plano)
+
+    def _iniciar(self):
+        hits_antes = self.auth_state.hits if self.auth_state is not None else 0
+        self._encerrar()
+        self._pw = self._factory().start()
+        self.launches += 1
+        self._browser, self._page = _abrir_sessao(self._pw, self.headless, self.auth_state)
+        if self.auth_state is None or self.auth_state.hits == hits_antes:
+            self.logins += 1
+        self._recem_logado = True
+
+    def _iniciar_em_segundo_plano(self):
+        try:
+            self._iniciar()
+        except Exception as e:
+            # O primeiro lote tenta de novo.
+            logging.warning(f"Falha ao abrir sessao da Yube antecipadamente: {e}")
+            self._encerrar()
+
+    def _preparar(self):
+        """Antes de cada lote: volta para a busca; relogin so se a sessao expirou."""
+        if self._page is None or self._page.is_closed():
+            self._iniciar()
+            return
+        if self._recem_logado:
+            # Navegador recem-aberto: ja esta na busca, com o filtro aplicado.
+            return
+        try:
+            self._page.goto(YUBE_URL, timeout=20000, wait_until="domcontentloaded")
+        except Exception as e:
+            logging.warning(f"Navegador da Yube indisponivel; abrindo nova sessao: {e}")
+            self._iniciar()
+            return
+        try:
+            SEL_BUSCA(self._page).wait_for(timeout=15000)
+        except Exception:
+            emit_terminal("INFO", "Sessao da Yube expirada; refazendo login.", step="login")
+            self._page = _login_e_guardar(self._page, self.auth_state)
+            self.logins += 1
+            self.relogins += 1
+        filtrar_todas_obras(self._page)
+
+    def _processar(self, base_path, specific_files=None, max_files=None):
+        inicio = time.time()
+        self._preparar()
+        files = _listar_arquivos(base_path, max_files, specific_files)
+        self._recem_logado = False
+        stats = _processar_arquivos(self._page, files)
+        self.batches += 1
+        self.files += len(files)
+        stats['tempo_total'] = str(timedelta(seconds=int(time.time() - inicio)))
+        return stats
+
+    def process(self, base_path, specific_files=None, max_files=None):
+        if self._executor is None:
+            raise RuntimeError("Sessao da Yube ja encerrada")
+        return self._executor.submit(self._processar, base_path, specific_files, max_files).result()
+
+    def _encerrar(self):
+        for fechar in (getattr(self._browser, "close", None), getattr(self._pw, "stop", None)):
+            if fechar is None:
+                continue
+            try:
+                fechar()
+            except Exception:
+                pass
+        self._pw = self._browser = self._page = None
+
+    def close(self):
+        if self._executor is None:
+            return
+        try:
+            self._executor.submit(self._encerrar).result()
+        finally:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def as_dict(self):
+        resumo = {
+            "launches": self.launches,
+            "logins": self.logins,
+            "relogins": self.relogins,
+            "batches": self.batches,
+            "files": self.files,
+        }
+        if self.auth_state is not None:
+            resumo["auth_state"] = self.auth_state.as_dict()
+        return resumo
+
+
+# Sessao da execucao em andamento (main): run_from_main a usa no lugar de abrir um navegador por email.
+_SESSAO = None
+
+
+def use_session(session):
+    """Ativa session para run_from_main (None desativa); devolve a sessao anterior."""
+    global _SESSAO
+    anterior = _SESSAO
+    _SESSAO = session
+    return anterior
+
+
 # função para integrar com main.py
 def run_from_main(base_path, files_to_process=None):
+    sessao = _SESSAO
+    if sessao is not None:
+        return sessao.process(base_path, specific_files=files_to_process)
     return process_folder(base_path, headless=False, specific_files=files_to_process)
 
 
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+from atomic_io import read_json, write_json_atomic
+
+
+class SyncState:
+    """
+    Marca d'agua por mailbox/pasta: ultimo ReceivedTime processado e os EntryIDs
+    exatamente nessa fronteira (mensagens com o mesmo horario nao sao perdidas
+    nem reprocessadas). Persistido em JSON com escrita atomica.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        data = read_json(path, default=None)
+        if not isinstance(data, dict) or not isinstance(data.get("folders"), dict):
+            data = {"version": self.VERSION, "folders": {}}
+        self._data = data
+        self._dirty = False
+
+    @staticmethod
+    def folder_key(store_id, folder_path):
+        return f"{store_id or ''}|{(folder_path or '').lower()}"
+
+    def watermark(self, key):
+        """Retorna (ultimo_recebido, entry_ids_na_fronteira) ou (None, set())."""
+        entry = self._data["folders"].get(key) or {}
+        try:
+            last = datetime.fromisoformat(entry["last_received"]) if entry.get("last_received") else None
+        except (TypeError, ValueError):
+            last = None
+        if last is None:
+            return None, set()
+        return last, set(entry.get("boundary_ids") or [])
+
+    def ja_sincronizada(self, key, received, entry_id):
+        last, ids = self.watermark(key)
+        if last is None or received is None:
+            return False
+        if received < last:
+            return True
+        return received == last and bool(entry_id) and entry_id in ids
+
+    def advance(self, key, received, entry_id):
+        if received is None:
+            return
+        last, ids = self.watermark(key)
+        if last is not None and received < last:
+            return
+        if last is None or received > last:
+            ids = set()
+        if entry_id:
+            ids.add(entry_id)
+        self._data["folders"][key] = {
+            "last_received": received.isoformat(),
+            "boundary_ids": sorted(ids),
+            "updated_at": datetime.now().isoformat(),
+        }
+        self._dirty = True
+
+    def reset(self, key=None):
+        if key is None:
+            self._data["folders"] = {}
+        else:
+            self._data["folders"].pop(key, None)
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty or not self.path:
+            return
+        self._data["version"] = self.VERSION
+        self._data["updated_at"] = datetime.now().isoformat()
+        write_json_atomic(self.path, self._data)
+        self._dirty = False
@@ -0,0 +1,73 @@
+import subprocess
+import time
+
+
+class TempoEsgotado(Exception):
+    """Orcamento de tempo estourado em uma etapa (OCR, rasterizacao, execucao)."""
+
+    def __init__(self, etapa, elapsed, limite):
+        self.etapa = etapa
+        self.elapsed = float(elapsed or 0)
+        self.limite = float(limite or 0)
+        super().__init__(f"Tempo esgotado em {etapa} ({self.elapsed:.1f}s de {self.limite:.0f}s)")
+
+
+class TimeBudget:
+    """
+    Orcamento de tempo (monotonic). seconds <= 0 significa sem limite.
+    O processo filho (tesseract/pdftoppm) e morto pela propria lib quando
+    recebe o timeout calculado por call_timeout().
+    """
+
+    def __init__(self, seconds, etapa="execucao"):
+        try:
+            self.seconds = float(seconds or 0)
+        except (TypeError, ValueError):
+            self.seconds = 0.0
+        self.etapa = etapa
+        self.started = time.monotonic()
+
+    @property
+    def ilimitado(self):
+        return self.seconds <= 0
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def remaining(self):
+        if self.ilimitado:
+            return None
+        return max(0.0, self.seconds - self.elapsed())
+
+    def expired(self):
+        return not self.ilimitado and self.elapsed() >= self.seconds
+
+    def check(self):
+        if self.expired():
+            raise TempoEsgotado(self.etapa, self.elapsed(), self.seconds)
+
+    def call_timeout(self, per_call):
+        """Timeout para uma chamada: menor entre o limite por chamada e o restante do orcamento (0 = sem limite)."""
+        try:
+            per_call = float(per_call or 0)
+        except (TypeError, ValueError):
+            per_call = 0.0
+        remaining = self.remaining()
+        if remaining is None:
+            return per_call
+        if per_call <= 0:
+            return max(1.0, remaining)
+        return max(1.0, min(per_call, remaining))
+
+
+# Mensagem exata do RuntimeError que o pytesseract levanta ao matar o tesseract por timeout.
+_TESSERACT_TIMEOUT = "Tesseract process timeout"
+
+
+def eh_timeout(exc):
+    """Reconhece timeouts das libs que matam o processo filho (pytesseract / pdf2image / subprocess)."""
+    if isinstance(exc, (TempoEsgotado, subprocess.TimeoutExpired)):
+        return True
+    if type(exc).__name__ == "PDFPopplerTimeoutError":
+        return True
+    return type(exc) is RuntimeError and str(exc) == _TESSERACT_TIMEOUT
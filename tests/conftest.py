@@ -11,6 +11,10 @@ ROOT = Path(__file__).resolve().parents[1]
 SRC = ROOT / "src"
 if str(SRC) not in sys.path:
     sys.path.insert(0, str(SRC))
+TESTS = ROOT / "tests"
+if str(TESTS) not in sys.path:
+    # Permite "from outlook_fakes import ..." tambem em tests/stress.
+    sys.path.insert(0, str(TESTS))
 
 
 @pytest.fixture
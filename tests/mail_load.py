@@ -0,0 +1,174 @@
+"""
+Gerador de carga sobre outlook_fakes: caixas com dezenas de milhares de emails com
+assuntos, datas e anexos PDF de ASO sinteticos, para stress e benchmarks de captar_emails.
+Cada variante de PDF e renderizada uma vez; o anexo de cada email ganha um sufixo
+proprio apos o %%EOF (conteudo unico, sem deduplicacao) e so e montado quando o Outlook
+falso o entrega (SaveAsFile/PropertyAccessor): a memoria nao cresce com o tamanho da caixa.
+"""
+from __future__ import annotations
+
+import io
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+from outlook_fakes import PR_ATTACH_DATA_BIN, FakeMailItem
+
+NOMES = (
+    "JOAO DA SILVA",
+    "MARIA APARECIDA SOUZA",
+    "CARLOS EDUARDO LIMA",
+    "ANA PAULA FERREIRA",
+    "JOSE ROBERTO SANTOS",
+)
+FUNCOES = ("SOLDADOR", "ELETRICISTA", "MONTADOR", "CALDEIREIRO", "AJUDANTE GERAL")
+ASSUNTOS_ASO = (
+    "ASO ADMISSIONAL - {obra} - {data}",
+    "ENC: ASO ADMISSIONAL - {obra} - {data}",
+    "RE: ASO ADMISSIONAL - {obra} - {data}",
+    "Aso Admissional - {obra} - {data}",
+    "ASO ADMISSIONAL - {obra}",
+)
+ASSUNTOS_OUTROS = (
+    "ASO PERIODICO - {obra} - {data}",
+    "ASO DEMISSIONAL - {obra} - {data}",
+    "Relatorio semanal da obra {obra}",
+    "RE: medicao da obra {obra}",
+    "Folha de ponto {data}",
+    "Convite: reuniao de seguranca",
+)
+
+
+def synthetic_aso_pdf(nome=NOMES[0], cpf="123.456.789-01", data="01/02/2025", funcao=FUNCOES[0], pages=1, size=(1240, 1754)):
+    """PDF (bytes) de um ASO sintetico: pagina A4 a 150 dpi com os campos que o OCR procura."""
+    imgs = []
+    for n in range(pages):
+        img = Image.new("RGB", size, color="white")
+        draw = ImageDraw.Draw(img)
+        linhas = [
+            "ATESTADO DE SAUDE OCUPACIONAL - ASO",
+            "EXAME ADMISSIONAL",
+            f"NOME: {nome}",
+            f"CPF: {cpf}",
+            f"FUNCAO: {funcao}",
+            f"DATA DO EXAME: {data}",
+            "RESULTADO: APTO",
+            f"PAGINA {n + 1} DE {pages}",
+        ]
+        for i, linha in enumerate(linhas):
+            draw.text((100, 120 + 60 * i), linha, fill="black")
+        imgs.append(img)
+    buf = io.BytesIO()
+    imgs[0].save(buf, "PDF", save_all=True, append_images=imgs[1:], resolution=150.0)
+    return buf.getvalue()
+
+
+class PdfPool:
+    """Poucas variantes renderizadas uma vez; content(chave) devolve um PDF unico por chave."""
+
+    def __init__(self, variants=4, pages=1):
+        self._base = [
+            synthetic_aso_pdf(
+                nome=NOMES[i % len(NOMES)],
+                cpf=f"{100 + i:03d}.456.789-{i % 100:02d}",
+                funcao=FUNCOES[i % len(FUNCOES)],
+                pages=pages,
+            )
+            for i in range(max(1, variants))
+        ]
+
+    def size(self, n):
+        return len(self._base[n % len(self._base)]) + 64
+
+    def content(self, n, chave):
+        # Bytes apos o %%EOF sao ignorados pelos leitores de PDF, mas mudam o hash.
+        return self._base[n % len(self._base)] + f"\n%{chave}\n".encode()
+
+
+class _LazyPropertyAccessor:
+    def __init__(self, att):
+        self._att = att
+
+    def GetProperty(self, name):
+        self._att._hit()
+        if name != PR_ATTACH_DATA_BIN:
+            raise KeyError(name)
+        return self._att.content()
+
+
+class SyntheticAttachment:
+    """Anexo PDF cujo conteudo so e montado quando o Outlook falso o entrega."""
+
+    def __init__(self, filename, pool, variant, key, counter=None, expose_data=True):
+        self.FileName = filename
+        self.Size = pool.size(variant) + 64 * 1024
+        self._pool = pool
+        self._variant = variant
+        self._key = key
+        self._counter = counter
+        self.saves = 0
+        if expose_data:
+            self.PropertyAccessor = _LazyPropertyAccessor(self)
+
+    def _hit(self):
+        if self._counter is not None:
+            self._counter.hit()
+
+    def content(self):
+        return self._pool.content(self._variant, self._key)
+
+    def SaveAsFile(self, path):
+        self._hit()
+        self.saves += 1
+        Path(path).write_bytes(self.content())
+
+
+def generate_messages(
+    total,
+    aso_ratio=0.2,
+    attachments_per_aso=(1, 2),
+    start=None,
+    interval_sec=(5, 90),
+    counter=None,
+    pool=None,
+    expose_data=True,
+    prefix="E",
+    seed=0,
+):
+    """
+    total emails do mais novo (start) para o mais antigo, com intervalos aleatorios em
+    interval_sec. aso_ratio deles sao "ASO ADMISSIONAL" (variacoes de ENC:/RE:/caixa) com
+    1..n PDFs; os demais tem assuntos comuns de obra (inclusive outros tipos de ASO).
+    """
+    rnd = random.Random(seed)
+    pool = pool or PdfPool()
+    quando = start or datetime.now()
+    mensagens = []
+    for i in range(total):
+        obra = rnd.randint(100, 9999)
+        data = (quando - timedelta(days=rnd.randint(0, 30))).strftime("%d/%m/%Y")
+        entry_id = f"{prefix}{i:06d}"
+        anexos = []
+        if rnd.random() < aso_ratio:
+            assunto = rnd.choice(ASSUNTOS_ASO).format(obra=obra, data=data)
+            for n in range(rnd.randint(*attachments_per_aso)):
+                variante = rnd.randrange(1 << 16)
+                anexos.append(SyntheticAttachment(
+                    f"ASO {rnd.choice(NOMES)} {n + 1}.pdf", pool, variante, f"{entry_id}-{n}",
+                    counter=counter, expose_data=expose_data,
+                ))
+        else:
+            assunto = rnd.choice(ASSUNTOS_OUTROS).format(obra=obra, data=data)
+        mensagens.append(FakeMailItem(entry_id, assunto, quando, anexos, counter=counter))
+        quando -= timedelta(seconds=rnd.uniform(*interval_sec))
+    return mensagens
+
+
+def span_days(mensagens, now=None):
+    """Dias entre o email mais antigo e hoje (valor para ASO_DAYS_BACK cobrir a caixa toda)."""
+    if not mensagens:
+        return 0
+    mais_antigo = min(m.raw("ReceivedTime") for m in mensagens)
+    return ((now or datetime.now()).date() - mais_antigo.date()).days
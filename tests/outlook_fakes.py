@@ -0,0 +1,378 @@
+"""
+Fakes do modelo de objetos do Outlook (Items, Folder.GetTable, GetItemFromID,
+caixas compartilhadas) para testes e benchmarks. ComCounter conta (e opcionalmente
+atrasa) cada "chamada COM" para comparar estrategias de varredura. Caixas grandes
+(dezenas de milhares de emails) sao geradas por mail_load.
+"""
+from __future__ import annotations
+
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+class ComCounter:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def hit(self, n: int = 1):
+        self.calls += n
+        if self.latency:
+            time.sleep(self.latency * n)
+
+
+class FakePropertyAccessor:
+    def __init__(self, props):
+        self._props = dict(props)
+        self.reads = 0
+
+    def GetProperty(self, name):
+        self.reads += 1
+        if name not in self._props:
+            raise KeyError(name)
+        return self._props[name]
+
+
+PR_ATTACH_DATA_BIN = "http://schemas.microsoft.com/mapi/proptag/0x37010102"
+
+
+class FakeAttachment:
+    def __init__(self, filename: str, content: bytes, size=None, expose_data=False):
+        self.FileName = filename
+        self._content = content
+        # Attachment.Size do Outlook inclui overhead MAPI; o default fica acima do limite de "PDF minusculo".
+        self.Size = size if size is not None else len(content) + 64 * 1024
+        self.saves = 0
+        if expose_data:
+            self.PropertyAccessor = FakePropertyAccessor({PR_ATTACH_DATA_BIN: content})
+
+    def SaveAsFile(self, path):
+        self.saves += 1
+        Path(path).write_bytes(self._content)
+
+
+class FakeAttachments:
+    def __init__(self, items):
+        self._items = list(items)
+
+    @property
+    def Count(self):
+        return len(self._items)
+
+    def Item(self, i):
+        return self._items[i - 1]
+
+
+_MAIL_PROPS = {"Class", "Subject", "ReceivedTime", "Body", "HTMLBody", "Attachments", "EntryID", "MessageClass", "Size"}
+
+
+class FakeMailItem:
+    def __init__(self, entry_id, subject, received, attachments=None, body="", html_body="", counter=None):
+        self.EntryID = entry_id
+        self.Class = 43
+        self.MessageClass = "IPM.Note"
+        self.Subject = subject
+        self.ReceivedTime = received
+        self.Body = body
+        self.HTMLBody = html_body
+        self.Attachments = FakeAttachments(attachments or [])
+        self.Size = 1024 + sum(getattr(a, "Size", 0) for a in (attachments or []))
+        self._counter = counter
+
+    def __getattribute__(self, name):
+        if name in _MAIL_PROPS:
+            counter = object.__getattribute__(self, "_counter")
+            if counter is not None:
+                counter.hit()
+        return object.__getattribute__(self, name)
+
+    def raw(self, name):
+        return object.__getattribute__(self, name)
+
+
+_CLAUSE_RE = re.compile(r'"([^"]+)"\s*(>=|<=|<>|=|<|>|LIKE)\s*\'((?:[^\']|\'\')*)\'', re.IGNORECASE)
+_DASL_PROPS = {
+    "urn:schemas:httpmail:datereceived": "ReceivedTime",
+    "urn:schemas:httpmail:subject": "Subject",
+}
+
+
+def _like(pattern, value):
+    regex = "^" + ".*".join(re.escape(p) for p in pattern.split("%")) + "$"
+    return re.match(regex, value or "", re.IGNORECASE | re.DOTALL) is not None
+
+
+def dasl_matches(filtro, item):
+    """Avaliador minimo para os filtros @SQL= gerados por outlook_scan.build_dasl_filter."""
+    if not filtro:
+        return True
+    if not filtro.startswith("@SQL="):
+        raise ValueError(f"filtro nao suportado: {filtro}")
+    for prop, op, literal in _CLAUSE_RE.findall(filtro[5:]):
+        literal = literal.replace("''", "'")
+        attr = _DASL_PROPS.get(prop)
+        if attr is None:
+            raise ValueError(f"propriedade nao suportada: {prop}")
+        value = item.raw(attr)
+        if attr == "ReceivedTime":
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            literal = datetime.strptime(literal, "%Y-%m-%d %H:%M")
+        op = op.upper()
+        ok = {
+            ">=": lambda a, b: a >= b,
+            "<=": lambda a, b: a <= b,
+            ">": lambda a, b: a > b,
+            "<": lambda a, b: a < b,
+            "=": lambda a, b: a == b,
+            "<>": lambda a, b: a != b,
+            "LIKE": lambda a, b: _like(b, a),
+        }[op](value, literal)
+        if not ok:
+            return False
+    return True
+
+
+class FakeItems:
+    def __init__(self, items, counter=None, supports_restrict=True):
+        self._items = list(items)
+        self._counter = counter
+        self._supports_restrict = supports_restrict
+
+    def _hit(self):
+        if self._counter is not None:
+            self._counter.hit()
+
+    @property
+    def Count(self):
+        self._hit()
+        return len(self._items)
+
+    def Sort(self, *_args, **_kwargs):
+        self._hit()
+        self._items.sort(key=lambda m: m.raw("ReceivedTime"), reverse=True)
+
+    def Item(self, i):
+        self._hit()
+        return self._items[i - 1]
+
+    def Restrict(self, filtro):
+        self._hit()
+        if not self._supports_restrict:
+            raise RuntimeError("Restrict nao suportado")
+        return FakeItems([m for m in self._items if dasl_matches(filtro, m)], self._counter)
+
+
+class FakeColumns:
+    def __init__(self, counter=None):
+        self.names = []
+        self._counter = counter
+
+    def RemoveAll(self):
+        self.names = []
+
+    def Add(self, name):
+        if self._counter is not None:
+            self._counter.hit()
+        self.names.append(name)
+
+
+_TABLE_PROPS = {
+    "EntryID": "EntryID",
+    "ReceivedTime": "ReceivedTime",
+    "Subject": "Subject",
+    "MessageClass": "MessageClass",
+    "Size": "Size",
+}
+
+
+class FakeTable:
+    def __init__(self, items, counter=None):
+        self._items = list(items)
+        self._pos = 0
+        self._counter = counter
+        self.Columns = FakeColumns(counter)
+        self.get_array_calls = 0
+
+    @property
+    def EndOfTable(self):
+        return self._pos >= len(self._items)
+
+    def Sort(self, _prop, descending=False):
+        self._items.sort(key=lambda m: m.raw("ReceivedTime"), reverse=bool(descending))
+
+    def _valor(self, item, coluna):
+        if coluna in _TABLE_PROPS:
+            return item.raw(_TABLE_PROPS[coluna])
+        if coluna == "urn:schemas:httpmail:hasattachment":
+            return item.raw("Attachments").Count > 0
+        raise ValueError(f"coluna nao suportada: {coluna}")
+
+    def GetArray(self, max_rows):
+        if self._counter is not None:
+            self._counter.hit()
+        self.get_array_calls += 1
+        bloco = self._items[self._pos:self._pos + max_rows]
+        self._pos += len(bloco)
+        return tuple(tuple(self._valor(m, c) for c in self.Columns.names) for m in bloco)
+
+
+class FakeFolder:
+    def __init__(
+        self,
+        items,
+        counter=None,
+        with_table=True,
+        store_id="STORE-1",
+        folder_path="\\\\Aso\\Caixa de Entrada",
+        entry_id="FOLDER-INBOX",
+    ):
+        self._messages = list(items)
+        self.EntryID = entry_id
+        self._counter = counter
+        self._with_table = with_table
+        self.StoreID = store_id
+        self.FolderPath = folder_path
+        self.tables = []
+
+    @property
+    def Items(self):
+        return FakeItems(self._messages, self._counter)
+
+    def __getattr__(self, name):
+        if name == "GetTable" and object.__getattribute__(self, "_with_table"):
+            return self._get_table
+        raise AttributeError(name)
+
+    def _get_table(self, filtro="", _table_contents=0):
+        if self._counter is not None:
+            self._counter.hit()
+        table = FakeTable([m for m in self._messages if dasl_matches(filtro, m)], self._counter)
+        self.tables.append(table)
+        return table
+
+
+class FakeFolders:
+    def __init__(self, mapping):
+        self._mapping = mapping
+
+    def __call__(self, name):
+        if name in self._mapping:
+            return self._mapping[name]
+        raise KeyError(name)
+
+    def __iter__(self):
+        return iter(list(self._mapping.values()))
+
+    @property
+    def Count(self):
+        return len(self._mapping)
+
+
+class FakeAccount:
+    def __init__(self, name, inbox):
+        self.DisplayName = name
+        self.Name = name
+        self.Folders = FakeFolders({"Caixa de Entrada": inbox, "Inbox": inbox})
+
+
+class FakeRecipient:
+    def __init__(self, address=""):
+        self.Address = address
+        self.Resolved = False
+
+    def Resolve(self):
+        self.Resolved = True
+
+
+class FakeNamespace:
+    def __init__(self, account, inbox, counter=None):
+        self._accounts = [account]
+        self.Folders = FakeFolders({account.DisplayName: account, "Aso": account})
+        self._inbox = inbox
+        self._inboxes = {account.DisplayName.lower(): inbox}
+        self._counter = counter
+        self._por_entry_id = None
+        self.opened = []
+        self.account_scans = 0
+        self.folder_lookups = []
+
+    def add_mailbox(self, account, inbox):
+        """Caixa adicional (compartilhada) no mesmo perfil: conta propria, StoreID proprio."""
+        self._accounts.append(account)
+        self.Folders._mapping[account.DisplayName] = account
+        self._inboxes[account.DisplayName.lower()] = inbox
+        self._por_entry_id = None
+
+    @property
+    def Accounts(self):
+        self.account_scans += 1
+        return self._accounts
+
+    def CreateRecipient(self, smtp):
+        return FakeRecipient(smtp)
+
+    def GetSharedDefaultFolder(self, recip, _):
+        return self._inboxes.get((getattr(recip, "Address", "") or "").lower(), self._inbox)
+
+    def _indice(self):
+        # EntryID -> item de todas as caixas: GetItemFromID O(1) mesmo com dezenas de milhares de emails.
+        if self._por_entry_id is None:
+            self._por_entry_id = {
+                m.raw("EntryID"): m for inbox in self._inboxes.values() for m in inbox._messages
+            }
+        return self._por_entry_id
+
+    def GetItemFromID(self, entry_id, store_id=None):
+        if self._counter is not None:
+            self._counter.hit()
+        self.opened.append((entry_id, store_id))
+        item = self._indice().get(entry_id)
+        if item is None:
+            # Testes acrescentam mensagens em inbox._messages depois de montar o perfil.
+            self._por_entry_id = None
+            item = self._indice().get(entry_id)
+        if item is None:
+            raise KeyError(entry_id)
+        return item
+
+    def GetFolderFromID(self, entry_id, store_id=None):
+        if self._counter is not None:
+            self._counter.hit()
+        self.folder_lookups.append((entry_id, store_id))
+        for inbox in self._inboxes.values():
+            if entry_id == inbox.EntryID and store_id in (None, inbox.StoreID):
+                return inbox
+        raise KeyError(entry_id)
+
+
+def build_mailbox(messages, account_name="aso@enesa.com.br", counter=None, with_table=True):
+    inbox = FakeFolder(messages, counter=counter, with_table=with_table)
+    account = FakeAccount(account_name, inbox)
+    return FakeNamespace(account, inbox, counter=counter), inbox
+
+
+def build_mailboxes(mailboxes, counter=None, with_table=True):
+    """
+    Varias caixas num mesmo perfil: {conta: mensagens} -> (namespace, {conta: inbox}).
+    Cada caixa tem StoreID/EntryID proprios; os EntryIDs das mensagens devem ser unicos.
+    """
+    namespace = None
+    inboxes = {}
+    for n, (conta, mensagens) in enumerate(mailboxes.items(), start=1):
+        inbox = FakeFolder(
+            mensagens,
+            counter=counter,
+            with_table=with_table,
+            store_id=f"STORE-{n}",
+            folder_path=f"\\\\{conta}\\Caixa de Entrada",
+            entry_id=f"FOLDER-INBOX-{n}",
+        )
+        account = FakeAccount(conta, inbox)
+        if namespace is None:
+            namespace = FakeNamespace(account, inbox, counter=counter)
+        else:
+            namespace.add_mailbox(account, inbox)
+        inboxes[conta] = inbox
+    return namespace, inboxes
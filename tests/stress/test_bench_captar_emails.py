@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import gc
+import os
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from mail_load import PdfPool, generate_messages, span_days
+from outlook_fakes import ComCounter, build_mailboxes
+
+
+def _caixas(total, quantas, counter):
+    pool = PdfPool()
+    contas = [f"aso{n}@enesa.com.br" for n in range(1, quantas + 1)]
+    return {
+        conta: generate_messages(total // quantas, counter=counter, pool=pool, prefix=f"C{n}E", seed=n)
+        for n, conta in enumerate(contas, start=1)
+    }
+
+
+@pytest.mark.stress
+def test_bench_captar_emails_end_to_end(load_main, monkeypatch):
+    if os.getenv("RUN_STRESS") != "1":
+        pytest.skip("benchmark skipped (set RUN_STRESS=1)")
+
+    total = int(os.getenv("ASO_BENCH_MAILS", "20000"))
+    quantas = max(1, int(os.getenv("ASO_BENCH_MAILBOXES", "1")))
+    latency = float(os.getenv("ASO_BENCH_COM_LATENCY", "0"))
+    ocr_real = os.getenv("ASO_BENCH_REAL_OCR") == "1"
+    rpa_real = os.getenv("ASO_BENCH_REAL_RPA") == "1"
+
+    counter = ComCounter(latency=latency)
+    por_caixa = _caixas(total, quantas, counter)
+    namespace, _inboxes = build_mailboxes(por_caixa, counter=counter)
+    dias = max(span_days(m) for m in por_caixa.values())
+
+    main = load_main(env={
+        "ASO_EMAIL_ACCOUNT": ";".join(por_caixa),
+        "ASO_MAILBOX_NAME": "",
+        "ASO_DAYS_BACK": str(dias),
+        "ASO_INCREMENTAL_SYNC": "0",
+    })
+    monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+    monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SKIPPED", None))
+
+    if not ocr_real:
+        def _fake_salvar(pdf_path, pasta, obra, lista_novos_arquivos=None, stats=None, **_k):
+            stats["total_detected"] += 1
+            lista_novos_arquivos.append(str(Path(pasta) / f"ASO {obra} {Path(pdf_path).stem}.pdf"))
+            return {"pages": 1, "failed_pages": []}
+
+        monkeypatch.setattr(main, "salvar_paginas_individualmente", _fake_salvar)
+    if not rpa_real:
+        monkeypatch.setattr(
+            main,
+            "run_from_main",
+            lambda *_a, files_to_process=None, **_k: {"sucessos": list(files_to_process or []), "erros": []},
+        )
+
+    now = datetime.now()
+    manifest = main._novo_manifest("bench", now)
+    gc.collect()
+    tracemalloc.start()
+    memoria_antes, _ = tracemalloc.get_traced_memory()
+    inicio = time.perf_counter()
+    stats = main.captar_emails(limit=total, execution_id="bench", started_at=now, manifest=manifest)
+    segundos = time.perf_counter() - inicio
+    memoria_depois, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    caixas = manifest.get("mailboxes") or []
+    emails = sum(c.get("emails", 0) for c in caixas)
+    anexos = sum(c.get("attachments", 0) for c in caixas)
+    mensagens = sum(c.get("messages", 0) for c in caixas)
+    print(
+        f"[BENCH] captar_emails mails={mensagens} mailboxes={quantas} aso_emails={emails} attachments={anexos} "
+        f"seconds={segundos:.2f} mails_per_sec={mensagens / segundos:.1f} aso_emails_per_sec={emails / segundos:.1f} "
+        f"com_calls={counter.calls} com_calls_per_mail={counter.calls / max(1, mensagens):.2f} "
+        f"com_calls_per_aso_email={counter.calls / max(1, emails):.2f} "
+        f"py_mem_growth_mb={(memoria_depois - memoria_antes) / 1e6:.1f} py_peak_mb={pico / 1e6:.1f} "
+        f"ocr={'real' if ocr_real else 'stub'} rpa={'real' if rpa_real else 'stub'}"
+    )
+    assert stats is not None
+    assert mensagens == total // quantas * quantas
+    assert emails > 0 and anexos >= emails
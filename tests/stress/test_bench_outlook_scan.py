@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import outlook_scan
+from outlook_fakes import ComCounter, FakeMailItem, build_mailbox
+
+
+def _mailbox(total, alvo_cada, latency):
+    counter = ComCounter(latency=latency)
+    agora = datetime.now()
+    msgs = []
+    for i in range(total):
+        assunto = f"ASO ADMISSIONAL - {i} - 01/02/2025" if i % alvo_cada == 0 else f"Assunto qualquer {i}"
+        msgs.append(FakeMailItem(f"E{i:05d}", assunto, agora - timedelta(minutes=i), counter=counter))
+    namespace, inbox = build_mailbox(msgs, counter=counter)
+    return namespace, inbox, counter
+
+
+def _varredura_items(inbox, limit):
+    # Comportamento historico: Items.Item(i) + leitura de propriedades por mensagem.
+    itens = inbox.Items
+    itens.Sort("[ReceivedTime]", True)
+    achados = []
+    for i in range(1, min(limit, itens.Count) + 1):
+        msg = itens.Item(i)
+        _ = msg.Class
+        _ = msg.ReceivedTime
+        if outlook_scan.ASO_SUBJECT_RE.search(msg.Subject or ""):
+            achados.append(msg)
+    return achados
+
+
+def _varredura_tabela(namespace, inbox, limit):
+    linhas = outlook_scan.table_rows(inbox, max_rows=limit)
+    candidatas = [linha for linha in linhas if outlook_scan.ASO_SUBJECT_RE.search(linha.subject)]
+    itens = outlook_scan.EntryIdItems(namespace, candidatas, store_id=inbox.StoreID)
+    return [itens.Item(i) for i in range(1, itens.Count + 1)]
+
+
+@pytest.mark.stress
+def test_bench_outlook_scan_items_vs_table():
+    if os.getenv("RUN_STRESS") != "1":
+        pytest.skip("benchmark skipped (set RUN_STRESS=1)")
+
+    total = int(os.getenv("ASO_BENCH_MAILS", "2000"))
+    latency = float(os.getenv("ASO_BENCH_COM_LATENCY", "0.0002"))
+    limit = total
+
+    resultados = []
+    for nome, fn in (
+        ("items", lambda ns, inbox: _varredura_items(inbox, limit)),
+        ("table", lambda ns, inbox: _varredura_tabela(ns, inbox, limit)),
+    ):
+        namespace, inbox, counter = _mailbox(total, alvo_cada=50, latency=latency)
+        inicio = time.perf_counter()
+        achados = fn(namespace, inbox)
+        resultados.append((nome, len(achados), counter.calls, round(time.perf_counter() - inicio, 3)))
+
+    for nome, achados, chamadas, segundos in resultados:
+        print(f"[BENCH] outlook_scan={nome} mails={total} matches={achados} com_calls={chamadas} seconds={segundos}")
+    assert resultados[0][1] == resultados[1][1]
+    assert resultados[1][2] < resultados[0][2]
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import os
+import time
+
+import pytest
+from PIL import Image, ImageDraw
+
+import preprocessing
+
+
+def _pagina_a4(angulo):
+    # A4 a 300 dpi, o mesmo tamanho entregue pelo rasterizador.
+    img = Image.new("L", (2480, 3508), color=235)
+    draw = ImageDraw.Draw(img)
+    for y in range(300, 3200, 60):
+        draw.text((200, y), "ATESTADO DE SAUDE OCUPACIONAL  NOME COMPLETO  CPF 000.000.000-00", fill=20)
+        draw.rectangle([200, y + 20, 2200, y + 34], fill=30)
+    return img.rotate(angulo, expand=True, fillcolor=235).convert("RGB")
+
+
+@pytest.mark.stress
+@pytest.mark.parametrize("metodo", ["otsu", "sauvola"])
+def test_bench_preprocess_for_ocr(metodo):
+    if os.getenv("RUN_STRESS") != "1":
+        pytest.skip("benchmark skipped (set RUN_STRESS=1)")
+
+    paginas = [_pagina_a4(a) for a in (2.5, -1.5, 0.0)]
+    started = time.perf_counter()
+    for img in paginas:
+        out = preprocessing.preprocess_for_ocr(img, method=metodo)
+        assert out.mode == "L"
+    elapsed = time.perf_counter() - started
+    ms_por_pagina = elapsed * 1000 / len(paginas)
+    print(f"[BENCH] preprocess={metodo} pages={len(paginas)} ms_per_page={ms_por_pagina:.0f}")
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import gc
+import io
+import os
+import shutil
+import time
+import tracemalloc
+from pathlib import Path
+
+import pytest
+from PIL import Image, ImageDraw
+
+import rasterizer
+
+
+def _synthetic_pdf(path: Path, pages: int = 3):
+    # Pagina A4 a 150 dpi com algum "texto" para nao ser uma imagem trivial.
+    imgs = []
+    for n in range(pages):
+        img = Image.new("RGB", (1240, 1754), color="white")
+        draw = ImageDraw.Draw(img)
+        for y in range(120, 1600, 40):
+            draw.text((100, y), f"ATESTADO DE SAUDE OCUPACIONAL - PAGINA {n + 1} - LINHA {y}", fill="black")
+        imgs.append(img)
+    buf = io.BytesIO()
+    imgs[0].save(buf, "PDF", save_all=True, append_images=imgs[1:], resolution=150.0)
+    path.write_bytes(buf.getvalue())
+    return path
+
+
+def _bench_pdfs(tmp_path):
+    bench_dir = os.getenv("ASO_BENCH_PDF_DIR")
+    if bench_dir and os.path.isdir(bench_dir):
+        pdfs = sorted(str(p) for p in Path(bench_dir).glob("*.pdf"))
+        if pdfs:
+            return pdfs
+    return [str(_synthetic_pdf(Path(tmp_path) / f"sintetico_{i}.pdf")) for i in range(3)]
+
+
+def _measure(backend, pdfs):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    pages = 0
+    for pdf in pdfs:
+        # Consome pagina a pagina, como o pipeline faz.
+        for _, img in backend.iter_pages(pdf):
+            pages += 1
+            img.close()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    label = f"{backend.name}-gray" if backend.grayscale else backend.name
+    return {"backend": label, "pages": pages, "seconds": round(elapsed, 3), "peak_py_mb": round(peak / 1e6, 1)}
+
+
+@pytest.mark.stress
+def test_bench_rasterizer_backends(tmp_path):
+    if os.getenv("RUN_STRESS") != "1":
+        pytest.skip("benchmark skipped (set RUN_STRESS=1)")
+
+    pdfs = _bench_pdfs(tmp_path)
+    dpi = int(os.getenv("ASO_BENCH_DPI", "300"))
+    results = []
+
+    poppler_path = os.getenv("POPPLER_PATH") or None
+    if poppler_path or shutil.which("pdftoppm"):
+        results.append(_measure(rasterizer.PopplerRasterizer(poppler_path=poppler_path, dpi=dpi), pdfs))
+    if rasterizer.pdfium_disponivel():
+        results.append(_measure(rasterizer.PdfiumRasterizer(dpi=dpi), pdfs))
+        results.append(_measure(rasterizer.PdfiumRasterizer(dpi=dpi, grayscale=True), pdfs))
+
+    if not results:
+        pytest.skip("nenhum backend de rasterizacao disponivel")
+    for r in results:
+        print(f"[BENCH] rasterizer={r['backend']} pages={r['pages']} seconds={r['seconds']} peak_py_mb={r['peak_py_mb']}")
+    assert all(r["pages"] > 0 for r in results)
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from admissional_archive import AdmissionalArchive
+
+
+def test_arquivo_admissional_faz_hardlink_e_deduplica(tmp_path):
+    origem = tmp_path / "temp_1.pdf"
+    origem.write_bytes(b"%PDF-1.4 joao")
+    arquivo = AdmissionalArchive(str(tmp_path / "adm"))
+    recebido = datetime(2026, 1, 5, 9, 30)
+
+    assert not arquivo.accepts("RE: ASO ADMISSIONAL - 1")
+    assert arquivo.accepts("aso admissional - 123")
+    destino = arquivo.consume(recebido, "JOAO: ASO.pdf", str(origem))
+    assert destino == str(tmp_path / "adm" / "2026-01-05" / "JOAO_ ASO.pdf")
+    assert os.path.samefile(destino, origem)
+    # Mesmo conteudo em outro email: nao arquiva de novo.
+    assert arquivo.consume(recebido, "copia.pdf", str(origem)) is None
+    assert arquivo.consume(recebido, "planilha.xlsx", str(origem)) is None
+
+    outro = tmp_path / "temp_2.pdf"
+    outro.write_bytes(b"%PDF-1.4 maria")
+    assert arquivo.consume(recebido, "JOAO: ASO.pdf", str(outro)).endswith("JOAO_ ASO_1.pdf")
+    assert (arquivo.saved, arquivo.linked) == (2, 2)
+
+
+def test_captar_emails_alimenta_arquivo_admissional_com_um_saveasfile(load_main, tmp_path, monkeypatch):
+    from outlook_fakes import FakeAttachment, FakeMailItem, build_mailbox
+
+    dest = tmp_path / "admissional"
+    main = load_main(env={
+        "ASO_EMAIL_ACCOUNT": "aso@enesa.com.br",
+        "ASO_MAILBOX_NAME": "Aso",
+        "ASO_ADMISSIONAL_SHARED": "1",
+        "ASO_DEST_BASE": str(dest),
+    })
+    agora = datetime.now()
+    anexos = [FakeAttachment("ASO JOAO.pdf", b"%PDF-1.4 joao"), FakeAttachment("ASO MARIA.pdf", b"%PDF-1.4 maria")]
+    msgs = [FakeMailItem("A", "ASO ADMISSIONAL - 123 - 01/02/2025", agora - timedelta(minutes=5), anexos)]
+    namespace, _inbox = build_mailbox(msgs)
+    monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+    ocr = []
+
+    def _fake_salvar(pdf_path, _pasta, obra, stats=None, **_k):
+        ocr.append(Path(pdf_path).read_bytes())
+        stats["total_detected"] += 1
+
+    monkeypatch.setattr(main, "salvar_paginas_individualmente", _fake_salvar)
+    monkeypatch.setattr(main, "run_from_main", lambda *_args, **_kwargs: {"sucessos": [], "erros": []})
+    monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+    manifest = main._novo_manifest("shared-1", agora)
+
+    main.captar_emails(limit=10, execution_id="shared-1", started_at=agora, manifest=manifest)
+
+    pasta = dest / (agora - timedelta(minutes=5)).strftime("%Y-%m-%d")
+    assert sorted(p.name for p in pasta.iterdir()) == ["ASO JOAO.pdf", "ASO MARIA.pdf"]
+    assert (pasta / "ASO JOAO.pdf").read_bytes() == b"%PDF-1.4 joao"
+    assert sorted(ocr) == [b"%PDF-1.4 joao", b"%PDF-1.4 maria"]
+    assert [a.saves for a in anexos] == [1, 1]
+    assert manifest["admissional"] == {"saved": 2, "linked": 2}
+
+
+def test_arquivo_admissional_so_recebe_o_que_o_main_salva(load_main, tmp_path, monkeypatch):
+    from outlook_fakes import FakeAttachment, FakeMailItem, build_mailbox
+
+    dest = tmp_path / "admissional"
+    main = load_main(env={
+        "ASO_EMAIL_ACCOUNT": "aso@enesa.com.br",
+        "ASO_MAILBOX_NAME": "Aso",
+        "ASO_ADMISSIONAL_SHARED": "1",
+        "ASO_DEST_BASE": str(dest),
+    })
+    agora = datetime.now()
+    recebido = agora - timedelta(minutes=10)
+    joao = FakeAttachment("ASO JOAO.pdf", b"%PDF-1.4 joao", expose_data=True)
+    sem_obra = FakeAttachment("ASO MARIA.pdf", b"%PDF-1.4 maria", expose_data=True)
+    msgs = [
+        FakeMailItem("A", "ASO ADMISSIONAL - 123 - 01/02/2025", recebido, [joao]),
+        # Aceito pelo prefixo do arquivo, mas nao pela regex do main (sem numero da obra).
+        FakeMailItem("B", "ASO ADMISSIONAL MARIA", recebido, [sem_obra]),
+    ]
+    namespace, inbox = build_mailbox(msgs)
+    monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+    monkeypatch.setattr(main, "salvar_paginas_individualmente", lambda *_a, **_k: {"pages": 1, "failed_pages": []})
+    monkeypatch.setattr(main, "run_from_main", lambda *_args, **_kwargs: {"sucessos": [], "erros": []})
+    monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+
+    main.captar_emails(limit=10, execution_id="adm-1", started_at=agora, manifest=main._novo_manifest("adm-1", agora))
+    # Proxima execucao: A fica atras da marca d'agua e C repete o conteudo de A (pre-filtro).
+    copia = FakeAttachment("ASO JOAO copia.pdf", b"%PDF-1.4 joao", expose_data=True)
+    inbox._messages.append(FakeMailItem("C", "ASO ADMISSIONAL - 123 - 01/02/2025", agora - timedelta(minutes=1), [copia]))
+    manifest = main._novo_manifest("adm-2", agora)
+    main.captar_emails(limit=10, execution_id="adm-2", started_at=agora, manifest=manifest)
+
+    pasta = dest / recebido.strftime("%Y-%m-%d")
+    assert sorted(p.name for p in pasta.iterdir()) == ["ASO JOAO.pdf"]
+    assert (joao.saves, sem_obra.saves, copia.saves) == (0, 0, 0)
+    assert manifest["sync"]["skipped_attachment_prefilter"] == 1
+    assert manifest.get("admissional", {}).get("saved", 0) == 0
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from attachment_index import AttachmentIndex, attachment_bytes, attachment_data, attachment_fingerprint
+from outlook_fakes import FakeAttachment, FakePropertyAccessor
+
+
+def test_fingerprint_forte_pelo_hash_dos_dados_e_fraca_sem_property_accessor():
+    a = attachment_fingerprint(FakeAttachment("ASO.pdf", b"conteudo", expose_data=True))
+    b = attachment_fingerprint(FakeAttachment("outro nome.pdf", b"conteudo", expose_data=True))
+    assert a.strong and a.key.startswith("sha256:")
+    assert a.key == b.key
+
+    fraca = attachment_fingerprint(FakeAttachment("ASO.pdf", b"conteudo", size=5000))
+    assert not fraca.strong
+    assert fraca.key == "meta:aso.pdf|5000"
+
+
+def test_fingerprint_usa_content_id_quando_dados_indisponiveis():
+    att = FakeAttachment("ASO.pdf", b"x", size=9000)
+    att.PropertyAccessor = FakePropertyAccessor({"http://schemas.microsoft.com/mapi/proptag/0x3712001F": "cid-123"})
+    fp = attachment_fingerprint(att)
+    assert fp.strong and fp.key == "cid:cid-123|aso.pdf|9000"
+    assert att.PropertyAccessor.reads == 2
+
+    # Binario ja recusado em attachment_data: nao e pedido de novo.
+    assert attachment_data(att) is None
+    assert attachment_fingerprint(att, read_data=False).key == fp.key
+    assert att.PropertyAccessor.reads == 4
+
+
+def test_bytes_do_anexo_via_property_accessor_ou_temporario_local(tmp_path):
+    com_dados = FakeAttachment("ASO.pdf", b"conteudo", expose_data=True)
+    assert attachment_bytes(com_dados, str(tmp_path)) == b"conteudo"
+    assert com_dados.saves == 0
+
+    sem_dados = FakeAttachment("ASO.pdf", b"salvo")
+    assert attachment_bytes(sem_dados, str(tmp_path)) == b"salvo"
+    assert sem_dados.saves == 1
+    assert list(tmp_path.iterdir()) == []
+
+    fp = attachment_fingerprint(sem_dados, data=b"conteudo")
+    assert fp.strong and fp.key == attachment_fingerprint(com_dados).key
+
+
+def test_indice_de_anexos_persiste(tmp_path):
+    path = tmp_path / "attachment_index.json"
+    index = AttachmentIndex(str(path))
+    index.add("sha256:abc", obra="1")
+    index.save()
+    assert "sha256:abc" in AttachmentIndex(str(path))
+    assert "sha256:def" not in AttachmentIndex(str(path))
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import json
+import os
+
+import auth_state
+from auth_state import AuthStateStore
+
+
+ESTADO = {"cookies": [{"name": "KEYCLOAK_SESSION", "value": "abc"}], "origins": []}
+
+
+def test_storage_state_salvo_e_relido(tmp_path, monkeypatch):
+    monkeypatch.setattr(auth_state, "win32crypt", None)
+    store = AuthStateStore(str(tmp_path / "state.json"), allow_plaintext=True)
+    assert store.load() is None
+
+    assert store.save(ESTADO)
+    assert AuthStateStore(str(tmp_path / "state.json"), allow_plaintext=True).load() == ESTADO
+    if os.name == "posix":
+        assert (tmp_path / "state.json").stat().st_mode & 0o077 == 0
+
+
+def test_storage_state_expirado_ou_ilegivel_e_apagado(tmp_path, monkeypatch):
+    monkeypatch.setattr(auth_state, "win32crypt", None)
+    agora = [1000.0]
+    path = tmp_path / "state.json"
+    store = AuthStateStore(str(path), max_age_h=1, clock=lambda: agora[0], allow_plaintext=True)
+    store.save(ESTADO)
+
+    agora[0] += 2 * 3600
+    assert store.load() is None
+    assert not path.exists()
+
+    path.write_text(json.dumps({"version": 1, "saved_at": agora[0], "protection": "dpapi", "state": "xx"}))
+    assert store.load() is None
+    assert not path.exists()
+
+
+def test_sem_dpapi_texto_puro_so_com_opt_in(tmp_path, monkeypatch):
+    monkeypatch.setattr(auth_state, "win32crypt", None)
+    path = tmp_path / "state.json"
+    avisos = []
+    store = AuthStateStore(str(path), log_fn=avisos.append)
+
+    assert store.save(ESTADO) is False
+    assert store.save(ESTADO) is False
+    assert not path.exists() and store.saves == 0
+    assert len(avisos) == 1 and "NAO sera salva" in avisos[0]
+
+    # Estado em texto puro deixado por uma configuracao anterior nao e usado sem o opt-in.
+    AuthStateStore(str(path), allow_plaintext=True).save(ESTADO)
+    assert store.load() is None
+    assert not path.exists()
+
+
+def test_storage_state_cifrado_com_dpapi(tmp_path, monkeypatch):
+    class _FakeDpapi:
+        @staticmethod
+        def CryptProtectData(dados, _desc, *_args):
+            return bytes(reversed(dados))
+
+        @staticmethod
+        def CryptUnprotectData(blob, *_args):
+            return "desc", bytes(reversed(blob))
+
+    monkeypatch.setattr(auth_state, "win32crypt", _FakeDpapi)
+    path = tmp_path / "state.json"
+    store = AuthStateStore(str(path))
+    store.save(ESTADO)
+
+    salvo = json.loads(path.read_text())
+    assert salvo["protection"] == "dpapi"
+    assert "KEYCLOAK_SESSION" not in path.read_text()
+    assert store.load() == ESTADO
+
+
+def test_taxa_de_reaproveitamento(tmp_path):
+    store = AuthStateStore(str(tmp_path / "state.json"))
+    assert store.as_dict()["hit_rate"] is None
+    store.hits, store.misses, store.absent = 3, 1, 0
+    assert store.as_dict()["hit_rate"] == 0.75
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import time
+
+from blob_store import BlobStore, StreamHasher, link_into, sha256_file
+from gdrive_http import stream_to_file
+
+
+class _Resposta(io.BytesIO):
+    headers = {}
+
+
+def _sha(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_ingest_guarda_por_sha256_e_liga_copias_repetidas_ao_blob(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"), buffer_size=8)
+    obra_1 = tmp_path / "Obra_1" / "temp_1.pdf"
+    obra_2 = tmp_path / "Obra_2" / "temp_9.pdf"
+    for p in (obra_1, obra_2):
+        p.parent.mkdir()
+        p.write_bytes(b"%PDF-1.4 mesmo conteudo")
+
+    digest, blob, novo = store.ingest(str(obra_1))
+    assert novo and digest == _sha(b"%PDF-1.4 mesmo conteudo")
+    assert blob == str(tmp_path / "blobs" / digest[:2] / f"{digest}.pdf")
+    assert os.path.samefile(blob, obra_1)
+
+    assert store.ingest(str(obra_2)) == (digest, blob, False)
+    # Copia repetida na obra passa a ser o mesmo inode do blob.
+    assert os.path.samefile(blob, obra_2)
+    assert store.as_dict() == {"stored": 1, "reused": 1, "hashed_on_write": 0, "rehashed_bytes": 2 * len(b"%PDF-1.4 mesmo conteudo"), "indexed": 1}
+
+    # Temporario removido apos o OCR: o blob continua.
+    obra_1.unlink()
+    obra_2.unlink()
+    assert sha256_file(blob) == digest
+
+
+def test_hash_calculado_no_stream_evita_releitura(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    hasher = StreamHasher()
+    destino = tmp_path / "drive.pdf"
+    stream_to_file(_Resposta(b"%PDF-1.4 drive" * 100), str(destino), hasher=hasher)
+    store.remember(str(destino), hasher.hexdigest())
+
+    digest, _blob, novo = store.ingest(str(destino))
+
+    assert novo and digest == _sha(b"%PDF-1.4 drive" * 100)
+    assert store.as_dict()["hashed_on_write"] == 1 and store.as_dict()["rehashed_bytes"] == 0
+
+
+def test_prune_so_remove_blob_velho_sem_referencia(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    solto, ligado = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    solto.write_bytes(b"a")
+    ligado.write_bytes(b"b")
+    blob_solto = store.ingest(str(solto))[1]
+    blob_ligado = store.ingest(str(ligado))[1]
+    solto.unlink()
+    velho = time.time() - 40 * 86400
+    for blob in (blob_solto, blob_ligado):
+        os.utime(blob, (velho, velho))
+
+    assert store.prune(30) == 1
+    assert not os.path.exists(blob_solto) and os.path.exists(blob_ligado)
+
+
+def test_link_into_substitui_destino_existente(tmp_path):
+    origem, destino = tmp_path / "o.pdf", tmp_path / "d.pdf"
+    origem.write_bytes(b"novo")
+    destino.write_bytes(b"antigo")
+
+    assert link_into(str(origem), str(destino)) == "link"
+    assert destino.read_bytes() == b"novo" and os.path.samefile(origem, destino)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["d.pdf", "o.pdf"]
+
+
+def test_indice_de_processados_sobrevive_a_execucao_e_ao_prune(tmp_path):
+    index = tmp_path / "json" / "blob_index.json"
+    store = BlobStore(str(tmp_path / "blobs"), str(index))
+    anexo = tmp_path / "temp_1.pdf"
+    anexo.write_bytes(b"%PDF-1.4 processado")
+    digest, blob, _novo = store.ingest(str(anexo))
+    assert store.lookup(digest) == blob and not store.is_processed(digest)
+    store.mark_processed(digest, obra="123")
+    # Anexo lido em memoria: so o digest, sem blob.
+    store.mark_processed(_sha(b"em memoria"))
+    store.save()
+    anexo.unlink()
+    velho = time.time() - 40 * 86400
+    os.utime(blob, (velho, velho))
+
+    proxima = BlobStore(str(tmp_path / "blobs"), str(index))
+    assert proxima.prune(30) == 1
+    assert proxima.lookup(digest) is None
+    assert proxima.is_processed(digest) and proxima.is_processed(_sha(b"em memoria"))
+    assert len(proxima) == 2
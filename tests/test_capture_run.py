@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+from blob_store import BlobStore
+from capture_run import CaptureRun
+from sync_state import SyncState
+
+
+def _run(**kwargs):
+    hoje = datetime(2025, 2, 1)
+    stats = {"skipped_synced": 0, "erros": [], "run_budget_exceeded": False, "tempo_total": ""}
+    return CaptureRun(stats, hoje, hoje - timedelta(days=1), hoje + timedelta(days=1), **kwargs)
+
+
+def test_stats_parcial_e_mesclar_somam_contadores_e_listas_de_varias_threads():
+    ctx = _run()
+    parcial = ctx.stats_parcial()
+    assert parcial == {"skipped_synced": 0, "erros": []}
+
+    def _worker():
+        p = ctx.stats_parcial()
+        p["skipped_synced"] += 1
+        p["erros"].append("x")
+        ctx.mesclar_stats(p)
+
+    threads = [threading.Thread(target=_worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert ctx.stats["skipped_synced"] == 8
+    assert ctx.stats["erros"] == ["x"] * 8
+
+
+def test_hash_novo_deduplica_na_execucao_e_entre_execucoes_pelo_indice_do_store(tmp_path):
+    pdf = tmp_path / "temp_1.pdf"
+    pdf.write_bytes(b"%PDF-1.4 anexo")
+    digest = hashlib.sha256(b"%PDF-1.4 anexo").hexdigest()
+    store = BlobStore(str(tmp_path / "blobs"), index_path=str(tmp_path / "blob_index.json"))
+
+    ctx = _run()
+    ctx.blob_store = store
+    assert ctx.hash_novo(str(pdf)) == digest
+    assert ctx.hash_novo(str(pdf)) is None
+    store.mark_processed(digest, obra="123")
+    store.save()
+
+    # Proxima execucao: mesmo conteudo (em memoria) ja processado pelo indice persistente.
+    seguinte = _run()
+    seguinte.blob_store = BlobStore(str(tmp_path / "blobs"), index_path=str(tmp_path / "blob_index.json"))
+    assert seguinte.hash_novo(None, dados=b"%PDF-1.4 anexo") is None
+    reprocesso = _run(reprocess=True)
+    reprocesso.blob_store = seguinte.blob_store
+    assert reprocesso.hash_novo(None, dados=b"%PDF-1.4 anexo") == digest
+
+
+def test_hash_novo_sem_store_usa_sha256_do_arquivo(tmp_path):
+    pdf = tmp_path / "temp_1.pdf"
+    pdf.write_bytes(b"%PDF-1.4 sem store")
+    assert _run().hash_novo(str(pdf)) == hashlib.sha256(b"%PDF-1.4 sem store").hexdigest()
+
+
+def test_reservar_pasta_so_aceita_a_primeira_caixa():
+    ctx = _run()
+    assert ctx.reservar_pasta("store|Inbox")
+    assert not ctx.reservar_pasta("store|Inbox")
+    assert ctx.reservar_pasta("outro|Inbox")
+
+
+def test_concluir_sync_nao_avanca_marca_alem_de_email_com_falha(tmp_path):
+    ctx = _run()
+    ctx.sync_state = SyncState(str(tmp_path / "sync.json"))
+    t0 = datetime(2025, 2, 1, 8)
+
+    ctx.concluir_sync({"sync_key": "a", "sync_msg": (t0, "E1")})
+    ctx.concluir_sync({"sync_key": "a", "sync_msg": (t0 + timedelta(minutes=1), "E2"), "falhou": True})
+    ctx.concluir_sync({"sync_key": "a", "sync_msg": (t0 + timedelta(minutes=2), "E3")})
+    # Anexo recusado pelo orcamento tambem segura a marca, mas so da propria pasta.
+    ctx.concluir_sync({"sync_key": "b", "sync_msg": (t0, "F1"), "nao_aceitos": 1})
+    ctx.concluir_sync({"sync_key": "c", "sync_msg": (t0, "G1")})
+    # RPA com erro ou paginas com falha: o email volta na proxima execucao.
+    ctx.concluir_sync({"sync_key": "d", "sync_msg": (t0, "H1"), "reler": True})
+
+    assert ctx.sync_state.watermark("a")[0] == t0
+    assert ctx.sync_state.watermark("b")[0] is None
+    assert ctx.sync_state.watermark("c")[0] == t0
+    assert ctx.sync_state.watermark("d")[0] is None
+
+
+def test_orcamento_estourado_marca_stats_e_avisa_uma_vez():
+    class _Budget:
+        seconds = 10
+
+        def expired(self):
+            return True
+
+        def elapsed(self):
+            return 11.0
+
+    avisos = []
+    ctx = _run(run_budget=_Budget(), log_fn=lambda msg, **_k: avisos.append(msg))
+    assert ctx.orcamento_estourado() and ctx.orcamento_estourado()
+    assert ctx.stats["run_budget_exceeded"] is True
+    assert len(avisos) == 1
+    assert not _run().orcamento_estourado()
+
+
+def test_estagio_processar_anexo_roda_sem_outlook_e_deduplica_pelo_estado(load_main, monkeypatch, tmp_path):
+    main = load_main(env={"ASO_EMAIL_ACCOUNT": "aso@enesa.com.br", "ASO_MAILBOX_NAME": "Aso"})
+    chamadas = []
+
+    def _fake_salvar(pdf_path, pasta, obra, lista_novos_arquivos=None, stats=None, **_k):
+        chamadas.append(pdf_path)
+        stats["total_detected"] += 1
+        lista_novos_arquivos.append(str(tmp_path / f"ASO {obra}.pdf"))
+        return {"pages": 1, "failed_pages": []}
+
+    monkeypatch.setattr(main, "salvar_paginas_individualmente", _fake_salvar)
+    ctx = _run(manifest_items=[])
+    ctx.stats["total_detected"] = 0
+    ctx.blob_store = BlobStore(str(tmp_path / "blobs"), index_path=str(tmp_path / "blob_index.json"))
+    email = {"pasta_data": str(tmp_path), "numero_obra": "123"}
+
+    saidas, tarefas = [], []
+    for idx in (1, 2):
+        temp_pdf = tmp_path / f"temp_{idx}.pdf"
+        temp_pdf.write_bytes(b"%PDF-1.4 mesmo anexo")
+        tarefa = {"tipo": "pdf", "idx": idx, "chave": f"pdf:{idx}:a.pdf", "temp_pdf": str(temp_pdf), "pendentes": None, "impressao": None}
+        tarefas.append(tarefa)
+        saidas.append(main._processar_anexo(ctx, email, tarefa))
+        assert not temp_pdf.exists()
+
+    assert len(chamadas) == 1
+    assert saidas[0]["stats"]["total_detected"] == 1 and saidas[0]["arquivos"]
+    assert saidas[1]["resumo"] == {"failed_pages": [], "duplicate": True}
+    # Conteudo so e marcado como processado depois do RPA.
+    digest = hashlib.sha256(b"%PDF-1.4 mesmo anexo").hexdigest()
+    assert saidas[0]["hash"] == digest
+    assert not ctx.blob_store.is_processed(digest)
+    main._marcar_concluidos(ctx, email, [(tarefas[0], saidas[0], None)])
+    assert ctx.blob_store.is_processed(digest)
+
+
+def test_link_do_drive_so_fica_processado_no_cache_apos_rpa_sem_erro(load_main, monkeypatch, tmp_path):
+    import os
+
+    from gdrive_cache import GDriveCache
+
+    main = load_main(env={"ASO_EMAIL_ACCOUNT": "aso@enesa.com.br", "ASO_MAILBOX_NAME": "Aso"})
+
+    def _fake_salvar(_pdf, _pasta, obra, lista_novos_arquivos=None, **_k):
+        lista_novos_arquivos.append(f"ASO {obra}.pdf")
+        return {"pages": 1, "failed_pages": []}
+
+    class _Pronto:
+        def __init__(self, caminho):
+            self._caminho = caminho
+
+        def result(self):
+            return self._caminho
+
+    monkeypatch.setattr(main, "salvar_paginas_individualmente", _fake_salvar)
+    ctx = _run(manifest_items=[])
+    for chave in ("total_detected", "error", "success", "skipped_yube", "total_processed"):
+        ctx.stats[chave] = 0
+    ctx.stats.update(sucessos=[], skipped_items=[])
+    ctx.blob_store = BlobStore(str(tmp_path / "blobs"), index_path=str(tmp_path / "blob_index.json"))
+    ctx.gdrive_cache = GDriveCache(str(tmp_path / "gdrive_cache.json"), ctx.blob_store)
+    origem = tmp_path / "download.pdf"
+    origem.write_bytes(b"%PDF-1.4 drive")
+    entrada = ctx.gdrive_cache.store("gid1", str(origem), "ASOS ENESA.pdf")
+
+    def _rodar(stats_rpa):
+        monkeypatch.setattr(main, "run_from_main", lambda *_a, **_k: stats_rpa)
+        temp_pdf = tmp_path / "ASOS ENESA.pdf"
+        os.link(entrada["blob"], temp_pdf)
+        tarefa = {"tipo": "gdrive", "idx": 1, "gid": "gid1", "chave": "gdrive:gid1", "pendentes": None, "download": _Pronto(str(temp_pdf))}
+        email = {
+            "pasta_data": str(tmp_path), "numero_obra": "123", "gdrive_ids": ["gid1"], "rpa": True,
+            "resultado_anexos": {}, "recebido": datetime(2025, 2, 1), "nao_aceitos": 0,
+        }
+        saida = main._processar_anexo(ctx, email, tarefa)
+        ctx._anexos_processados.clear()
+        main._finalizar_email(ctx, email, [(tarefa, saida, None)])
+        return email
+
+    email = _rodar({"sucessos": [], "erros": [{"arquivo": "ASO 123.pdf", "erro": "timeout"}]})
+    assert email.get("reler")
+    assert not ctx.gdrive_ja_processado(ctx.gdrive_cache.get("gid1"))
+
+    _rodar({"sucessos": ["ASO 123.pdf"], "erros": []})
+    assert ctx.gdrive_ja_processado(ctx.gdrive_cache.get("gid1"))
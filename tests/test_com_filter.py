@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import threading
+
+from com_filter import BackoffSchedule, RejectionStats
+
+
+def test_backoff_fixo_mantem_o_ciclo_historico():
+    schedule = BackoffSchedule()
+    assert [schedule.next_delay() for _ in range(5)] == [250, 500, 1000, 2000, 250]
+
+
+def test_backoff_adaptativo_sobe_com_rajada_e_volta_na_calmaria():
+    agora = [0.0]
+    schedule = BackoffSchedule(adaptive=True, window_sec=10, clock=lambda: agora[0])
+    rajada = []
+    for _ in range(6):
+        rajada.append(schedule.next_delay())
+        agora[0] += 0.5
+    assert rajada == [250, 500, 1000, 2000, 2000, 2000]
+
+    agora[0] += 30
+    assert schedule.next_delay() == 250
+
+
+def test_rejection_stats_soma_por_thread_e_guarda_maior_espera():
+    stats = RejectionStats()
+    stats.record(250, 0, thread_name="aso-com-1")
+    stats.record(500, 250, thread_name="aso-com-1")
+    stats.record(-1, 61000, thread_name="aso-com-2")
+
+    assert stats.for_thread("aso-com-1") == {
+        "rejections": 2, "retries": 2, "cancelled": 0, "backoff_ms": 750, "max_delay_ms": 500, "max_wait_ms": 750,
+    }
+    assert stats.as_dict() == {
+        "rejections": 3, "retries": 2, "cancelled": 1, "backoff_ms": 750, "max_delay_ms": 500, "max_wait_ms": 61000,
+    }
+    stats.record(1000, 0)
+    assert stats.for_thread(threading.current_thread().name)["retries"] == 1
+    stats.reset()
+    assert stats.as_dict()["rejections"] == 0
+
+
+def test_message_filter_registra_rejeicoes_e_cancela_pelo_tempo_da_chamada(load_main):
+    main = load_main()
+    stats = RejectionStats()
+    filtro = main.MessageFilter(max_wait_sec=1, stats=stats)
+
+    assert filtro.RetryRejectedCall(None, 2, 0) == 250
+    assert filtro.RetryRejectedCall(None, 2, 300) == 500
+    assert filtro.RetryRejectedCall(None, 2, 1500) == -1
+    assert filtro.RetryRejectedCall(None, 1, 0) == -1  # SERVERCALL_REJECTED: nao insiste
+
+    total = stats.as_dict()
+    assert (total["rejections"], total["retries"], total["cancelled"]) == (4, 2, 2)
+    assert total["backoff_ms"] == 750 and total["max_wait_ms"] == 1500
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import json
+
+from folder_cache import FolderCache, mailbox_key
+from outlook_fakes import build_mailbox
+
+
+def test_cache_abre_pasta_por_entry_id_e_esquece_id_invalido(tmp_path):
+    path = tmp_path / "json" / "folder_cache.json"
+    key = mailbox_key("aso@enesa.com.br", "Aso")
+    namespace, inbox = build_mailbox([])
+
+    cache = FolderCache(str(path))
+    assert cache.open(namespace, key) is None
+    cache.remember(key, inbox)
+    cache.save()
+
+    recarregado = FolderCache(str(path))
+    assert recarregado.open(namespace, key) is inbox
+    assert namespace.folder_lookups == [("FOLDER-INBOX", "STORE-1")]
+
+    inbox.EntryID = "MOVIDA"
+    logs = []
+    assert recarregado.open(namespace, key, log_fn=logs.append) is None
+    assert logs and recarregado.get(key) is None
+    recarregado.save()
+    assert json.loads(path.read_text(encoding="utf-8"))["folders"] == {}
+
+
+def test_cache_corrompido_recomeca_vazio(tmp_path):
+    path = tmp_path / "folder_cache.json"
+    path.write_text("{nao e json", encoding="utf-8")
+    assert FolderCache(str(path)).get(mailbox_key("x")) is None
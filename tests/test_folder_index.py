@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import json
+
+from folder_index import FolderIndex, find_folder
+
+
+class _Colecao:
+    def __init__(self, itens, chamadas):
+        self._itens = itens
+        self._chamadas = chamadas
+
+    @property
+    def Count(self):
+        self._chamadas.append("Count")
+        return len(self._itens)
+
+    def Item(self, i):
+        self._chamadas.append("Item")
+        return self._itens[i - 1]
+
+
+class _Pasta:
+    def __init__(self, name, store_id, chamadas, filhos=(), itens=0):
+        self.Name = name
+        self.StoreID = store_id
+        self.EntryID = f"{store_id}:{name}"
+        self.FolderPath = f"\\\\{store_id}\\{name}"
+        self._filhos = list(filhos)
+        self._chamadas = chamadas
+        self._itens = itens
+
+    @property
+    def Folders(self):
+        return _Colecao(self._filhos, self._chamadas)
+
+    @property
+    def Items(self):
+        return _Colecao([None] * self._itens, self._chamadas)
+
+
+class _Store:
+    def __init__(self, root):
+        self._root = root
+
+    def GetRootFolder(self):
+        return self._root
+
+
+class _Namespace:
+    def __init__(self, roots, chamadas):
+        self._roots = roots
+        self._chamadas = chamadas
+        self.abertas = []
+
+    @property
+    def Folders(self):
+        return _Colecao(self._roots, self._chamadas)
+
+    @property
+    def Stores(self):
+        return _Colecao([_Store(r) for r in self._roots], self._chamadas)
+
+    def GetFolderFromID(self, entry_id, store_id=None):
+        self.abertas.append(entry_id)
+        pendentes = list(self._roots)
+        while pendentes:
+            pasta = pendentes.pop()
+            if pasta.EntryID == entry_id and pasta.StoreID == store_id:
+                return pasta
+            pendentes.extend(pasta._filhos)
+        raise KeyError(entry_id)
+
+
+def _arvore(chamadas):
+    aso_fundo = _Pasta("Aso antigo", "S1", chamadas)
+    s1 = _Pasta("Compartilhada", "S1", chamadas, [
+        _Pasta("Arquivo", "S1", chamadas, [_Pasta("2024", "S1", chamadas, [aso_fundo])]),
+        _Pasta("ASO", "S1", chamadas, itens=7),
+    ])
+    s2 = _Pasta("Outra", "S2", chamadas, [_Pasta("Caixa de Entrada", "S2", chamadas)])
+    return [s1, s2]
+
+
+def test_indice_em_largura_persistido_e_consultado_sem_varrer(tmp_path):
+    path = tmp_path / "json" / "folder_index.json"
+    chamadas = []
+    namespace = _Namespace(_arvore(chamadas), chamadas)
+
+    indice = FolderIndex(str(path))
+    pasta = find_folder(namespace, indice, ["Aso"], max_depth=6)
+    indice.save()
+
+    # Largura: "ASO" (profundidade 1) vence "Aso antigo" (profundidade 3).
+    assert pasta.EntryID == "S1:ASO"
+    assert indice.scanned_roots == 2
+    salvo = json.loads(path.read_text(encoding="utf-8"))
+    registros = {f["name"]: f for raiz in salvo["roots"].values() for f in raiz["folders"]}
+    assert registros["ASO"]["item_count"] == 7 and registros["ASO"]["store_id"] == "S1"
+
+    chamadas.clear()
+    recarregado = FolderIndex(str(path))
+    assert find_folder(namespace, recarregado, ["aso"], max_depth=6).EntryID == "S1:ASO"
+    assert recarregado.scanned_roots == 0
+    # So a listagem das raizes (Folders/Stores): nenhuma subpasta percorrida.
+    assert len(chamadas) <= 6
+
+
+def test_entry_id_que_nao_abre_reindexa_so_a_raiz(tmp_path):
+    chamadas = []
+    roots = _arvore(chamadas)
+    namespace = _Namespace(roots, chamadas)
+    indice = FolderIndex(str(tmp_path / "idx.json"))
+    indice.refresh(namespace, max_depth=6)
+
+    # Pasta movida: EntryID antigo nao abre mais.
+    aso = roots[0]._filhos[1]
+    aso.EntryID = "S1:ASO-movida"
+    indice.scanned_roots = 0
+
+    assert find_folder(namespace, indice, ["ASO"], max_depth=6).EntryID == "S1:ASO-movida"
+    assert indice.scanned_roots == 1
+
+
+def test_raiz_nova_ou_mais_profunda_e_indexada_incrementalmente(tmp_path):
+    chamadas = []
+    roots = _arvore(chamadas)
+    namespace = _Namespace(roots[:1], chamadas)
+    indice = FolderIndex(str(tmp_path / "idx.json"))
+    indice.refresh(namespace, max_depth=1)
+    assert not indice.find(["Aso antigo"])
+
+    namespace._roots = roots
+    indice.scanned_roots = 0
+    indice.refresh(namespace, max_depth=1)
+    assert indice.scanned_roots == 1
+    assert [r.name for r in indice.find(["entrada"])] == ["Caixa de Entrada"]
+
+    indice.refresh(namespace, max_depth=6)
+    assert [r.name for r in indice.find(["Aso antigo"])] == ["Aso antigo"]
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+from blob_store import BlobStore
+from gdrive_cache import GDriveCache
+
+
+def test_cache_guarda_no_store_por_sha256_e_recarrega(tmp_path):
+    path = tmp_path / "json" / "gdrive_cache.json"
+    store = BlobStore(str(tmp_path / "blobs"))
+    origem = tmp_path / "ASOS ENESA 1.pdf"
+    origem.write_bytes(b"%PDF-1.4 lote")
+
+    cache = GDriveCache(str(path), store, ttl_sec=3600)
+    assert cache.get("id1") is None
+    entry = cache.store("id1", str(origem), "ASOS ENESA 1.pdf", etag='"v1"', last_modified="Mon, 05 Jan 2026 10:00:00 GMT")
+    # Mesmo conteudo com outro id compartilha o blob; o download vira hardlink dele (sem copia).
+    assert cache.store("id2", str(origem), "ASOS ENESA 1.pdf")["blob"] == entry["blob"]
+    assert os.path.samefile(entry["blob"], origem)
+    assert entry["sha256"] == hashlib.sha256(b"%PDF-1.4 lote").hexdigest() and entry["size"] == len(b"%PDF-1.4 lote")
+    assert GDriveCache.validators(entry) == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 05 Jan 2026 10:00:00 GMT"}
+    assert not GDriveCache.is_processed(entry)
+    cache.mark_processed("id1", "outro-sha")
+    cache.mark_processed("id1", entry["sha256"])
+    cache.save()
+
+    recarregado = GDriveCache(str(path), store, ttl_sec=3600)
+    atual = recarregado.get("id1")
+    assert GDriveCache.is_processed(atual)
+    assert recarregado.is_fresh(atual)
+    assert not recarregado.is_fresh(atual, now=datetime.now() + timedelta(hours=2))
+
+    os.remove(entry["blob"])
+    assert recarregado.get("id1") is None
+
+
+def test_conteudo_novo_no_mesmo_id_perde_marca_de_processado(tmp_path):
+    cache = GDriveCache(str(tmp_path / "c.json"), BlobStore(str(tmp_path / "blobs")))
+    origem = tmp_path / "a.pdf"
+    origem.write_bytes(b"v1")
+    sha_v1 = cache.store("id", str(origem), "a.pdf")["sha256"]
+    cache.mark_processed("id", sha_v1)
+
+    # Novo download: arquivo novo (nao reescreve o blob ligado ao anterior).
+    origem.unlink()
+    origem.write_bytes(b"v2")
+    entry = cache.store("id", str(origem), "a.pdf")
+
+    assert entry["processed_sha256"] == sha_v1
+    assert not GDriveCache.is_processed(entry)
+
+
+def test_cache_md5_da_versao_anterior_e_descartado(tmp_path):
+    from atomic_io import write_json_atomic
+
+    path = tmp_path / "c.json"
+    write_json_atomic(str(path), {"version": 1, "files": {"id": {"md5": "x", "blob": str(tmp_path / "x.pdf")}}})
+
+    assert len(GDriveCache(str(path), BlobStore(str(tmp_path / "blobs")))) == 0
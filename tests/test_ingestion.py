@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import format_datetime
+from pathlib import Path
+
+from ingestion import DirectorySource
+
+# Acima de ASO_ATTACH_MIN_BYTES: o pre-filtro de anexos usa o tamanho real do arquivo.
+PAD = b"0" * 4096
+
+
+def _escrever_eml(path, assunto, recebido, corpo, anexos=(), message_id=None):
+    msg = EmailMessage()
+    msg["Subject"] = assunto
+    msg["Date"] = format_datetime(recebido.astimezone())
+    if message_id:
+        msg["Message-ID"] = message_id
+    msg.set_content(corpo)
+    for nome, dados in anexos:
+        msg.add_attachment(dados, maintype="application", subtype="pdf", filename=nome)
+    Path(path).write_bytes(bytes(msg))
+
+
+def _montar_pasta(base, agora):
+    _escrever_eml(
+        base / "a.eml",
+        "ASO ADMISSIONAL - 123 - 01/02/2025",
+        agora - timedelta(minutes=5),
+        "https://drive.google.com/file/d/ABCdef12345/view",
+        anexos=[("joao.pdf", b"%PDF-1.4 a" + PAD)],
+        message_id="<a@enesa>",
+    )
+    (base / "Obra_77" / "2026-01-01").mkdir(parents=True)
+    (base / "Obra_77" / "x.pdf").write_bytes(b"%PDF-1.4 x" + PAD)
+    # Saida do proprio robo (subpasta de data) nao e reingerida.
+    (base / "Obra_77" / "2026-01-01" / "out.pdf").write_bytes(b"%PDF-1.4 y" + PAD)
+    (base / "notas.txt").write_text("ignorar")
+    antigo = (agora - timedelta(hours=1)).timestamp()
+    os.utime(base / "Obra_77" / "x.pdf", (antigo, antigo))
+
+
+def test_directory_source_le_eml_e_pdfs_de_obra(tmp_path):
+    agora = datetime.now()
+    _montar_pasta(tmp_path, agora)
+
+    fonte = DirectorySource(tmp_path)
+    items = fonte.Items
+    items.Sort("[ReceivedTime]", True)
+
+    assert items.Count == 2
+    assert [items.entry(i).entry_id for i in (1, 2)] == ["file:a.eml", "file:Obra_77/x.pdf"]
+
+    mail = items.Item(1)
+    assert mail.Subject == "ASO ADMISSIONAL - 123 - 01/02/2025"
+    assert "drive.google.com" in mail.Body
+    assert abs((mail.ReceivedTime - (agora - timedelta(minutes=5))).total_seconds()) < 1
+    assert mail.PropertyAccessor.GetProperty("http://schemas.microsoft.com/mapi/proptag/0x1035001F") == "<a@enesa>"
+    anexo = mail.Attachments.Item(1)
+    assert anexo.FileName == "joao.pdf"
+    destino = tmp_path / "salvo.pdf"
+    anexo.SaveAsFile(str(destino))
+    assert destino.read_bytes() == b"%PDF-1.4 a" + PAD
+
+    pdf = items.Item(2)
+    assert pdf.Subject == "ASO ADMISSIONAL - 77"
+    assert pdf.Attachments.Item(1).FileName == "x.pdf"
+
+
+def test_directory_source_ignora_msg_sem_extract_msg(tmp_path, monkeypatch):
+    import ingestion
+
+    def _sem_extract_msg(_path):
+        raise ImportError("extract_msg")
+
+    monkeypatch.setattr(ingestion, "_abrir_msg", _sem_extract_msg)
+    (tmp_path / "a.msg").write_bytes(b"x")
+    (tmp_path / "b.msg").write_bytes(b"x")
+    logs = []
+
+    assert DirectorySource(tmp_path, log_fn=logs.append).scan() == []
+    assert len(logs) == 1
+
+
+def test_captar_emails_com_fonte_offline_nao_usa_outlook(load_main, tmp_path, monkeypatch):
+    main = load_main(env={"ASO_DAYS_BACK": "1"})
+    agora = datetime.now()
+    entrada = tmp_path / "entrada"
+    entrada.mkdir()
+    _montar_pasta(entrada, agora)
+
+    def _sem_outlook(*_a, **_k):
+        raise AssertionError("Outlook nao deveria ser aberto")
+
+    monkeypatch.setattr(main, "get_outlook_namespace_robusto", _sem_outlook)
+    processados, downloads = [], []
+
+    def _fake_salvar(pdf_path, _pasta, obra, stats=None, **_k):
+        processados.append((obra, Path(pdf_path).read_bytes()))
+        stats["total_detected"] += 1
+
+    def _fake_download(gid, dest_dir):
+        downloads.append(gid)
+        p = Path(dest_dir) / "drive.pdf"
+        p.write_bytes(b"%PDF-1.4 drive" + PAD)
+        return str(p)
+
+    monkeypatch.setattr(main, "salvar_paginas_individualmente", _fake_salvar)
+    monkeypatch.setattr(main, "download_gdrive_file", _fake_download)
+    monkeypatch.setattr(main, "run_from_main", lambda *_args, **_kwargs: {"sucessos": [], "erros": []})
+    monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+
+    main.captar_emails(limit=10, execution_id="offline-1", started_at=agora, manifest=main._novo_manifest("offline-1", agora), fonte=DirectorySource(entrada))
+
+    assert downloads == ["ABCdef12345"]
+    assert sorted(processados) == sorted([("123", b"%PDF-1.4 a" + PAD), ("123", b"%PDF-1.4 drive" + PAD), ("77", b"%PDF-1.4 x" + PAD)])
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import threading
+
+from mailboxes import Mailbox, parse_mailboxes, scan_mailboxes
+
+
+def test_parse_mailboxes_pareia_contas_e_nomes_por_posicao():
+    assert parse_mailboxes("aso@enesa.com.br", "Aso") == [Mailbox("aso@enesa.com.br", "Aso")]
+    assert parse_mailboxes("a@x.com; b@x.com,A@X.com;", "Aso A;Aso B") == [
+        Mailbox("a@x.com", "Aso A"),
+        Mailbox("b@x.com", "Aso B"),
+        Mailbox("A@X.com", ""),
+    ]
+    assert parse_mailboxes("", "Aso") == [Mailbox("", "Aso")]
+    assert parse_mailboxes("a@x.com;a@x.com", "") == [Mailbox("a@x.com", "")]
+    assert parse_mailboxes("", "") == []
+
+
+def test_scan_mailboxes_usa_uma_thread_por_caixa_e_isola_falhas():
+    caixas = [Mailbox("a@x.com", ""), Mailbox("b@x.com", ""), Mailbox("c@x.com", "")]
+    threads, finalizadas, logs = {}, [], []
+
+    def _scan(caixa):
+        threads[caixa.account] = threading.current_thread().name
+        if caixa.account == "b@x.com":
+            raise RuntimeError("Outlook ocupado")
+        return caixa.account.upper()
+
+    resultados = scan_mailboxes(caixas, _scan, finalize_fn=lambda: finalizadas.append(threading.current_thread().name), log_fn=logs.append)
+
+    assert resultados == ["A@X.COM", None, "C@X.COM"]
+    assert threads == {"a@x.com": "aso-com-1", "b@x.com": "aso-com-2", "c@x.com": "aso-com-3"}
+    assert sorted(finalizadas) == ["aso-com-1", "aso-com-2", "aso-com-3"]
+    assert len(logs) == 1 and "b@x.com" in logs[0]
+
+
+def test_scan_mailboxes_com_uma_caixa_roda_na_thread_atual():
+    atual = threading.current_thread().name
+    assert scan_mailboxes([Mailbox("a@x.com", "")], lambda _c: threading.current_thread().name, finalize_fn=lambda: 1 / 0) == [atual]
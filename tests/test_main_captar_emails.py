@@ -3,6 +3,8 @@ from __future__ import annotations
 from datetime import datetime, timedelta
 from pathlib import Path
 
+import pytest
+
 
 class _FakeAttachment:
     def __init__(self, filename: str, content: bytes):
@@ -262,3 +264,613 @@ def test_captar_emails_accepts_string_datetime_and_nonstandard_mail_class(load_m
     main.captar_emails(limit=10, execution_id="exec-3", started_at=now, manifest=None)
 
     assert len(calls) == 1
+
+
+def test_captar_emails_para_de_aceitar_anexos_quando_orcamento_da_execucao_estoura(load_main, monkeypatch):
+    main = load_main(env={"ASO_EMAIL_ACCOUNT": "aso@enesa.com.br", "ASO_MAILBOX_NAME": "Aso", "ASO_RUN_BUDGET_SEC": "0.0001"})
+
+    now = datetime.now()
+    msg = _FakeMessage("ASO ADMISSIONAL - 123 - 01/02/2025", now, attachments=[_FakeAttachment("a.pdf", b"x")])
+    inbox = _FakeFolder([msg])
+    account = _FakeAccount("aso@enesa.com.br", inbox)
+    namespace = _FakeNamespace(account, inbox)
+
+    monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+    calls = []
+    monkeypatch.setattr(main, "salvar_paginas_individualmente", lambda pdf_path, *_a, **_k: calls.append(pdf_path))
+    monkeypatch.setattr(main, "run_from_main", lambda *_args, **_kwargs: {"sucessos": [], "erros": []})
+    monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+
+    manifest = {"paths": {}, "items": []}
+    stats = main.captar_emails(limit=10, execution_id="exec-4", started_at=now, manifest=manifest)
+
+    assert calls == []
+    assert stats["run_budget_exceeded"] is True
+    assert manifest["run_budget"]["exceeded"] is True
+
+
+class _RestrictableItems(_FakeItems):
+    def __init__(self, items):
+        super().__init__(items)
+        self.filtros = []
+
+    def Restrict(self, filtro):
+        self.filtros.append(filtro)
+        return _FakeItems([m for m in self._items if "ASO ADMISSIONAL" in m.__dict__["Subject"].upper()])
+
+
+class _CountingMessage(_FakeMessage):
+    lidas = 0
+
+    def __getattribute__(self, name):
+        if name == "Subject":
+            _CountingMessage.lidas += 1
+        return object.__getattribute__(self, name)
+
+
+def test_captar_emails_filtra_no_outlook_com_restrict(load_main, monkeypatch):
+    main = load_main(env={"ASO_EMAIL_ACCOUNT": "aso@enesa.com.br", "ASO_MAILBOX_NAME": "Aso"})
+
+    now = datetime.now()
+    ruido = [_CountingMessage(f"Newsletter {n}", now) for n in range(30)]
+    alvo = _FakeMessage("ASO ADMISSIONAL - 123 - 01/02/2025", now, attachments=[_FakeAttachment("a.pdf", b"x")])
+    inbox = _FakeFolder(ruido + [alvo])
+    inbox.Items = _RestrictableItems(ruido + [alvo])
+    account = _FakeAccount("aso@enesa.com.br", inbox)
+    namespace = _FakeNamespace(account, inbox)
+
+    monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+    calls = []
+    monkeypatch.setattr(main, "salvar_paginas_individualmente", lambda pdf_path, *_a, **_k: calls.append(pdf_path))
+    monkeypatch.setattr(main, "run_from_main", lambda *_args, **_kwargs: {"sucessos": [], "erros": []})
+    monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+
+    _CountingMessage.lidas = 0
+    main.captar_emails(limit=500, execution_id="exec-5", started_at=now, manifest=None)
+
+    assert len(calls) == 1
+    assert inbox.Items.filtros and "LIKE '%ASO%ADMISSIONAL%'" in inbox.Items.filtros[0]
+    assert _CountingMessage.lidas == 0
+
+
+def test_captar_emails_usa_table_api_e_abre_so_candidatas(load_main, monkeypatch):
+    from outlook_fakes import ComCounter, FakeAttachment, FakeMailItem, build_mailbox
+
+    main = load_main(env={"ASO_EMAIL_ACCOUNT": "aso@enesa.com.br", "ASO_MAILBOX_NAME": "Aso"})
+
+    now = datetime.now()
+    counter = ComCounter()
+    msgs = [FakeMailItem(f"N{i}", f"Newsletter {i}", now, counter=counter) for i in range(40)]
+    msgs.append(FakeMailItem("ALVO", "ASO ADMISSIONAL - 123 - 01/02/2025", now, [FakeAttachment("a.pdf", b"x")], counter=counter))
+    msgs.append(FakeMailItem("VELHO", "ASO ADMISSIONAL - 9 - 01/02/2025", now - timedelta(days=30), counter=counter))
+    namespace, _inbox = build_mailbox(msgs, counter=counter)
+
+    monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+    calls = []
+    monkeypatch.setattr(main, "salvar_paginas_individualmente", lambda pdf_path, *_a, **_k: calls.append(pdf_path))
+    monkeypatch.setattr(main, "run_from_main", lambda *_args, **_kwargs: {"sucessos": [], "erros": []})
+    monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+
+    main.captar_emails(limit=500, execution_id="exec-6", started_at=now, manifest=None)
+
+    assert len(calls) == 1
+    assert [entry_id for entry_id, _store in namespace.opened] == ["ALVO"]
+    assert counter.calls < 40
+
+
+def test_captar_emails_incremental_pula_emails_ja_sincronizados(load_main, monkeypatch):
+    from outlook_fakes import FakeAttachment, FakeMailItem, build_mailbox
+
+    now = datetime.now()
+    msgs = [
+        FakeMailItem("A", "ASO ADMISSIONAL - 123 - 01/02/2025", now - timedelta(minutes=10), [FakeAttachment("a.pdf", b"a")]),
+        FakeMailItem("B", "ASO ADMISSIONAL - 124 - 01/02/2025", now - timedelta(minutes=5), [FakeAttachment("b.pdf", b"b")]),
+    ]
+
+    def _rodar(env_extra=None):
+        env = {"ASO_EMAIL_ACCOUNT": "aso@enesa.com.br", "ASO_MAILBOX_NAME": "Aso"}
+        env.update(env_extra or {})
+        main = load_main(env=env)
+        namespace, _inbox = build_mailbox(msgs)
+        monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+        calls = []
+        monkeypatch.setattr(main, "salvar_paginas_individualmente", lambda pdf_path, *_a, **_k: calls.append(pdf_path))
+        monkeypatch.setattr(main, "run_from_main", lambda *_args, **_kwargs: {"sucessos": [], "erros": []})
+        monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+        stats = main.captar_emails(limit=50, execution_id="exec-7", started_at=now, manifest=None)
+        return calls, stats
+
+    primeira, _ = _rodar()
+    assert len(primeira) == 2
+
+    segunda, stats = _rodar()
+    assert segunda == []
+    # "A" ja fica fora do filtro (>= marca d'agua); "B" e a fronteira, pulada pelo EntryID.
+    assert stats["skipped_synced"] == 1
+
+    msgs.append(FakeMailItem("C", "ASO ADMISSIONAL - 125 - 01/02/2025", now - timedelta(minutes=1), [FakeAttachment("c.pdf", b"c")]))
+    terceira, _ = _rodar()
+    assert len(terceira) == 1
+
+    # Full rescan reexamina a janela inteira; o indice de mensagens ainda pula os concluidos.
+    completa, stats = _rodar({"ASO_FULL_RESCAN": "1"})
+    assert completa == []
+    assert stats["skipped_message_index"] == 3
+
+    # Sem indice de mensagens, o indice do store de anexos pula o conteudo ja processado.
+    completa, _ = _rodar({"ASO_FULL_RESCAN": "1", "ASO_MESSAGE_INDEX_ENABLE": "0"})
+    assert completa == []
+
+    completa, _ = _rodar({"ASO_FULL_RESCAN": "1", "ASO_MESSAGE_INDEX_ENABLE": "0", "ASO_BLOB_STORE": "0"})
+    assert len(completa) == 3
+
+
+@pytest.mark.parametrize("with_table", [True, False])
+def test_captar_emails_incremental_com_limite_pagina_do_mais_antigo(load_main, monkeypatch, with_table):
+    from outlook_fakes import FakeAttachment, FakeMailItem, build_mailbox
+
+    now = datetime.now()
+    msgs = [
+        FakeMailItem(f"M{n}", f"ASO ADMISSIONAL - {100 + n} - 01/02/2025", now - timedelta(minutes=10 - n), [FakeAttachment(f"{n}.pdf", f"{n}".encode())])
+        for n in range(5)
+    ]
+    obras = []
+
+    def _rodar():
+        main = load_main(env={"ASO_EMAIL_ACCOUNT": "aso@enesa.com.br", "ASO_MAILBOX_NAME": "Aso", "ASO_MESSAGE_INDEX_ENABLE": "0"})
+        namespace, _inbox = build_mailbox(msgs, with_table=with_table)
+        monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+        monkeypatch.setattr(main, "salvar_paginas_individualmente", lambda _pdf, _pasta, obra, **_k: obras.append(obra))
+        monkeypatch.setattr(main, "run_from_main", lambda *_args, **_kwargs: {"sucessos": [], "erros": []})
+        monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+        main.captar_emails(limit=2, execution_id="exec-lim", started_at=now, manifest=None)
+
+    # Cada execucao le as 2 mais antigas acima da marca d'agua: nenhuma fica para tras.
+    for _ in range(3):
+        _rodar()
+    assert obras == ["100", "101", "102", "103", "104"]
+
+
+def test_captar_emails_incremental_truncado_sem_filtro_mantem_marca_dagua(load_main, monkeypatch):
+    from outlook_fakes import FakeAttachment, FakeMailItem, build_mailbox
+
+    now = datetime.now()
+    msgs = [
+        FakeMailItem(f"M{n}", f"ASO ADMISSIONAL - {100 + n} - 01/02/2025", now - timedelta(minutes=10 - n), [FakeAttachment(f"{n}.pdf", f"{n}".encode())])
+        for n in range(3)
+    ]
+    main = load_main(env={"ASO_EMAIL_ACCOUNT": "aso@enesa.com.br", "ASO_MAILBOX_NAME": "Aso", "ASO_OUTLOOK_RESTRICT": "0"})
+    namespace, inbox = build_mailbox(msgs, with_table=False)
+    monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+    monkeypatch.setattr(main, "salvar_paginas_individualmente", lambda *_a, **_k: None)
+    monkeypatch.setattr(main, "run_from_main", lambda *_args, **_kwargs: {"sucessos": [], "erros": []})
+    monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+
+    main.captar_emails(limit=2, execution_id="exec-trunc", started_at=now, manifest=None)
+
+    # M0 ficou de fora do limite e ainda esta na janela: a marca d'agua nao pode passar dele.
+    sync = main.SyncState(main.SYNC_STATE_PATH)
+    assert sync.watermark(main.SyncState.folder_key(inbox.StoreID, inbox.FolderPath)) == (None, set())
+
+
+@pytest.mark.parametrize("falha", ["rpa_erro", "rpa_crash", "paginas"])
+def test_captar_emails_incremental_reprocessa_email_com_falha_na_execucao_seguinte(load_main, monkeypatch, falha):
+    from outlook_fakes import FakeAttachment, FakeMailItem, build_mailbox
+
+    now = datetime.now()
+    msgs = [
+        FakeMailItem("A", "ASO ADMISSIONAL - 123 - 01/02/2025", now - timedelta(minutes=10), [FakeAttachment("a.pdf", b"a")]),
+        FakeMailItem("B", "ASO ADMISSIONAL - 124 - 01/02/2025", now - timedelta(minutes=5), [FakeAttachment("b.pdf", b"b")]),
+    ]
+
+    def _rodar(falhar):
+        main = load_main(env={"ASO_EMAIL_ACCOUNT": "aso@enesa.com.br", "ASO_MAILBOX_NAME": "Aso"})
+        namespace, _inbox = build_mailbox(msgs)
+        monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+        salvos, rpa = [], []
+
+        def _fake_salvar(_pdf, _pasta, obra, lista_novos_arquivos=None, **_k):
+            salvos.append(obra)
+            lista_novos_arquivos.append(f"ASO {obra}.pdf")
+            if falhar and obra == "123" and falha == "paginas":
+                return {"pages": 2, "failed_pages": [2]}
+            return {"pages": 1, "failed_pages": []}
+
+        def _fake_rpa(_pasta, files_to_process=None):
+            rpa.append(list(files_to_process))
+            if falhar and files_to_process == ["ASO 123.pdf"]:
+                if falha == "rpa_crash":
+                    raise RuntimeError("Yube fora do ar")
+                if falha == "rpa_erro":
+                    return {"sucessos": [], "erros": [{"arquivo": "ASO 123.pdf", "erro": "timeout"}]}
+            return {"sucessos": list(files_to_process), "erros": []}
+
+        monkeypatch.setattr(main, "salvar_paginas_individualmente", _fake_salvar)
+        monkeypatch.setattr(main, "run_from_main", _fake_rpa)
+        monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+        stats = main.captar_emails(limit=50, execution_id="exec-falha", started_at=now, manifest=None)
+        return salvos, rpa, stats
+
+    salvos, _rpa, _ = _rodar(True)
+    assert salvos == ["123", "124"]
+
+    # A marca d'agua nao passou de "A": ele volta; "B" (concluido) e pulado pelo indice de mensagens.
+    salvos, rpa, stats = _rodar(False)
+    assert salvos == ["123"]
+    assert rpa == [["ASO 123.pdf"]]
+    assert stats["skipped_synced"] == 0
+    assert stats["skipped_message_index"] == 1
+
+    salvos, rpa, _ = _rodar(False)
+    assert salvos == [] and rpa == []
+
+
+def test_captar_emails_store_de_anexos_so_marca_conteudo_apos_rpa_sem_erro(load_main, monkeypatch):
+    from outlook_fakes import FakeAttachment, FakeMailItem, build_mailbox
+
+    now = datetime.now()
+    msgs = [FakeMailItem("A", "ASO ADMISSIONAL - 123 - 01/02/2025", now - timedelta(minutes=10), [FakeAttachment("a.pdf", b"a")])]
+    env = {
+        "ASO_EMAIL_ACCOUNT": "aso@enesa.com.br",
+        "ASO_MAILBOX_NAME": "Aso",
+        "ASO_INCREMENTAL_SYNC": "0",
+        "ASO_MESSAGE_INDEX_ENABLE": "0",
+    }
+
+    def _rodar(erros):
+        main = load_main(env=env)
+        namespace, _inbox = build_mailbox(msgs)
+        monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+        salvos = []
+
+        def _fake_salvar(_pdf, _pasta, obra, lista_novos_arquivos=None, **_k):
+            salvos.append(obra)
+            lista_novos_arquivos.append(f"ASO {obra}.pdf")
+
+        monkeypatch.setattr(main, "salvar_paginas_individualmente", _fake_salvar)
+        monkeypatch.setattr(main, "run_from_main", lambda *_a, files_to_process=None, **_k: {"sucessos": [], "erros": erros})
+        monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+        main.captar_emails(limit=50, execution_id="exec-blob", started_at=now, manifest=None)
+        return salvos
+
+    # RPA com erro: o conteudo nao entra no indice do store e volta na execucao seguinte.
+    assert _rodar([{"arquivo": "ASO 123.pdf", "erro": "timeout"}]) == ["123"]
+    assert _rodar([]) == ["123"]
+    assert _rodar([]) == []
+
+
+def test_captar_emails_indice_de_mensagens_reentra_so_paginas_com_falha(load_main, monkeypatch):
+    from outlook_fakes import FakeAttachment, FakeMailItem, build_mailbox
+
+    now = datetime.now()
+    msgs = [
+        FakeMailItem(
+            "A",
+            "ASO ADMISSIONAL - 123 - 01/02/2025",
+            now - timedelta(minutes=10),
+            [FakeAttachment("a.pdf", b"a"), FakeAttachment("b.pdf", b"b")],
+        ),
+    ]
+    respostas = {"a.pdf": [{"pages": 3, "failed_pages": [2]}, {"pages": 1, "failed_pages": []}], "b.pdf": [{"pages": 2, "failed_pages": []}]}
+
+    def _rodar():
+        main = load_main(env={"ASO_EMAIL_ACCOUNT": "aso@enesa.com.br", "ASO_MAILBOX_NAME": "Aso", "ASO_INCREMENTAL_SYNC": "0"})
+        namespace, _inbox = build_mailbox(msgs)
+        monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+        calls = []
+        nomes = {"temp_1.pdf": "a.pdf", "temp_2.pdf": "b.pdf"}
+
+        def _fake_salvar(pdf_path, *_a, paginas=None, **_k):
+            nome = nomes[Path(pdf_path).name]
+            calls.append((nome, paginas))
+            return respostas[nome].pop(0)
+
+        monkeypatch.setattr(main, "salvar_paginas_individualmente", _fake_salvar)
+        monkeypatch.setattr(main, "run_from_main", lambda *_args, **_kwargs: {"sucessos": [], "erros": []})
+        monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+        original_save = FakeAttachment.SaveAsFile
+
+        def _save(att, path):
+            calls.append(("save", att.FileName))
+            return original_save(att, path)
+
+        monkeypatch.setattr(FakeAttachment, "SaveAsFile", _save)
+        stats = main.captar_emails(limit=50, execution_id="exec-8", started_at=now, manifest=None)
+        return calls, stats
+
+    primeira, _ = _rodar()
+    assert primeira == [("save", "a.pdf"), ("a.pdf", None), ("save", "b.pdf"), ("b.pdf", None)]
+
+    segunda, stats = _rodar()
+    # b.pdf ja concluido: nem SaveAsFile.
+    assert segunda == [("save", "a.pdf"), ("a.pdf", {2})]
+    assert stats["reentered_pages"] == 1
+
+    terceira, stats = _rodar()
+    assert terceira == []
+    assert stats["skipped_message_index"] == 1
+
+
+def test_captar_emails_pre_filtro_de_anexos_evita_save_as_file(load_main, monkeypatch):
+    from outlook_fakes import FakeAttachment, FakeMailItem, build_mailbox
+
+    main = load_main(env={"ASO_EMAIL_ACCOUNT": "aso@enesa.com.br", "ASO_MAILBOX_NAME": "Aso", "ASO_ATTACH_MIN_BYTES": "1024"})
+
+    now = datetime.now()
+    original = FakeAttachment("a.pdf", b"mesmo-conteudo", expose_data=True)
+    encaminhado = FakeAttachment("a (1).pdf", b"mesmo-conteudo", expose_data=True)
+    minusculo = FakeAttachment("vazio.pdf", b"%PDF", size=300)
+    msgs = [
+        FakeMailItem("A", "ASO ADMISSIONAL - 123 - 01/02/2025", now - timedelta(minutes=10), [original, minusculo]),
+        FakeMailItem("B", "ENC: ASO ADMISSIONAL - 123 - 01/02/2025", now - timedelta(minutes=5), [encaminhado]),
+    ]
+    namespace, _inbox = build_mailbox(msgs)
+    monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+    calls = []
+    monkeypatch.setattr(main, "salvar_paginas_individualmente", lambda pdf_path, *_a, **_k: calls.append(Path(pdf_path).read_bytes()))
+    monkeypatch.setattr(main, "run_from_main", lambda *_args, **_kwargs: {"sucessos": [], "erros": []})
+    monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+
+    manifest = {"paths": {}, "items": []}
+    stats = main.captar_emails(limit=50, execution_id="exec-9", started_at=now, manifest=manifest)
+
+    assert calls == [b"mesmo-conteudo"]
+    # Os bytes lidos para a impressao digital viram o temporario: um unico PR_ATTACH_DATA_BIN, sem SaveAsFile.
+    assert (original.saves, encaminhado.saves, minusculo.saves) == (0, 0, 0)
+    assert original.PropertyAccessor.reads == 1
+    assert stats["skipped_attachment_prefilter"] == 1
+    assert stats["skipped_tiny"] == 1
+    assert any(item["outcome"] == "SKIPPED_TINY" for item in manifest["items"])
+
+
+def test_captar_emails_pre_filtro_so_registra_anexo_apos_rpa_sem_erro(load_main, monkeypatch):
+    from outlook_fakes import FakeAttachment, FakeMailItem, build_mailbox
+
+    now = datetime.now()
+    msgs = [FakeMailItem("A", "ASO ADMISSIONAL - 123 - 01/02/2025", now - timedelta(minutes=10), [FakeAttachment("a.pdf", b"a", expose_data=True)])]
+    env = {
+        "ASO_EMAIL_ACCOUNT": "aso@enesa.com.br",
+        "ASO_MAILBOX_NAME": "Aso",
+        "ASO_INCREMENTAL_SYNC": "0",
+        "ASO_MESSAGE_INDEX_ENABLE": "0",
+        "ASO_BLOB_STORE": "0",
+    }
+
+    def _rodar(erros):
+        main = load_main(env=env)
+        namespace, _inbox = build_mailbox(msgs)
+        monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+        salvos = []
+
+        def _fake_salvar(_pdf, _pasta, obra, lista_novos_arquivos=None, **_k):
+            salvos.append(obra)
+            lista_novos_arquivos.append(f"ASO {obra}.pdf")
+
+        monkeypatch.setattr(main, "salvar_paginas_individualmente", _fake_salvar)
+        monkeypatch.setattr(main, "run_from_main", lambda *_a, files_to_process=None, **_k: {"sucessos": [], "erros": erros})
+        monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+        stats = main.captar_emails(limit=50, execution_id="exec-pre", started_at=now, manifest=None)
+        return salvos, stats
+
+    salvos, _ = _rodar([{"arquivo": "ASO 123.pdf", "erro": "timeout"}])
+    assert salvos == ["123"]
+    salvos, stats = _rodar([])
+    assert salvos == ["123"] and stats["skipped_attachment_prefilter"] == 0
+    salvos, stats = _rodar([])
+    assert salvos == [] and stats["skipped_attachment_prefilter"] == 1
+
+
+def test_captar_emails_anexo_em_memoria_nao_grava_temporario_na_pasta_da_obra(load_main, tmp_path, monkeypatch):
+    from outlook_fakes import FakeAttachment, FakeMailItem, build_mailbox
+
+    main = load_main(env={"ASO_EMAIL_ACCOUNT": "aso@enesa.com.br", "ASO_MAILBOX_NAME": "Aso", "ASO_ATTACH_IN_MEMORY": "1", "ASO_ATTACH_TMP_DIR": str(tmp_path)})
+
+    now = datetime.now()
+    via_accessor = FakeAttachment("a.pdf", b"conteudo-a", expose_data=True)
+    via_save = FakeAttachment("b.pdf", b"conteudo-b")
+    msgs = [FakeMailItem("A", "ASO ADMISSIONAL - 123 - 01/02/2025", now, [via_accessor, via_save])]
+    namespace, _inbox = build_mailbox(msgs)
+    monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+    recebidos = []
+
+    def _fake_salvar(pdf_path, pasta, _obra, pdf_bytes=None, **_k):
+        recebidos.append((Path(pdf_path).name, pdf_bytes, sorted(p.name for p in Path(pasta).iterdir())))
+        return {"pages": 1, "failed_pages": []}
+
+    monkeypatch.setattr(main, "salvar_paginas_individualmente", _fake_salvar)
+    monkeypatch.setattr(main, "run_from_main", lambda *_args, **_kwargs: {"sucessos": [], "erros": []})
+    monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+
+    manifest = {"paths": {}, "items": []}
+    main.captar_emails(limit=50, execution_id="exec-12", started_at=now, manifest=manifest)
+
+    assert sorted(dados for _, dados, _ in recebidos) == [b"conteudo-a", b"conteudo-b"]
+    assert all(nome.startswith("temp_") for nome, _, _ in recebidos)
+    assert all(not arquivos for _, _, arquivos in recebidos)
+    assert (via_accessor.saves, via_save.saves) == (0, 1)
+    assert list(tmp_path.glob("aso_anexo_*")) == []
+    assert manifest["attachments_in_memory"] == {"attachments": 2, "bytes": 20}
+
+
+def test_captar_emails_reabre_inbox_do_cache_sem_descoberta(load_main, monkeypatch):
+    from outlook_fakes import FakeAttachment, FakeMailItem, build_mailbox
+
+    now = datetime.now()
+    msgs = [FakeMailItem("A", "ASO ADMISSIONAL - 123 - 01/02/2025", now, [FakeAttachment("a.pdf", b"a")])]
+
+    def _rodar():
+        main = load_main(env={"ASO_EMAIL_ACCOUNT": "aso@enesa.com.br", "ASO_MAILBOX_NAME": "Aso", "ASO_INCREMENTAL_SYNC": "0"})
+        namespace, _inbox = build_mailbox(msgs)
+        monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+        monkeypatch.setattr(main, "salvar_paginas_individualmente", lambda *_a, **_k: None)
+        monkeypatch.setattr(main, "run_from_main", lambda *_args, **_kwargs: {"sucessos": [], "erros": []})
+        monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+        main.captar_emails(limit=50, execution_id="exec-10", started_at=now, manifest=None)
+        return namespace
+
+    primeira = _rodar()
+    assert primeira.account_scans == 1
+    assert primeira.folder_lookups == []
+
+    segunda = _rodar()
+    assert segunda.account_scans == 0
+    assert segunda.folder_lookups == [("FOLDER-INBOX", "STORE-1")]
+
+
+def test_captar_emails_nao_guarda_no_cache_inbox_escolhida_pela_heuristica(load_main, monkeypatch):
+    from outlook_fakes import FakeAttachment, FakeMailItem, build_mailboxes
+
+    now = datetime.now()
+    caixas = {
+        "aso@enesa.com.br": [],
+        "outra@enesa.com.br": [FakeMailItem("A", "ASO ADMISSIONAL - 123 - 01/02/2025", now, [FakeAttachment("a.pdf", b"a")])],
+    }
+
+    def _rodar():
+        main = load_main(env={"ASO_EMAIL_ACCOUNT": "aso@enesa.com.br", "ASO_MAILBOX_NAME": "", "ASO_INCREMENTAL_SYNC": "0"})
+        namespace, _inboxes = build_mailboxes(caixas)
+        monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+        monkeypatch.setattr(main, "salvar_paginas_individualmente", lambda *_a, **_k: None)
+        monkeypatch.setattr(main, "run_from_main", lambda *_args, **_kwargs: {"sucessos": [], "erros": []})
+        monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+        manifest = {"paths": {}, "items": []}
+        main.captar_emails(limit=50, execution_id="exec-heur", started_at=now, manifest=manifest)
+        return main, namespace, manifest
+
+    main, primeira, manifest = _rodar()
+    # Inbox configurada vazia na janela: a heuristica troca para a outra caixa, sem gravar no cache.
+    assert manifest["mailboxes"][0]["folder"] == "\\\\outra@enesa.com.br\\Caixa de Entrada"
+    assert main.FolderCache(main.FOLDER_CACHE_PATH).get(main.mailbox_key("aso@enesa.com.br", "")) is None
+
+    _main, segunda, _ = _rodar()
+    # Sem cache, a descoberta roda de novo e a escolha e refeita.
+    assert segunda.account_scans >= 1
+    assert segunda.folder_lookups == []
+
+
+def test_captar_emails_pipeline_com_workers_roda_ocr_fora_da_thread_com(load_main, monkeypatch):
+    import threading
+
+    from outlook_fakes import FakeAttachment, FakeMailItem, build_mailbox
+
+    main = load_main(env={"ASO_EMAIL_ACCOUNT": "aso@enesa.com.br", "ASO_MAILBOX_NAME": "Aso", "ASO_PIPELINE_WORKERS": "2"})
+
+    now = datetime.now()
+    msgs = [
+        FakeMailItem(f"M{n}", f"ASO ADMISSIONAL - 12{n} - 01/02/2025", now - timedelta(minutes=10 - n), [FakeAttachment("a.pdf", f"pdf-{n}".encode())])
+        for n in range(3)
+    ]
+    namespace, _inbox = build_mailbox(msgs)
+    monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+    thread_com = threading.current_thread().name
+    ocr, rpa = [], []
+
+    def _fake_salvar(pdf_path, pasta, obra, lista_novos_arquivos=None, stats=None, **_k):
+        ocr.append(threading.current_thread().name)
+        stats["total_detected"] += 1
+        lista_novos_arquivos.append(str(Path(pasta) / f"ASO {obra}.pdf"))
+        return {"pages": 1, "failed_pages": []}
+
+    def _fake_rpa(_pasta, files_to_process=None):
+        rpa.append((threading.current_thread().name, [Path(f).name for f in files_to_process]))
+        return {"sucessos": list(files_to_process), "erros": []}
+
+    monkeypatch.setattr(main, "salvar_paginas_individualmente", _fake_salvar)
+    monkeypatch.setattr(main, "run_from_main", _fake_rpa)
+    monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+
+    stats = main.captar_emails(limit=50, execution_id="exec-11", started_at=now, manifest=None)
+
+    assert len(ocr) == 3 and thread_com not in ocr
+    assert rpa == [("aso-rpa", ["ASO 120.pdf"]), ("aso-rpa", ["ASO 121.pdf"]), ("aso-rpa", ["ASO 122.pdf"])]
+    assert stats["total_detected"] == 3
+    assert stats["success"] == 3
+
+
+def test_captar_emails_le_varias_caixas_em_threads_com_e_deduplica_entre_elas(load_main, monkeypatch):
+    import threading
+
+    main = load_main(env={"ASO_EMAIL_ACCOUNT": "a@enesa.com.br; b@enesa.com.br", "ASO_MAILBOX_NAME": ""})
+
+    now = datetime.now()
+    inbox_a = _FakeFolder([_FakeMessage("ASO ADMISSIONAL - 1 - 01/02/2025", now, [_FakeAttachment("a.pdf", b"mesmo")])])
+    inbox_a.FolderPath = "\\\\a@enesa.com.br\\Caixa de Entrada"
+    inbox_b = _FakeFolder([
+        _FakeMessage("ENC: ASO ADMISSIONAL - 1 - 01/02/2025", now, [_FakeAttachment("a.pdf", b"mesmo")]),
+        _FakeMessage("ASO ADMISSIONAL - 2 - 01/02/2025", now, [_FakeAttachment("b.pdf", b"outro")]),
+    ])
+    inbox_b.FolderPath = "\\\\b@enesa.com.br\\Caixa de Entrada"
+    conta_a = _FakeAccount("a@enesa.com.br", inbox_a)
+    conta_b = _FakeAccount("b@enesa.com.br", inbox_b)
+    namespace = _FakeNamespace(conta_a, inbox_a)
+    namespace.Accounts = [conta_a, conta_b]
+    threads_com = []
+
+    def _namespace(*_):
+        threads_com.append(threading.current_thread().name)
+        return None, namespace
+
+    monkeypatch.setattr(main, "get_outlook_namespace_robusto", _namespace)
+    salvos = []
+
+    def _fake_salvar(pdf_path, pasta, obra, lista_novos_arquivos=None, stats=None, **_k):
+        salvos.append((obra, Path(pdf_path).read_bytes()))
+        stats["total_detected"] += 1
+        lista_novos_arquivos.append(str(Path(pasta) / f"ASO {obra}.pdf"))
+
+    monkeypatch.setattr(main, "salvar_paginas_individualmente", _fake_salvar)
+    monkeypatch.setattr(main, "run_from_main", lambda *_a, files_to_process=None, **_k: {"sucessos": list(files_to_process), "erros": []})
+    monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+    manifest = main._novo_manifest("exec-mb", now)
+
+    stats = main.captar_emails(limit=10, execution_id="exec-mb", started_at=now, manifest=manifest)
+
+    assert sorted(threads_com) == ["aso-com-1", "aso-com-2"]
+    # Mesmo PDF encaminhado para as duas caixas: OCR/RPA uma vez so.
+    assert sorted(salvos) == [("1", b"mesmo"), ("2", b"outro")]
+    assert len(list(Path(main.BLOB_STORE_DIR).rglob("*.pdf"))) == 2
+    assert stats["success"] == 2
+    por_caixa = {c["account"]: c for c in manifest["mailboxes"]}
+    assert por_caixa["a@enesa.com.br"]["status"] == por_caixa["b@enesa.com.br"]["status"] == "ok"
+    assert (por_caixa["a@enesa.com.br"]["emails"], por_caixa["b@enesa.com.br"]["emails"]) == (1, 2)
+    assert por_caixa["a@enesa.com.br"]["success"] + por_caixa["b@enesa.com.br"]["success"] == 2
+
+
+def test_captar_emails_caixas_geradas_pelo_gerador_de_carga(load_main, monkeypatch):
+    from mail_load import ASSUNTOS_ASO, PdfPool, generate_messages, span_days
+    from outlook_fakes import ComCounter, build_mailboxes
+
+    counter = ComCounter()
+    pool = PdfPool(variants=1)
+    por_caixa = {
+        "a@enesa.com.br": generate_messages(40, aso_ratio=0.5, counter=counter, pool=pool, prefix="A", seed=1),
+        "b@enesa.com.br": generate_messages(40, aso_ratio=0.5, counter=counter, pool=pool, prefix="B", seed=2),
+    }
+    namespace, inboxes = build_mailboxes(por_caixa, counter=counter)
+    assert namespace.GetItemFromID("B000003").raw("EntryID") == "B000003"
+    assert inboxes["b@enesa.com.br"].StoreID == "STORE-2"
+
+    dias = max(span_days(m) for m in por_caixa.values())
+    main = load_main(env={"ASO_EMAIL_ACCOUNT": "a@enesa.com.br; b@enesa.com.br", "ASO_MAILBOX_NAME": "", "ASO_DAYS_BACK": str(dias)})
+    monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+    conteudos = []
+
+    def _fake_salvar(pdf_path, pasta, obra, lista_novos_arquivos=None, stats=None, **_k):
+        conteudos.append(Path(pdf_path).read_bytes())
+        lista_novos_arquivos.append(str(Path(pasta) / f"ASO {obra} {len(conteudos)}.pdf"))
+
+    monkeypatch.setattr(main, "salvar_paginas_individualmente", _fake_salvar)
+    monkeypatch.setattr(main, "run_from_main", lambda *_a, files_to_process=None, **_k: {"sucessos": list(files_to_process), "erros": []})
+    monkeypatch.setattr(main, "enviar_resumo_email", lambda *_args, **_kwargs: ("SENT", None))
+    manifest = main._novo_manifest("exec-load", datetime.now())
+
+    main.captar_emails(limit=100, execution_id="exec-load", started_at=datetime.now(), manifest=manifest)
+
+    modelos = [a.split(" - ")[0] for a in ASSUNTOS_ASO]
+    esperados = [m for msgs in por_caixa.values() for m in msgs if m.raw("Subject").split(" - ")[0] in modelos]
+    anexos = sum(m.raw("Attachments").Count for m in esperados)
+    assert sum(c["emails"] for c in manifest["mailboxes"]) == len(esperados)
+    # Cada anexo gerado tem conteudo proprio: nenhum e descartado como duplicado.
+    assert len(conteudos) == len(set(conteudos)) == anexos
+    assert all(c.startswith(b"%PDF") for c in conteudos)
+    assert counter.calls > 0
@@ -54,3 +54,24 @@ def test_extrair_dados_completos_prefere_data_contextual_mais_recente(load_main)
     assert cpf == "987.654.321-00"
     assert data_aso == "27/02/2026"
     assert funcao == "Desconhecida"
+
+
+def test_ocr_with_fallback_usa_imagem_preprocessada_na_primeira_passada(load_main, monkeypatch):
+    from PIL import Image
+
+    main = load_main(env={"ASO_OCR_PREPROCESS": "1"})
+    original = Image.new("RGB", (40, 40), color="white")
+    preprocessada = Image.new("L", (40, 40), color=255)
+    monkeypatch.setattr(main, "preprocess_for_ocr", lambda img, method=None: preprocessada)
+
+    vistos = []
+
+    def _fake_tesseract(img, config, budget=None):
+        vistos.append((img, config))
+        return "ASO CPF 123.456.789-01"
+
+    monkeypatch.setattr(main, "_tesseract", _fake_tesseract)
+
+    texto = main.ocr_with_fallback(original)
+    assert "CPF" in texto
+    assert vistos == [(preprocessada, "--oem 3 --psm 6")]
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import json
+import time
 from pathlib import Path
 
+import pytest
 from PIL import Image
 
 
@@ -62,3 +65,207 @@ def test_salvar_paginas_individualmente_flow(load_main, tmp_path, monkeypatch):
     assert len(novos) == 1
     assert any(item["outcome"] == "SKIPPED_DRAFT" for item in manifest_items)
     assert any(item["outcome"] == "SKIPPED_NON_ASO" for item in manifest_items)
+
+
+def test_salvar_paginas_registra_pagina_com_tempo_esgotado(load_main, tmp_path, monkeypatch):
+    main = load_main()
+
+    img = Image.new("RGB", (10, 10), color="white")
+    monkeypatch.setattr(main, "convert_from_path", lambda *_args, **_kwargs: [img, img])
+
+    chamadas = {"n": 0}
+
+    def _fake_ocr(_img, budget=None, **_kwargs):
+        chamadas["n"] += 1
+        if chamadas["n"] == 1:
+            raise main.TempoEsgotado("OCR pagina 1", 181.0, 180)
+        return "ASO OK"
+
+    monkeypatch.setattr(main, "ocr_with_fallback", _fake_ocr)
+    monkeypatch.setattr(
+        main,
+        "extrair_dados_completos",
+        lambda *_args, **_kwargs: ("RASCUNHO", "Ignorar", "", "", "RASCUNHO"),
+    )
+
+    pdf_path = Path(tmp_path) / "input.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    stats = {
+        "total_detected": 0,
+        "error": 0,
+        "skipped_draft": 0,
+        "skipped_non_aso": 0,
+        "skipped_duplicate": 0,
+        "ocr_failures": [],
+        "erros": [],
+        "skipped_items": [],
+    }
+    manifest_items = []
+
+    main.salvar_paginas_individualmente(str(pdf_path), str(tmp_path), "1234", stats=stats, manifest_items=manifest_items)
+
+    assert stats["error"] == 1
+    assert stats["skipped_draft"] == 1
+    timed_out = [item for item in manifest_items if item.get("timed_out")]
+    assert len(timed_out) == 1
+    assert timed_out[0]["outcome"] == "ERROR"
+    assert timed_out[0]["page"] == 1
+    assert "elapsed_sec" in timed_out[0]
+
+
+def test_tesseract_timeout_por_chamada_nao_derruba_pagina(load_main, monkeypatch):
+    main = load_main()
+
+    def _timeout(*_args, **kwargs):
+        assert kwargs["timeout"] > 0
+        raise RuntimeError("Tesseract process timeout")
+
+    monkeypatch.setattr(main.pytesseract, "image_to_string", _timeout)
+    budget = main.TimeBudget(600)
+    assert main._tesseract(object(), "--psm 6", budget) == ""
+
+    expirado = main.TimeBudget(0.0001)
+    time.sleep(0.01)
+    with pytest.raises(main.TempoEsgotado):
+        main._tesseract(object(), "--psm 6", expirado)
+
+
+def test_salvar_paginas_grava_artefato_ocr_uma_vez(load_main, tmp_path, monkeypatch):
+    main = load_main()
+
+    img = Image.new("RGB", (10, 10), color="white")
+    monkeypatch.setattr(main, "convert_from_path", lambda *_args, **_kwargs: [img, img])
+    monkeypatch.setattr(main, "ocr_with_fallback", lambda *_args, **_kwargs: "ASO 123.456.789-01")
+    results = iter([
+        ("RASCUNHO", "Ignorar", "", "", "RASCUNHO"),
+        ("JOAO DA SILVA", "123.456.789-01", "01/02/2025", "SOLDADOR", "ASO 123.456.789-01"),
+    ])
+    monkeypatch.setattr(main, "extrair_dados_completos", lambda *_a, **_k: next(results))
+    monkeypatch.setattr(main, "eh_aso", lambda _t: True)
+
+    gravacoes = []
+    original_write = main.OcrArtifactBundle.write
+
+    def _spy_write(self, pasta):
+        gravacoes.append(len(self.pages))
+        return original_write(self, pasta)
+
+    monkeypatch.setattr(main.OcrArtifactBundle, "write", _spy_write)
+
+    pdf_path = Path(tmp_path) / "input.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    main.salvar_paginas_individualmente(str(pdf_path), str(tmp_path), "1234")
+
+    assert gravacoes == [2]
+    linhas = (Path(tmp_path) / "OCR_input.jsonl").read_text(encoding="utf-8").splitlines()
+    registros = [json.loads(linha) for linha in linhas]
+    assert [r["page"] for r in registros] == [1, 2]
+    assert registros[0]["outcome"] == "SKIPPED_DRAFT"
+    assert registros[1]["outcome"] == "SUCCESS"
+    assert registros[1]["arquivo_gerado"] == "JOAO DA SILVA - ***.***.**9-01.pdf"
+    assert "123.456.789-01" not in linhas[1]
+    assert "ocr_sec" in registros[1]["timings"]
+
+    txt = (Path(tmp_path) / "OCR_input.txt").read_text(encoding="utf-8")
+    assert "Outcome: SKIPPED_DRAFT" in txt
+    assert "Arquivo gerado: JOAO DA SILVA - 123.456.789-01.pdf" in txt
+    assert "CPF: ***.***.**9-01" in txt
+
+
+def test_salvar_paginas_reentra_somente_paginas_pedidas(load_main, tmp_path, monkeypatch):
+    main = load_main()
+
+    img = Image.new("RGB", (10, 10), color="white")
+    pedidas = []
+
+    def _fake_convert(*_args, **kwargs):
+        pedidas.append((kwargs.get("first_page"), kwargs.get("last_page")))
+        return [img]
+
+    monkeypatch.setattr(main, "convert_from_path", _fake_convert)
+    monkeypatch.setattr(main, "ocr_with_fallback", lambda *_args, **_kwargs: "dummy")
+    monkeypatch.setattr(
+        main, "extrair_dados_completos", lambda *_a, **_k: ("Desconhecido", "CPF_Desconhecido", "", "", "dummy")
+    )
+
+    pdf_path = Path(tmp_path) / "input.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    resumo = main.salvar_paginas_individualmente(str(pdf_path), str(tmp_path), "1234", paginas={4, 2})
+
+    assert pedidas == [(2, 2), (4, 4)]
+    assert resumo == {"pages": 2, "failed_pages": [2, 4]}
+
+
+def test_salvar_paginas_rasteriza_bytes_em_memoria(load_main, tmp_path, monkeypatch):
+    main = load_main()
+
+    img = Image.new("RGB", (10, 10), color="white")
+    recebidos = []
+    monkeypatch.setattr(main, "convert_from_path", lambda *_args, **_kwargs: pytest.fail("leu o PDF do disco"))
+    monkeypatch.setattr(main, "convert_from_bytes", lambda dados, **_kwargs: recebidos.append(dados) or [img])
+    monkeypatch.setattr(main, "ocr_with_fallback", lambda *_args, **_kwargs: "dummy")
+    monkeypatch.setattr(
+        main,
+        "extrair_dados_completos",
+        lambda *_args, **_kwargs: ("RASCUNHO", "Ignorar", "", "", "RASCUNHO"),
+    )
+
+    # Caminho virtual: so nomeia o artefato de OCR, o arquivo nunca existe.
+    pdf_path = Path(tmp_path) / "temp_1.pdf"
+    resumo = main.salvar_paginas_individualmente(str(pdf_path), str(tmp_path), "1234", pdf_bytes=b"%PDF-1.4")
+
+    assert recebidos == [b"%PDF-1.4"]
+    assert resumo["pages"] == 1
+    assert not pdf_path.exists()
+    assert (Path(tmp_path) / "OCR_temp_1.jsonl").exists()
+
+
+def test_workers_com_mesmo_destino_gravam_e_registram_uma_vez(load_main, tmp_path, monkeypatch):
+    import threading
+
+    import atomic_io
+
+    main = load_main()
+
+    img = Image.new("RGB", (10, 10), color="white")
+    monkeypatch.setattr(main, "convert_from_path", lambda *_args, **_kwargs: [img])
+    juntos = threading.Barrier(2)
+
+    def _fake_ocr(*_args, **_kwargs):
+        # Os dois workers chegam juntos a verificacao do destino.
+        juntos.wait(timeout=5)
+        return "ASO OK"
+
+    monkeypatch.setattr(main, "ocr_with_fallback", _fake_ocr)
+    monkeypatch.setattr(
+        main,
+        "extrair_dados_completos",
+        lambda *_a, texto_ocr="", **_k: ("JOAO DA SILVA", "123.456.789-01", "01/02/2025", "SOLDADOR", texto_ocr),
+    )
+    monkeypatch.setattr(main, "eh_aso", lambda texto: "ASO OK" in texto)
+    registros = []
+    monkeypatch.setattr(main, "insert_aso_record", lambda payload, **_k: registros.append(payload["arquivo_origem"]))
+
+    destino = tmp_path / "Obra_1234" / "2025-02-01"
+    destino.mkdir(parents=True)
+    novos = {}
+
+    def _worker(n):
+        pdf_path = tmp_path / f"temp_{n}.pdf"
+        pdf_path.write_bytes(b"%PDF-1.4")
+        stats = {k: 0 for k in ("total_detected", "error", "skipped_duplicate", "skipped_draft", "skipped_non_aso")}
+        stats.update({"ocr_failures": [], "erros": [], "skipped_items": []})
+        novos[n] = []
+        main.salvar_paginas_individualmente(str(pdf_path), str(destino), "1234", lista_novos_arquivos=novos[n], stats=stats)
+
+    threads = [threading.Thread(target=_worker, args=(n,)) for n in (1, 2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    final = str(destino / "JOAO DA SILVA - 123.456.789-01.pdf")
+    assert registros == [final]
+    assert novos[1] == novos[2] == [final]
+    assert [p.name for p in destino.glob("*.pdf*")] == ["JOAO DA SILVA - 123.456.789-01.pdf"]
+    assert atomic_io._TRAVAS == {}
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+
+def test_executar_watch_acumula_ciclos_e_envia_resumo_periodico(load_main, monkeypatch):
+    main = load_main()
+
+    ciclos = iter([
+        {"total_detected": 2, "success": 2, "error": 0, "sucessos": ["a.pdf", "b.pdf"], "erros": [], "tempo_total": "0:00:05"},
+        {"total_detected": 0, "success": 0, "error": 0, "sucessos": [], "erros": []},
+        {"total_detected": 1, "success": 0, "error": 1, "sucessos": [], "erros": [{"arquivo": "c.pdf", "erro": "x"}], "last_error": "x"},
+    ])
+    chamadas, resumos, pausas = [], [], []
+
+    def _fake_captar(**kwargs):
+        chamadas.append(kwargs)
+        return next(ciclos)
+
+    monkeypatch.setattr(main, "captar_emails", _fake_captar)
+    monkeypatch.setattr(main.reporter, "save_report", lambda stats: {"json": None, "md": None})
+    monkeypatch.setattr(
+        main, "enviar_resumo_email",
+        lambda _to, relatorio, execution_id, run_status, **_k: resumos.append((dict(relatorio), execution_id, run_status)) or ("SENT", None),
+    )
+
+    manifest = main._novo_manifest("watch-1", datetime.now())
+    sessao = main.executar_watch(
+        execution_id="watch-1", manifest=manifest, intervalo_sec=5, resumo_min=0, max_ciclos=3, sleep_fn=pausas.append,
+    )
+
+    assert [c["watch"] for c in chamadas] == [True, True, True]
+    assert [c["execution_id"] for c in chamadas] == ["watch-1-1", "watch-1-2", "watch-1-3"]
+    assert pausas == [5, 5]
+    # Ciclo vazio nao gera email.
+    assert [(r["total_detected"], r["sucessos"], status) for r, _id, status in resumos] == [
+        (2, ["a.pdf", "b.pdf"], "CONSISTENT"),
+        (1, [], "INCONSISTENT"),
+    ]
+    assert sessao["total_detected"] == 3 and sessao["total_processed"] == 3
+    assert sessao["last_error"] == "x"
+    assert manifest["totals"]["success"] == 2
+    assert manifest["watch"]["cycles"] == 3
+
+
+def test_captar_emails_em_modo_watch_so_le_o_que_chegou_e_nao_envia_email(load_main, monkeypatch):
+    from outlook_fakes import FakeAttachment, FakeMailItem, build_mailbox
+
+    main = load_main(env={"ASO_EMAIL_ACCOUNT": "aso@enesa.com.br", "ASO_MAILBOX_NAME": "Aso"})
+
+    now = datetime.now()
+    msgs = [FakeMailItem("A", "ASO ADMISSIONAL - 123 - 01/02/2025", now - timedelta(minutes=10), [FakeAttachment("a.pdf", b"a")])]
+    namespace, inbox = build_mailbox(msgs)
+    monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: (None, namespace))
+    processados, emails, manifests = [], [], []
+
+    def _fake_salvar(pdf_path, _pasta, obra, stats=None, **_k):
+        processados.append(obra)
+        stats["total_detected"] += 1
+
+    monkeypatch.setattr(main, "salvar_paginas_individualmente", _fake_salvar)
+    monkeypatch.setattr(main, "run_from_main", lambda *_args, **_kwargs: {"sucessos": [], "erros": []})
+    monkeypatch.setattr(main, "enviar_resumo_email", lambda *a, **k: emails.append(a) or ("SENT", None))
+    original_manifest = main.salvar_manifest
+    monkeypatch.setattr(main, "salvar_manifest", lambda m, *a, **k: manifests.append(m["execution_id"]) or original_manifest(m, *a, **k))
+
+    def _ciclo(n):
+        return main.captar_emails(limit=50, execution_id=f"w-{n}", started_at=now, manifest=main._novo_manifest(f"w-{n}", now), watch=True)
+
+    _ciclo(1)
+    _ciclo(2)
+    inbox._messages.append(FakeMailItem("B", "ASO ADMISSIONAL - 124 - 01/02/2025", now - timedelta(minutes=1), [FakeAttachment("b.pdf", b"b")]))
+    _ciclo(3)
+
+    assert processados == ["123", "124"]
+    assert emails == []
+    assert manifests == ["w-1", "w-3"]
+
+
+def test_executar_watch_reaproveita_sessao_yube_e_threads_com_entre_ciclos(load_main, monkeypatch):
+    main = load_main(env={"ASO_YUBE_SESSION": "1"})
+    sessoes, chamadas = [], []
+
+    class _Sessao:
+        launches = 0
+
+        def __init__(self, **_kwargs):
+            self.fechada = False
+            sessoes.append(self)
+
+        def close(self):
+            self.fechada = True
+
+    def _fake_captar(**kwargs):
+        chamadas.append(kwargs)
+        assert not kwargs["sessao_yube"].fechada
+        return {"total_detected": 0, "error": 0}
+
+    monkeypatch.setattr(main, "YubeSession", _Sessao)
+    monkeypatch.setattr(main, "captar_emails", _fake_captar)
+    main.executar_watch(execution_id="w", intervalo_sec=0, resumo_min=60, max_ciclos=3, sleep_fn=lambda _s: None)
+
+    assert len(sessoes) == 1 and sessoes[0].fechada
+    assert all(c["sessao_yube"] is sessoes[0] for c in chamadas)
+    assert len({id(c["com_threads"]) for c in chamadas}) == 1
+
+
+def test_captar_emails_com_threads_persistentes_mantem_namespace_do_outlook(load_main, monkeypatch):
+    from mailboxes import ComThreads
+    from outlook_fakes import FakeAttachment, FakeMailItem, build_mailboxes
+
+    main = load_main(env={"ASO_EMAIL_ACCOUNT": "a@enesa.com.br;b@enesa.com.br", "ASO_MAILBOX_NAME": ""})
+    now = datetime.now()
+    namespace, inboxes = build_mailboxes({
+        "a@enesa.com.br": [FakeMailItem("A", "ASO ADMISSIONAL - 123 - 01/02/2025", now - timedelta(minutes=5), [FakeAttachment("a.pdf", b"a")])],
+        "b@enesa.com.br": [],
+    })
+    conexoes, finalizadas = [], []
+    monkeypatch.setattr(main, "get_outlook_namespace_robusto", lambda *_: conexoes.append(1) or (None, namespace))
+    monkeypatch.setattr(main, "salvar_paginas_individualmente", lambda *_a, **_k: None)
+    monkeypatch.setattr(main, "run_from_main", lambda *_args, **_kwargs: {"sucessos": [], "erros": []})
+    threads = ComThreads(finalize_fn=lambda: finalizadas.append(1))
+
+    for n in (1, 2):
+        main.captar_emails(
+            limit=50, execution_id=f"w-{n}", started_at=now, manifest=main._novo_manifest(f"w-{n}", now), watch=True, com_threads=threads,
+        )
+    # Uma conexao por caixa (thread COM), nao uma por ciclo.
+    assert len(conexoes) == 2
+    assert finalizadas == []
+    threads.close()
+    assert finalizadas == [1, 1]
+
+
+def test_executar_watch_troca_manifest_de_processados_ao_virar_o_dia(load_main, monkeypatch, tmp_path):
+    main = load_main()
+    ontem, hoje = str(tmp_path / "processed_index_ontem.json"), str(tmp_path / "processed_index_hoje.json")
+    main._save_processed_index(hoje, {"chave-de-hoje"})
+    monkeypatch.setattr(main, "PROCESSED_INDEX_ENABLED", True)
+    monkeypatch.setattr(main, "PROCESSED_INDEX_PATH", ontem)
+    monkeypatch.setattr(main, "PROCESSED_INDEX_SUCCESS", {"chave-de-ontem"})
+    monkeypatch.delenv("ASO_PROCESSED_INDEX_PATH", raising=False)
+    dias = iter([ontem, hoje])
+    monkeypatch.setattr(main, "_default_processed_index_path", lambda: next(dias))
+    vistos = []
+    monkeypatch.setattr(main, "captar_emails", lambda **_k: vistos.append((main.PROCESSED_INDEX_PATH, set(main.PROCESSED_INDEX_SUCCESS))) or {})
+
+    main.executar_watch(execution_id="w", intervalo_sec=0, resumo_min=60, max_ciclos=2, sleep_fn=lambda _s: None, fonte=object())
+
+    assert vistos == [(ontem, {"chave-de-ontem"}), (hoje, {"chave-de-hoje"})]
+    assert main._load_processed_index(ontem) == {"chave-de-ontem"}
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from message_index import MessageIndex, message_identity
+
+
+class _Accessor:
+    def __init__(self, value):
+        self._value = value
+
+    def GetProperty(self, _prop):
+        if isinstance(self._value, Exception):
+            raise self._value
+        return self._value
+
+
+class _Msg:
+    def __init__(self, entry_id, imid):
+        self.EntryID = entry_id
+        self.PropertyAccessor = _Accessor(imid)
+
+
+def test_identidade_prefere_internet_message_id():
+    assert message_identity(_Msg("E1", "<abc@x>")) == "imid:<abc@x>"
+    assert message_identity(_Msg("E1", RuntimeError("sem prop"))) == "entry:E1"
+
+
+def test_chave_muda_com_anexos_e_indice_persiste(tmp_path):
+    k1 = MessageIndex.message_key("imid:1", [("a.pdf", 10)])
+    k2 = MessageIndex.message_key("imid:1", [("a.pdf", 11)])
+    assert k1 != k2
+    assert MessageIndex.message_key(None, []) is None
+
+    path = tmp_path / "message_index.json"
+    index = MessageIndex(str(path))
+    index.record(k1, "ERROR", attachments={"pdf:1:a.pdf": {"pages": 3, "failed_pages": [2]}, "pdf:2:b.pdf": {"error": "x"}})
+    index.save()
+
+    recarregado = MessageIndex(str(path))
+    entry = recarregado.get(k1)
+    assert not recarregado.is_complete(k1)
+    assert MessageIndex.pending_pages(entry, "pdf:1:a.pdf") == {2}
+    assert MessageIndex.pending_pages(entry, "pdf:2:b.pdf") is None
+    assert MessageIndex.pending_pages(entry, "pdf:3:c.pdf") is None
+    assert MessageIndex.pending_pages(None, "pdf:1:a.pdf") is None
+
+    recarregado.record(k1, "SUCCESS", attachments={"pdf:1:a.pdf": {"failed_pages": []}})
+    assert recarregado.is_complete(k1)
+    assert MessageIndex.pending_pages(recarregado.get(k1), "pdf:1:a.pdf") == set()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import json
+import os
+
+from atomic_io import read_json, write_json_atomic, write_text_atomic
+from ocr_artifacts import OcrArtifactBundle
+
+
+def test_write_text_atomic_substitui_sem_temporarios(tmp_path):
+    destino = tmp_path / "sub" / "arquivo.txt"
+    write_text_atomic(str(destino), "um")
+    write_text_atomic(str(destino), "dois")
+    assert destino.read_text(encoding="utf-8") == "dois"
+    assert os.listdir(destino.parent) == ["arquivo.txt"]
+
+
+def test_read_json_retorna_default_em_arquivo_invalido(tmp_path):
+    caminho = tmp_path / "estado.json"
+    assert read_json(str(caminho), default={}) == {}
+    caminho.write_text("{quebrado", encoding="utf-8")
+    assert read_json(str(caminho), default={"a": 1}) == {"a": 1}
+    write_json_atomic(str(caminho), {"ok": True})
+    assert read_json(str(caminho)) == {"ok": True}
+
+
+def test_bundle_preserva_conteudo_de_anexo_homonimo(tmp_path):
+    for obra in ("1", "2"):
+        bundle = OcrArtifactBundle(str(tmp_path / "temp_1.pdf"), obra, engine={"ocr": "tesseract"})
+        bundle.add_page(1, "SKIPPED_NON_ASO", "Nao identificado como ASO", {"nome": "X", "cpf": "12345678901"})
+        bundle.add_page(2, "ERROR", "Tempo esgotado", legacy_txt=False, timed_out=True)
+        bundle.write(str(tmp_path))
+
+    linhas = (tmp_path / "OCR_temp_1.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(linha)["obra"] for linha in linhas] == ["1", "1", "2", "2"]
+    assert json.loads(linhas[1])["timed_out"] is True
+    assert "12345678901" not in "".join(linhas)
+
+    txt = (tmp_path / "OCR_temp_1.txt").read_text(encoding="utf-8")
+    assert txt.count("Outcome: SKIPPED_NON_ASO") == 2
+    assert "Tempo esgotado" not in txt
+
+
+def test_bundle_sem_paginas_nao_grava(tmp_path):
+    bundle = OcrArtifactBundle(str(tmp_path / "vazio.pdf"), "1")
+    assert bundle.write(str(tmp_path)) == (None, None)
+    assert os.listdir(tmp_path) == []
+
+
+def test_bundles_homonimos_em_paralelo_nao_perdem_linhas(tmp_path, monkeypatch):
+    import threading
+    import time
+
+    import ocr_artifacts
+
+    ler = ocr_artifacts.read_text
+
+    def _ler_devagar(path, *args):
+        # Alarga a janela entre a leitura e a troca do arquivo.
+        texto = ler(path, *args)
+        time.sleep(0.01)
+        return texto
+
+    monkeypatch.setattr(ocr_artifacts, "read_text", _ler_devagar)
+    juntos = threading.Barrier(8)
+
+    def _worker(obra):
+        bundle = OcrArtifactBundle(str(tmp_path / "temp_1.pdf"), obra)
+        bundle.add_page(1, "SKIPPED_NON_ASO", "Nao identificado como ASO", {"nome": obra})
+        juntos.wait(timeout=5)
+        bundle.write(str(tmp_path))
+
+    threads = [threading.Thread(target=_worker, args=(str(n),)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    linhas = (tmp_path / "OCR_temp_1.jsonl").read_text(encoding="utf-8").splitlines()
+    assert sorted(json.loads(linha)["obra"] for linha in linhas) == [str(n) for n in range(8)]
+    assert (tmp_path / "OCR_temp_1.txt").read_text(encoding="utf-8").count("Obra: ") == 8
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import outlook_scan
+from outlook_fakes import ComCounter, FakeMailItem, build_mailbox
+
+
+class _Items:
+    def __init__(self, items, fail=False):
+        self._items = list(items)
+        self._fail = fail
+        self.filtros = []
+        self.sorted = False
+
+    @property
+    def Count(self):
+        return len(self._items)
+
+    def Sort(self, *_args):
+        self.sorted = True
+
+    def Item(self, i):
+        return self._items[i - 1]
+
+    def Restrict(self, filtro):
+        self.filtros.append(filtro)
+        if self._fail:
+            raise RuntimeError("Cannot parse condition")
+        return _Items(self._items[:1])
+
+
+def test_build_dasl_filter_usa_utc_e_like_no_assunto():
+    inicio = datetime(2026, 3, 2, 0, 0, tzinfo=timezone.utc)
+    fim = datetime(2026, 3, 3, 0, 0, tzinfo=timezone.utc)
+    filtro = outlook_scan.build_dasl_filter(inicio, fim)
+    assert filtro == (
+        '@SQL="urn:schemas:httpmail:datereceived" >= \'2026-03-02 00:00\''
+        ' AND "urn:schemas:httpmail:datereceived" < \'2026-03-03 00:00\''
+        ' AND "urn:schemas:httpmail:subject" LIKE \'%ASO%ADMISSIONAL%\''
+    )
+
+
+def test_build_dasl_filter_escapa_aspas_e_aceita_sem_clausulas():
+    assert outlook_scan.build_dasl_filter(subject_like="%D'AVILA%").endswith("LIKE '%D''AVILA%'")
+    assert outlook_scan.build_dasl_filter(subject_like=None) is None
+
+
+def test_restrict_items_devolve_colecao_restrita_ordenada():
+    items = _Items(["a", "b", "c"])
+    restritos, filtrado = outlook_scan.restrict_items(items, "@SQL=x")
+    assert filtrado is True
+    assert restritos.Count == 1
+    assert restritos.sorted is True
+
+
+def test_restrict_items_faz_fallback_quando_restrict_falha_ou_nao_existe():
+    items = _Items(["a", "b"], fail=True)
+    mensagens = []
+    restritos, filtrado = outlook_scan.restrict_items(items, "@SQL=x", log_fn=mensagens.append)
+    assert (restritos, filtrado) == (items, False)
+    assert mensagens
+
+    sem_restrict = object()
+    assert outlook_scan.restrict_items(sem_restrict, "@SQL=x") == (sem_restrict, False)
+
+
+def _mensagens(n, alvo_cada=10, counter=None):
+    agora = datetime.now()
+    msgs = []
+    for i in range(n):
+        assunto = f"ASO ADMISSIONAL - {i} - 01/02/2025" if i % alvo_cada == 0 else f"Newsletter {i}"
+        msgs.append(FakeMailItem(f"E{i:04d}", assunto, agora - timedelta(minutes=i), counter=counter))
+    return msgs
+
+
+def test_table_rows_le_colunas_em_lotes_ordenado_desc():
+    counter = ComCounter()
+    _ns, inbox = build_mailbox(_mensagens(25), counter=counter)
+    linhas = outlook_scan.table_rows(inbox, batch_size=10)
+    assert [linha.entry_id for linha in linhas[:3]] == ["E0000", "E0001", "E0002"]
+    assert len(linhas) == 25
+    assert inbox.tables[0].get_array_calls == 3
+    assert linhas[0].received is not None and linhas[0].has_attachments is False
+
+
+def test_table_rows_aplica_filtro_e_limite():
+    _ns, inbox = build_mailbox(_mensagens(50))
+    filtro = outlook_scan.build_dasl_filter(datetime.now() - timedelta(days=1), datetime.now() + timedelta(days=1))
+    linhas = outlook_scan.table_rows(inbox, filtro)
+    assert len(linhas) == 5
+    assert len(outlook_scan.table_rows(inbox, max_rows=7)) == 7
+
+
+def test_table_rows_repete_sem_filtro_rejeitado_e_none_sem_table_api():
+    _ns, inbox = build_mailbox(_mensagens(3))
+    avisos = []
+    linhas = outlook_scan.table_rows(inbox, "[Invalido] = 1", log_fn=avisos.append)
+    assert len(linhas) == 3 and avisos
+
+    _ns, sem_table = build_mailbox(_mensagens(3), with_table=False)
+    assert outlook_scan.table_rows(sem_table) is None
+
+
+def test_entry_id_items_abre_mailitem_sob_demanda():
+    ns, inbox = build_mailbox(_mensagens(20))
+    linhas = outlook_scan.table_rows(inbox)
+    itens = outlook_scan.EntryIdItems(ns, linhas[:2], store_id=inbox.StoreID)
+    assert itens.Count == 2 and ns.opened == []
+    assert itens.Item(2).EntryID == "E0001"
+    assert ns.opened == [("E0001", "STORE-1")]
+
+
+def test_to_naive_datetime_aceita_texto_e_timezone():
+    assert outlook_scan.to_naive_datetime("02/03/2026 10:30") == datetime(2026, 3, 2, 10, 30)
+    aware = datetime(2026, 3, 2, 13, 0, tzinfo=timezone.utc)
+    assert outlook_scan.to_naive_datetime(aware) == aware.astimezone().replace(tzinfo=None)
+    assert outlook_scan.to_naive_datetime("lixo") is None
+
+
+class _SemRecebimento(FakeMailItem):
+    def __getattribute__(self, name):
+        valor = super().__getattribute__(name)
+        if name == "ReceivedTime":
+            raise RuntimeError("propriedade indisponivel")
+        return valor
+
+
+def test_mail_proxy_le_cada_propriedade_uma_vez_e_normaliza_data():
+    counter = ComCounter()
+    enviado = datetime(2025, 2, 1, 9, 30, tzinfo=timezone.utc)
+    msg = _SemRecebimento("A", "ASO ADMISSIONAL - 1", None, counter=counter)
+    msg.SentOn = enviado
+    stats = outlook_scan.ProxyStats()
+    proxy = outlook_scan.MailProxy(msg, stats)
+
+    assert proxy.received == outlook_scan.to_naive_datetime(enviado)
+    assert proxy.received == outlook_scan.to_naive_datetime(enviado)
+    for _ in range(3):
+        assert proxy.Subject == "ASO ADMISSIONAL - 1"
+        try:
+            proxy.ReceivedTime
+        except RuntimeError:
+            pass
+    assert counter.calls == 2  # ReceivedTime (falha memorizada) + Subject; SentOn nao e contado
+    assert (stats.calls, stats.hits) == (3, 5)
+
+    proxy.Subject = "outro"
+    assert msg.raw("Subject") == "outro" and proxy.Subject == "outro"
+
+
+def test_proxy_items_reaproveita_proxy_do_mesmo_indice():
+    now = datetime.now()
+    counter = ComCounter()
+    items = outlook_scan.ProxyItems(
+        _Items([FakeMailItem(str(i), f"s{i}", now - timedelta(minutes=i), counter=counter) for i in range(3)]),
+        cache_size=2,
+    )
+
+    assert items.Count == 3
+    assert items.Item(1) is items.Item(1)
+    items.Item(1).Subject
+    items.Item(1).Subject
+    assert counter.calls == 1
+    items.Item(2)
+    items.Item(3)
+    assert items.Item(1).Subject == "s0" and counter.calls == 2  # saiu do LRU: relido
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from pipeline import MailPipeline, PipelineJob
+
+
+def test_pipeline_inline_processa_na_hora_e_conclui_no_submit():
+    eventos = []
+    pipeline = MailPipeline(
+        lambda payload, tarefa: eventos.append(("ocr", payload, tarefa)) or tarefa * 10,
+        lambda payload, resultados: eventos.append(("rpa", payload, [r for _t, r, _e in resultados])),
+    )
+    assert pipeline.inline
+
+    job = PipelineJob("email-1")
+    pipeline.add(job, 1)
+    eventos.append(("com", "save-2"))
+    pipeline.add(job, 2)
+    pipeline.submit(job)
+    pipeline.close()
+
+    assert eventos == [
+        ("ocr", "email-1", 1),
+        ("com", "save-2"),
+        ("ocr", "email-1", 2),
+        ("rpa", "email-1", [10, 20]),
+    ]
+
+
+def test_pipeline_com_workers_sobrepoe_ocr_e_conclui_na_ordem_de_leitura():
+    threads_ocr = set()
+    concluidos = []
+
+    def _ocr(payload, tarefa):
+        threads_ocr.add(threading.current_thread().name)
+        # O primeiro email e o mais lento: mesmo assim o RPA respeita a ordem de leitura.
+        time.sleep(0.05 if payload == 0 else 0.01)
+        if tarefa == "falha":
+            raise RuntimeError("pdf corrompido")
+        return (payload, tarefa)
+
+    def _rpa(payload, resultados):
+        concluidos.append((payload, threading.current_thread().name, [(r, type(e).__name__ if e else None) for _t, r, e in resultados]))
+
+    with MailPipeline(_ocr, _rpa, workers=3, queue_size=1) as pipeline:
+        for n in range(4):
+            job = PipelineJob(n)
+            pipeline.add(job, "a")
+            pipeline.add(job, "falha" if n == 2 else "b")
+            pipeline.submit(job)
+
+    assert [p for p, _thread, _r in concluidos] == [0, 1, 2, 3]
+    assert all(thread == "aso-rpa" for _p, thread, _r in concluidos)
+    assert concluidos[2][2] == [((2, "a"), None), (None, "RuntimeError")]
+    assert len(threads_ocr) > 1 and all(nome.startswith("aso-ocr") for nome in threads_ocr)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import io
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+import rasterizer
+
+
+def _make_pdf(path: Path, pages: int = 2):
+    imgs = [Image.new("RGB", (120, 160), color="white") for _ in range(pages)]
+    buf = io.BytesIO()
+    imgs[0].save(buf, "PDF", save_all=True, append_images=imgs[1:], resolution=72.0)
+    path.write_bytes(buf.getvalue())
+    return path
+
+
+def test_poppler_backend_uses_convert_fn():
+    calls = []
+
+    def _fake_convert(pdf_path, **kwargs):
+        calls.append((pdf_path, kwargs))
+        count = 1 if kwargs.get("first_page") else 3
+        return [Image.new("L", (5, 5)) for _ in range(count)]
+
+    r = rasterizer.PopplerRasterizer(poppler_path="C:/poppler", dpi=200, grayscale=True, convert_fn=_fake_convert)
+
+    pages = list(r.iter_pages("x.pdf"))
+    assert [n for n, _ in pages] == [1, 2, 3]
+    assert calls[0][1]["dpi"] == 200
+    assert calls[0][1]["grayscale"] is True
+    assert calls[0][1]["poppler_path"] == "C:/poppler"
+
+    assert r.render_page("x.pdf", 2) is not None
+    assert calls[-1][1]["first_page"] == 2
+    assert calls[-1][1]["last_page"] == 2
+
+
+def test_poppler_backend_renders_bytes_without_a_file():
+    calls = []
+
+    def _fake_bytes(data, **kwargs):
+        calls.append((data, kwargs))
+        return [Image.new("L", (5, 5))]
+
+    r = rasterizer.PopplerRasterizer(dpi=200, convert_fn=lambda *_a, **_k: pytest.fail("leu do disco"), convert_bytes_fn=_fake_bytes)
+
+    assert [n for n, _ in r.iter_pages(b"%PDF-1.4")] == [1]
+    assert r.render_page(bytearray(b"%PDF-1.4"), 1) is not None
+    assert calls[0][0] == b"%PDF-1.4" and calls[0][1]["dpi"] == 200
+    assert calls[1][1]["first_page"] == 1
+
+
+def test_pdfium_backend_renders_per_page(tmp_path):
+    pytest.importorskip("pypdfium2")
+    pdf = _make_pdf(Path(tmp_path) / "doc.pdf", pages=3)
+
+    r = rasterizer.PdfiumRasterizer(dpi=144, grayscale=True)
+    assert r.page_count(str(pdf)) == 3
+
+    pages = list(r.iter_pages(str(pdf)))
+    assert [n for n, _ in pages] == [1, 2, 3]
+    img = pages[0][1]
+    assert img.mode == "L"
+    assert img.size == (240, 320)
+
+    single = r.render_page(str(pdf), 3)
+    assert single.size == img.size
+
+
+def test_pdfium_backend_renders_from_bytes(tmp_path):
+    pytest.importorskip("pypdfium2")
+    dados = _make_pdf(Path(tmp_path) / "doc.pdf", pages=2).read_bytes()
+
+    r = rasterizer.PdfiumRasterizer(dpi=72)
+    assert r.page_count(dados) == 2
+    assert [n for n, _ in r.iter_pages(dados)] == [1, 2]
+    assert r.render_page(memoryview(dados), 2).size == (120, 160)
+
+
+def test_build_rasterizer_falls_back_to_poppler(monkeypatch):
+    monkeypatch.setattr(rasterizer, "pdfium_disponivel", lambda: False)
+    r = rasterizer.build_rasterizer("pdfium", poppler_path=None)
+    assert r.name == "poppler"
+
+    r2 = rasterizer.build_rasterizer("desconhecido")
+    assert r2.name == "poppler"
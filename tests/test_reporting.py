@@ -38,3 +38,19 @@ def test_report_generator_writes_and_masks(tmp_path):
     data = json.loads(json_path.read_text(encoding="utf-8"))
     assert "12345678901" not in json.dumps(data)
     assert "12345678901" not in md_path.read_text(encoding="utf-8")
+
+
+def test_report_markdown_lista_totais_por_caixa(tmp_path):
+    stats = {
+        "execution_id": "exec-2",
+        "mailboxes": [
+            {"account": "a@enesa.com.br", "status": "ok", "messages": 10, "emails": 2, "processed": 2, "success": 3, "error": 0},
+            {"account": "b@enesa.com.br", "status": "not_found"},
+        ],
+    }
+    paths = ReportGenerator(str(tmp_path)).save_report(stats)
+
+    md = Path(paths["md"]).read_text(encoding="utf-8")
+    assert "## Caixas de Email" in md
+    assert "- **a@enesa.com.br** (ok): mensagens=10, emails ASO=2, processados=2, sucessos=3, erros=0" in md
+    assert "- **b@enesa.com.br** (not_found)" in md
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import importlib
 import os
+import threading
+import types
 from pathlib import Path
 
 
@@ -27,3 +29,149 @@ def test_extrair_cpf_do_nome_and_registrar_log(tmp_path, monkeypatch):
 
     content = log_path.read_text(encoding="utf-8")
     assert "12345678901" not in content
+
+
+class _FakePage:
+    def __init__(self):
+        self.gotos = []
+        self.closed = False
+
+    def goto(self, url, **_kwargs):
+        self.gotos.append(url)
+
+    def is_closed(self):
+        return self.closed
+
+
+class _FakeBrowser:
+    def __init__(self, page):
+        self._page = page
+        self.closed = False
+
+    def new_context(self, **kwargs):
+        self.context_kwargs = kwargs
+        context = types.SimpleNamespace(new_page=lambda: self._page, storage_state=lambda: {"cookies": ["sessao"], "origins": []})
+        self._page.context = context
+        return context
+
+    def close(self):
+        self.closed = True
+
+
+class _FakePlaywright:
+    def __init__(self):
+        self.launches = []
+        self.stopped = False
+        self.chromium = types.SimpleNamespace(launch=self._launch)
+
+    def _launch(self, **_kwargs):
+        browser = _FakeBrowser(_FakePage())
+        self.launches.append(browser)
+        return browser
+
+    def start(self):
+        return self
+
+    def stop(self):
+        self.stopped = True
+
+
+def _sessao_falsa(monkeypatch, busca_ok=lambda: True, **kwargs):
+    import rpa_yube
+
+    pw = _FakePlaywright()
+    chamadas = {"login": 0, "filtro": 0, "arquivos": [], "threads": set()}
+
+    def _login(page):
+        chamadas["login"] += 1
+        return page
+
+    def _processar(_page, f):
+        chamadas["arquivos"].append(os.path.basename(f))
+        chamadas["threads"].add(threading.current_thread().name)
+        return True
+
+    def _busca(_page):
+        def _wait_for(timeout=None):
+            if not busca_ok():
+                raise RuntimeError("timeout")
+        return types.SimpleNamespace(wait_for=_wait_for, count=lambda: 1)
+
+    monkeypatch.setattr(rpa_yube, "login", _login)
+    monkeypatch.setattr(rpa_yube, "filtrar_todas_obras", lambda _page: chamadas.__setitem__("filtro", chamadas["filtro"] + 1))
+    monkeypatch.setattr(rpa_yube, "processar_arquivo", _processar)
+    monkeypatch.setattr(rpa_yube, "SEL_BUSCA", _busca)
+    return rpa_yube.YubeSession(playwright_factory=lambda: pw, **kwargs), pw, chamadas
+
+
+def test_sessao_yube_abre_um_navegador_para_varios_lotes(monkeypatch):
+    import rpa_yube
+
+    sessao, pw, chamadas = _sessao_falsa(monkeypatch)
+    assert pw.launches == []
+
+    anterior = rpa_yube.use_session(sessao)
+    try:
+        lotes = []
+        for n in range(3):
+            # Cada email chega de uma thread (COM/RPA); o navegador fica na thread da sessao.
+            t = threading.Thread(target=lambda n=n: lotes.append(rpa_yube.run_from_main("pasta", files_to_process=[f"C:/x/{n}.pdf"])))
+            t.start()
+            t.join()
+    finally:
+        rpa_yube.use_session(anterior)
+        sessao.close()
+
+    assert len(pw.launches) == 1 and chamadas["login"] == 1
+    assert sorted(chamadas["arquivos"]) == ["0.pdf", "1.pdf", "2.pdf"]
+    assert all(lote["sucessos"] for lote in lotes)
+    assert chamadas["threads"] == {"aso-yube_0"}
+    assert pw.launches[0].closed and pw.stopped
+    assert sessao.as_dict() == {"launches": 1, "logins": 1, "relogins": 0, "batches": 3, "files": 3}
+
+
+def test_sessao_yube_refaz_login_so_quando_expira(monkeypatch):
+    respostas = iter([True, False, True])
+    sessao, pw, chamadas = _sessao_falsa(monkeypatch, busca_ok=lambda: next(respostas), lazy=False)
+    try:
+        for n in range(4):
+            sessao.process("pasta", specific_files=[f"C:/x/{n}.pdf"])
+    finally:
+        sessao.close()
+
+    # lazy=False: o login ja aconteceu na criacao; o 1o lote nao navega, o 3o encontra a sessao expirada.
+    assert len(pw.launches) == 1
+    assert chamadas["login"] == 2
+    assert sessao.relogins == 1
+    assert len(pw.launches[0]._page.gotos) == 3
+
+
+def test_sessao_yube_reaproveita_storage_state_salvo_e_pula_login(tmp_path, monkeypatch):
+    import auth_state
+
+    monkeypatch.setattr(auth_state, "win32crypt", None)
+    store = auth_state.AuthStateStore(str(tmp_path / "yube_state.json"), allow_plaintext=True)
+
+    # 1a execucao: sem estado salvo -> login completo, estado guardado.
+    sessao, pw, chamadas = _sessao_falsa(monkeypatch, auth_state=store)
+    sessao.process("pasta", specific_files=["C:/x/1.pdf"])
+    sessao.close()
+    assert chamadas["login"] == 1
+    assert store.load() == {"cookies": ["sessao"], "origins": []}
+
+    # 2a execucao: contexto criado com o estado e a sonda acha a busca -> sem login.
+    sessao, pw, chamadas = _sessao_falsa(monkeypatch, auth_state=store)
+    sessao.process("pasta", specific_files=["C:/x/2.pdf"])
+    sessao.close()
+    assert chamadas["login"] == 0
+    assert pw.launches[0].context_kwargs["storage_state"] == {"cookies": ["sessao"], "origins": []}
+    assert sessao.logins == 0
+
+    # 3a execucao: estado recusado pela sonda -> login completo e estado regravado.
+    respostas = iter([False, True])
+    sessao, pw, chamadas = _sessao_falsa(monkeypatch, busca_ok=lambda: next(respostas, True), auth_state=store)
+    sessao.process("pasta", specific_files=["C:/x/3.pdf"])
+    sessao.close()
+    assert chamadas["login"] == 1
+    assert store.as_dict() == {"hits": 1, "misses": 1, "absent": 1, "saves": 2, "hit_rate": 0.333}
+    assert sessao.as_dict()["auth_state"]["hits"] == 1
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sync_state import SyncState
+
+
+def test_marca_dagua_avanca_e_guarda_ids_da_fronteira(tmp_path):
+    path = tmp_path / "json" / "sync_state.json"
+    key = SyncState.folder_key("STORE", "\\\\Aso\\Inbox")
+    t0 = datetime(2026, 3, 2, 10, 0, 0)
+
+    state = SyncState(str(path))
+    state.advance(key, t0, "A")
+    state.advance(key, t0, "B")
+    state.advance(key, t0 - timedelta(minutes=5), "VELHO")
+    state.save()
+
+    recarregado = SyncState(str(path))
+    assert recarregado.watermark(key) == (t0, {"A", "B"})
+    assert recarregado.ja_sincronizada(key, t0 - timedelta(seconds=1), "X")
+    assert recarregado.ja_sincronizada(key, t0, "A")
+    assert not recarregado.ja_sincronizada(key, t0, "C")
+    assert not recarregado.ja_sincronizada(key, t0 + timedelta(seconds=1), "A")
+
+    recarregado.advance(key, t0 + timedelta(seconds=1), "C")
+    assert recarregado.watermark(key) == (t0 + timedelta(seconds=1), {"C"})
+
+
+def test_estado_corrompido_ou_reset_recomeca_do_zero(tmp_path):
+    path = tmp_path / "sync_state.json"
+    path.write_text("{nao e json", encoding="utf-8")
+    state = SyncState(str(path))
+    assert state.watermark("k") == (None, set())
+
+    state.advance("k", datetime(2026, 1, 1), "A")
+    state.reset("k")
+    assert state.watermark("k") == (None, set())
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import subprocess
+
+import pytest
+
+import time_budget
+
+
+def test_time_budget_limits_and_call_timeout(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time_budget.time, "monotonic", lambda: now[0])
+
+    budget = time_budget.TimeBudget(10, etapa="OCR pagina 1")
+    assert budget.call_timeout(60) == 10
+    assert budget.call_timeout(0) == 10
+
+    now[0] += 7
+    assert budget.call_timeout(60) == pytest.approx(3)
+    assert not budget.expired()
+
+    now[0] += 5
+    assert budget.expired()
+    with pytest.raises(time_budget.TempoEsgotado) as exc:
+        budget.check()
+    assert exc.value.elapsed == pytest.approx(12)
+    assert exc.value.etapa == "OCR pagina 1"
+
+
+def test_time_budget_unlimited():
+    budget = time_budget.TimeBudget(0)
+    assert budget.ilimitado
+    assert budget.remaining() is None
+    assert budget.call_timeout(30) == 30
+    assert budget.expired() is False
+    budget.check()
+
+
+def test_eh_timeout():
+    class PDFPopplerTimeoutError(Exception):
+        pass
+
+    assert time_budget.eh_timeout(RuntimeError("Tesseract process timeout"))
+    assert time_budget.eh_timeout(PDFPopplerTimeoutError("Run poppler timeout."))
+    assert time_budget.eh_timeout(time_budget.TempoEsgotado("ocr", 1, 1))
+    assert time_budget.eh_timeout(subprocess.TimeoutExpired(["pdftoppm"], 5))
+    assert not time_budget.eh_timeout(ValueError("x"))
+    # Outros RuntimeError com "timeout" na mensagem nao sao timeout do processo filho.
+    assert not time_budget.eh_timeout(RuntimeError("Yube: login timeout"))
+    assert not time_budget.eh_timeout(RuntimeError("timeout"))